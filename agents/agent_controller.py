@@ -5,6 +5,7 @@ import json
 import time
 from typing import Dict, Any, Optional, List
 from .utils.logger import Logger
+from .utils.model_router import ModelCascade
 from .planner_agent import PlannerAgent
 from .developer_agent import DeveloperAgent
 from .qa_agent import QAAgent
@@ -121,6 +122,9 @@ class AgentController:
             }
         }
         
+        # Model tier the planner left the ticket on; low confidence and failed tests move it up
+        cascade = ModelCascade.from_dict(task_plan.get("model_routing"))
+        
         attempt = 1
         success = False
         
@@ -147,11 +151,17 @@ class AgentController:
             
             developer_input = {
                 **task_plan,
-                "context": context
+                "context": context,
+                "model_routing": cascade.to_dict()
             }
             
             patch_data = await self._run_agent(self.developer_agent, developer_input)
             
+            # The developer's calls were recorded on its copy of the cascade
+            if patch_data.get("model_routing"):
+                cascade = ModelCascade.from_dict(patch_data["model_routing"])
+            result["analytics"]["model_routing"] = cascade.summary()
+            
             # Get or estimate confidence score for this patch
             confidence_score = patch_data.get("confidence_score", 75)  # Default if not provided
             
@@ -165,6 +175,19 @@ class AgentController:
                 "output": patch_data
             }
             
+            # A cheaper model's low-confidence patch is regenerated on the next tier instead of escalated
+            if confidence_score < self.confidence_threshold and cascade.escalate(
+                    "developer", f"confidence {confidence_score}% below {self.confidence_threshold}%"):
+                self.logger.warning(f"Low confidence score ({confidence_score}%), retrying with {cascade.model}")
+                result["analytics"]["model_routing"] = cascade.summary()
+                attempt_result["model_escalation"] = cascade.model
+                attempt_result["end_time"] = time.time()
+                attempt_result["duration"] = attempt_result["end_time"] - attempt_result["start_time"]
+                attempt_result["success"] = False
+                result["fix_attempts"].append(attempt_result)
+                attempt += 1
+                continue
+            
             # Check for low confidence early escalation
             if confidence_score < self.confidence_threshold:
                 self.logger.warning(f"Low confidence score ({confidence_score}%) detected, escalating early")
@@ -346,6 +369,10 @@ class AgentController:
                 
                 # Update previous failure summary for pattern detection
                 previous_failure_summary = current_failure_summary
+                
+                # The next attempt uses a stronger model if there is one
+                if cascade.escalate("qa", f"tests failed: {current_failure_summary[:200] or 'unknown failure'}"):
+                    result["analytics"]["model_routing"] = cascade.summary()
             else:
                 # If successful, clear the QA failure summaries
                 context["previous_attempts"] = []
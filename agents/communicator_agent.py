@@ -5,6 +5,8 @@ from typing import Dict, Any, Optional, List
 from .utils.logger import Logger
 from .utils.jira_client import JiraClient
 from .utils.github_client import GitHubClient
+from .utils.git_publisher import GIT_PUBLISH_BACKEND, GitWorktreePublisher
+from .utils.progress_state import ProgressCommentState
 
 class CommunicatorAgent:
     """
@@ -20,12 +22,19 @@ class CommunicatorAgent:
         try:
             self.jira_client = JiraClient()
             self.github_client = GitHubClient()
+            # With GIT_PUBLISH_BACKEND=git fixes are pushed from the local clone instead of the REST API
+            self.publisher = GitWorktreePublisher(token=self.github_client.github_token)
             # Check if we're configured to use only the default branch
             self.use_default_branch_only = os.environ.get("GITHUB_USE_DEFAULT_BRANCH_ONLY", "False").lower() == "true"
             self.default_branch = os.environ.get("GITHUB_DEFAULT_BRANCH", "main")
+            # Post each attempt's progress as a new comment (false) or edit one status comment per ticket (true)
+            self.progress_comments_enabled = os.environ.get("JIRA_PROGRESS_COMMENTS", "true").lower() == "true"
         except Exception as e:
             self.logger.error(f"Error initializing API clients: {str(e)}")
             raise
+        
+        # Edit-in-place progress comment per ticket, kept across restarts
+        self.progress_comments = ProgressCommentState()
             
     def run(self, communication_task: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -165,22 +174,54 @@ class CommunicatorAgent:
         else:
             comment += "⚠️ No QA results available\n"
         
+        if attempt == 1:
+            # A new run gets its own progress comment and starts from whatever status the ticket has in JIRA now
+            self.progress_comments.reset(ticket_id)
+        
         # Post the comment to JIRA
-        self.jira_client.add_comment(ticket_id, comment)
-        result["jira_updated"] = True
+        if self.progress_comments_enabled:
+            result["jira_updated"] = self._update_progress_comment(ticket_id, comment)
+        else:
+            self.jira_client.add_comment(ticket_id, comment)
+            result["jira_updated"] = True
         result["comments_added"].append(comment)
         
         # Update ticket status based on result
+        progress = self.progress_comments.get(ticket_id)
         if success:
             self.jira_client.update_ticket(ticket_id, "In Review", "Fix implemented, awaiting PR creation")
             result["ticket_status"] = "In Review"
         else:
             status = "In Progress" if attempt < max_retries else "Needs Review"
-            self.jira_client.update_ticket(ticket_id, status, "")
+            # Repeating the same transition every attempt costs two requests for nothing
+            if status != progress["status"]:
+                self.jira_client.update_ticket(ticket_id, status, "")
             result["ticket_status"] = status
+        progress["status"] = result["ticket_status"]
+        self.progress_comments.save(ticket_id)
             
         return result
     
+    def _update_progress_comment(self, ticket_id: str, section: str) -> bool:
+        """
+        Append an attempt's report to the ticket's progress comment and edit it in place
+        
+        The comment shows the latest JIRA_PROGRESS_MAX_SECTIONS reports and counts the rest.
+        
+        Returns:
+            True if JIRA shows the updated comment
+        """
+        progress = self.progress_comments.add_section(ticket_id, section.strip())
+        text = self.progress_comments.render(ticket_id)
+        
+        comment_id = self.jira_client.upsert_comment(ticket_id, text, progress["comment_id"])
+        if comment_id is None:
+            self.progress_comments.save(ticket_id)
+            return False
+        progress["comment_id"] = comment_id or None
+        self.progress_comments.save(ticket_id)
+        return True
+    
     def _handle_early_escalation(
         self,
         ticket_id: str,
@@ -248,8 +289,9 @@ class CommunicatorAgent:
         branch_name = self.default_branch if self.use_default_branch_only else f"bugfix/{ticket_id.lower()}"
         self.logger.info(f"Using branch {branch_name} for fix")
         
-        # Only create a branch if we're not using the default branch only mode
-        if not self.use_default_branch_only:
+        # Only create a branch if we're not using the default branch only mode;
+        # the git backend creates it with its push
+        if not self.use_default_branch_only and GIT_PUBLISH_BACKEND != "git":
             branch_created = self.github_client.create_branch(branch_name)
             if not branch_created:
                 self.logger.error(f"Failed to create branch {branch_name}")
@@ -263,13 +305,26 @@ class CommunicatorAgent:
         patched_files = patch_data.get("patched_files", [])
         patch_content = patch_data.get("patch_content", "")
         
-        # Apply the patch via GitHub API
-        commit_success = self.github_client.commit_patch(
-            branch_name=branch_name,
-            patch_content=patch_content,
-            commit_message=commit_message,
-            patch_file_paths=patched_files
-        )
+        file_contents = patch_data.get("patched_code")
+        if GIT_PUBLISH_BACKEND == "git":
+            # One commit in a worktree of the local clone and one push
+            file_changes = [{"filename": path, "content": content} for path, content in (file_contents or {}).items()]
+            commit_success = self.publisher.publish(
+                branch_name,
+                commit_message,
+                file_changes=file_changes or None,
+                patch=None if file_changes else patch_content,
+                base_branch=self.default_branch
+            ) is not None
+        else:
+            # Apply the patch via GitHub API, as one commit when the patched files are available
+            commit_success = self.github_client.commit_patch(
+                branch_name=branch_name,
+                patch_content=patch_content,
+                commit_message=commit_message,
+                patch_file_paths=patched_files,
+                file_contents=file_contents
+            )
         
         if not commit_success:
             self.logger.error("Failed to commit changes")
@@ -1,12 +1,12 @@
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import os
+import asyncio
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-import openai
-from openai import OpenAI
+from utils.llm_gateway import get_llm_gateway, priority_for_ticket
+from utils.model_router import model_for_attempt
 
 # Configure logging
 logging.basicConfig(
@@ -15,8 +15,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger("developer-agent")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Completions go through the gateway shared by every agent in the process, created on first use
+gateway = None
+
+def get_gateway():
+    """Get the LLM gateway, creating it (and opening its cache) on the first completion"""
+    global gateway
+    if gateway is None:
+        gateway = get_llm_gateway()
+    return gateway
 
 app = FastAPI(title="BugFix AI Developer Agent")
 
@@ -30,6 +37,14 @@ class TicketDetails(BaseModel):
     description: str
     reproduction_steps: Optional[str]
     acceptance_criteria: Optional[str]
+    priority: Optional[str] = None
+    # Set to pin the model; otherwise each retry moves one tier up LLM_MODEL_TIERS
+    model: Optional[str] = None
+
+class GenerationOptions(BaseModel):
+    # Set per speculative candidate, so that candidates explore different fixes
+    temperature: Optional[float] = None
+    strategy: Optional[str] = None
 
 class FileDiff(BaseModel):
     filename: str
@@ -46,8 +61,56 @@ class DeveloperResponse(BaseModel):
     attempt: int
     analysis_summary: str
 
-def analyze_with_gpt4(analysis: PlannerAnalysis, ticket: TicketDetails, attempt: int) -> Dict[str, Any]:
+async def generate_file_diff(file: str, solution: str, model: str, priority: int) -> FileDiff:
+    """
+    Generate the diff for one affected file from the overall solution
+
+    Args:
+        file: Path of the file
+        solution: The analysis with the code changes for all files
+        model: Model to use
+        priority: Gateway lane of the ticket
+
+    Returns:
+        The file's diff
+
+    Raises:
+        Exception: If the completion failed
+    """
+    file_prompt = f"Generate specific changes for file {file}:\n{solution}"
+    diff_content = await get_gateway().complete(
+        model=model,
+        messages=[
+            {"role": "system", "content": "Generate a precise git-style diff for the file."},
+            {"role": "user", "content": file_prompt}
+        ],
+        temperature=0.1,
+        max_tokens=4000,
+        priority=priority
+    )
+    if diff_content is None:
+        raise Exception(f"OpenAI request failed for {file}")
+    # Count lines added/removed (simplified)
+    lines_added = len([l for l in diff_content.split('\n') if l.startswith('+')])
+    lines_removed = len([l for l in diff_content.split('\n') if l.startswith('-')])
+    
+    return FileDiff(
+        filename=file,
+        diff=diff_content,
+        lines_added=lines_added,
+        lines_removed=lines_removed,
+        explanation=f"Changes in {file} to address the root cause"
+    )
+
+async def analyze_with_gpt4(analysis: PlannerAnalysis, ticket: TicketDetails, attempt: int,
+                           options: Optional[GenerationOptions] = None) -> Dict[str, Any]:
     """Use GPT-4 to analyze the bug and generate a fix"""
+    options = options or GenerationOptions()
+    strategy = f"\n        Strategy: {options.strategy}\n" if options.strategy else ""
+    priority = priority_for_ticket(ticket.priority)
+    # The first attempt goes to the cheapest model; the caller retries failed fixes with a higher attempt
+    model = ticket.model or model_for_attempt(attempt)
+    logger.info(f"Using {model} for attempt {attempt}")
     try:
         prompt = f"""
         Analyze this bug and generate a fix:
@@ -74,50 +137,51 @@ def analyze_with_gpt4(analysis: PlannerAnalysis, ticket: TicketDetails, attempt:
         1. Precise code changes needed to fix the bug
         2. Clear explanation of what is being changed and why
         3. Ensure changes match the codebase style
-        """
+        {strategy}"""
 
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        solution = await get_gateway().complete(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are an expert code reviewer and bug fixer. Generate minimal, precise code changes."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.2
+            temperature=options.temperature if options.temperature is not None else 0.2,
+            max_tokens=4000,
+            priority=priority
         )
-
-        # Parse GPT-4's response to extract code changes and explanations
-        solution = response.choices[0].message.content
+        if solution is None:
+            raise Exception("OpenAI request failed")
         
         # Process the solution into structured diffs
         # This is a simplified version - in production you'd want more robust parsing
-        diffs = []
-        for file in analysis.affected_files:
-            # Generate specific diff for each affected file
-            file_prompt = f"Generate specific changes for file {file}:\n{solution}"
-            file_response = client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "Generate a precise git-style diff for the file."},
-                    {"role": "user", "content": file_prompt}
-                ],
-                temperature=0.1
+        # All files are requested at once; the gateway's LLM_MAX_IN_FLIGHT limit decides how many run together
+        diffs: Dict[str, FileDiff] = {}
+        pending = list(analysis.affected_files)
+        # Files whose diff failed are retried once; a fix missing a file's changes is never returned
+        for round_number in range(2):
+            results = await asyncio.gather(
+                *(generate_file_diff(file, solution, model, priority) for file in pending),
+                return_exceptions=True
+            )
+            failed_files = []
+            for file, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Diff generation failed for {file} (try {round_number + 1}): {str(result)}")
+                    failed_files.append(file)
+                else:
+                    diffs[file] = result
+            if not failed_files:
+                break
+            pending = failed_files
+        if failed_files:
+            raise Exception(
+                f"OpenAI requests failed for {len(failed_files)} of {len(analysis.affected_files)} files "
+                f"after a retry, failed_files: {', '.join(failed_files)}"
             )
-            
-            diff_content = file_response.choices[0].message.content
-            # Count lines added/removed (simplified)
-            lines_added = len([l for l in diff_content.split('\n') if l.startswith('+')])
-            lines_removed = len([l for l in diff_content.split('\n') if l.startswith('-')])
-            
-            diffs.append(FileDiff(
-                filename=file,
-                diff=diff_content,
-                lines_added=lines_added,
-                lines_removed=lines_removed,
-                explanation=f"Changes in {file} to address the root cause"
-            ))
 
         return {
-            "diffs": diffs,
+            # Back in the order of affected_files
+            "diffs": [diffs[file] for file in analysis.affected_files],
             "analysis_summary": solution
         }
         
@@ -130,12 +194,13 @@ async def root():
     return {"message": "Developer Agent is running", "status": "healthy"}
 
 @app.post("/generate-fix", response_model=DeveloperResponse)
-async def generate_fix(analysis: PlannerAnalysis, ticket: TicketDetails, attempt: int = 1):
+async def generate_fix(analysis: PlannerAnalysis, ticket: TicketDetails, attempt: int = 1,
+                       options: Optional[GenerationOptions] = None):
     logger.info(f"Generating fix for ticket {analysis.ticket_id} (attempt {attempt})")
     
     try:
         # Generate fix using GPT-4
-        solution = analyze_with_gpt4(analysis, ticket, attempt)
+        solution = await analyze_with_gpt4(analysis, ticket, attempt, options)
         
         response = DeveloperResponse(
             ticket_id=analysis.ticket_id,
@@ -2,10 +2,14 @@
 import os
 import time
 import json
-from typing import Dict, Any, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 import openai
 from .utils.logger import Logger
+from .utils.context_packer import CONTEXT_HISTORY_TOKEN_BUDGET, ContextPacker, truncate_to_tokens
+from .utils.model_router import ModelCascade
 from .utils.openai_client import OpenAIClient
+from .utils.patch_stream import StreamingPatchParser
+from .utils.ticket_cleaner import StackTraceExtractor
 
 class DeveloperAgent:
     """
@@ -13,21 +17,27 @@ class DeveloperAgent:
     Uses GPT-4 to generate code patches and handles multiple retry attempts.
     """
     
-    def __init__(self, max_retries: int = 4):
+    def __init__(self, max_retries: int = 4, on_file_ready: Optional[Callable[[str, str], Any]] = None):
         """
         Initialize the developer agent
         
         Args:
             max_retries: Maximum number of retry attempts for generating a successful patch
+            on_file_ready: Called with (file_path, diff) as soon as a file's diff has been generated,
+                while the rest of the patch is still being written, e.g. to start preparing QA
         """
         self.logger = Logger("developer_agent")
         self.max_retries = max_retries
+        self.on_file_ready = on_file_ready
         
         # Get repo path from environment
         self.repo_path = os.environ.get("REPO_PATH", "/mnt/codebase")
         
         # Initialize OpenAI client
         self.openai_client = OpenAIClient()
+        
+        # Keeps the files in the prompt to the chunks most relevant to the bug
+        self.context_packer = ContextPacker()
 
         # Get patch mode from environment (intelligent, line-by-line, direct)
         self.patch_mode = os.environ.get("PATCH_MODE", "line-by-line")
@@ -60,16 +70,20 @@ class DeveloperAgent:
         attempt = context.get("attempt", 1)
         previous_attempts = context.get("previousAttempts", [])
             
-        self.logger.info(f"Starting fix attempt {attempt}/{self.max_retries}")
+        # The ticket's model tier and call record, handed back to the controller with the patch
+        cascade = ModelCascade.from_dict(task_plan.get("model_routing"))
+            
+        self.logger.info(f"Starting fix attempt {attempt}/{self.max_retries} using {cascade.model}")
         
         try:
             # Generate the fix using OpenAI
-            patch_data = self.generate_fix(task_plan, attempt, previous_attempts)
+            patch_data = self.generate_fix(task_plan, attempt, previous_attempts, cascade)
             
             # Add metadata
             patch_data["attempt"] = attempt
             patch_data["ticket_id"] = ticket_id
             patch_data["patch_mode"] = self.patch_mode
+            patch_data["model_routing"] = cascade.to_dict()
             
             # Save patch to file
             patch_file_path = f"logs/patch_{ticket_id}_attempt_{attempt}.patch"
@@ -97,11 +111,13 @@ class DeveloperAgent:
                 "commit_message": "",
                 "attempt": attempt,
                 "ticket_id": ticket_id,
+                "model_routing": cascade.to_dict(),
                 "success": False
             }
             
     def generate_fix(self, task_plan: Dict[str, Any], attempt: int = 1, 
-                     previous_attempts: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+                     previous_attempts: List[Dict[str, Any]] = None,
+                     cascade: Optional[ModelCascade] = None) -> Dict[str, Any]:
         """
         Generate a code fix based on the task plan using GPT-4
         
@@ -109,6 +125,7 @@ class DeveloperAgent:
             task_plan: The task plan from PlannerAgent
             attempt: Current attempt number
             previous_attempts: List of previous attempts and their results
+            cascade: The ticket's model cascade; the call goes to its current model
             
         Returns:
             Dictionary with patch information
@@ -117,20 +134,33 @@ class DeveloperAgent:
             previous_attempts = []
             
         # Read file contents for the files identified in the task plan
-        file_contents = self._read_identified_files(task_plan.get("files", []))
+        full_contents = self._read_identified_files(task_plan.get("files", []))
+        file_contents = self._pack_context(task_plan, full_contents, previous_attempts)
+        # Files the packer cut down to numbered excerpts can't be reproduced whole
+        packed_files = [path for path, content in file_contents.items() if content != full_contents.get(path)]
         
         # Create prompt for GPT-4
-        prompt = self._create_developer_prompt(task_plan, file_contents, previous_attempts)
+        prompt = self._create_developer_prompt(task_plan, file_contents, previous_attempts, packed_files)
         
-        # Get code fix from GPT-4
+        # Get code fix from GPT-4, checking the patch as it is written so a bad answer is stopped early
         self.logger.info(f"Sending prompt to GPT-4 for code generation (attempt {attempt})")
-        response = self.openai_client.generate_completion(prompt)
+        parser = StreamingPatchParser(on_file_ready=self._file_ready)
+        response = self.openai_client.generate_completion_stream(prompt, parser.feed, cascade=cascade)
         
+        if parser.abort_reason:
+            raise Exception(f"Abandoned code generation on attempt {attempt}: {parser.abort_reason}")
         if not response:
             raise Exception(f"Failed to generate code fix. OpenAI API call failed on attempt {attempt}.")
+        parser.finish()
         
         # Parse the response to extract the patch content
         return self._extract_patch(response, task_plan)
+        
+    def _file_ready(self, file_path: str, diff: str) -> None:
+        """Pass a file's diff on while the rest of the patch is still being generated"""
+        self.logger.info(f"Diff for {file_path} is complete")
+        if self.on_file_ready is not None:
+            self.on_file_ready(file_path, diff)
             
     def _read_identified_files(self, files: List[Dict[str, Any]]) -> Dict[str, str]:
         """
@@ -162,9 +192,42 @@ class DeveloperAgent:
                 
         return file_contents
         
+    def _pack_context(self, task_plan: Dict[str, Any], file_contents: Dict[str, str],
+                      previous_attempts: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Reduce the files to the parts most relevant to the bug, within the context token budget
+        
+        Args:
+            task_plan: The task plan from PlannerAgent
+            file_contents: Dictionary mapping file paths to their contents
+            previous_attempts: List of previous fix attempts and their results
+            
+        Returns:
+            Dictionary mapping file paths to their packed contents
+        """
+        description = task_plan.get("description", "") or ""
+        traces = StackTraceExtractor.extract_stack_traces(description)
+        if task_plan.get("stack_trace"):
+            traces.append(task_plan["stack_trace"])
+        # The last test run's failure points at the code the next attempt has to change
+        if previous_attempts:
+            qa_results = previous_attempts[-1].get("qa_results", {})
+            traces.append(qa_results.get("failure_summary") or qa_results.get("error_message") or "")
+        
+        ticket_text = "\n".join(str(task_plan.get(key) or "") for key in (
+            "title", "description", "bug_summary", "root_cause", "approach", "implementation_details"
+        ))
+        return self.context_packer.pack(
+            file_contents,
+            stack_trace="\n".join(traces),
+            error_type=task_plan.get("error_type", "") or "",
+            ticket_text=ticket_text
+        )
+        
     def _create_developer_prompt(self, task_plan: Dict[str, Any], 
                               file_contents: Dict[str, str],
-                              previous_attempts: List[Dict[str, Any]]) -> str:
+                              previous_attempts: List[Dict[str, Any]],
+                              packed_files: Optional[List[str]] = None) -> str:
         """
         Create a prompt for GPT-4 to generate a code fix
         
@@ -172,6 +235,7 @@ class DeveloperAgent:
             task_plan: The task plan from PlannerAgent
             file_contents: Dictionary mapping file paths to their contents
             previous_attempts: List of previous fix attempts and their results
+            packed_files: Files shown as numbered excerpts, for which the patch must contain hunks only
             
         Returns:
             Prompt for GPT-4
@@ -192,8 +256,8 @@ class DeveloperAgent:
         
         """
         
-        # Add file contents section
-        prompt += "\nHere are the contents of the relevant files:\n\n"
+        # Add file contents section; long files are cut down to their relevant parts
+        prompt += "\nHere are the contents of the relevant files (omitted lines are marked, line numbers are exact):\n\n"
         
         for file_path, content in file_contents.items():
             prompt += f"--- {file_path} ---\n"
@@ -204,12 +268,21 @@ class DeveloperAgent:
         if previous_attempts:
             prompt += "\nPrevious fix attempts:\n\n"
             
+            # Half the history budget for the latest patch, the rest shared by the test failures
+            failure_budget = CONTEXT_HISTORY_TOKEN_BUDGET // (2 * len(previous_attempts))
+            
             for i, attempt in enumerate(previous_attempts):
                 prompt += f"Attempt {i+1}:\n"
                 
-                # Add patch content if available
+                # Add patch content if available; earlier patches only by the files they touched
                 if "patch_content" in attempt:
-                    prompt += f"Patch:\n{attempt['patch_content']}\n"
+                    if i == len(previous_attempts) - 1:
+                        patch = truncate_to_tokens(attempt["patch_content"], CONTEXT_HISTORY_TOKEN_BUDGET // 2)
+                        prompt += f"Patch:\n{patch}\n"
+                    else:
+                        patched = [line[6:].strip() for line in attempt["patch_content"].split("\n")
+                                   if line.startswith("+++ b/")]
+                        prompt += f"Patched files: {', '.join(patched) or 'unknown'}\n"
                 
                 # Add QA results and failure summary
                 if "qa_results" in attempt:
@@ -219,9 +292,11 @@ class DeveloperAgent:
                     if not passed:
                         # Add more detailed QA failure information
                         if "failure_summary" in attempt["qa_results"]:
-                            prompt += f"Test Failure Summary:\n{attempt['qa_results']['failure_summary']}\n"
+                            summary = truncate_to_tokens(attempt["qa_results"]["failure_summary"], failure_budget)
+                            prompt += f"Test Failure Summary:\n{summary}\n"
                         elif "error_message" in attempt["qa_results"]:
-                            prompt += f"Error: {attempt['qa_results']['error_message']}\n"
+                            error = truncate_to_tokens(attempt["qa_results"]["error_message"], failure_budget)
+                            prompt += f"Error: {error}\n"
                 
                 prompt += "\n"
                 
@@ -240,7 +315,16 @@ class DeveloperAgent:
         Please implement a fix for the bug based on the analysis and file contents above.
         
         Provide your solution in the form of a unified diff/patch format. Include the entire file content
-        for each modified file, not just the changes. Format your response like this:
+        for each modified file, not just the changes.
+        """
+        if packed_files:
+            prompt += f"""
+        These files were shown as numbered excerpts: {', '.join(packed_files)}. For them, do not
+        reproduce the file; give hunks that change only the lines you need to, with a few unchanged
+        context lines taken from the excerpts and their exact line numbers. Never write out omitted lines.
+        """
+        prompt += """
+        Format your response like this:
         
         ```patch
         --- a/path/to/file1.py
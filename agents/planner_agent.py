@@ -3,8 +3,9 @@ import os
 import json
 import re
 from typing import Dict, Any, List, Optional, Tuple
-import openai
 from .utils.logger import Logger
+from .utils.llm_gateway import PRIORITY_NORMAL, get_llm_gateway, priority_for_ticket
+from .utils.model_router import ModelCascade
 from .utils.ticket_cleaner import TicketCleaner, StackTraceExtractor, RepositoryValidator
 
 class PlannerAgent:
@@ -23,7 +24,8 @@ class PlannerAgent:
             self.logger.error("Missing OpenAI API key")
             raise EnvironmentError("Missing OPENAI_API_KEY environment variable")
         
-        openai.api_key = self.api_key
+        # Completions go through the gateway shared by every agent in the process
+        self.gateway = get_llm_gateway(self.api_key)
         
         # Initialize repository validator
         self.repo_validator = RepositoryValidator()
@@ -82,10 +84,17 @@ class PlannerAgent:
             
             # Step 4: Get analysis from GPT with retry mechanism
             self.logger.info(f"Sending ticket {ticket_id} to GPT for analysis")
-            gpt_response = self._query_gpt_with_retry(prompt)
+            priority = priority_for_ticket(ticket_data.get("priority"))
             
-            # Step 5: Validate GPT response
-            is_valid, parsed_data, error_message = self._validate_gpt_response(gpt_response)
+            # Routing state for the ticket's LLM calls, continued by the developer/QA loop
+            cascade = ModelCascade.from_dict(ticket_data.get("model_routing"))
+            while True:
+                gpt_response = self._query_gpt_with_retry(prompt, priority=priority, cascade=cascade)
+                
+                # Step 5: Validate GPT response; a cheaper model's invalid answer goes to the next tier
+                is_valid, parsed_data, error_message = self._validate_gpt_response(gpt_response)
+                if (is_valid and parsed_data) or not cascade.escalate("planner", error_message):
+                    break
             
             if is_valid and parsed_data:
                 # Step 6: Validate affected files against repository structure
@@ -109,6 +118,8 @@ class PlannerAgent:
                 # Use fallback mechanism
                 output = self._generate_fallback_output(ticket_id, description)
             
+            output["model_routing"] = cascade.to_dict()
+            
             self.logger.info(f"Planning complete for ticket {ticket_id}")
             self.logger.end_task(f"Planning for ticket {ticket_id}", success=True)
             
@@ -263,13 +274,16 @@ class PlannerAgent:
         {description}
         """
         
-    def _query_gpt_with_retry(self, prompt: str, max_retries: int = 1) -> str:
+    def _query_gpt_with_retry(self, prompt: str, max_retries: int = 1, priority: int = PRIORITY_NORMAL,
+                              cascade: Optional[ModelCascade] = None) -> str:
         """
         Query GPT with automatic retry on failure
         
         Args:
             prompt: The prompt to send to GPT
             max_retries: Maximum number of retries (default: 1)
+            priority: Gateway lane for the request
+            cascade: The ticket's model cascade, which picks the model and records the call
             
         Returns:
             The GPT response text
@@ -280,7 +294,8 @@ class PlannerAgent:
         while attempts < max_attempts:
             try:
                 self.logger.info(f"Querying GPT (attempt {attempts + 1}/{max_attempts})")
-                response = self._query_gpt(prompt)
+                # A cached answer that wasn't JSON would come back again on a retry
+                response = self._query_gpt(prompt, priority, use_cache=attempts == 0, cascade=cascade)
                 
                 # Check if response looks like valid JSON
                 if response and ('{' in response and '}' in response):
@@ -300,23 +315,26 @@ class PlannerAgent:
         # Return whatever we have after max attempts
         return response if 'response' in locals() else ""
         
-    def _query_gpt(self, prompt: str) -> str:
-        """Query GPT with the given prompt"""
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a senior software developer tasked with analyzing bug tickets and extracting structured information."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            self.logger.error(f"Error querying GPT: {str(e)}")
-            raise
+    def _query_gpt(self, prompt: str, priority: int = PRIORITY_NORMAL, use_cache: bool = True,
+                   cascade: Optional[ModelCascade] = None) -> str:
+        """Query GPT with the given prompt, on the cascade's current model"""
+        cascade = cascade or ModelCascade()
+        response = cascade.complete_sync(
+            self.gateway,
+            "planner",
+            [
+                {"role": "system", "content": "You are a senior software developer tasked with analyzing bug tickets and extracting structured information."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=2000,
+            priority=priority,
+            use_cache=use_cache
+        )
+        if response is None:
+            self.logger.error("Error querying GPT: the request failed")
+            raise Exception("OpenAI request failed")
+        return response
     
     def _extract_first_sentences(self, text: str, max_sentences: int = 2) -> str:
         """Extract the first 1-2 sentences from text for fallback summary"""
@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import os
 import logging
+import re
 import subprocess
 import sys
 from datetime import datetime
@@ -30,6 +31,8 @@ class DeveloperResponse(BaseModel):
     diffs: List[FileDiff]
     commit_message: str
     attempt: int
+    # Set per speculative candidate; names the candidate's own copy of the codebase
+    sandbox_id: Optional[str] = None
 
 class TestResult(BaseModel):
     name: str
@@ -162,11 +165,12 @@ async def root():
 
 @app.post("/test", response_model=QAResponse)
 async def test_fix(fix: DeveloperResponse):
-    logger.info(f"Testing fix for ticket {fix.ticket_id} (attempt {fix.attempt})")
+    logger.info(f"Testing fix for ticket {fix.ticket_id} (attempt {fix.attempt}, sandbox {fix.sandbox_id or 'default'})")
     
     try:
-        # Create a temporary directory for testing
-        with tempfile.TemporaryDirectory() as temp_dir:
+        # Create a temporary directory for testing; candidates tested at the same time each get their own
+        sandbox_prefix = re.sub(r"[^A-Za-z0-9_.-]", "_", fix.sandbox_id or fix.ticket_id)
+        with tempfile.TemporaryDirectory(prefix=f"qa-{sandbox_prefix}-") as temp_dir:
             # Copy codebase to temporary directory
             codebase_path = os.getenv("CODEBASE_PATH", "/app/code_repo")
             temp_codebase = os.path.join(temp_dir, "code")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from agents.communicator_agent import CommunicatorAgent
+from agents.utils.progress_state import ProgressCommentState
+
+ENV = {
+    'GITHUB_TOKEN': 'test-token',
+    'GITHUB_REPO_OWNER': 'test-owner',
+    'GITHUB_REPO_NAME': 'test-repo',
+    'JIRA_URL': 'https://test.atlassian.net',
+    'JIRA_USER': 'test-user',
+    'JIRA_TOKEN': 'test-token',
+}
+
+
+class TestCommunicatorProgress(unittest.TestCase):
+    """Test cases for the communicator's edit-in-place progress comments"""
+
+    def setUp(self):
+        """Set up a temporary state file"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_path = os.path.join(self.temp_dir.name, "progress.json")
+
+    def report_failure(self, attempt):
+        """Report a failed attempt from a freshly started agent, returning its upsert and update calls"""
+        with patch.dict(os.environ, ENV), \
+                patch('agents.utils.jira_client.JiraClient.upsert_comment', return_value="10001") as upsert, \
+                patch('agents.utils.jira_client.JiraClient.update_ticket', return_value=True) as update:
+            agent = CommunicatorAgent()
+            agent.progress_comments = ProgressCommentState(self.state_path)
+            agent._handle_progress_update("TEST-123", attempt, 4, {"patched_files": ["app.py"]},
+                                          {"passed": False}, False, "AssertionError", 70)
+        return upsert, update
+
+    def test_restarted_agent_edits_the_same_comment(self):
+        """Test that the comment ID and status survive a restart"""
+        upsert, update = self.report_failure(1)
+        self.assertIsNone(upsert.call_args[0][2])
+        update.assert_called_once_with("TEST-123", "In Progress", "")
+
+        upsert, update = self.report_failure(2)
+        self.assertEqual(upsert.call_args[0][2], "10001")
+        self.assertIn("AssertionError", upsert.call_args[0][1])
+        update.assert_not_called()
+
+    def test_new_run_starts_a_new_comment(self):
+        """Test that a first attempt doesn't reuse the comment or trust the status saved by an earlier run"""
+        self.report_failure(1)
+        upsert, update = self.report_failure(1)
+        self.assertIsNone(upsert.call_args[0][2])
+        self.assertEqual(upsert.call_args[0][1].count("Attempt 1/4"), 1)
+        update.assert_called_once_with("TEST-123", "In Progress", "")
+
+    def test_comment_shows_the_latest_reports(self):
+        """Test that older attempt reports are counted instead of shown"""
+        with patch("agents.utils.progress_state.JIRA_PROGRESS_MAX_SECTIONS", 2):
+            for attempt in range(1, 5):
+                upsert, _ = self.report_failure(attempt)
+        text = upsert.call_args[0][1]
+        self.assertIn("... 2 earlier updates", text)
+        self.assertNotIn("Attempt 2/4", text)
+        self.assertIn("Attempt 3/4", text)
+        self.assertIn("Attempt 4/4", text)
+
+    def test_state_keeps_the_most_recent_tickets(self):
+        """Test that the state forgets the least recently updated tickets beyond the limit"""
+        state = ProgressCommentState(self.state_path)
+        with patch("agents.utils.progress_state.JIRA_PROGRESS_MAX_TICKETS", 2):
+            for n in range(3):
+                state.get(f"TEST-{n}")["comment_id"] = str(n)
+                state.save(f"TEST-{n}")
+        self.assertEqual(sorted(ProgressCommentState(self.state_path).tickets), ["TEST-1", "TEST-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from agents.communicator_agent import CommunicatorAgent
+from agents.utils.git_publisher import GitWorktreePublisher
+
+ENV = {
+    'GITHUB_TOKEN': 'test-token',
+    'GITHUB_REPO_OWNER': 'test-owner',
+    'GITHUB_REPO_NAME': 'test-repo',
+    'JIRA_URL': 'https://test.atlassian.net',
+    'JIRA_USER': 'test-user',
+    'JIRA_TOKEN': 'test-token',
+}
+
+
+def git(*args, cwd=None):
+    """Run a git command and return its output"""
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestCommunicatorPublish(unittest.TestCase):
+    """Test cases for publishing a successful fix with GIT_PUBLISH_BACKEND=git"""
+
+    def setUp(self):
+        """Create a bare "remote" with one commit on main and a clone of it"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.remote = os.path.join(self.temp_dir.name, "remote.git")
+        self.clone = os.path.join(self.temp_dir.name, "code_repo")
+        git("init", "--quiet", "--bare", "--initial-branch=main", self.remote)
+        git("clone", "--quiet", self.remote, self.clone)
+        with open(os.path.join(self.clone, "app.py"), "w") as f:
+            f.write('print("hello")\n')
+        git("add", "app.py", cwd=self.clone)
+        git("-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "--quiet", "-m", "Initial", cwd=self.clone)
+        git("push", "--quiet", "origin", "HEAD:main", cwd=self.clone)
+
+    @patch('agents.utils.jira_client.JiraClient.add_comment', return_value=True)
+    @patch('agents.utils.jira_client.JiraClient.update_ticket', return_value=True)
+    @patch('agents.utils.github_client.GitHubClient.commit_patch')
+    @patch('agents.utils.github_client.GitHubClient.create_branch')
+    @patch('agents.utils.github_client.GitHubClient.create_pull_request',
+           return_value="https://github.com/test/test/pull/1")
+    def test_fix_is_pushed_from_the_local_clone(self, create_pr, create_branch, commit_patch, *_):
+        """Test that the fix is pushed with git and only the PR goes through the REST API"""
+        with patch.dict(os.environ, ENV), patch("agents.communicator_agent.GIT_PUBLISH_BACKEND", "git"):
+            agent = CommunicatorAgent()
+            agent.publisher = GitWorktreePublisher(self.clone, token="",
+                                                   worktree_root=os.path.join(self.temp_dir.name, "worktrees"))
+            result = agent._handle_successful_fix(
+                "TEST-123",
+                {"commit_message": "Greet the world", "patched_files": ["app.py"],
+                 "patched_code": {"app.py": 'print("hello, world")\n'}},
+                {"passed": True, "execution_time": 1.5},
+                {"root_cause": "Test root cause", "approach": "Test approach"},
+                attempt=1
+            )
+
+        self.assertTrue(result["pr_created"])
+        self.assertEqual(git("--git-dir", self.remote, "show", "bugfix/test-123:app.py"), 'print("hello, world")')
+        self.assertEqual(git("--git-dir", self.remote, "log", "-1", "--format=%s", "bugfix/test-123"),
+                         "Fix TEST-123: Greet the world")
+        create_branch.assert_not_called()
+        commit_patch.assert_not_called()
+        self.assertEqual(create_pr.call_args.kwargs["head_branch"], "bugfix/test-123")
+
+
+if __name__ == "__main__":
+    unittest.main()
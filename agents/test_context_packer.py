@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import unittest
+from unittest.mock import patch
+from agents.utils.context_packer import ContextPacker, count_tokens, split_into_chunks, truncate_to_tokens
+
+# A module whose bug is in parse_amount, padded with unrelated helpers
+HELPERS = "\n\n".join(
+    f"def helper_{i}(values):\n    total = 0\n    for value in values:\n        total += value * {i}\n    return total"
+    for i in range(40)
+)
+MODULE = f'''import decimal
+import json
+
+
+{HELPERS}
+
+
+class Invoice:
+    """An invoice with line items"""
+
+    def __init__(self, items):
+        self.items = items
+
+    def parse_amount(self, raw):
+        return decimal.Decimal(raw["amount"])
+
+
+def load_invoice(path):
+    with open(path) as f:
+        return Invoice(json.load(f)["items"])
+'''
+
+LINES = MODULE.splitlines()
+TRACE = f'''Traceback (most recent call last):
+  File "/app/billing/invoice.py", line {LINES.index("def load_invoice(path):") + 3}, in load_invoice
+  File "/app/billing/invoice.py", line {LINES.index("    def parse_amount(self, raw):") + 2}, in parse_amount
+KeyError: 'amount'
+'''
+
+
+class TestContextPacker(unittest.TestCase):
+    """Test cases for packing the developer prompt's code context"""
+
+    def test_python_files_are_split_at_definitions(self):
+        """Test that imports, functions and classes become separate chunks with exact line ranges"""
+        chunks = split_into_chunks("billing/invoice.py", MODULE)
+        names = [chunk["name"] for chunk in chunks]
+        self.assertEqual(names[0], None)
+        self.assertIn("helper_0", names)
+        self.assertIn("Invoice", names)
+        self.assertIn("load_invoice", names)
+        for chunk in chunks:
+            self.assertEqual(chunk["text"], "\n".join(LINES[chunk["start"] - 1:chunk["end"]]))
+
+    def test_large_classes_are_split_into_methods(self):
+        """Test that a class over the chunk limit is split per method"""
+        with patch("agents.utils.context_packer.CONTEXT_MAX_CHUNK_TOKENS", 10):
+            names = [chunk["name"] for chunk in split_into_chunks("billing/invoice.py", MODULE)]
+        self.assertIn("Invoice.parse_amount", names)
+        self.assertIn("Invoice.__init__", names)
+
+    def test_traced_code_is_kept_within_the_budget(self):
+        """Test that the chunks named by the trace survive and the rest is cut to the budget"""
+        packer = ContextPacker(token_budget=200)
+        packed = packer.pack({"billing/invoice.py": MODULE}, stack_trace=TRACE, error_type="KeyError",
+                             ticket_text="Invoices without an amount crash the import")
+        content = packed["billing/invoice.py"]
+        self.assertIn("def parse_amount(self, raw):", content)
+        self.assertIn("def load_invoice(path):", content)
+        self.assertIn("import decimal", content)
+        self.assertIn("omitted) ...", content)
+        self.assertNotIn("def helper_17", content)
+        self.assertLess(count_tokens(content), count_tokens(MODULE) // 3)
+
+        # Line numbers in the markers are the file's own
+        start = LINES.index("def load_invoice(path):") + 1
+        self.assertIn(f"# lines {start}-", content)
+
+    def test_small_files_are_unchanged(self):
+        """Test that files within the budget are passed on as they are"""
+        files = {"a.py": "x = 1\n", "b.js": "function f() {\n  return 1;\n}\n"}
+        self.assertEqual(ContextPacker(token_budget=1000).pack(files), files)
+
+    def test_other_languages_are_split_at_blocks(self):
+        """Test that non-Python files are split at top-level blocks and ranked by the trace"""
+        source = "\n\n".join(f"function handler{i}(req) {{\n  return req.body.v{i};\n}}" for i in range(30))
+        line = source.splitlines().index("function handler12(req) {") + 2
+        trace = f"TypeError: Cannot read properties of undefined\n    at handler12 (src/api.js:{line}:14)\n"
+        packed = ContextPacker(token_budget=40).pack({"src/api.js": source}, stack_trace=trace, error_type="TypeError")
+        self.assertIn("function handler12(req)", packed["src/api.js"])
+        self.assertNotIn("function handler3(req)", packed["src/api.js"])
+
+    def test_truncate_to_tokens(self):
+        """Test that long text is cut at a line and says how much is missing"""
+        text = "\n".join(f"line {i}" for i in range(100))
+        truncated = truncate_to_tokens(text, 20)
+        self.assertTrue(truncated.startswith("line 0\nline 1"))
+        self.assertTrue(truncated.endswith("more lines truncated)"))
+        self.assertEqual(truncate_to_tokens("short", 20), "short")
+
+
+    def test_prompt_asks_for_hunks_only_for_packed_files(self):
+        """Test that the developer prompt doesn't ask for whole files it only showed excerpts of"""
+        from agents.developer_agent import DeveloperAgent
+        agent = DeveloperAgent.__new__(DeveloperAgent)
+        files = {"billing/invoice.py": MODULE, "billing/tax.py": "RATE = 0.2\n"}
+        agent.context_packer = ContextPacker(token_budget=200)
+        with patch.object(DeveloperAgent, "_read_identified_files", return_value=files), \
+                patch.object(DeveloperAgent, "_create_developer_prompt", return_value="") as create_prompt:
+            agent.openai_client = type("Client", (), {"generate_completion_stream": lambda *a, **k: None})()
+            with self.assertRaises(Exception):
+                agent.generate_fix({"description": TRACE}, attempt=1)
+        packed_files = create_prompt.call_args[0][3]
+        self.assertEqual(packed_files, ["billing/invoice.py", "billing/tax.py"])
+
+        prompt = agent._create_developer_prompt({}, files, [], ["billing/invoice.py"])
+        self.assertIn("shown as numbered excerpts: billing/invoice.py.", prompt)
+        self.assertNotIn("numbered excerpts", agent._create_developer_prompt({}, files, []))
+
+if __name__ == "__main__":
+    unittest.main()
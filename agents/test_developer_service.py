@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+# The service imports its helpers as utils.*, like in its image
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from developer.agent import GenerationOptions, PlannerAnalysis, TicketDetails, analyze_with_gpt4
+
+FILES = [f"app/module_{i}.py" for i in range(6)]
+
+
+class FakeGateway:
+    """Answers completions after a delay and records how many ran at once"""
+
+    def __init__(self, delay=0.05, failing=(), flaky=()):
+        self.delay = delay
+        self.failing = set(failing)
+        # Files whose first request fails and whose retry succeeds
+        self.flaky = set(flaky)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def complete(self, messages, model=None, **kwargs):
+        self.calls.append((messages[-1]["content"], kwargs.get("temperature")))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        prompt = messages[-1]["content"]
+        for file in self.failing | self.flaky:
+            if f"file {file}:" in prompt:
+                self.flaky.discard(file)
+                return None
+        if prompt.startswith("Generate specific changes for file "):
+            file = prompt.split(":", 1)[0].rsplit(" ", 1)[-1]
+            return f"--- a/{file}\n+++ b/{file}\n@@ -1 +1 @@\n-old\n+new\n"
+        return "Change old to new in every module"
+
+
+class TestDeveloperService(unittest.TestCase):
+    """Test cases for the developer service's per-file diff generation"""
+
+    def analyze(self, gateway, options=None):
+        analysis = PlannerAnalysis(ticket_id="BUG-1", affected_files=FILES, root_cause="old value",
+                                   suggested_approach="use the new value")
+        ticket = TicketDetails(description="Modules use the old value", reproduction_steps=None,
+                               acceptance_criteria=None)
+        with patch("developer.agent.gateway", gateway):
+            started = time.monotonic()
+            result = asyncio.run(analyze_with_gpt4(analysis, ticket, attempt=1, options=options))
+        return result, time.monotonic() - started
+
+    def test_file_diffs_are_generated_concurrently_in_order(self):
+        """Test that a six-file fix takes about two round trips and keeps the files' order"""
+        gateway = FakeGateway()
+        result, elapsed = self.analyze(gateway)
+
+        self.assertEqual([diff.filename for diff in result["diffs"]], FILES)
+        self.assertEqual(result["diffs"][2].lines_added, 2)
+        self.assertEqual(gateway.max_in_flight, len(FILES))
+        self.assertLess(elapsed, gateway.delay * 4)
+
+    def test_candidate_options_reach_the_analysis(self):
+        """Test that a speculative candidate's strategy is in the prompt and its temperature on the call"""
+        gateway = FakeGateway()
+        strategy = "Fix the underlying root cause, even if it touches more code."
+        self.analyze(gateway, GenerationOptions(temperature=0.8, strategy=strategy))
+        prompt, temperature = gateway.calls[0]
+        self.assertIn(f"Strategy: {strategy}", prompt)
+        self.assertEqual(temperature, 0.8)
+
+        gateway = FakeGateway()
+        self.analyze(gateway)
+        self.assertNotIn("Strategy:", gateway.calls[0][0])
+        self.assertEqual(gateway.calls[0][1], 0.2)
+
+    def test_failed_files_are_retried_once(self):
+        """Test that a file whose diff failed once is requested again and the fix is complete"""
+        gateway = FakeGateway(flaky=[FILES[1], FILES[4]])
+        result, _ = self.analyze(gateway)
+        self.assertEqual([diff.filename for diff in result["diffs"]], FILES)
+        self.assertEqual(len(gateway.calls), 1 + len(FILES) + 2)
+
+    def test_file_failing_again_fails_the_attempt(self):
+        """Test that no partial fix is returned when a file still has no diff after the retry"""
+        with self.assertRaises(Exception) as raised:
+            self.analyze(FakeGateway(failing=[FILES[1], FILES[4]]))
+        detail = str(raised.exception.detail)
+        self.assertIn("2 of 6 files", detail)
+        self.assertIn(f"failed_files: {FILES[1]}, {FILES[4]}", detail)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,324 @@
+"""
+Relevance-ranked, token-budgeted code context for the developer prompt.
+
+Pasting every identified file in full blows past the context window on large
+modules, and the bigger the prompt the slower and more expensive the
+completion, and the less room is left for the answer. ContextPacker splits the
+files into function- and class-level chunks, ranks them by how closely they
+relate to the stack trace, the error type and the ticket text, and keeps the
+best ones that fit in CONTEXT_TOKEN_BUDGET. The packed files keep their line
+numbers and mark what was left out, so the model can still write hunks
+against the real file.
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated at
+about 4 characters per token like the gateway's budget does.
+"""
+import ast
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to the character estimate
+    tiktoken = None
+
+logger = logging.getLogger("context-packer")
+
+# Most tokens of file content in the developer prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Most tokens of previous attempts (patches and test failures) in the developer prompt
+CONTEXT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CONTEXT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Classes larger than this are split into their methods
+CONTEXT_MAX_CHUNK_TOKENS = int(os.environ.get("CONTEXT_MAX_CHUNK_TOKENS", "800"))
+
+# Words too common in tickets to say anything about the code
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "not", "are", "was", "when", "but", "have", "has",
+    "should", "would", "could", "into", "then", "there", "their", "which", "what", "error", "bug", "fix",
+    "file", "line", "call", "most", "recent", "last", "traceback", "self", "none", "true", "false", "return",
+    "def", "class", "import", "function", "value", "issue", "after", "before", "does", "will", "can",
+}
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a piece of text
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Token count, from tiktoken if available, otherwise estimated
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        try:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            return len(_encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, estimating tokens: {str(e)}")
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Cut text at a line boundary so it fits in a token budget
+
+    Args:
+        text: Text to cut
+        budget: Most tokens to keep
+
+    Returns:
+        The text, or its first lines followed by a note of how many were dropped
+    """
+    if count_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    kept, used = [], 0
+    for line in lines:
+        tokens = count_tokens(line + "\n")
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept + [f"... ({len(lines) - len(kept)} more lines truncated)"])
+
+
+def split_into_chunks(file_path: str, content: str) -> List[Dict[str, Any]]:
+    """
+    Split a file into function- and class-level chunks
+
+    Python files are split along their syntax tree; other files at top-level
+    blocks separated by blank lines. Code between definitions (imports,
+    constants) becomes chunks of its own.
+
+    Args:
+        file_path: Path of the file
+        content: File content
+
+    Returns:
+        Chunks in file order, each with path, name, start and end line (1-based, inclusive) and text
+    """
+    lines = content.splitlines()
+    spans = None
+    if file_path.endswith(".py"):
+        try:
+            spans = _python_spans(ast.parse(content), lines)
+        except (SyntaxError, ValueError):
+            spans = None
+    if spans is None:
+        spans = _block_spans(lines)
+
+    chunks = []
+    for start, end, name in spans:
+        text = "\n".join(lines[start - 1:end])
+        if text.strip():
+            chunks.append({"path": file_path, "name": name, "start": start, "end": end, "text": text})
+    return chunks
+
+
+def _python_spans(tree: ast.Module, lines: List[str]) -> List[Tuple[int, int, Optional[str]]]:
+    """Get (start, end, name) for each top-level definition and the code between them"""
+    definitions = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            definitions.append((start, node.end_lineno, node))
+
+    spans = []
+    position = 1
+    for start, end, node in definitions:
+        if start > position:
+            spans.append((position, start - 1, None))
+        too_large = count_tokens("\n".join(lines[start - 1:end])) > CONTEXT_MAX_CHUNK_TOKENS
+        if isinstance(node, ast.ClassDef) and too_large:
+            spans.extend(_class_spans(node, start, end))
+        else:
+            spans.append((start, end, node.name))
+        position = end + 1
+    if position <= len(lines):
+        spans.append((position, len(lines), None))
+    return spans
+
+
+def _class_spans(node: ast.ClassDef, start: int, end: int) -> List[Tuple[int, int, Optional[str]]]:
+    """Split a large class into its header and one chunk per method"""
+    spans = []
+    position = start
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            child_start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+            if child_start > position:
+                spans.append((position, child_start - 1, node.name))
+            spans.append((child_start, child.end_lineno, f"{node.name}.{child.name}"))
+            position = child.end_lineno + 1
+    if position <= end:
+        spans.append((position, end, node.name))
+    return spans
+
+
+# Lines that start a definition in most languages
+_DEFINITION = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|async\s+)*"
+    r"(?:def|class|function|func|fn|interface|struct|const|let|var)\s+([A-Za-z_$][\w$]*)"
+)
+
+
+def _block_spans(lines: List[str]) -> List[Tuple[int, int, Optional[str]]]:
+    """Get (start, end, name) for blocks starting at column 0 after a blank line"""
+    spans = []
+    start = 1
+    for index in range(1, len(lines)):
+        line = lines[index]
+        if line and not line[0].isspace() and not lines[index - 1].strip() and line.strip() not in ("}", ")", "]"):
+            spans.append((start, index, _block_name(lines[start - 1:index])))
+            start = index + 1
+    if lines:
+        spans.append((start, len(lines), _block_name(lines[start - 1:])))
+    return spans
+
+
+def _block_name(lines: List[str]) -> Optional[str]:
+    for line in lines:
+        match = _DEFINITION.match(line)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _identifiers(text: str) -> List[str]:
+    """Get the lowercase identifiers and words of a text, without stopwords"""
+    words = re.findall(r"[A-Za-z_][A-Za-z0-9_]{2,}", text or "")
+    return [word.lower() for word in words if word.lower() not in STOPWORDS]
+
+
+class ContextPacker:
+    """Picks the code chunks most relevant to a bug that fit in a token budget"""
+
+    # File and line references in Python, JavaScript and Java traces
+    TRACE_LOCATIONS = [
+        re.compile(r'File "([^"]+)", line (\d+)'),
+        re.compile(r"([\w./\\-]+\.\w+):(\d+)(?::\d+)?"),
+    ]
+    # Function names in Python ("in name") and JavaScript/Java ("at name (") traces
+    TRACE_FUNCTIONS = [
+        re.compile(r", in ([A-Za-z_][\w]*)"),
+        re.compile(r"\bat (?:new )?([\w$.<>]+) \("),
+    ]
+
+    def __init__(self, token_budget: int = None):
+        """
+        Initialize the packer
+
+        Args:
+            token_budget: Most tokens of file content. Defaults to CONTEXT_TOKEN_BUDGET.
+        """
+        self.token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+
+    def pack(self, file_contents: Dict[str, str], stack_trace: str = "", error_type: str = "",
+             ticket_text: str = "") -> Dict[str, str]:
+        """
+        Reduce files to their most relevant chunks within the token budget
+
+        Args:
+            file_contents: File paths and their contents
+            stack_trace: Stack traces and test failure output
+            error_type: Error class, e.g. "KeyError"
+            ticket_text: Title, description and analysis of the ticket
+
+        Returns:
+            File paths and packed contents, in the original order. Files that fit
+            are unchanged; others keep their chosen chunks with line numbers and
+            a note for each gap. Files none of whose chunks fit are left out.
+        """
+        chunks = []
+        for file_path, content in file_contents.items():
+            chunks.extend(split_into_chunks(file_path, content))
+        for chunk in chunks:
+            chunk["tokens"] = count_tokens(chunk["text"])
+
+        total = sum(chunk["tokens"] for chunk in chunks)
+        if total <= self.token_budget:
+            return dict(file_contents)
+
+        locations, functions = self._trace_signals(stack_trace)
+        error_words = set(_identifiers(error_type))
+        ticket_terms = set(_identifiers(ticket_text)) | functions
+        for chunk in chunks:
+            chunk["score"] = self._score(chunk, locations, functions, error_words, ticket_terms)
+
+        # Best first; ties go to the earlier chunk so the packing is stable
+        order = {path: index for index, path in enumerate(file_contents)}
+        ranked = sorted(chunks, key=lambda c: (-c["score"], order[c["path"]], c["start"]))
+        selected, used = [], 0
+        for chunk in ranked:
+            if used + chunk["tokens"] <= self.token_budget:
+                selected.append(chunk)
+                used += chunk["tokens"]
+
+        logger.info(f"Packed {len(selected)}/{len(chunks)} chunks, {used}/{total} tokens of file content")
+        packed = {}
+        for file_path, content in file_contents.items():
+            file_chunks = sorted((c for c in selected if c["path"] == file_path), key=lambda c: c["start"])
+            if file_chunks:
+                packed[file_path] = self._render(file_chunks, len(content.splitlines()))
+        return packed
+
+    def _trace_signals(self, stack_trace: str) -> Tuple[List[Tuple[str, int]], set]:
+        """Get the (path, line) locations and function names mentioned in a trace"""
+        locations = []
+        for pattern in self.TRACE_LOCATIONS:
+            for match in pattern.finditer(stack_trace or ""):
+                locations.append((match.group(1).replace("\\", "/"), int(match.group(2))))
+        functions = set()
+        for pattern in self.TRACE_FUNCTIONS:
+            for match in pattern.finditer(stack_trace or ""):
+                functions.add(match.group(1).split(".")[-1].lower())
+        return locations, functions
+
+    @staticmethod
+    def _score(chunk: Dict[str, Any], locations: List[Tuple[str, int]], functions: set,
+               error_words: set, ticket_terms: set) -> float:
+        """Score a chunk's relevance: trace lines, then traced functions, the error type and ticket terms"""
+        score = 0.0
+        path = chunk["path"].replace("\\", "/")
+        for trace_path, line in locations:
+            if (trace_path.endswith(path) or path.endswith(trace_path.lstrip("./"))) \
+                    and chunk["start"] <= line <= chunk["end"]:
+                score += 10
+        name = (chunk["name"] or "").split(".")[-1].lower()
+        if name and name in functions:
+            score += 5
+        words = set(_identifiers(chunk["text"]))
+        if error_words & words:
+            score += 2
+        score += min(len(ticket_terms & words), 10) * 0.5
+        if chunk["name"] is None and chunk["start"] == 1:
+            # The imports at the top explain the names used everywhere else
+            score += 1
+        return score
+
+    @staticmethod
+    def _render(chunks: List[Dict[str, Any]], line_count: int) -> str:
+        """Join chunks in file order with a note for every gap"""
+        parts = []
+        position = 1
+        for chunk in chunks:
+            if chunk["start"] > position:
+                parts.append(f"... (lines {position}-{chunk['start'] - 1} omitted) ...")
+            parts.append(f"# lines {chunk['start']}-{chunk['end']}")
+            parts.append(chunk["text"])
+            position = chunk["end"] + 1
+        if position <= line_count:
+            parts.append(f"... (lines {position}-{line_count} omitted) ...")
+        return "\n".join(parts)
@@ -2,8 +2,17 @@
 import os
 import base64
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Tuple
 from .logger import Logger
+from .rate_limiter import get_rate_limiter
+
+# Blob uploads in flight at once when committing several files
+GITHUB_BLOB_CONCURRENCY = int(os.environ.get("GITHUB_BLOB_CONCURRENCY", "8"))
+
+# Attempts at a multi-file commit when the branch moves underneath it
+GITHUB_COMMIT_RETRIES = int(os.environ.get("GITHUB_COMMIT_RETRIES", "3"))
+
 
 class GitHubClient:
     """Client for interacting with the GitHub API"""
@@ -36,6 +45,16 @@ class GitHubClient:
         self.base_url = "https://api.github.com"
         self.repo_api_url = f"{self.base_url}/repos/{self.repo_owner}/{self.repo_name}"
         
+        # Requests count against the token's budget, shared with other clients using it
+        self.rate_limiter = get_rate_limiter("github", self.github_token)
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a GitHub API request, waiting for the token's shared rate limit"""
+        self.rate_limiter.acquire()
+        response = requests.request(method, url, **kwargs)
+        self.rate_limiter.record_response(response.status_code, response.headers)
+        return response
+        
     # ... keep existing code (file content retrieval logic)
         
     def check_branch_exists(self, branch_name: str) -> bool:
@@ -51,7 +70,7 @@ class GitHubClient:
         url = f"{self.repo_api_url}/git/refs/heads/{branch_name}"
         
         self.logger.info(f"Checking if branch {branch_name} exists")
-        response = requests.get(url, headers=self.headers)
+        response = self._request("GET", url, headers=self.headers)
         
         if response.status_code == 200:
             self.logger.info(f"Branch {branch_name} exists")
@@ -94,7 +113,7 @@ class GitHubClient:
         url = f"{self.repo_api_url}/git/refs/heads/{from_branch}"
         
         self.logger.info(f"Getting latest commit from {from_branch}")
-        response = requests.get(url, headers=self.headers)
+        response = self._request("GET", url, headers=self.headers)
         
         if response.status_code != 200:
             self.logger.error(f"Failed to get commit SHA for {from_branch}: {response.status_code}")
@@ -110,7 +129,7 @@ class GitHubClient:
         }
         
         self.logger.info(f"Creating branch {branch_name} from {from_branch}")
-        create_response = requests.post(create_url, headers=self.headers, json=payload)
+        create_response = self._request("POST", create_url, headers=self.headers, json=payload)
         
         # Handle case where branch might already exist
         if create_response.status_code == 422:
@@ -156,7 +175,7 @@ class GitHubClient:
         }
         
         self.logger.info(f"Creating PR from {head_branch} to {base_branch}")
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self._request("POST", url, headers=self.headers, json=payload)
         
         if response.status_code != 201:
             # Check if it's because the PR already exists
@@ -164,7 +183,8 @@ class GitHubClient:
                 self.logger.info(f"PR from {head_branch} to {base_branch} already exists")
                 
                 # Try to get the URL of the existing PR
-                existing_prs = requests.get(
+                existing_prs = self._request(
+                    "GET",
                     f"{self.repo_api_url}/pulls?head={self.repo_owner}:{head_branch}&base={base_branch}&state=open",
                     headers=self.headers
                 )
@@ -225,7 +245,7 @@ class GitHubClient:
             payload = {"body": comment}
             
             self.logger.info(f"Adding comment to PR #{pr_number_str}")
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = self._request("POST", url, headers=self.headers, json=payload)
             
             if response.status_code != 201:
                 self.logger.error(f"Failed to add comment to PR #{pr_number_str}: {response.status_code}, {response.text}")
@@ -260,7 +280,7 @@ class GitHubClient:
         }
         
         self.logger.info(f"Searching for PRs from branch {branch_name} to {base_branch}")
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._request("GET", url, headers=self.headers, params=params)
         
         if response.status_code != 200:
             self.logger.error(f"Failed to search for PRs: {response.status_code}, {response.text}")
@@ -284,7 +304,109 @@ class GitHubClient:
         
         
     # ... keep existing code (patch application logic)'''
-    def commit_patch(self, branch_name: str, patch_content: str, commit_message: str, patch_file_paths: List[str] = None) -> bool:
+    def _create_blob(self, content: str) -> Optional[str]:
+        """Upload file content as a blob and return its SHA, or None on failure"""
+        response = self._request(
+            "POST",
+            f"{self.repo_api_url}/git/blobs",
+            headers=self.headers,
+            json={"content": base64.b64encode(content.encode()).decode(), "encoding": "base64"}
+        )
+        if response.status_code != 201:
+            self.logger.error(f"Failed to create blob: {response.status_code}, {response.text}")
+            return None
+        return response.json()["sha"]
+
+    def commit_files(self, branch_name: str, file_changes: List[Dict[str, Any]], commit_message: str) -> bool:
+        """
+        Commit several files to a branch as a single commit using the Git Data API
+
+        The blobs are uploaded concurrently, followed by one tree, one commit
+        and a ref update. A fix is therefore one commit, and costs the blobs
+        plus five requests however many files it touches. If the branch moves
+        while this runs, the commit is rebuilt on the new head.
+
+        Args:
+            branch_name: Branch to commit to
+            file_changes: List of file changes, each with filename and content.
+                A change with action "delete" removes the file.
+            commit_message: Commit message
+
+        Returns:
+            Success status (True/False)
+        """
+        if self.use_default_branch_only:
+            self.logger.info(f"Using default branch {self.default_branch} instead of {branch_name}")
+            branch_name = self.default_branch
+
+        changes = [
+            change for change in file_changes or []
+            if change.get("filename") and (change.get("action") == "delete" or change.get("content") is not None)
+        ]
+        if not changes:
+            self.logger.error("No valid file changes to commit")
+            return False
+
+        uploads = [change for change in changes if change.get("action") != "delete"]
+        with ThreadPoolExecutor(max_workers=max(1, min(GITHUB_BLOB_CONCURRENCY, len(uploads)))) as executor:
+            blob_shas = list(executor.map(lambda change: self._create_blob(str(change["content"])), uploads))
+        if None in blob_shas:
+            return False
+
+        tree = [{"path": change["filename"], "mode": "100644", "type": "blob", "sha": sha}
+                for change, sha in zip(uploads, blob_shas)]
+        tree += [{"path": change["filename"], "mode": "100644", "type": "blob", "sha": None}
+                 for change in changes if change.get("action") == "delete"]
+
+        ref_url = f"{self.repo_api_url}/git/refs/heads/{branch_name}"
+        for attempt in range(GITHUB_COMMIT_RETRIES):
+            ref_response = self._request("GET", ref_url, headers=self.headers)
+            if ref_response.status_code != 200:
+                self.logger.error(f"Failed to get branch {branch_name}: {ref_response.status_code}, {ref_response.text}")
+                return False
+            head_sha = ref_response.json()["object"]["sha"]
+
+            head_response = self._request("GET", f"{self.repo_api_url}/git/commits/{head_sha}", headers=self.headers)
+            if head_response.status_code != 200:
+                self.logger.error(f"Failed to get commit {head_sha}: {head_response.status_code}, {head_response.text}")
+                return False
+
+            tree_response = self._request(
+                "POST",
+                f"{self.repo_api_url}/git/trees",
+                headers=self.headers,
+                json={"base_tree": head_response.json()["tree"]["sha"], "tree": tree}
+            )
+            if tree_response.status_code != 201:
+                self.logger.error(f"Failed to create tree: {tree_response.status_code}, {tree_response.text}")
+                return False
+
+            commit_response = self._request(
+                "POST",
+                f"{self.repo_api_url}/git/commits",
+                headers=self.headers,
+                json={"message": commit_message, "tree": tree_response.json()["sha"], "parents": [head_sha]}
+            )
+            if commit_response.status_code != 201:
+                self.logger.error(f"Failed to create commit: {commit_response.status_code}, {commit_response.text}")
+                return False
+            commit_sha = commit_response.json()["sha"]
+
+            update_response = self._request("PATCH", ref_url, headers=self.headers, json={"sha": commit_sha})
+            if update_response.status_code == 200:
+                self.logger.info(f"Committed {len(tree)} files to {branch_name} as {commit_sha}")
+                return True
+            if update_response.status_code != 422:
+                self.logger.error(f"Failed to update branch {branch_name}: {update_response.status_code}, {update_response.text}")
+                return False
+            # Not a fast-forward: someone pushed to the branch meanwhile
+            self.logger.warning(f"Branch {branch_name} moved while committing, retrying ({attempt + 1}/{GITHUB_COMMIT_RETRIES})")
+
+        self.logger.error(f"Gave up committing to {branch_name} after {GITHUB_COMMIT_RETRIES} attempts")
+        return False
+
+    def commit_patch(self, branch_name: str, patch_content: str, commit_message: str, patch_file_paths: List[str] = None,
+                     file_contents: Dict[str, str] = None) -> bool:
         """
         Apply a patch and commit changes
         
@@ -293,10 +415,19 @@ class GitHubClient:
             patch_content: Patch content to apply
             commit_message: Commit message
             patch_file_paths: List of file paths affected by the patch
+            file_contents: Patched content of each file. When given, the files are
+                committed together in a single commit.
             
         Returns:
             Success status (True/False)
         """
+        if file_contents:
+            return self.commit_files(
+                branch_name,
+                [{"filename": path, "content": content} for path, content in file_contents.items()],
+                commit_message
+            )
+            
         # If configured to only use default branch, use that instead of the provided branch
         if self.use_default_branch_only:
             self.logger.info(f"Using default branch {self.default_branch} instead of {branch_name}")
@@ -327,7 +458,7 @@ class GitHubClient:
         params = {"ref": branch}
         
         self.logger.info(f"Fetching file content: {file_path} from branch {branch}")
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._request("GET", url, headers=self.headers, params=params)
         
         if response.status_code != 200:
             self.logger.error(f"Failed to fetch file {file_path}: {response.status_code}")
@@ -397,7 +528,7 @@ class GitHubClient:
         params = {"ref": branch_name}
         
         self.logger.info(f"Checking if file {file_path} exists in {branch_name}")
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._request("GET", url, headers=self.headers, params=params)
         
         if response.status_code == 200:
             # File exists, update it
@@ -411,7 +542,7 @@ class GitHubClient:
             }
             
             self.logger.info(f"Updating existing file {file_path} in {branch_name}")
-            update_response = requests.put(url, headers=self.headers, json=update_data)
+            update_response = self._request("PUT", url, headers=self.headers, json=update_data)
             
             if update_response.status_code != 200:
                 self.logger.error(f"Failed to update file {file_path}: {update_response.status_code}, {update_response.text}")
@@ -428,7 +559,7 @@ class GitHubClient:
             }
             
             self.logger.info(f"Creating new file {file_path} in {branch_name}")
-            create_response = requests.put(url, headers=self.headers, json=create_data)
+            create_response = self._request("PUT", url, headers=self.headers, json=create_data)
             
             if create_response.status_code != 201:
                 self.logger.error(f"Failed to create file {file_path}: {create_response.status_code}, {create_response.text}")
@@ -0,0 +1,291 @@
+"""
+Record and replay of the HTTP calls to OpenAI, JIRA and GitHub.
+
+Running the pipeline means paying for tokens and depending on three remote
+services, so Orchestrator.process_ticket could neither be benchmarked nor
+profiled offline. RecordReplayTransport sits under the httpx clients of the
+LLM gateway, JiraSession and AsyncGitHubClient:
+
+- HTTP_REPLAY_MODE=record sends every call to the network as usual and saves
+  the response as a JSON fixture under HTTP_REPLAY_DIR/<service>/.
+- HTTP_REPLAY_MODE=replay answers every call from the fixtures without any
+  network access, after the recorded response time times
+  HTTP_REPLAY_LATENCY_SCALE (or a fixed HTTP_REPLAY_LATENCY_SECONDS). A call
+  without a fixture fails like an unreachable server.
+
+A fixture is keyed by method, URL with sorted query parameters, and body with
+sorted JSON keys; request headers, and so credentials, are never written. A
+request made several times keeps its responses in order, e.g. a ticket read
+before and after a transition, and replay serves them in the same order,
+repeating the last one. Requests whose body changes from run to run (a JQL
+filter on the current time, a sampled completion's seed) don't match their
+recording; the pipeline treats them as network errors.
+
+The module only needs the standard library and httpx, so the agents can use
+it too; the agent images carry an identical copy as agents/utils/http_replay.py.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("http-replay")
+
+# "record" saves the OpenAI, JIRA and GitHub responses as fixtures, "replay" serves them instead of the network
+HTTP_REPLAY_MODE = os.environ.get("HTTP_REPLAY_MODE", "off").lower()
+
+# Directory of the fixtures, one subdirectory per service
+HTTP_REPLAY_DIR = os.environ.get("HTTP_REPLAY_DIR", "data/http_fixtures")
+
+# Multiplies the recorded response times in replay; 0 answers at once
+HTTP_REPLAY_LATENCY_SCALE = float(os.environ.get("HTTP_REPLAY_LATENCY_SCALE", "1.0"))
+
+# Response time for every replayed call instead of the recorded ones, e.g. "0.2"
+HTTP_REPLAY_LATENCY_SECONDS = os.environ.get("HTTP_REPLAY_LATENCY_SECONDS", "")
+
+REPLAY_MODES = ("record", "replay")
+
+# Response headers that don't describe the saved body, or shouldn't be saved
+SKIPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+class ReplayMissError(httpx.TransportError):
+    """Raised in replay mode for a request that has no recorded response"""
+
+
+def request_key(request: httpx.Request) -> Dict[str, str]:
+    """
+    Get the parts of a request that identify its fixture
+
+    Args:
+        request: Request whose body has been read
+
+    Returns:
+        Dictionary with method, url (query parameters sorted) and body (JSON keys sorted)
+    """
+    url = request.url.copy_with(query=None)
+    params = sorted(request.url.params.multi_items())
+    if params:
+        url = url.copy_with(params=params)
+    body = request.content.decode("utf-8", errors="replace")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        pass
+    return {"method": request.method, "url": str(url), "body": body}
+
+
+class FixtureStore:
+    """Reads and writes the recorded responses of a fixture directory"""
+
+    def __init__(self, directory: str = None):
+        """
+        Initialize the store
+
+        Args:
+            directory: Fixture directory. Defaults to HTTP_REPLAY_DIR.
+        """
+        self.directory = directory or HTTP_REPLAY_DIR
+        self._lock = threading.Lock()
+        # Responses served (replay) or written (record) per fixture in this process
+        self._positions: Dict[str, int] = {}
+
+    def path_for(self, service: str, key: Dict[str, str]) -> str:
+        """Get the fixture file of a request, named after its method and path so they can be found by hand"""
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", httpx.URL(key["url"]).path).strip("_")[:60]
+        return os.path.join(self.directory, service, f"{key['method'].lower()}_{slug}_{digest}.json")
+
+    def next_response(self, service: str, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Get the next recorded response for a request
+
+        Args:
+            service: Service the request went to, e.g. "jira"
+            key: Result of request_key
+
+        Returns:
+            The recorded response, or None if the request was never recorded
+        """
+        path = self.path_for(service, key)
+        try:
+            with open(path) as f:
+                responses = json.load(f).get("responses", [])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading fixture {path}: {str(e)}")
+            return None
+        if not responses:
+            return None
+        with self._lock:
+            position = self._positions.get(path, 0)
+            self._positions[path] = position + 1
+        return responses[min(position, len(responses) - 1)]
+
+    def save(self, service: str, key: Dict[str, str], response: Dict[str, Any]) -> None:
+        """
+        Add a response to a request's fixture
+
+        The first response saved by this process replaces an older recording,
+        so recording a run again doesn't mix two runs.
+
+        Args:
+            service: Service the request went to
+            key: Result of request_key
+            response: Status code, headers, body and latency of the response
+        """
+        path = self.path_for(service, key)
+        with self._lock:
+            position = self._positions.get(path, 0)
+            self._positions[path] = position + 1
+            try:
+                responses = []
+                if position and os.path.exists(path):
+                    with open(path) as f:
+                        responses = json.load(f).get("responses", [])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump({"request": key, "responses": responses + [response]}, f, indent=2)
+                os.replace(temp_path, path)
+            except Exception as e:
+                logger.error(f"Error writing fixture {path}: {str(e)}")
+
+    def reset(self) -> None:
+        """Start serving every fixture from its first response again, e.g. before the next benchmark run"""
+        with self._lock:
+            self._positions.clear()
+
+
+class RecordReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records responses to fixtures or serves them from there"""
+
+    def __init__(self, service: str, mode: str = None, store: FixtureStore = None,
+                 transport: httpx.AsyncBaseTransport = None, latency_scale: float = None,
+                 latency_seconds: float = None):
+        """
+        Initialize the transport
+
+        Args:
+            service: Name of the service, the fixtures' subdirectory
+            mode: "record" or "replay". Defaults to HTTP_REPLAY_MODE.
+            store: Fixture store. Defaults to the shared one for HTTP_REPLAY_DIR.
+            transport: Transport that reaches the network when recording. Defaults to httpx's.
+            latency_scale: Factor for the recorded response times. Defaults to HTTP_REPLAY_LATENCY_SCALE.
+            latency_seconds: Response time for every call instead. Defaults to HTTP_REPLAY_LATENCY_SECONDS.
+        """
+        self.service = service
+        self.mode = mode or HTTP_REPLAY_MODE
+        self.store = store or get_fixture_store()
+        self.transport = transport
+        self.latency_scale = latency_scale if latency_scale is not None else HTTP_REPLAY_LATENCY_SCALE
+        if latency_seconds is None and HTTP_REPLAY_LATENCY_SECONDS:
+            latency_seconds = float(HTTP_REPLAY_LATENCY_SECONDS)
+        self.latency_seconds = latency_seconds
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = request_key(request)
+        if self.mode == "replay":
+            return await self._replay(request, key)
+
+        if self.transport is None:
+            self.transport = httpx.AsyncHTTPTransport()
+        started = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        try:
+            # The stream the transport returned, still content-encoded
+            raw = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        latency = time.monotonic() - started
+
+        if self.mode == "record":
+            # Saved decoded, so the fixtures can be read and edited
+            decoded = httpx.Response(response.status_code, headers=response.headers, content=raw)
+            decoded.read()
+            self.store.save(self.service, key, {
+                "status_code": response.status_code,
+                "headers": [[name, value] for name, value in decoded.headers.multi_items()
+                            if name.lower() not in SKIPPED_RESPONSE_HEADERS],
+                **_encode_body(decoded.content),
+                "latency_seconds": round(latency, 3),
+            })
+        return httpx.Response(response.status_code, headers=response.headers, content=raw, request=request)
+
+    async def _replay(self, request: httpx.Request, key: Dict[str, str]) -> httpx.Response:
+        recorded = self.store.next_response(self.service, key)
+        if recorded is None:
+            path = self.store.path_for(self.service, key)
+            logger.error(f"No recorded {self.service} response for {key['method']} {key['url']} ({path})")
+            raise ReplayMissError(f"No recorded response for {key['method']} {key['url']}", request=request)
+
+        latency = self.latency_seconds
+        if latency is None:
+            latency = recorded.get("latency_seconds", 0) * self.latency_scale
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return httpx.Response(
+            recorded["status_code"],
+            headers=recorded.get("headers", []),
+            content=_decode_body(recorded),
+            request=request
+        )
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    """Store a body as text when it is UTF-8, otherwise as base64"""
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(content).decode("ascii"), "body_encoding": "base64"}
+
+
+def _decode_body(recorded: Dict[str, Any]) -> bytes:
+    if recorded.get("body_encoding") == "base64":
+        return base64.b64decode(recorded.get("body", ""))
+    return recorded.get("body", "").encode("utf-8")
+
+
+_stores: Dict[str, FixtureStore] = {}
+_stores_lock = threading.Lock()
+
+def get_fixture_store(directory: str = None) -> FixtureStore:
+    """Get the shared fixture store of a directory, so all clients of a run share the response order"""
+    directory = directory or HTTP_REPLAY_DIR
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = FixtureStore(directory)
+            _stores[directory] = store
+        return store
+
+
+def replay_transport(service: str) -> Optional[RecordReplayTransport]:
+    """
+    Get the transport a service's client should use
+
+    Args:
+        service: "openai", "jira" or "github"
+
+    Returns:
+        A RecordReplayTransport when HTTP_REPLAY_MODE is record or replay, otherwise None for the network
+    """
+    if HTTP_REPLAY_MODE not in REPLAY_MODES:
+        if HTTP_REPLAY_MODE not in ("", "off"):
+            logger.warning(f"Unknown HTTP_REPLAY_MODE '{HTTP_REPLAY_MODE}', using the network")
+        return None
+    return RecordReplayTransport(service)
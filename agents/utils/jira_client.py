@@ -5,6 +5,7 @@ import requests
 import time
 from typing import Dict, Any, List, Optional, Union
 from .logger import Logger
+from .rate_limiter import get_rate_limiter
 
 class JiraClient:
     """Client for interacting with JIRA REST API"""
@@ -34,7 +35,17 @@ class JiraClient:
             "Content-Type": "application/json"
         }
         
+        # Shares the site and user's budget with the backend's JIRA session
+        self.rate_limiter = get_rate_limiter("jira", f"{self.jira_url.rstrip('/')}|{self.jira_user}")
+        
         self.logger.info(f"JIRA client initialized for {self.jira_url}")
+    
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a JIRA API request, waiting for the site's shared rate limit"""
+        self.rate_limiter.acquire()
+        response = requests.request(method, url, **kwargs)
+        self.rate_limiter.record_response(response.status_code, response.headers)
+        return response
         
     def get_ticket(self, ticket_id: str) -> Dict[str, Any]:
         """
@@ -50,7 +61,8 @@ class JiraClient:
         
         self.logger.info(f"Fetching ticket {ticket_id}")
         start_time = time.time()
-        response = requests.get(
+        response = self._request(
+            "GET",
             url, 
             auth=self.auth, 
             headers=self.headers
@@ -96,7 +108,8 @@ class JiraClient:
         self.logger.debug(f"GET {url} with params: {params}")
         
         start_time = time.time()
-        response = requests.get(
+        response = self._request(
+            "GET",
             url,
             params=params,
             auth=self.auth,
@@ -219,7 +232,8 @@ class JiraClient:
         
         try:
             start_time = time.time()
-            response = requests.post(
+            response = self._request(
+                "POST",
                 url,
                 json=payload,
                 auth=self.auth,
@@ -239,6 +253,81 @@ class JiraClient:
             self.logger.error(f"Exception adding comment to {ticket_id}: {str(e)}")
             return False
     
+    def upsert_comment(self, ticket_id: str, comment: str, comment_id: Optional[str] = None) -> Optional[str]:
+        """
+        Replace the text of an existing comment, or add a new one
+        
+        Used for edit-in-place progress comments. If comment_id is given but the
+        comment was deleted, a new comment is created.
+        
+        Args:
+            ticket_id: The JIRA ticket ID
+            comment: Comment text
+            comment_id: ID of the comment to edit, or None to create one
+            
+        Returns:
+            ID of the edited or created comment, or None on failure
+        """
+        url = f"{self.jira_url}/rest/api/3/issue/{ticket_id}/comment"
+        payload = {
+            "body": {
+                "type": "doc",
+                "version": 1,
+                "content": [
+                    {
+                        "type": "paragraph",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": comment
+                            }
+                        ]
+                    }
+                ]
+            }
+        }
+        
+        try:
+            if comment_id:
+                start_time = time.time()
+                response = self._request(
+                    "PUT",
+                    f"{url}/{comment_id}",
+                    json=payload,
+                    auth=self.auth,
+                    headers=self.headers
+                )
+                end_time = time.time()
+                
+                self.logger.info(f"PUT {url}/{comment_id} - Status: {response.status_code} - Time: {end_time - start_time:.2f}s")
+                
+                if response.status_code == 200:
+                    return comment_id
+                if response.status_code != 404:
+                    self.logger.error(f"Failed to edit comment {comment_id} on {ticket_id}: {response.status_code}, {response.text}")
+                    return None
+                self.logger.info(f"Comment {comment_id} on {ticket_id} no longer exists, adding a new one")
+            
+            start_time = time.time()
+            response = self._request(
+                "POST",
+                url,
+                json=payload,
+                auth=self.auth,
+                headers=self.headers
+            )
+            end_time = time.time()
+            
+            self.logger.info(f"POST {url} - Status: {response.status_code} - Time: {end_time - start_time:.2f}s")
+            
+            if response.status_code not in (201, 200):
+                self.logger.error(f"Failed to add comment to {ticket_id}: {response.status_code}, {response.text}")
+                return None
+            return str(response.json().get("id", ""))
+        except Exception as e:
+            self.logger.error(f"Exception writing comment on {ticket_id}: {str(e)}")
+            return None
+    
     def update_ticket(self, ticket_id: str, status: str, comment: Optional[str] = None) -> bool:
         """
         Update a JIRA ticket status and optionally add a comment
@@ -268,7 +357,8 @@ class JiraClient:
             try:
                 self.logger.info(f"Fetching available transitions for {ticket_id}")
                 start_time = time.time()
-                transitions_response = requests.get(
+                transitions_response = self._request(
+                    "GET",
                     transitions_url,
                     auth=self.auth,
                     headers=self.headers
@@ -312,7 +402,8 @@ class JiraClient:
                 self.logger.info(f"Updating ticket {ticket_id} to status '{status}' using transition ID {transition_id}")
                 
                 start_time = time.time()
-                transition_result = requests.post(
+                transition_result = self._request(
+                    "POST",
                     transitions_url,
                     json=transition_payload,
                     auth=self.auth,
@@ -0,0 +1,471 @@
+"""
+Shared asyncio gateway for OpenAI chat completions.
+
+Each agent used to create its own OpenAI client and call it synchronously,
+retrying with time.sleep. Many tickets calling at once therefore meant a
+thread blocked per call and a burst of requests that hit the rate limit
+together and then retried together.
+
+Every completion now goes through one LLMGateway per API key and process. The
+gateway runs its own event loop on a background thread, so synchronous agents
+(complete_sync) and coroutines on any loop (complete) share one scheduler:
+
+- At most LLM_MAX_IN_FLIGHT completions run at once. Further calls wait in
+  priority lanes, and a free slot goes to the most urgent lane first, so an
+  urgent ticket's call goes ahead of backlog triage.
+- Before sending, a call takes a request from the "openai" bucket and its
+  estimated tokens (prompt plus max_tokens, as OpenAI counts them) from the
+  "openai_tokens" bucket of rate_limiter. Both are shared with the other
+  processes using the key, and responses and 429s feed back into them.
+- Connection errors, timeouts and server errors back off with asyncio.sleep
+  after giving up the slot, so waiting calls aren't held up.
+- Deterministic calls are answered from llm_cache when the same request was
+  answered before, without taking a slot or any budget. Pass use_cache=False
+  to always ask the model.
+- complete_stream and complete_stream_sync hand the text to a callback as it
+  is generated. The callback can stop the generation, which frees the slot at
+  once instead of waiting for a long answer that is already known to be bad.
+
+The module only needs the standard library and openai, so the agents can use
+it too; the agent images carry identical copies as agents/utils/llm_gateway.py,
+agents/utils/llm_cache.py and agents/utils/http_replay.py.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+
+try:
+    from .http_replay import replay_transport
+    from .llm_cache import LLMResponseCache, get_llm_cache, is_cacheable
+    from .rate_limiter import get_rate_limiter
+except ImportError:  # Imported as a top-level module in the backend
+    from http_replay import replay_transport
+    from llm_cache import LLMResponseCache, get_llm_cache, is_cacheable
+    from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger("llm-gateway")
+
+# Most completions in flight at once, per process and API key
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "8"))
+
+# Retries for connection errors, timeouts and server errors: backoff * 2^attempt between them
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get("LLM_RETRY_BACKOFF_SECONDS", "1"))
+
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+# Model used when the caller doesn't name one
+LLM_DEFAULT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o")
+
+# Marks the end of a stream in the queue the deltas are passed through
+_STREAM_END = object()
+
+# Priority lanes, most urgent first
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKLOG = 2
+
+# JIRA priority names and the lane their calls use; others use PRIORITY_NORMAL
+TICKET_PRIORITY_LANES = {
+    "blocker": PRIORITY_URGENT,
+    "highest": PRIORITY_URGENT,
+    "critical": PRIORITY_URGENT,
+    "high": PRIORITY_URGENT,
+    "low": PRIORITY_BACKLOG,
+    "lowest": PRIORITY_BACKLOG,
+    "trivial": PRIORITY_BACKLOG,
+}
+
+
+def priority_for_ticket(priority_name: Optional[str]) -> int:
+    """
+    Get the lane for a ticket's JIRA priority
+
+    Args:
+        priority_name: JIRA priority name, e.g. "Highest" or "Low"
+
+    Returns:
+        PRIORITY_URGENT, PRIORITY_NORMAL or PRIORITY_BACKLOG
+    """
+    return TICKET_PRIORITY_LANES.get(str(priority_name or "").strip().lower(), PRIORITY_NORMAL)
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    """Estimate the tokens a completion counts against the budget: about 4 characters per prompt token"""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + len(messages) * 4 + (max_tokens or 0)
+
+
+class LLMGateway:
+    """Schedules chat completions for one API key: in-flight limit, priority lanes, token budget and backoff"""
+
+    def __init__(self, api_key: str = None, max_in_flight: int = None, client: Any = None,
+                 cache: Optional[LLMResponseCache] = None):
+        """
+        Initialize the gateway
+
+        Args:
+            api_key: OpenAI API key. Defaults to OPENAI_API_KEY.
+            max_in_flight: Most completions running at once. Defaults to LLM_MAX_IN_FLIGHT.
+            client: openai.AsyncOpenAI-compatible client (for tests). Created on first use by default.
+            cache: Completion cache. Defaults to the process-wide cache from get_llm_cache.
+        """
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        if not self.api_key and client is None:
+            logger.error("Missing OpenAI API key")
+            raise EnvironmentError("Missing OPENAI_API_KEY environment variable")
+        self.max_in_flight = max(1, max_in_flight or LLM_MAX_IN_FLIGHT)
+        self.client = client
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.request_limiter = get_rate_limiter("openai", self.api_key or "")
+        self.token_limiter = get_rate_limiter("openai_tokens", self.api_key or "")
+
+        # Scheduler state, only touched on the gateway's loop
+        self._in_flight = 0
+        self._waiting: List[Any] = []
+        self._sequence = itertools.count()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the gateway's event loop, starting its thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _acquire_slot(self, priority: int) -> None:
+        """Wait for an in-flight slot; free slots go to the most urgent, then oldest, waiter"""
+        if self._in_flight < self.max_in_flight and not self._waiting:
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Granted just before the cancel: pass the slot on
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        while self._waiting and self._in_flight < self.max_in_flight:
+            _, _, waiter = heapq.heappop(self._waiting)
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def _get_client(self) -> Any:
+        if self.client is None:
+            # Retries are done here, where they can give up their slot while waiting
+            # With HTTP_REPLAY_MODE set, responses are recorded to or served from fixtures
+            transport = replay_transport("openai")
+            self.client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=0,
+                timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+                http_client=openai.DefaultAsyncHttpxClient(transport=transport) if transport else None
+            )
+        return self.client
+
+    def _cache_key(self, messages: List[Dict[str, Any]], model: str, temperature: float, max_tokens: int,
+                   options: Dict[str, Any], use_cache: bool) -> Optional[str]:
+        """Get the cache key for a call, or None if it shouldn't use the cache"""
+        if not use_cache or self.cache is None or not is_cacheable(temperature):
+            return None
+        return LLMResponseCache.make_key(model, temperature, messages, {"max_tokens": max_tokens, **options})
+
+    async def _complete(self, messages: List[Dict[str, Any]], model: str, priority: int, temperature: float,
+                        max_tokens: int, max_retries: int, options: Dict[str, Any],
+                        cache_key: Optional[str] = None) -> Optional[str]:
+        cost = estimate_tokens(messages, max_tokens)
+        for attempt in range(max_retries + 1):
+            delay = 0.0
+            await self._acquire_slot(priority)
+            try:
+                await self.request_limiter.acquire_async()
+                await self.token_limiter.acquire_async(cost)
+                raw_response = await self._get_client().chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **options
+                )
+                self.request_limiter.record_response(raw_response.status_code, raw_response.headers)
+                self.token_limiter.record_response(raw_response.status_code, raw_response.headers)
+                completion = raw_response.parse().choices[0].message.content
+                if cache_key and completion is not None:
+                    await asyncio.to_thread(self.cache.set, cache_key, model, completion)
+                return completion
+            except openai.RateLimitError as e:
+                # The buckets hold the next attempt until Retry-After or the reset time, for every process using the key
+                self.request_limiter.record_response(e.status_code, e.response.headers)
+                self.token_limiter.record_response(e.status_code, e.response.headers)
+                logger.warning(f"OpenAI rate limit hit. Attempt {attempt + 1}/{max_retries + 1}")
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                delay = LLM_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"OpenAI request failed: {str(e)}. Attempt {attempt + 1}/{max_retries + 1}")
+            except openai.APIError as e:
+                logger.error(f"OpenAI API error: {str(e)}")
+                return None
+            except Exception as e:
+                logger.error(f"Unexpected error from OpenAI: {str(e)}")
+                return None
+            finally:
+                self._release_slot()
+            if delay and attempt < max_retries:
+                await asyncio.sleep(delay)
+
+        logger.error("Maximum OpenAI retries reached. Giving up.")
+        return None
+
+    async def _stream(self, messages: List[Dict[str, Any]], model: str, priority: int, temperature: float,
+                      max_tokens: int, max_retries: int, options: Dict[str, Any], emit: Callable[[str], Any],
+                      stop: threading.Event, cache_key: Optional[str] = None) -> Optional[str]:
+        """Stream a completion, passing each piece of text to emit until it's done or stop is set"""
+        cost = estimate_tokens(messages, max_tokens)
+        for attempt in range(max_retries + 1):
+            delay = 0.0
+            started = False
+            await self._acquire_slot(priority)
+            try:
+                await self.request_limiter.acquire_async()
+                await self.token_limiter.acquire_async(cost)
+                raw_response = await self._get_client().chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    **options
+                )
+                self.request_limiter.record_response(raw_response.status_code, raw_response.headers)
+                self.token_limiter.record_response(raw_response.status_code, raw_response.headers)
+                stream = raw_response.parse()
+                parts = []
+                try:
+                    async for chunk in stream:
+                        if stop.is_set():
+                            logger.info("Completion stream stopped by the caller")
+                            return None
+                        text = chunk.choices[0].delta.content if chunk.choices else None
+                        if text:
+                            started = True
+                            parts.append(text)
+                            emit(text)
+                finally:
+                    # Closing the response stops the generation on OpenAI's side
+                    await stream.close()
+                if stop.is_set():
+                    return None
+                completion = "".join(parts)
+                if cache_key:
+                    await asyncio.to_thread(self.cache.set, cache_key, model, completion)
+                return completion
+            except openai.RateLimitError as e:
+                self.request_limiter.record_response(e.status_code, e.response.headers)
+                self.token_limiter.record_response(e.status_code, e.response.headers)
+                logger.warning(f"OpenAI rate limit hit. Attempt {attempt + 1}/{max_retries + 1}")
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if started:
+                    # The caller has seen part of the answer, so it can't be asked again transparently
+                    logger.error(f"OpenAI stream broke off: {str(e)}")
+                    return None
+                delay = LLM_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"OpenAI request failed: {str(e)}. Attempt {attempt + 1}/{max_retries + 1}")
+            except openai.APIError as e:
+                logger.error(f"OpenAI API error: {str(e)}")
+                return None
+            except Exception as e:
+                logger.error(f"Unexpected error from OpenAI: {str(e)}")
+                return None
+            finally:
+                self._release_slot()
+            if delay and attempt < max_retries:
+                await asyncio.sleep(delay)
+
+        logger.error("Maximum OpenAI retries reached. Giving up.")
+        return None
+
+    async def complete(self, messages: List[Dict[str, Any]], model: str = None, priority: int = PRIORITY_NORMAL,
+                       temperature: float = 0.1, max_tokens: int = 2000, max_retries: int = None,
+                       use_cache: bool = True, **options) -> Optional[str]:
+        """
+        Get a chat completion without blocking the caller's event loop
+
+        Args:
+            messages: Chat messages
+            model: Model name. Defaults to LLM_DEFAULT_MODEL.
+            priority: PRIORITY_URGENT, PRIORITY_NORMAL or PRIORITY_BACKLOG
+            temperature: Sampling temperature
+            max_tokens: Most tokens to generate
+            max_retries: Retries after rate limits and transient errors. Defaults to LLM_MAX_RETRIES.
+            use_cache: Answer from the completion cache if possible (deterministic calls only)
+            **options: Further arguments for chat.completions.create
+
+        Returns:
+            The completion text, or None if the request failed
+        """
+        model = model or LLM_DEFAULT_MODEL
+        cache_key = self._cache_key(messages, model, temperature, max_tokens, options, use_cache)
+        if cache_key:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return cached
+        future = asyncio.run_coroutine_threadsafe(self._complete(
+            messages, model, priority, temperature, max_tokens,
+            LLM_MAX_RETRIES if max_retries is None else max_retries, options, cache_key
+        ), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    def complete_sync(self, messages: List[Dict[str, Any]], model: str = None, priority: int = PRIORITY_NORMAL,
+                      temperature: float = 0.1, max_tokens: int = 2000, max_retries: int = None,
+                      use_cache: bool = True, **options) -> Optional[str]:
+        """Get a chat completion like complete, blocking the calling thread (not the gateway) until it's done"""
+        model = model or LLM_DEFAULT_MODEL
+        cache_key = self._cache_key(messages, model, temperature, max_tokens, options, use_cache)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        future = asyncio.run_coroutine_threadsafe(self._complete(
+            messages, model, priority, temperature, max_tokens,
+            LLM_MAX_RETRIES if max_retries is None else max_retries, options, cache_key
+        ), self._get_loop())
+        return future.result()
+
+    async def complete_stream(self, messages: List[Dict[str, Any]], on_delta: Callable[[str], Optional[bool]],
+                              model: str = None, priority: int = PRIORITY_NORMAL, temperature: float = 0.1,
+                              max_tokens: int = 2000, max_retries: int = None, use_cache: bool = True,
+                              **options) -> Optional[str]:
+        """
+        Get a chat completion like complete, passing the text to on_delta as it is generated
+
+        Args:
+            messages: Chat messages
+            on_delta: Called on the caller's loop with each new piece of text.
+                Returning False stops the generation.
+            model: Model name. Defaults to LLM_DEFAULT_MODEL.
+            priority: PRIORITY_URGENT, PRIORITY_NORMAL or PRIORITY_BACKLOG
+            temperature: Sampling temperature
+            max_tokens: Most tokens to generate
+            max_retries: Retries after rate limits and transient errors before any text arrived.
+                Defaults to LLM_MAX_RETRIES.
+            use_cache: Answer from the completion cache if possible; a cached answer is passed on in one piece
+            **options: Further arguments for chat.completions.create
+
+        Returns:
+            The completion text, or None if the request failed or on_delta stopped it
+        """
+        model = model or LLM_DEFAULT_MODEL
+        cache_key = self._cache_key(messages, model, temperature, max_tokens, options, use_cache)
+        if cache_key:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return None if on_delta(cached) is False else cached
+
+        caller_loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self._stream(
+            messages, model, priority, temperature, max_tokens,
+            LLM_MAX_RETRIES if max_retries is None else max_retries, options,
+            lambda text: caller_loop.call_soon_threadsafe(deltas.put_nowait, text), stop, cache_key
+        ), self._get_loop())
+        future.add_done_callback(lambda _: caller_loop.call_soon_threadsafe(deltas.put_nowait, _STREAM_END))
+        try:
+            while True:
+                text = await deltas.get()
+                if text is _STREAM_END:
+                    break
+                if not stop.is_set() and on_delta(text) is False:
+                    stop.set()
+        except BaseException:
+            # Cancelled, or on_delta raised: don't leave the generation running
+            stop.set()
+            raise
+        completion = await asyncio.wrap_future(future)
+        return None if stop.is_set() else completion
+
+    def complete_stream_sync(self, messages: List[Dict[str, Any]], on_delta: Callable[[str], Optional[bool]],
+                             model: str = None, priority: int = PRIORITY_NORMAL, temperature: float = 0.1,
+                             max_tokens: int = 2000, max_retries: int = None, use_cache: bool = True,
+                             **options) -> Optional[str]:
+        """Stream a chat completion like complete_stream, calling on_delta on the calling thread"""
+        model = model or LLM_DEFAULT_MODEL
+        cache_key = self._cache_key(messages, model, temperature, max_tokens, options, use_cache)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return None if on_delta(cached) is False else cached
+
+        deltas: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self._stream(
+            messages, model, priority, temperature, max_tokens,
+            LLM_MAX_RETRIES if max_retries is None else max_retries, options, deltas.put, stop, cache_key
+        ), self._get_loop())
+        future.add_done_callback(lambda _: deltas.put(_STREAM_END))
+        try:
+            while True:
+                text = deltas.get()
+                if text is _STREAM_END:
+                    break
+                if not stop.is_set() and on_delta(text) is False:
+                    stop.set()
+        except BaseException:
+            stop.set()
+            raise
+        completion = future.result()
+        return None if stop.is_set() else completion
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the in-flight and waiting calls per lane, for health reporting"""
+        lanes = {PRIORITY_URGENT: "urgent", PRIORITY_NORMAL: "normal", PRIORITY_BACKLOG: "backlog"}
+        waiting = {name: 0 for name in lanes.values()}
+        for priority, _, waiter in list(self._waiting):
+            if not waiter.done():
+                waiting[lanes.get(priority, "normal")] += 1
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": waiting,
+            "tokens": self.token_limiter.get_status(),
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+        }
+
+
+# One gateway per API key, shared by every agent in the process
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+def get_llm_gateway(api_key: str = None) -> LLMGateway:
+    """
+    Get the shared gateway for an API key
+
+    Args:
+        api_key: OpenAI API key. Defaults to OPENAI_API_KEY.
+
+    Returns:
+        The gateway
+    """
+    api_key = api_key or os.environ.get("OPENAI_API_KEY") or ""
+    with _gateways_lock:
+        gateway = _gateways.get(api_key)
+        if gateway is None:
+            gateway = LLMGateway(api_key)
+            _gateways[api_key] = gateway
+        return gateway
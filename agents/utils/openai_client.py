@@ -1,14 +1,15 @@
 
 import os
-import time
-import openai
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
 from .logger import Logger
+from .llm_gateway import PRIORITY_NORMAL, get_llm_gateway
+from .model_router import ModelCascade
 
 class OpenAIClient:
     """
     Client for interacting with OpenAI API.
-    Handles authentication, model selection, and error handling.
+    Handles authentication and model selection; requests go through the
+    shared LLM gateway, which handles concurrency, rate limits and retries.
     """
     
     def __init__(self):
@@ -24,59 +25,95 @@ class OpenAIClient:
         # Get model from environment or use default
         self.model = os.environ.get("OPENAI_MODEL", "gpt-4o")
         
-        # Initialize OpenAI client
-        openai.api_key = self.api_key
+        # Shared by every agent in the process using this key
+        self.gateway = get_llm_gateway(self.api_key)
         
-    def generate_completion(self, prompt: str, max_retries: int = 3) -> Optional[str]:
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "You are an expert software developer fixing bugs."},
+            {"role": "user", "content": prompt}
+        ]
+        
+    def generate_completion(self, prompt: str, max_retries: int = 3, priority: int = PRIORITY_NORMAL,
+                            use_cache: bool = True, cascade: Optional[ModelCascade] = None) -> Optional[str]:
         """
         Send a prompt to OpenAI API and get completion
         
         Args:
             prompt: The prompt to send to the API
-            max_retries: Maximum number of retries for API errors
+            max_retries: Maximum number of attempts for API errors
+            priority: Gateway lane, e.g. llm_gateway.PRIORITY_URGENT
+            use_cache: Answer from the completion cache if the same prompt was answered before
+            cascade: The ticket's model cascade, which picks the model and records the call.
+                Without one, OPENAI_MODEL is used.
             
         Returns:
             Completion text or None if all retries fail
         """
-        self.logger.info(f"Sending prompt to OpenAI API using model {self.model}")
+        cascade = cascade or ModelCascade(models=[self.model])
+        self.logger.info(f"Sending prompt to OpenAI API using model {cascade.model}")
+        completion = cascade.complete_sync(
+            self.gateway,
+            "developer",
+            self._messages(prompt),
+            priority=priority,
+            temperature=0.1,  # Use low temperature for deterministic outputs
+            max_tokens=4000,
+            max_retries=max(0, max_retries - 1),
+            use_cache=use_cache
+        )
+        if completion is not None:
+            self.logger.info("Successfully received completion from OpenAI API")
+        return completion
+        
+    async def generate_completion_async(self, prompt: str, max_retries: int = 3, priority: int = PRIORITY_NORMAL,
+                                        use_cache: bool = True,
+                                        cascade: Optional[ModelCascade] = None) -> Optional[str]:
+        """Send a prompt like generate_completion, without blocking the event loop"""
+        cascade = cascade or ModelCascade(models=[self.model])
+        self.logger.info(f"Sending prompt to OpenAI API using model {cascade.model}")
+        return await cascade.complete(
+            self.gateway,
+            "developer",
+            self._messages(prompt),
+            priority=priority,
+            temperature=0.1,
+            max_tokens=4000,
+            max_retries=max(0, max_retries - 1),
+            use_cache=use_cache
+        )
         
-        attempt = 0
-        while attempt < max_retries:
-            try:
-                self.logger.info(f"API request attempt {attempt + 1}/{max_retries}")
-                
-                # Create chat completion
-                response = openai.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are an expert software developer fixing bugs."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,  # Use low temperature for deterministic outputs
-                    max_tokens=4000
-                )
-                
-                # Extract and return the completion text
-                completion = response.choices[0].message.content
-                self.logger.info("Successfully received completion from OpenAI API")
-                return completion
-                
-            except openai.RateLimitError:
-                attempt += 1
-                wait_time = 2 ** attempt  # Exponential backoff
-                self.logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds.")
-                time.sleep(wait_time)
-                
-            except openai.APIError as e:
-                attempt += 1
-                self.logger.error(f"API error: {str(e)}. Attempt {attempt}/{max_retries}")
-                if attempt >= max_retries:
-                    self.logger.error("Maximum retries reached. Giving up.")
-                    return None
-                time.sleep(1)
-                
-            except Exception as e:
-                self.logger.error(f"Unexpected error: {str(e)}")
-                return None
-                
-        return None
+    def generate_completion_stream(self, prompt: str, on_delta: Callable[[str], Optional[bool]],
+                                   max_retries: int = 3, priority: int = PRIORITY_NORMAL,
+                                   use_cache: bool = True, cascade: Optional[ModelCascade] = None) -> Optional[str]:
+        """
+        Send a prompt like generate_completion, passing the answer to on_delta as it is generated
+        
+        Args:
+            prompt: The prompt to send to the API
+            on_delta: Called with each new piece of text; returning False stops the generation
+            max_retries: Maximum number of attempts for API errors before any text arrived
+            priority: Gateway lane, e.g. llm_gateway.PRIORITY_URGENT
+            use_cache: Answer from the completion cache if the same prompt was answered before
+            cascade: The ticket's model cascade, which picks the model and records the call.
+                Without one, OPENAI_MODEL is used.
+            
+        Returns:
+            Completion text, or None if the request failed or on_delta stopped it
+        """
+        cascade = cascade or ModelCascade(models=[self.model])
+        self.logger.info(f"Streaming prompt to OpenAI API using model {cascade.model}")
+        completion = cascade.complete_stream_sync(
+            self.gateway,
+            "developer",
+            self._messages(prompt),
+            on_delta,
+            priority=priority,
+            temperature=0.1,
+            max_tokens=4000,
+            max_retries=max(0, max_retries - 1),
+            use_cache=use_cache
+        )
+        if completion is not None:
+            self.logger.info("Successfully received completion from OpenAI API")
+        return completion
@@ -0,0 +1,217 @@
+"""
+Incremental parsing of patches while the model is still writing them.
+
+The developer prompt asks for up to 4000 tokens, and waiting for all of them
+before looking at the answer means paying the full latency for a generation
+that went wrong in its first lines: an explanation instead of a diff, or a
+diff against placeholder paths like a/path/to/file.py. StreamingPatchParser
+is fed the completion as it arrives, recognizes the file headers and hunks of
+a unified diff, and tells the caller to stop as soon as the output can no
+longer become a usable patch. Each file's diff is handed to on_file_ready as
+soon as the next file starts or the patch block closes, so work on the first
+file (e.g. preparing a QA sandbox) can start while the rest is generated.
+
+Only unmistakable placeholders (STREAM_ABORT_PATTERNS) abandon a generation.
+The wider checks PatchValidator applies to finished patches, which it takes
+from find_placeholders here, also match real files and code (app/sampler.py,
+an existing # TODO), so they only lower the patch's confidence.
+
+The module only uses the standard library so the agents can use it too; the
+agent images carry an identical copy as agents/utils/patch_stream.py.
+"""
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("patch-stream")
+
+# Characters of output allowed before the first diff header; more means the model isn't writing a patch
+PATCH_STREAM_MAX_PREAMBLE_CHARS = int(os.environ.get("PATCH_STREAM_MAX_PREAMBLE_CHARS", "2000"))
+
+# File paths that are examples rather than files of the repository
+PATH_PLACEHOLDER_PATTERNS = [
+    r'/path/to/',
+    r'example\.py',
+    r'your_',
+    r'my_',
+    r'placeholder',
+    r'sample',
+    r'/tmp/',
+    r'foo\.py',
+    r'bar\.py'
+]
+
+# Diff content left for someone else to fill in
+DIFF_PLACEHOLDER_PATTERNS = [
+    r'# TODO',
+    r'# FIXME',
+    r'# NOTE',
+    r'your_function',
+    r'your_variable',
+    r'your_class',
+    r'insert your',
+    r'replace this',
+    r'xyz\.py',
+    r'example\.com'
+]
+
+# Placeholders no real patch contains; only these abandon a generation while it streams
+STREAM_ABORT_PATTERNS = [
+    r'/path/to/',
+    r'\byour_\w+'
+]
+
+
+def find_placeholders(file_path: str, diff: str) -> List[str]:
+    """
+    Check for placeholder text in a file path or diff
+
+    Args:
+        file_path: File path to check
+        diff: Diff content to check
+
+    Returns:
+        List of placeholder patterns found, e.g. "path_placeholder:/path/to/"
+    """
+    placeholders = []
+    for pattern in PATH_PLACEHOLDER_PATTERNS:
+        if re.search(pattern, file_path or "", re.IGNORECASE):
+            placeholders.append(f"path_placeholder:{pattern}")
+    for pattern in DIFF_PLACEHOLDER_PATTERNS:
+        if re.search(pattern, diff or "", re.IGNORECASE):
+            placeholders.append(f"diff_placeholder:{pattern}")
+    return placeholders
+
+
+def find_abort_placeholder(text: str) -> Optional[str]:
+    """Get the first STREAM_ABORT_PATTERNS pattern found in a file path or added line, or None"""
+    for pattern in STREAM_ABORT_PATTERNS:
+        if re.search(pattern, text or "", re.IGNORECASE):
+            return pattern
+    return None
+
+
+class StreamingPatchParser:
+    """Parses a unified diff from completion deltas and decides whether the generation is worth finishing"""
+
+    def __init__(self, on_file_ready: Optional[Callable[[str, str], Any]] = None,
+                 max_preamble_chars: int = None):
+        """
+        Initialize the parser
+
+        Args:
+            on_file_ready: Called with (file_path, diff) once a file's diff is complete
+            max_preamble_chars: Output allowed before the first diff header.
+                Defaults to PATCH_STREAM_MAX_PREAMBLE_CHARS.
+        """
+        self.on_file_ready = on_file_ready
+        self.max_preamble_chars = max_preamble_chars or PATCH_STREAM_MAX_PREAMBLE_CHARS
+        self.files: List[Dict[str, str]] = []
+        self.abort_reason: Optional[str] = None
+
+        self._buffer = ""
+        self._preamble_chars = 0
+        self._seen_header = False
+        self._old_header: Optional[str] = None
+        self._current: Optional[Dict[str, Any]] = None
+
+    def feed(self, delta: str) -> bool:
+        """
+        Parse the next piece of the completion
+
+        Args:
+            delta: Text received since the last call
+
+        Returns:
+            False once the generation should be abandoned (see abort_reason), True otherwise
+        """
+        if self.abort_reason:
+            return False
+        self._buffer += delta
+        while "\n" in self._buffer and not self.abort_reason:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._parse_line(line)
+        if not self._seen_header and not self.abort_reason:
+            if self._preamble_chars + len(self._buffer) > self.max_preamble_chars:
+                self._abort(f"no diff header in the first {self.max_preamble_chars} characters")
+        return not self.abort_reason
+
+    def finish(self) -> List[Dict[str, str]]:
+        """
+        Parse what is left once the completion is complete
+
+        Returns:
+            The complete file diffs, each with file_path and diff
+        """
+        if self._buffer and not self.abort_reason:
+            self._parse_line(self._buffer)
+        self._buffer = ""
+        self._complete_file()
+        return self.files
+
+    def _abort(self, reason: str) -> None:
+        self.abort_reason = reason
+        logger.warning(f"Abandoning patch generation: {reason}")
+
+    def _parse_line(self, line: str) -> None:
+        if line.startswith("```"):
+            # A closing fence ends the patch; an opening one starts it
+            self._complete_file()
+            return
+        if line.startswith("diff --git "):
+            self._complete_file()
+            self._seen_header = True
+            return
+        if line.startswith("--- ") and (self._current is None or self._current["hunks"]):
+            self._complete_file()
+            self._old_header = line
+            self._seen_header = True
+            return
+        if line.startswith("+++ ") and self._current is None:
+            self._start_file(line)
+            return
+        if self._current is None:
+            if not self._seen_header:
+                self._preamble_chars += len(line) + 1
+            return
+
+        if line.startswith("@@"):
+            self._current["hunks"] += 1
+        elif line.startswith("+") and self._current["hunks"]:
+            placeholder = find_abort_placeholder(line[1:])
+            if placeholder:
+                self._abort(f"placeholder {placeholder} added to {self._current['file_path']}")
+                return
+        self._current["lines"].append(line)
+
+    def _start_file(self, new_header: str) -> None:
+        header_path = new_header[4:].split("\t")[0].strip()
+        file_path = header_path[2:] if header_path.startswith("b/") else header_path
+        # Checked with its b/ prefix so the /path/to/ of the prompt's example matches
+        placeholder = find_abort_placeholder(header_path)
+        if placeholder:
+            self._abort(f"placeholder path {file_path} ({placeholder})")
+            return
+        self._seen_header = True
+        lines = [self._old_header] if self._old_header else []
+        self._current = {"file_path": file_path, "lines": lines + [new_header], "hunks": 0}
+        self._old_header = None
+
+    def _complete_file(self) -> None:
+        """Hand on the current file's diff if it has at least one hunk"""
+        current, self._current = self._current, None
+        self._old_header = None
+        if not current or not current["hunks"]:
+            return
+        # Blank lines between files belong to neither
+        lines = current["lines"]
+        while lines and not lines[-1].strip():
+            lines.pop()
+        diff = "\n".join(lines) + "\n"
+        self.files.append({"file_path": current["file_path"], "diff": diff})
+        if self.on_file_ready is not None:
+            try:
+                self.on_file_ready(current["file_path"], diff)
+            except Exception as e:
+                logger.error(f"Error handling completed diff for {current['file_path']}: {str(e)}")
@@ -0,0 +1,103 @@
+"""
+Persisted state of the communicator's edit-in-place progress comments.
+
+The CommunicatorAgent edits one progress comment per ticket and skips status
+transitions the ticket already made. Kept in memory only, that state was lost
+on restart, which opened a second progress comment, and it grew with every
+ticket ever handled. It is saved to a JSON file instead, like the backend's
+progress comment store, and keeps the most recently updated tickets only. A
+comment shows the latest attempt reports and counts the older ones, so it
+stays under JIRA's comment size limit however often a ticket is retried.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger("progress-state")
+
+# Directory holding the communicator's progress comment state, shared with the backend's poll state
+JIRA_POLL_STATE_DIR = os.environ.get("JIRA_POLL_STATE_DIR", "data")
+
+# Attempt reports shown in a ticket's comment; older ones are summarised, keeping it under JIRA's size limit
+JIRA_PROGRESS_MAX_SECTIONS = int(os.environ.get("JIRA_PROGRESS_MAX_SECTIONS", "8"))
+
+# Tickets whose progress is remembered, most recently updated first
+JIRA_PROGRESS_MAX_TICKETS = int(os.environ.get("JIRA_PROGRESS_MAX_TICKETS", "500"))
+
+
+class ProgressCommentState:
+    """Progress comment ID, latest report sections and last status per ticket, saved after each change"""
+
+    def __init__(self, state_path: str = None):
+        """
+        Initialize the state
+
+        Args:
+            state_path: State file path. Defaults to JIRA_POLL_STATE_DIR/jira_progress_communicator_agent.json
+        """
+        self.state_path = state_path or os.path.join(JIRA_POLL_STATE_DIR, "jira_progress_communicator_agent.json")
+        self._lock = threading.Lock()
+        self.tickets: Dict[str, Dict[str, Any]] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, "r") as f:
+                    return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Couldn't read progress comment state {self.state_path}: {str(e)}")
+        return {}
+
+    def get(self, ticket_id: str) -> Dict[str, Any]:
+        """Get a ticket's entry: {"comment_id", "sections", "count", "status"}; changes are kept by save()"""
+        with self._lock:
+            return self.tickets.setdefault(ticket_id, self._new_entry())
+
+    def reset(self, ticket_id: str) -> Dict[str, Any]:
+        """Start a ticket's entry over, e.g. for a new run, and return it"""
+        with self._lock:
+            self.tickets[ticket_id] = self._new_entry()
+            return self.tickets[ticket_id]
+
+    def add_section(self, ticket_id: str, section: str) -> Dict[str, Any]:
+        """Append an attempt's report, keeping only the latest JIRA_PROGRESS_MAX_SECTIONS, and return the entry"""
+        with self._lock:
+            entry = self.tickets.setdefault(ticket_id, self._new_entry())
+            entry["sections"] = (entry["sections"] + [section])[-JIRA_PROGRESS_MAX_SECTIONS:]
+            entry["count"] = entry.get("count", 0) + 1
+            return entry
+
+    def render(self, ticket_id: str) -> str:
+        """Build the progress comment text from a ticket's latest reports"""
+        entry = self.get(ticket_id)
+        lines = ["BugFix AI progress (this comment is updated after each attempt)"]
+        hidden = entry.get("count", 0) - len(entry["sections"])
+        if hidden > 0:
+            lines.append(f"... {hidden} earlier updates")
+        return "\n\n".join(lines + entry["sections"])
+
+    @staticmethod
+    def _new_entry() -> Dict[str, Any]:
+        return {"comment_id": None, "sections": [], "count": 0, "status": None}
+
+    def save(self, ticket_id: str) -> None:
+        """Persist the state atomically after a ticket's entry changed, forgetting the least recently updated tickets beyond the limit"""
+        with self._lock:
+            if ticket_id in self.tickets:
+                self.tickets[ticket_id]["updated_at"] = time.time()
+            if len(self.tickets) > JIRA_PROGRESS_MAX_TICKETS:
+                newest = sorted(self.tickets.items(), key=lambda item: item[1].get("updated_at", 0), reverse=True)
+                self.tickets = dict(newest[:JIRA_PROGRESS_MAX_TICKETS])
+            try:
+                state_dir = os.path.dirname(self.state_path)
+                if state_dir:
+                    os.makedirs(state_dir, exist_ok=True)
+                tmp_path = f"{self.state_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self.tickets, f)
+                os.replace(tmp_path, self.state_path)
+            except IOError as e:
+                logger.error(f"Couldn't save progress comment state {self.state_path}: {str(e)}")
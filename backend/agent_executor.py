@@ -0,0 +1,258 @@
+"""
+Execution layer for running agents off the asyncio event loop.
+
+LLM-backed agents (planner, developer, communicator) are I/O bound and run in
+dedicated thread pools. The QA agent shells out to test runners for minutes at
+a time, so it runs in a process pool that can be torn down when a call times
+out or is cancelled.
+
+For thread-pool agents a timeout or cancellation is best-effort: Python can't
+stop a running thread, so the caller gets AgentTimeoutError or
+CancelledError at once while the agent keeps running in its worker thread
+and holds its pool slot until it returns on its own. Agents that may hang
+should run in a process pool, or bound their own I/O with timeouts.
+
+A process-pool agent runs on a copy of the agent object, so the child sends
+back the agent's status with the result and it is applied to the parent's
+agent; get_agent_statuses then reports it as for in-process agents.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("agent-executor")
+
+# Pool configuration per agent type: executor kind, pool size and per-call timeout
+AGENT_POOL_CONFIG = {
+    "planner": {
+        "kind": "thread",
+        "workers": int(os.environ.get("PLANNER_POOL_SIZE", "4")),
+        "timeout": float(os.environ.get("PLANNER_TIMEOUT_SECONDS", "300")),
+    },
+    "developer": {
+        "kind": "thread",
+        "workers": int(os.environ.get("DEVELOPER_POOL_SIZE", "4")),
+        "timeout": float(os.environ.get("DEVELOPER_TIMEOUT_SECONDS", "600")),
+    },
+    "qa": {
+        "kind": "process",
+        "workers": int(os.environ.get("QA_POOL_SIZE", "1")),
+        "timeout": float(os.environ.get("QA_TIMEOUT_SECONDS", "900")),
+    },
+    "communicator": {
+        "kind": "thread",
+        "workers": int(os.environ.get("COMMUNICATOR_POOL_SIZE", "2")),
+        "timeout": float(os.environ.get("COMMUNICATOR_TIMEOUT_SECONDS", "120")),
+    },
+    "default": {
+        "kind": "thread",
+        "workers": int(os.environ.get("DEFAULT_POOL_SIZE", "4")),
+        "timeout": float(os.environ.get("DEFAULT_AGENT_TIMEOUT_SECONDS", "600")),
+    },
+}
+
+
+class AgentTimeoutError(Exception):
+    """Raised when an agent call exceeds its timeout"""
+
+
+def _run_agent_in_process(agent, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Any]:
+    """Entry point for agent calls executed in a worker process. Returns the result and the agent's status."""
+    result = agent.run(input_data)
+    return result, getattr(agent, "status", None)
+
+
+class AgentExecutor:
+    """Runs agent calls in per-agent-type thread or process pools"""
+
+    def __init__(self, pool_config: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize the executor
+
+        Args:
+            pool_config: Pool settings keyed by agent type. Defaults to AGENT_POOL_CONFIG.
+        """
+        self.pool_config = pool_config or AGENT_POOL_CONFIG
+        self._pools: Dict[str, Executor] = {}
+        self._pools_lock = threading.Lock()
+
+    def _get_config(self, agent_type: str) -> Dict[str, Any]:
+        """Get the pool settings for an agent type, falling back to the default pool"""
+        if agent_type in self.pool_config:
+            return self.pool_config[agent_type]
+        return self.pool_config.get("default", AGENT_POOL_CONFIG["default"])
+
+    def _pool_name(self, agent_type: str) -> str:
+        return agent_type if agent_type in self.pool_config else "default"
+
+    def _get_pool(self, agent_type: str) -> Executor:
+        """Get or lazily create the pool for an agent type"""
+        name = self._pool_name(agent_type)
+        with self._pools_lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                config = self._get_config(agent_type)
+                workers = max(1, config.get("workers", 1))
+                if config.get("kind") == "process":
+                    # Spawn rather than fork: the parent has running threads and an event loop
+                    pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    pool = ThreadPoolExecutor(
+                        max_workers=workers,
+                        thread_name_prefix=f"{name}-agent"
+                    )
+                self._pools[name] = pool
+                logger.info(f"Created {config.get('kind', 'thread')} pool '{name}' with {workers} workers")
+            return pool
+
+    def _reset_process_pool(self, agent_type: str) -> None:
+        """
+        Kill a process pool's workers so a timed out or cancelled call stops running.
+
+        Other calls in flight on the same pool fail with BrokenProcessPool; the
+        pool is recreated on the next call.
+        """
+        name = self._pool_name(agent_type)
+        with self._pools_lock:
+            pool = self._pools.pop(name, None)
+        if not isinstance(pool, ProcessPoolExecutor):
+            return
+
+        count = self._terminate_pool(pool)
+        logger.warning(f"Terminated {count} worker process(es) in pool '{name}'")
+
+    def _terminate_pool(self, pool: ProcessPoolExecutor) -> int:
+        """Shut down a process pool and kill its workers. Returns the number of workers."""
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        return len(processes)
+
+    def _can_use_process(self, agent, input_data: Dict[str, Any]) -> bool:
+        """Check that the agent and its input can be sent to a worker process"""
+        try:
+            pickle.dumps((agent, input_data))
+            return True
+        except Exception as e:
+            logger.warning(f"Agent {type(agent).__name__} can't be sent to a process pool, using a thread: {str(e)}")
+            return False
+
+    async def run(self, agent, input_data: Dict[str, Any], agent_type: str = "default",
+                  timeout: Optional[float] = None, isolated: bool = False) -> Dict[str, Any]:
+        """
+        Run an agent's run() method without blocking the event loop
+
+        Args:
+            agent: Agent instance with a run(input_data) method
+            input_data: Input passed to the agent
+            agent_type: Pool to run in (planner, developer, qa, communicator)
+            timeout: Seconds before the call is abandoned. Defaults to the pool's timeout.
+                Process-pool calls are killed; thread-pool calls keep running in
+                their thread until they return, only the caller stops waiting.
+            isolated: For process pools, run in a dedicated worker process so that
+                cancelling this call never kills other calls sharing the pool
+
+        Returns:
+            The agent's result
+
+        Raises:
+            AgentTimeoutError: If the call did not finish within the timeout
+        """
+        config = self._get_config(agent_type)
+        if timeout is None:
+            timeout = config.get("timeout")
+
+        # Async agents already cooperate with the event loop
+        if asyncio.iscoroutinefunction(agent.run):
+            try:
+                return await asyncio.wait_for(agent.run(input_data), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise AgentTimeoutError(f"{agent_type} agent timed out after {timeout}s")
+
+        loop = asyncio.get_running_loop()
+        use_process = config.get("kind") == "process" and self._can_use_process(agent, input_data)
+
+        dedicated_pool = None
+        if use_process and isolated:
+            dedicated_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            future = loop.run_in_executor(dedicated_pool, _run_agent_in_process, agent, input_data)
+        elif use_process:
+            future = loop.run_in_executor(self._get_pool(agent_type), _run_agent_in_process, agent, input_data)
+        else:
+            pool = self._get_pool(agent_type) if config.get("kind") != "process" else self._get_pool("default")
+            future = loop.run_in_executor(pool, agent.run, input_data)
+
+        try:
+            result = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{agent_type} agent timed out after {timeout}s")
+            if not use_process:
+                logger.warning(f"{agent_type} agent keeps running in its worker thread until it returns")
+            if dedicated_pool:
+                self._terminate_pool(dedicated_pool)
+            elif use_process:
+                self._reset_process_pool(agent_type)
+            raise AgentTimeoutError(f"{agent_type} agent timed out after {timeout}s")
+        except asyncio.CancelledError:
+            logger.warning(f"{agent_type} agent call cancelled")
+            if dedicated_pool:
+                self._terminate_pool(dedicated_pool)
+            elif use_process:
+                self._reset_process_pool(agent_type)
+            raise
+        finally:
+            if dedicated_pool:
+                dedicated_pool.shutdown(wait=False)
+
+        if use_process:
+            # The child ran a copy of the agent; keep its status on ours
+            result, status = result
+            if status is not None:
+                agent.status = status
+
+        # Some agents return a coroutine from a synchronous run()
+        if hasattr(result, "__await__"):
+            result = await result
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the configured pools and which ones are running"""
+        return {
+            name: {
+                "kind": config.get("kind"),
+                "workers": config.get("workers"),
+                "timeout": config.get("timeout"),
+                "started": name in self._pools
+            }
+            for name, config in self.pool_config.items()
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Shut down all pools"""
+        with self._pools_lock:
+            pools = list(self._pools.items())
+            self._pools = {}
+        for name, pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+            logger.info(f"Shut down agent pool '{name}'")
+
+
+# Singleton instance
+_agent_executor = None
+
+def get_agent_executor() -> AgentExecutor:
+    """Get the singleton instance of the agent executor"""
+    global _agent_executor
+    if _agent_executor is None:
+        _agent_executor = AgentExecutor()
+    return _agent_executor
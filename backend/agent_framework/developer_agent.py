@@ -15,6 +15,10 @@ class DeveloperAgent(Agent):
     Produces patches that can be applied to the codebase to fix the identified bugs.
     """
     
+    # The fixes don't depend on a temperature or prompt strategy, so speculative
+    # candidates would all be the same patch
+    supports_sampling = False
+    
     def __init__(self, max_retries: int = 4):
         """
         Initialize the developer agent
@@ -73,8 +77,8 @@ class DeveloperAgent(Agent):
                 result["error"] = "Failed to generate code fix"
                 return result
                 
-            # Apply the generated fix to the codebase
-            patch_applied = self.apply_patch(result)
+            # Apply the generated fix to the codebase (or the candidate's sandbox)
+            patch_applied = self.apply_patch(result, repo_path=input_data.get("repo_path"))
             if not patch_applied:
                 logger.error("Failed to apply patch")
                 result["error"] = "Failed to apply generated patch"
@@ -292,12 +296,13 @@ class DeveloperAgent(Agent):
         logger.info(f"Developer output successfully validated: {json.dumps(result, indent=2)}")
         return True
         
-    def apply_patch(self, patch_data: Dict[str, Any]) -> bool:
+    def apply_patch(self, patch_data: Dict[str, Any], repo_path: Optional[str] = None) -> bool:
         """
         Apply a patch to the local repository
         
         Args:
             patch_data: Dictionary with patch information
+            repo_path: Repository to patch. Defaults to REPO_PATH.
             
         Returns:
             Boolean indicating if patch was applied successfully
@@ -317,7 +322,7 @@ class DeveloperAgent(Agent):
                 return False
                 
             # Write patched files to disk
-            repo_path = os.environ.get("REPO_PATH", "/mnt/codebase")
+            repo_path = repo_path or os.environ.get("REPO_PATH", "/mnt/codebase")
             for file_path in patched_files:
                 if file_path in patched_code:
                     # Create directory if it doesn't exist
@@ -5,12 +5,24 @@ import os
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 from .agent_base import Agent, AgentStatus
+from .planner_cache import PLANNER_CACHE_ENABLED, PlannerCache, get_repo_commit
+from llm_gateway import PRIORITY_NORMAL, get_llm_gateway, priority_for_ticket
+from model_router import LLM_MODEL_TIERS, ModelCascade
+
+# Strongest model used for ticket analysis; cheaper tiers of LLM_MODEL_TIERS are tried first
+PLANNER_MODEL = os.environ.get("PLANNER_MODEL", "gpt-4o")
+# Bump whenever the planning prompt or output format changes so cached results are ignored
+PLANNER_PROMPT_VERSION = "2"
 
 class PlannerAgent(Agent):
-    def __init__(self):
+    def __init__(self, cache: Optional[PlannerCache] = None):
         super().__init__(name="PlannerAgent")
         self.output_dir = os.path.join(os.path.dirname(__file__), "planner_outputs")
         os.makedirs(self.output_dir, exist_ok=True)
+        self.model = PLANNER_MODEL
+        
+        # Results for unchanged tickets are served from the cache instead of calling GPT
+        self.cache = cache or (PlannerCache() if PLANNER_CACHE_ENABLED else None)
 
     def _clean_ticket(self, text: str) -> str:
         """Clean a ticket description by removing noise elements"""
@@ -257,63 +269,59 @@ class PlannerAgent(Agent):
             json.dump(output_data, f, indent=2)
         self.log(f"Analysis output saved to {filepath}")
 
-    def _query_gpt(self, prompt: str, max_retries: int = 1) -> str:
+    def _query_gpt(self, prompt: str, max_retries: int = 1, priority: int = PRIORITY_NORMAL,
+                   cascade: Optional[ModelCascade] = None) -> str:
         """
         Query GPT-4 with the given prompt and retry on failure
         
         Args:
             prompt: The prompt to send to the API
             max_retries: Maximum number of retries (default: 1)
+            priority: Gateway lane for the request, from the ticket's priority
+            cascade: The ticket's model cascade, which picks the model and records the call.
+                Defaults to PLANNER_MODEL.
             
         Returns:
             The completion text
         """
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            self.log("Missing OpenAI API key")
+            return ""
+        gateway = get_llm_gateway(api_key)
+        cascade = cascade or ModelCascade(models=[self.model])
+        
+        result = ""
         attempts = 0
         max_attempts = max_retries + 1  # Initial attempt plus retries
         
         while attempts < max_attempts:
-            try:
-                import openai
-                
-                # Get OpenAI API key from environment
-                api_key = os.environ.get("OPENAI_API_KEY")
-                if not api_key:
-                    self.log("Missing OpenAI API key")
-                    raise EnvironmentError("Missing OPENAI_API_KEY environment variable")
-                    
-                openai.api_key = api_key
-                
-                self.log(f"Querying GPT (attempt {attempts + 1}/{max_attempts})")
-                response = openai.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are a senior software developer tasked with analyzing bug tickets and extracting structured information."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=2000
-                )
-                
-                result = response.choices[0].message.content
-                
-                # Check if result looks like valid JSON
-                if result and ('{' in result and '}' in result):
-                    return result
-                    
-                self.log("GPT response doesn't appear to be valid JSON")
-                    
-            except Exception as e:
-                self.log(f"Error querying GPT-4: {str(e)}")
+            self.log(f"Querying GPT (attempt {attempts + 1}/{max_attempts})")
+            # The gateway waits for the shared rate limits and retries API errors itself
+            result = cascade.complete_sync(
+                gateway,
+                "planner",
+                [
+                    {"role": "system", "content": "You are a senior software developer tasked with analyzing bug tickets and extracting structured information."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                max_tokens=2000,
+                priority=priority,
+                # A cached answer that wasn't JSON would come back again on a retry
+                use_cache=attempts == 0
+            ) or ""
             
+            # Check if result looks like valid JSON
+            if result and ('{' in result and '}' in result):
+                return result
+                
+            self.log("GPT response doesn't appear to be valid JSON")
             attempts += 1
-            
-            # If we've used all attempts, break out
-            if attempts >= max_attempts:
-                self.log("Maximum GPT query attempts reached")
-                break
         
         # Return whatever we have after max attempts
-        return result if 'result' in locals() else ""
+        self.log("Maximum GPT query attempts reached")
+        return result
 
     def _extract_first_sentences(self, text: str, max_sentences: int = 2) -> str:
         """Extract the first 1-2 sentences from text for fallback summary"""
@@ -340,6 +348,23 @@ class PlannerAgent(Agent):
             noise_removed = original_length - cleaned_length
             self.log(f"Cleaned ticket description, removed {noise_removed} characters of noise")
             
+            # Routing state for the ticket's LLM calls, continued by the developer/QA loop
+            cascade = ModelCascade.from_dict(input_data.get("model_routing")) if input_data.get("model_routing") \
+                else ModelCascade(models=LLM_MODEL_TIERS[:-1] + [self.model])
+            
+            # Skip the GPT round-trip entirely if this exact ticket content was already analyzed
+            cache_key = None
+            if self.cache:
+                cache_key = PlannerCache.make_key(
+                    title, cleaned_description, labels, get_repo_commit(), self.model, PLANNER_PROMPT_VERSION
+                )
+                cached_output = self.cache.get(cache_key)
+                if cached_output:
+                    self.log(f"[PlannerAgent] Cache hit for ticket {ticket_id}, skipping GPT analysis")
+                    output = {**cached_output, "ticket_id": ticket_id, "model_routing": cascade.to_dict()}
+                    self._save_output(ticket_id, output)
+                    return output
+            
             # Step 2: Extract and highlight stack traces
             highlighted_description = self._highlight_stack_traces(cleaned_description)
             stack_traces = self._extract_stack_traces(cleaned_description)
@@ -359,10 +384,14 @@ class PlannerAgent(Agent):
             
             # Step 4: Get analysis from GPT with retry
             self.log(f"Sending ticket {ticket_id} to GPT for analysis with retry mechanism")
-            gpt_response = self._query_gpt(prompt, max_retries=1)
-            
-            # Step 5: Validate GPT response
-            is_valid, parsed_data, error_message = self._validate_gpt_response(gpt_response)
+            priority = priority_for_ticket(input_data.get("priority"))
+            while True:
+                gpt_response = self._query_gpt(prompt, max_retries=1, priority=priority, cascade=cascade)
+                
+                # Step 5: Validate GPT response; a cheaper model's invalid answer goes to the next tier
+                is_valid, parsed_data, error_message = self._validate_gpt_response(gpt_response)
+                if (is_valid and parsed_data) or not cascade.escalate("planner", error_message):
+                    break
             
             if is_valid and parsed_data:
                 # Step 6: Validate affected files against repository structure
@@ -379,11 +408,17 @@ class PlannerAgent(Agent):
                 }
                 
                 self.log(f"[PlannerAgent] Parsed ticket {ticket_id} | Valid JSON received | Bug Summary: \"{parsed_data['bug_summary']}\"")
+                
+                # Only successful analyses are cached; fallbacks should be retried
+                if cache_key:
+                    self.cache.set(cache_key, ticket_id, output)
             else:
                 # Use fallback if validation fails
                 self.log(f"[PlannerAgent] Fallback triggered for {ticket_id} | Reason: {error_message}")
                 output = self._generate_fallback_output(ticket_id, description)
             
+            output["model_routing"] = cascade.to_dict()
+            
             # Save output for debugging/inspection
             self._save_output(ticket_id, output)
             
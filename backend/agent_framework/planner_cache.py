@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("planner-cache")
+
+PLANNER_CACHE_ENABLED = os.environ.get("PLANNER_CACHE_ENABLED", "true").lower() == "true"
+PLANNER_CACHE_DB = os.environ.get("PLANNER_CACHE_DB", "data/planner_cache.db")
+PLANNER_CACHE_TTL_SECONDS = int(os.environ.get("PLANNER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PLANNER_CACHE_MAX_ENTRIES = int(os.environ.get("PLANNER_CACHE_MAX_ENTRIES", "1000"))
+
+
+def get_repo_commit(repo_path: Optional[str] = None) -> str:
+    """Get the HEAD commit of the code repository, or 'unknown' if it can't be read"""
+    repo_path = repo_path or os.environ.get("REPO_PATH", "/mnt/codebase")
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        if process.returncode == 0:
+            return process.stdout.strip()
+    except Exception as e:
+        logger.debug(f"Could not read repository commit: {str(e)}")
+    return "unknown"
+
+
+def _normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only edits don't change the key"""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class PlannerCache:
+    """
+    Persistent cache of planner results keyed by ticket content.
+
+    The key is a hash of the normalized title, description and labels, the
+    repository commit, the model and the prompt version, so any change that
+    could alter the analysis misses the cache. Entries expire after a TTL and
+    the least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, db_path: str = None, ttl_seconds: int = None, max_entries: int = None):
+        """
+        Initialize the cache
+
+        Args:
+            db_path: SQLite database path. Defaults to PLANNER_CACHE_DB.
+            ttl_seconds: Entry lifetime. Defaults to PLANNER_CACHE_TTL_SECONDS.
+            max_entries: Maximum number of entries. Defaults to PLANNER_CACHE_MAX_ENTRIES.
+        """
+        self.db_path = db_path or PLANNER_CACHE_DB
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else PLANNER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else PLANNER_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS planner_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    ticket_id TEXT,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_planner_cache_ticket ON planner_cache (ticket_id)")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and rolling back on error"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with self._lock:
+                yield conn
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(title: str, description: str, labels: List[str], repo_commit: str,
+                 model: str, prompt_version: str) -> str:
+        """
+        Build the cache key for a ticket
+
+        Args:
+            title: Ticket title
+            description: Cleaned ticket description
+            labels: Ticket labels (order doesn't matter)
+            repo_commit: Commit of the repository being analyzed
+            model: LLM model name
+            prompt_version: Version of the planner prompt
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        content = json.dumps({
+            "title": _normalize_text(title),
+            "description": _normalize_text(description),
+            "labels": sorted(_normalize_text(str(label)) for label in (labels or [])),
+            "repo_commit": repo_commit,
+            "model": model,
+            "prompt_version": prompt_version
+        }, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached planner result, or None if it is missing or expired"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT output, created_at FROM planner_cache WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM planner_cache WHERE cache_key = ?", (cache_key,))
+                    return None
+                conn.execute("UPDATE planner_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+                return json.loads(row[0])
+        except Exception as e:
+            logger.error(f"Error reading planner cache: {str(e)}")
+            return None
+
+    def set(self, cache_key: str, ticket_id: str, output: Dict[str, Any]) -> None:
+        """Store a planner result and evict the least recently used entries over the limit"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO planner_cache (cache_key, ticket_id, output, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, ticket_id, json.dumps(output), now, now)
+                )
+                if self.ttl_seconds:
+                    conn.execute("DELETE FROM planner_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                if self.max_entries:
+                    conn.execute(
+                        "DELETE FROM planner_cache WHERE cache_key IN ("
+                        "SELECT cache_key FROM planner_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+        except Exception as e:
+            logger.error(f"Error writing planner cache: {str(e)}")
+
+    def invalidate(self, ticket_id: str = None, cache_key: str = None) -> int:
+        """
+        Remove cached results for a ticket, a single key, or everything
+
+        Args:
+            ticket_id: Remove all entries stored for this ticket
+            cache_key: Remove this entry
+
+        Returns:
+            Number of entries removed
+        """
+        try:
+            with self._connect() as conn:
+                if cache_key:
+                    cursor = conn.execute("DELETE FROM planner_cache WHERE cache_key = ?", (cache_key,))
+                elif ticket_id:
+                    cursor = conn.execute("DELETE FROM planner_cache WHERE ticket_id = ?", (ticket_id,))
+                else:
+                    cursor = conn.execute("DELETE FROM planner_cache")
+                removed = cursor.rowcount
+            logger.info(f"Invalidated {removed} planner cache entries")
+            return removed
+        except Exception as e:
+            logger.error(f"Error invalidating planner cache: {str(e)}")
+            return 0
+
+    def size(self) -> int:
+        """Get the number of cached entries"""
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM planner_cache").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error reading planner cache size: {str(e)}")
+            return 0
@@ -72,7 +72,8 @@ class QAAgent(Agent):
             
         # Verify that code changes were actually made
         logger.info("Verifying code changes")
-        if not self._verify_code_changes(result):
+        repo_path = input_data.get("repo_path")
+        if not self._verify_code_changes(result, repo_path=repo_path):
             result["error_message"] = "No code changes detected"
             logger.error("No code changes detected in the repository")
             return result
@@ -81,7 +82,7 @@ class QAAgent(Agent):
         logger.info("Running tests")
         test_command = os.environ.get("TEST_COMMAND", "python -m pytest")
         logger.info(f"Using test command from environment: {test_command}")
-        success, test_output = self._run_test_command(test_command)
+        success, test_output = self._run_test_command(test_command, repo_path=repo_path)
         
         # Parse and process test results
         if success:
@@ -192,12 +193,13 @@ class QAAgent(Agent):
         
         return valid
         
-    def _verify_code_changes(self, result: Dict[str, Any]) -> bool:
+    def _verify_code_changes(self, result: Dict[str, Any], repo_path: Optional[str] = None) -> bool:
         """
         Verify that code changes were actually made using git diff
         
         Args:
             result: Result dictionary to update
+            repo_path: Repository to check. Defaults to REPO_PATH.
             
         Returns:
             Boolean indicating if code changes were detected
@@ -206,7 +208,7 @@ class QAAgent(Agent):
             # Run git diff to check for changes
             diff_process = subprocess.run(
                 ["git", "diff", "--exit-code"],
-                cwd=os.environ.get("REPO_PATH", "/mnt/codebase"),
+                cwd=repo_path or os.environ.get("REPO_PATH", "/mnt/codebase"),
                 capture_output=True,
                 text=True
             )
@@ -228,13 +230,14 @@ class QAAgent(Agent):
             result["code_changes_detected"] = False
             return False
     
-    def _run_test_command(self, test_command: str, timeout: int = 300) -> tuple:
+    def _run_test_command(self, test_command: str, timeout: int = 300, repo_path: Optional[str] = None) -> tuple:
         """
         Run tests using the specified command
         
         Args:
             test_command: Command to run tests
             timeout: Timeout in seconds
+            repo_path: Repository to run the tests in. Defaults to REPO_PATH.
             
         Returns:
             Tuple of (success, output)
@@ -282,7 +285,7 @@ class QAAgent(Agent):
             
             process = subprocess.run(
                 command_parts,
-                cwd=os.environ.get("REPO_PATH", "/mnt/codebase"),
+                cwd=repo_path or os.environ.get("REPO_PATH", "/mnt/codebase"),
                 capture_output=True,
                 text=True,
                 timeout=timeout,
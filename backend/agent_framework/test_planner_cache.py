@@ -0,0 +1,104 @@
+import logging
+import unittest
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add parent directory to the path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_framework.planner_agent import PlannerAgent
+from agent_framework.planner_cache import PlannerCache
+
+VALID_GPT_RESPONSE = '{"bug_summary": "Crash on login", "affected_files": ["auth.py"], "error_type": "KeyError"}'
+
+
+class TestPlannerCache(unittest.TestCase):
+    """Test cases for the planner result cache"""
+
+    def setUp(self):
+        """Set up a cache in a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = PlannerCache(os.path.join(self.temp_dir.name, "planner_cache.db"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_ignores_whitespace_and_label_order(self):
+        """Test that formatting-only edits produce the same key"""
+        key_a = PlannerCache.make_key("Login  crash", "Fails\nwhen  logging in", ["b", "a"], "abc", "gpt-4o", "2")
+        key_b = PlannerCache.make_key("Login crash ", "Fails when logging in", ["a", "b"], "abc", "gpt-4o", "2")
+        self.assertEqual(key_a, key_b)
+
+    def test_key_changes_with_commit_model_and_prompt(self):
+        """Test that repository, model and prompt changes miss the cache"""
+        base = PlannerCache.make_key("t", "d", [], "abc", "gpt-4o", "2")
+        self.assertNotEqual(base, PlannerCache.make_key("t", "d", [], "def", "gpt-4o", "2"))
+        self.assertNotEqual(base, PlannerCache.make_key("t", "d", [], "abc", "gpt-4o-mini", "2"))
+        self.assertNotEqual(base, PlannerCache.make_key("t", "d", [], "abc", "gpt-4o", "3"))
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are not returned"""
+        cache = PlannerCache(os.path.join(self.temp_dir.name, "ttl.db"), ttl_seconds=1)
+        cache.set("key", "BUG-1", {"bug_summary": "x"})
+        self.assertEqual(cache.get("key"), {"bug_summary": "x"})
+        with patch("agent_framework.planner_cache.time.time", return_value=time.time() + 5):
+            self.assertIsNone(cache.get("key"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted over the limit"""
+        cache = PlannerCache(os.path.join(self.temp_dir.name, "lru.db"), ttl_seconds=0, max_entries=2)
+        with patch("agent_framework.planner_cache.time.time", side_effect=[1000, 1001, 1002, 1003]):
+            cache.set("a", "BUG-1", {"n": 1})
+            cache.set("b", "BUG-2", {"n": 2})
+            cache.get("a")
+            cache.set("c", "BUG-3", {"n": 3})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_invalidate(self):
+        """Test invalidation by ticket and of the whole cache"""
+        self.cache.set("a", "BUG-1", {"n": 1})
+        self.cache.set("b", "BUG-2", {"n": 2})
+        self.assertEqual(self.cache.invalidate(ticket_id="BUG-1"), 1)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.invalidate(), 1)
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_planner_skips_gpt_for_unchanged_ticket(self):
+        """Test that PlannerAgent only queries GPT once for the same ticket content"""
+        planner = PlannerAgent(cache=self.cache)
+        ticket = {"ticket_id": "BUG-1", "title": "Login crash", "description": "KeyError when logging in"}
+
+        with patch.object(PlannerAgent, "_query_gpt", return_value=VALID_GPT_RESPONSE) as mock_query:
+            first = planner.run(ticket)
+            second = planner.run({**ticket, "ticket_id": "BUG-2"})
+
+        self.assertEqual(mock_query.call_count, 1)
+        self.assertFalse(first["using_fallback"])
+        self.assertEqual(second["bug_summary"], first["bug_summary"])
+        self.assertEqual(second["ticket_id"], "BUG-2")
+
+    def test_fallback_results_are_not_cached(self):
+        """Test that failed analyses are retried instead of served from the cache"""
+        planner = PlannerAgent(cache=self.cache)
+        ticket = {"ticket_id": "BUG-1", "title": "Login crash", "description": "KeyError when logging in"}
+
+        with patch.object(PlannerAgent, "_query_gpt", return_value="not json") as mock_query:
+            planner.run(ticket)
+            planner.run(ticket)
+
+        # Each run asks the cheap model, then the strong one
+        self.assertEqual(mock_query.call_count, 4)
+        self.assertEqual(self.cache.size(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Pooled HTTP clients for calls to the agent services.
+
+Each agent service gets one long-lived httpx.AsyncClient, so connections are
+kept alive and reused across the many calls made per ticket instead of paying
+a TCP/TLS handshake on every hop. Connection limits and timeouts are set per
+agent: QA runs test suites and needs minutes, the communicator should answer
+in seconds. HTTP/2 can be enabled with AGENT_HTTP2=true when the h2 package
+is installed (pip install httpx[http2]).
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("agent-http")
+
+# Per-agent service URL, request timeout and connection pool size
+AGENT_HTTP_CONFIG = {
+    "planner": {
+        "url": os.getenv("PLANNER_URL", "http://planner:8001"),
+        "timeout": float(os.getenv("PLANNER_HTTP_TIMEOUT_SECONDS", "120")),
+        "max_connections": int(os.getenv("PLANNER_HTTP_MAX_CONNECTIONS", "10")),
+    },
+    "developer": {
+        "url": os.getenv("DEVELOPER_URL", "http://developer:8002"),
+        "timeout": float(os.getenv("DEVELOPER_HTTP_TIMEOUT_SECONDS", "300")),
+        "max_connections": int(os.getenv("DEVELOPER_HTTP_MAX_CONNECTIONS", "4")),
+    },
+    "qa": {
+        "url": os.getenv("QA_URL", "http://qa:8003"),
+        "timeout": float(os.getenv("QA_HTTP_TIMEOUT_SECONDS", "600")),
+        "max_connections": int(os.getenv("QA_HTTP_MAX_CONNECTIONS", "2")),
+    },
+    "communicator": {
+        "url": os.getenv("COMMUNICATOR_URL", "http://communicator:8004"),
+        "timeout": float(os.getenv("COMMUNICATOR_HTTP_TIMEOUT_SECONDS", "60")),
+        "max_connections": int(os.getenv("COMMUNICATOR_HTTP_MAX_CONNECTIONS", "10")),
+    },
+}
+
+# Settings shared by all agent clients
+AGENT_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AGENT_HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+AGENT_HTTP_KEEPALIVE_SECONDS = float(os.getenv("AGENT_HTTP_KEEPALIVE_SECONDS", "60"))
+AGENT_HTTP2 = os.getenv("AGENT_HTTP2", "false").lower() == "true"
+
+
+def _http2_available() -> bool:
+    """Check whether httpx can speak HTTP/2 (needs the h2 package)"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AgentClientPool:
+    """Lifecycle-managed pool of one HTTP client per agent service"""
+
+    def __init__(self, config: Optional[Dict[str, Dict[str, Any]]] = None, http2: bool = None,
+                 transport: httpx.AsyncBaseTransport = None):
+        """
+        Initialize the pool
+
+        Args:
+            config: Client settings keyed by agent name. Defaults to AGENT_HTTP_CONFIG.
+            http2: Enable HTTP/2. Defaults to AGENT_HTTP2.
+            transport: Transport used by every client instead of the network (for tests)
+        """
+        self.config = config or AGENT_HTTP_CONFIG
+        self.http2 = AGENT_HTTP2 if http2 is None else http2
+        if self.http2 and not _http2_available():
+            logger.warning("AGENT_HTTP2 is enabled but the h2 package is missing, using HTTP/1.1")
+            self.http2 = False
+        self.transport = transport
+        # Clients are bound to the event loop they were created on
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+    def _create_client(self, agent: str) -> httpx.AsyncClient:
+        """Create the client for an agent from its settings"""
+        settings = self.config[agent]
+        max_connections = settings.get("max_connections", 10)
+        return httpx.AsyncClient(
+            base_url=settings["url"],
+            timeout=httpx.Timeout(settings.get("timeout", 120.0), connect=AGENT_HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=AGENT_HTTP_KEEPALIVE_SECONDS
+            ),
+            http2=self.http2,
+            transport=self.transport
+        )
+
+    def get_client(self, agent: str) -> httpx.AsyncClient:
+        """
+        Get the shared client for an agent, creating it on first use
+
+        Args:
+            agent: Agent name (planner, developer, qa, communicator)
+
+        Returns:
+            The agent's AsyncClient, with base_url set to the agent service
+        """
+        if agent not in self.config:
+            raise ValueError(f"Unknown agent: {agent}")
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(agent)
+        if entry is not None:
+            client, client_loop = entry
+            if client_loop is loop and not client.is_closed:
+                return client
+            # The old client belongs to a loop that has since closed; its
+            # connections can't be reused, so drop it without awaiting them
+            logger.debug(f"Replacing {agent} HTTP client created on another event loop")
+        client = self._create_client(agent)
+        self._clients[agent] = (client, loop)
+        return client
+
+    async def post(self, agent: str, path: str, **kwargs) -> httpx.Response:
+        """POST to an agent service through its pooled client"""
+        return await self.get_client(agent).post(path, **kwargs)
+
+    async def start(self) -> None:
+        """Create the clients up front, e.g. on application startup"""
+        for agent in self.config:
+            self.get_client(agent)
+        logger.info(f"Agent HTTP clients ready for {list(self.config)} (http2={self.http2})")
+
+    async def close(self) -> None:
+        """Close every client and its pooled connections, e.g. on application shutdown"""
+        loop = asyncio.get_running_loop()
+        clients, self._clients = self._clients, {}
+        for agent, (client, client_loop) in clients.items():
+            if client_loop is loop and not client.is_closed:
+                await client.aclose()
+        logger.info("Agent HTTP clients closed")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get which agent clients are open and their settings"""
+        return {
+            agent: {
+                "url": settings["url"],
+                "timeout": settings.get("timeout"),
+                "max_connections": settings.get("max_connections"),
+                "open": agent in self._clients and not self._clients[agent][0].is_closed
+            }
+            for agent, settings in self.config.items()
+        }
+
+
+# Singleton instance
+_agent_client_pool = None
+
+def get_agent_client_pool() -> AgentClientPool:
+    """Get the singleton agent client pool instance"""
+    global _agent_client_pool
+    if _agent_client_pool is None:
+        _agent_client_pool = AgentClientPool()
+    return _agent_client_pool
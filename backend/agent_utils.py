@@ -1,19 +1,14 @@
 
 import logging
-import os
-import httpx
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+from agent_http import get_agent_client_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("agent-utils")
 
-# Agent service URLs
-PLANNER_URL = os.getenv("PLANNER_URL", "http://planner:8001")
-DEVELOPER_URL = os.getenv("DEVELOPER_URL", "http://developer:8002")
-QA_URL = os.getenv("QA_URL", "http://qa:8003")
-COMMUNICATOR_URL = os.getenv("COMMUNICATOR_URL", "http://communicator:8004")
+# Agent service URLs, timeouts and connection limits are configured in agent_http
 
 async def call_planner_agent(ticket: Dict[str, Any]):
     """Send ticket information to the enhanced Planner agent"""
@@ -53,65 +48,101 @@ async def call_planner_agent(ticket: Dict[str, Any]):
         
         logger.info(f"Calling Planner agent with payload: {payload}")
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{PLANNER_URL}/analyze",
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Planner agent error: {response.status_code}, {response.text}")
-                return None
-            
-            # Safely parse JSON response
-            try:
-                result = response.json()
-                logger.info(f"Planner agent returned: {result}")
-                return result
-            except Exception as json_error:
-                logger.error(f"Failed to parse Planner agent response: {str(json_error)}")
-                return None
+        # Reuse the agent's pooled keep-alive connection
+        response = await get_agent_client_pool().post("planner", "/analyze", json=payload)
+        
+        if response.status_code != 200:
+            logger.error(f"Planner agent error: {response.status_code}, {response.text}")
+            return None
+        
+        # Safely parse JSON response
+        try:
+            result = response.json()
+            logger.info(f"Planner agent returned: {result}")
+            return result
+        except Exception as json_error:
+            logger.error(f"Failed to parse Planner agent response: {str(json_error)}")
+            return None
     except Exception as e:
         logger.error(f"Error calling Planner agent: {str(e)}")
         return None
 
-async def call_developer_agent(planner_analysis: Dict[str, Any], attempt: int, context: Dict[str, Any] = None):
-    """Send planner analysis to Developer agent"""
+async def call_developer_agent(
+    planner_analysis: Dict[str, Any],
+    attempt: int,
+    context: Dict[str, Any] = None,
+    ticket: Dict[str, Any] = None,
+    options: Dict[str, Any] = None
+):
+    """
+    Send planner analysis to the Developer agent's /generate-fix endpoint
+    
+    Args:
+        planner_analysis: Planner agent response
+        attempt: Attempt number, which also picks the model tier
+        context: Extra information like previous QA results
+        ticket: The ticket, for its description and priority
+        options: A speculative candidate's "temperature" and "strategy"
+        
+    Returns:
+        The Developer agent's response, or None on error
+    """
     try:
         # Ensure planner_analysis is not None
         if not planner_analysis or not isinstance(planner_analysis, dict):
             logger.error("Planner analysis is None or not a dictionary")
             return None
-            
+        ticket = ticket or {}
+        
+        # The planner reports files as {"file", "valid"} entries; the developer takes the valid paths
+        affected_files = [
+            item.get("file") if isinstance(item, dict) else item
+            for item in planner_analysis.get("affected_files", [])
+            if not isinstance(item, dict) or item.get("valid", True)
+        ]
         payload = {
-            "analysis": planner_analysis,
-            "attempt": attempt
+            "analysis": {
+                "ticket_id": planner_analysis.get("ticket_id") or ticket.get("ticket_id", ""),
+                "affected_files": [file for file in affected_files if file],
+                "root_cause": planner_analysis.get("root_cause") or planner_analysis.get("bug_summary", ""),
+                "suggested_approach": planner_analysis.get("suggested_approach")
+                    or f"Fix the {planner_analysis.get('error_type', 'bug')} in the affected files"
+            },
+            "ticket": {
+                "description": ticket.get("description") or "",
+                "reproduction_steps": ticket.get("reproduction_steps"),
+                "acceptance_criteria": ticket.get("acceptance_criteria"),
+                "priority": ticket.get("priority")
+            }
         }
         
         # Add context information (like previous QA results) if available
         if context and isinstance(context, dict):
             payload["context"] = context
         
+        # Speculative candidates differ by sampling temperature and prompt strategy
+        if options:
+            payload["options"] = {key: options.get(key) for key in ("temperature", "strategy")}
+        
         logger.info(f"Calling Developer agent with payload: {payload}")
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{DEVELOPER_URL}/generate",
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Developer agent error: {response.status_code}, {response.text}")
-                return None
-            
-            # Safely parse JSON response
-            try:
-                result = response.json()
-                logger.info(f"Developer agent returned: {result}")
-                return result
-            except Exception as json_error:
-                logger.error(f"Failed to parse Developer agent response: {str(json_error)}")
-                return None
+        # Reuse the agent's pooled keep-alive connection
+        response = await get_agent_client_pool().post(
+            "developer", "/generate-fix", json=payload, params={"attempt": attempt}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Developer agent error: {response.status_code}, {response.text}")
+            return None
+        
+        # Safely parse JSON response
+        try:
+            result = response.json()
+            logger.info(f"Developer agent returned: {result}")
+            return result
+        except Exception as json_error:
+            logger.error(f"Failed to parse Developer agent response: {str(json_error)}")
+            return None
     except Exception as e:
         logger.error(f"Error calling Developer agent: {str(e)}")
         return None
@@ -126,28 +157,85 @@ async def call_qa_agent(developer_response: Dict[str, Any]):
             
         logger.info(f"Calling QA agent with payload: {developer_response}")
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{QA_URL}/test",
-                json=developer_response
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"QA agent error: {response.status_code}, {response.text}")
-                return None
-            
-            # Safely parse JSON response
-            try:
-                result = response.json()
-                logger.info(f"QA agent returned: {result}")
-                return result
-            except Exception as json_error:
-                logger.error(f"Failed to parse QA agent response: {str(json_error)}")
-                return None
+        # Reuse the agent's pooled keep-alive connection
+        response = await get_agent_client_pool().post("qa", "/test", json=developer_response)
+        
+        if response.status_code != 200:
+            logger.error(f"QA agent error: {response.status_code}, {response.text}")
+            return None
+        
+        # Safely parse JSON response
+        try:
+            result = response.json()
+            logger.info(f"QA agent returned: {result}")
+            return result
+        except Exception as json_error:
+            logger.error(f"Failed to parse QA agent response: {str(json_error)}")
+            return None
     except Exception as e:
         logger.error(f"Error calling QA agent: {str(e)}")
         return None
 
+def build_communicator_payload(
+    ticket_id: str,
+    diffs: List[Dict[str, Any]] = None,
+    test_results: List[Dict[str, Any]] = None,
+    commit_message: str = None,
+    test_passed: bool = False,
+    escalated: bool = False,
+    early_escalation: bool = False,
+    early_escalation_reason: str = None,
+    retry_count: int = 0,
+    max_retries: int = 4,
+    failure_details: str = None,
+    agent_type: str = None,
+    confidence_score: int = None
+) -> Optional[Dict[str, Any]]:
+    """Build the Communicator agent request, or None if ticket_id is missing"""
+    # Validate ticket_id
+    if not ticket_id:
+        logger.error("Missing required parameter: ticket_id")
+        return None
+        
+    # Handle default parameters
+    if diffs is None:
+        diffs = []
+    if test_results is None:
+        test_results = []
+        
+    # Build payload with all possible parameters
+    payload = {
+        "ticket_id": ticket_id,
+        "diffs": diffs,
+        "test_results": test_results,
+        "repository": "main",  # This would be configurable in a real implementation
+        "test_passed": test_passed
+    }
+    
+    # Add optional parameters only if they have values
+    if commit_message:
+        payload["commit_message"] = commit_message
+    if escalated:
+        payload["escalated"] = escalated
+    if early_escalation:
+        payload["early_escalation"] = early_escalation
+    if early_escalation_reason:
+        payload["early_escalation_reason"] = early_escalation_reason
+    if retry_count > 0:
+        payload["retry_count"] = retry_count
+    if max_retries > 0:
+        payload["max_retries"] = max_retries
+    if failure_details:
+        payload["failure_details"] = str(failure_details)  # Ensure it's a string
+    if agent_type:
+        payload["agent_type"] = agent_type
+    if confidence_score is not None:
+        payload["confidence_score"] = confidence_score
+    
+    # Ensure payload is JSON serializable by removing any non-serializable objects
+    payload = _ensure_json_serializable(payload)
+    return payload
+
 async def call_communicator_agent(
     ticket_id: str,
     diffs: List[Dict[str, Any]] = None,
@@ -165,69 +253,30 @@ async def call_communicator_agent(
 ):
     """Send results to Communicator agent with enhanced error handling"""
     try:
-        # Validate ticket_id
-        if not ticket_id:
-            logger.error("Missing required parameter: ticket_id")
+        payload = build_communicator_payload(
+            ticket_id, diffs, test_results, commit_message, test_passed, escalated, early_escalation,
+            early_escalation_reason, retry_count, max_retries, failure_details, agent_type, confidence_score
+        )
+        if payload is None:
             return None
-            
-        # Handle default parameters
-        if diffs is None:
-            diffs = []
-        if test_results is None:
-            test_results = []
-            
-        # Build payload with all possible parameters
-        payload = {
-            "ticket_id": ticket_id,
-            "diffs": diffs,
-            "test_results": test_results,
-            "repository": "main",  # This would be configurable in a real implementation
-            "test_passed": test_passed
-        }
-        
-        # Add optional parameters only if they have values
-        if commit_message:
-            payload["commit_message"] = commit_message
-        if escalated:
-            payload["escalated"] = escalated
-        if early_escalation:
-            payload["early_escalation"] = early_escalation
-        if early_escalation_reason:
-            payload["early_escalation_reason"] = early_escalation_reason
-        if retry_count > 0:
-            payload["retry_count"] = retry_count
-        if max_retries > 0:
-            payload["max_retries"] = max_retries
-        if failure_details:
-            payload["failure_details"] = str(failure_details)  # Ensure it's a string
-        if agent_type:
-            payload["agent_type"] = agent_type
-        if confidence_score is not None:
-            payload["confidence_score"] = confidence_score
-        
-        # Ensure payload is JSON serializable by removing any non-serializable objects
-        payload = _ensure_json_serializable(payload)
                 
         logger.info(f"Calling Communicator agent with payload: {payload}")
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{COMMUNICATOR_URL}/deploy",
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Communicator agent error: {response.status_code}, {response.text}")
-                return None
-            
-            # Safely parse JSON response
-            try:
-                result = response.json()
-                logger.info(f"Communicator agent returned: {result}")
-                return result
-            except Exception as json_error:
-                logger.error(f"Failed to parse Communicator agent response: {str(json_error)}")
-                return None
+        # Reuse the agent's pooled keep-alive connection
+        response = await get_agent_client_pool().post("communicator", "/deploy", json=payload)
+        
+        if response.status_code != 200:
+            logger.error(f"Communicator agent error: {response.status_code}, {response.text}")
+            return None
+        
+        # Safely parse JSON response
+        try:
+            result = response.json()
+            logger.info(f"Communicator agent returned: {result}")
+            return result
+        except Exception as json_error:
+            logger.error(f"Failed to parse Communicator agent response: {str(json_error)}")
+            return None
     except Exception as e:
         logger.error(f"Error calling Communicator agent: {str(e)}")
         return None
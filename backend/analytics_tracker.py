@@ -3,6 +3,7 @@ import os
 import csv
 import json
 import logging
+import statistics
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
@@ -58,7 +59,8 @@ class AnalyticsTracker:
         escalation_reason: Optional[str] = None,
         qa_failure_summary: Optional[str] = None,
         early_escalation: bool = False,
-        additional_data: Optional[Dict[str, Any]] = None
+        additional_data: Optional[Dict[str, Any]] = None,
+        model_routing: Optional[Dict[str, Any]] = None
     ):
         """
         Log a ticket processing result
@@ -72,6 +74,7 @@ class AnalyticsTracker:
             qa_failure_summary: Summary of QA test failures (if applicable)
             early_escalation: Whether ticket was escalated early (before max retries)
             additional_data: Any additional data to include in the JSON log
+            model_routing: Model cascade summary: escalations, LLM latency, cost and savings
         """
         try:
             timestamp = datetime.now().isoformat()
@@ -104,6 +107,8 @@ class AnalyticsTracker:
             # Add additional data if provided
             if additional_data:
                 log_entry.update(additional_data)
+            if model_routing:
+                log_entry['model_routing'] = model_routing
                 
             # Append to JSONL file (one JSON object per line)
             with open(self.json_log_path, 'a') as jsonfile:
@@ -184,6 +189,62 @@ class AnalyticsTracker:
                 'success_rate': 0
             }
 
+    def get_model_routing_summary(self) -> Dict[str, Any]:
+        """
+        Generate summary statistics for the model cascade
+        
+        Returns:
+            Dictionary with LLM latency and cost per ticket, savings against using the
+            strongest model for everything, and why tickets were escalated to stronger models
+        """
+        try:
+            latencies = []
+            costs = []
+            savings = 0.0
+            cheapest_tier_tickets = 0
+            final_models = {}
+            escalations = {}
+            
+            with open(self.json_log_path, 'r') as jsonfile:
+                for line in jsonfile:
+                    try:
+                        entry = json.loads(line.strip())
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping invalid JSON line in analytics log")
+                        continue
+                    routing = entry.get('model_routing')
+                    if not routing:
+                        continue
+                    
+                    latencies.append(routing.get('llm_latency_seconds', 0))
+                    costs.append(routing.get('cost_usd', 0))
+                    savings += routing.get('savings_usd', 0)
+                    final_model = routing.get('final_model', 'unknown')
+                    final_models[final_model] = final_models.get(final_model, 0) + 1
+                    if not routing.get('escalations'):
+                        cheapest_tier_tickets += 1
+                    for escalation in routing.get('escalations', []):
+                        stage = escalation.get('stage', 'unknown')
+                        escalations[stage] = escalations.get(stage, 0) + 1
+            
+            return {
+                'routed_tickets': len(costs),
+                'median_llm_latency_seconds': statistics.median(latencies) if latencies else 0,
+                'median_cost_per_ticket_usd': statistics.median(costs) if costs else 0,
+                'total_cost_usd': round(sum(costs), 6),
+                'total_savings_usd': round(savings, 6),
+                'cheapest_tier_tickets': cheapest_tier_tickets,
+                'final_models': final_models,
+                'escalations_by_stage': escalations,
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generating model routing summary: {str(e)}")
+            return {
+                'error': str(e),
+                'routed_tickets': 0
+            }
+
 # Singleton instance
 _analytics_tracker = None
 
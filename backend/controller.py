@@ -4,9 +4,12 @@ import os
 import json
 from datetime import datetime
 import shutil
+import time
 import traceback
-from jira_utils import fetch_jira_tickets
 from ticket_processor import process_ticket, cleanup_old_tickets, active_tickets
+from notification_outbox import get_notification_outbox
+from ticket_ingestion import TicketIngestion, default_consumer_id
+from work_queue import get_work_queue
 
 # Configure logging
 logging.basicConfig(
@@ -22,69 +25,164 @@ logger = logging.getLogger("bugfix-controller")
 # Configuration for log rotation (days to keep logs)
 LOG_RETENTION_DAYS = os.environ.get('LOG_RETENTION_DAYS', 30)
 
+# Interval of the JIRA reconciliation sweep. Tickets normally arrive through the
+# webhook endpoint, so the poll only catches deliveries that were missed.
+JIRA_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('JIRA_RECONCILE_INTERVAL_SECONDS', 600))
+
+# How often to look for tickets published by other processes or whose lease expired
+TICKET_CLAIM_INTERVAL_SECONDS = int(os.environ.get('TICKET_CLAIM_INTERVAL_SECONDS', 5))
+
+# Maximum number of tickets this controller leases at once
+CONTROLLER_MAX_TICKETS = int(os.environ.get('CONTROLLER_MAX_TICKETS', 4))
+
 # Track which tickets have already been processed
 processed_tickets = set()
 
+# Tickets whose processing task is still running in this process
+running_tickets = set()
+
+# Shared ingestion, see get_ingestion()
+_ingestion = None
+
+def get_ingestion() -> TicketIngestion:
+    """Get this controller's handle on the shared ticket ingestion"""
+    global _ingestion
+    if _ingestion is None:
+        _ingestion = TicketIngestion(
+            default_consumer_id("controller"),
+            poll_interval=JIRA_RECONCILE_INTERVAL_SECONDS
+        )
+    return _ingestion
+
+async def process_leased_ticket(ticket):
+    """Process a ticket while keeping its lease alive, then release it"""
+    ticket_id = ticket.get("ticket_id")
+    ingestion = get_ingestion()
+    completed = False
+    try:
+        async with ingestion.heartbeat(ticket_id) as heartbeat:
+            await process_ticket(ticket, lease=heartbeat)
+        completed = get_work_queue("controller").is_finished(ticket_id)
+    finally:
+        ingestion.release(ticket_id, completed=completed)
+        running_tickets.discard(ticket_id)
+
+def start_ticket_task(ticket):
+    """Mark a ticket as processed and start processing it in the background"""
+    ticket_id = ticket.get("ticket_id")
+    
+    # Track that we're processing this ticket
+    processed_tickets.add(ticket_id)
+    running_tickets.add(ticket_id)
+    
+    try:
+        # Create task to process ticket asynchronously
+        task = asyncio.create_task(process_leased_ticket(ticket))
+        # Add error handling callback
+        task.add_done_callback(lambda t: handle_task_completion(t, ticket_id))
+    except Exception as e:
+        logger.error(f"Error creating task for ticket {ticket_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+
+def submit_ticket(ticket) -> bool:
+    """
+    Start processing a ticket unless it is already active or finished
+    
+    Used by both the webhook endpoint and the lease loop. The ticket is
+    leased first, so it isn't processed twice across processes.
+    
+    Returns:
+        True if processing was started, False if the ticket was skipped
+    """
+    ticket_id = ticket.get("ticket_id")
+    if not ticket_id:
+        logger.warning("Received ticket without ID, skipping")
+        return False
+    
+    work_queue = get_work_queue("controller")
+    
+    # Skip if already being processed or already processed, including before a restart
+    if ticket_id in active_tickets or ticket_id in processed_tickets:
+        logger.info(f"Ticket {ticket_id} is already being processed or was previously processed, skipping")
+        return False
+    
+    ingestion = get_ingestion()
+    if work_queue.is_finished(ticket_id):
+        logger.info(f"Ticket {ticket_id} was previously processed, skipping")
+        ingestion.release(ticket_id, completed=True)
+        return False
+    
+    # Take the lease so no other consumer works on the ticket at the same time
+    if not ingestion.acquire_ticket(ticket):
+        logger.info(f"Ticket {ticket_id} is leased by another consumer, skipping")
+        return False
+        
+    # Create log directory for this ticket
+    ticket_log_dir = f"logs/{ticket_id}"
+    os.makedirs(ticket_log_dir, exist_ok=True)
+    
+    # Log the input received
+    with open(f"{ticket_log_dir}/controller_input.json", 'w') as f:
+        json.dump(ticket, f, indent=2)
+    
+    # Record the ticket durably before starting work on it
+    work_queue.enqueue(ticket)
+    
+    # Process the ticket
+    start_ticket_task(ticket)
+    return True
+
 async def run_controller():
-    """Main controller loop that runs every 60 seconds"""
+    """Main controller loop: resumes unfinished tickets, then leases tickets from the shared ingestion"""
+    work_queue = get_work_queue("controller")
+    ingestion = get_ingestion()
+    
+    # First, check if git is installed
+    try:
+        import subprocess
+        result = subprocess.run(['which', 'git'], capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error("Git is not installed in the container. This will cause issues with git operations.")
+            logger.error("Please rebuild the container with git installed.")
+        else:
+            logger.info(f"Git is installed at: {result.stdout.strip()}")
+    except Exception as git_check_error:
+        logger.error(f"Error checking for git: {git_check_error}")
+    
+    # Deliver JIRA/Communicator notifications in the background, including any
+    # left undelivered when the process last stopped
+    get_notification_outbox().start()
+    
+    # Resume tickets that were queued or in progress when the process last stopped
+    for ticket in work_queue.pending_tickets():
+        logger.info(f"Resuming unfinished ticket {ticket.get('ticket_id')} from the work queue")
+        submit_ticket(ticket)
+    
+    last_cleanup = 0.0
     while True:
         try:
-            # First, check if git is installed
-            try:
-                import subprocess
-                result = subprocess.run(['which', 'git'], capture_output=True, text=True)
-                if result.returncode != 0:
-                    logger.error("Git is not installed in the container. This will cause issues with git operations.")
-                    logger.error("Please rebuild the container with git installed.")
-                else:
-                    logger.info(f"Git is installed at: {result.stdout.strip()}")
-            except Exception as git_check_error:
-                logger.error(f"Error checking for git: {git_check_error}")
-            
-            # Fetch new tickets from JIRA
-            new_tickets = await fetch_jira_tickets()
+            # Reconcile with JIRA in case webhook deliveries were missed. Only one
+            # consumer polls per interval; the rest see its tickets in the store.
+            await ingestion.poll_if_due()
             
-            # Process each new ticket
-            for ticket in new_tickets:
+            # Lease as many tickets as we have room for
+            free_slots = CONTROLLER_MAX_TICKETS - len(running_tickets)
+            for ticket in ingestion.acquire(limit=free_slots):
                 ticket_id = ticket.get("ticket_id")
-                if not ticket_id:
-                    logger.warning("Received ticket without ID, skipping")
-                    continue
-                
-                # Skip if already being processed or already processed
-                if ticket_id in active_tickets or ticket_id in processed_tickets:
-                    logger.info(f"Ticket {ticket_id} is already being processed or was previously processed, skipping")
-                    continue
-                    
-                # Create log directory for this ticket
-                ticket_log_dir = f"logs/{ticket_id}"
-                os.makedirs(ticket_log_dir, exist_ok=True)
-                
-                # Log the input received
-                with open(f"{ticket_log_dir}/controller_input.json", 'w') as f:
-                    json.dump(ticket, f, indent=2)
+                if not submit_ticket(ticket) and ticket_id not in running_tickets:
+                    ingestion.release(ticket_id, completed=work_queue.is_finished(ticket_id))
+            
+            if time.time() - last_cleanup >= JIRA_RECONCILE_INTERVAL_SECONDS:
+                last_cleanup = time.time()
                 
-                # Track that we're processing this ticket
-                processed_tickets.add(ticket_id)
+                # Clean up old tickets
+                await cleanup_old_tickets()
                 
-                # Process the ticket
-                try:
-                    # Create task to process ticket asynchronously
-                    task = asyncio.create_task(process_ticket(ticket))
-                    # Add error handling callback
-                    task.add_done_callback(lambda t: handle_task_completion(t, ticket_id))
-                except Exception as e:
-                    logger.error(f"Error creating task for ticket {ticket_id}: {str(e)}")
-                    logger.error(traceback.format_exc())
-            
-            # Clean up old tickets
-            await cleanup_old_tickets()
+                # Clean up old logs
+                await cleanup_old_logs(int(LOG_RETENTION_DAYS))
             
-            # Clean up old logs
-            await cleanup_old_logs(int(LOG_RETENTION_DAYS))
-            
-            # Wait for next cycle
-            await asyncio.sleep(60)
+            # Wait for next round
+            await asyncio.sleep(TICKET_CLAIM_INTERVAL_SECONDS)
         except Exception as e:
             logger.error(f"Controller error: {str(e)}")
             # Log the error with timestamp
@@ -0,0 +1,226 @@
+"""
+Conditional-request cache for GitHub reads.
+
+File contents and branch refs are read over and over while a ticket is worked
+on: by patch validation, by diff generation and before every commit. Each read
+used to cost a full download and a request from the 5000 per hour budget.
+GitHub answers a request carrying the ETag of the previous response with
+304 Not Modified when nothing changed, and 304s don't count against the rate
+limit. Responses are therefore kept with their ETag and Last-Modified, first
+in memory and then on disk so they survive restarts and are shared by the
+processes on a host. Repeat reads send If-None-Match or If-Modified-Since and
+are answered from the cache on 304.
+
+Entries are keyed by URL, query parameters and a hash of the token, so one
+token never sees another's responses.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("github-cache")
+
+# Set to false to send every GitHub read unconditionally
+GITHUB_CACHE_ENABLED = os.environ.get("GITHUB_CACHE_ENABLED", "true").lower() == "true"
+
+# Directory for cached responses; empty keeps them in memory only
+GITHUB_CACHE_DIR = os.environ.get("GITHUB_CACHE_DIR", "data/github_cache")
+
+# Responses kept in memory, most recently used first
+GITHUB_CACHE_MEMORY_ENTRIES = int(os.environ.get("GITHUB_CACHE_MEMORY_ENTRIES", "512"))
+
+# Responses kept on disk; the least recently stored are pruned beyond this
+GITHUB_CACHE_MAX_FILES = int(os.environ.get("GITHUB_CACHE_MAX_FILES", "5000"))
+
+# Stored writes between checks of the disk limit
+PRUNE_EVERY_WRITES = 100
+
+
+class CachedResponse:
+    """The parts of a GitHub response that callers read, whether fresh or from the cache"""
+
+    def __init__(self, status_code: int, text: str, headers: Dict[str, str] = None, from_cache: bool = False):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class GitHubResponseCache:
+    """ETag and Last-Modified cache for GET requests, in memory and on disk"""
+
+    def __init__(self, cache_dir: str = None, memory_entries: int = None, max_files: int = None):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for cached responses. Defaults to GITHUB_CACHE_DIR; empty disables the disk cache.
+            memory_entries: Responses kept in memory. Defaults to GITHUB_CACHE_MEMORY_ENTRIES.
+            max_files: Responses kept on disk. Defaults to GITHUB_CACHE_MAX_FILES.
+        """
+        self.cache_dir = GITHUB_CACHE_DIR if cache_dir is None else cache_dir
+        self.memory_entries = memory_entries or GITHUB_CACHE_MEMORY_ENTRIES
+        self.max_files = max_files or GITHUB_CACHE_MAX_FILES
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(url: str, params: Dict[str, Any] = None, credential: str = "") -> str:
+        """Build the cache key for a request"""
+        query = json.dumps(params or {}, sort_keys=True)
+        token_hash = hashlib.sha256((credential or "").encode("utf-8")).hexdigest()[:16]
+        return hashlib.sha256(f"{token_hash} {url} {query}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Ignoring unreadable GitHub cache entry {key}: {str(e)}")
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        self._remember(key, entry)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except IOError as e:
+            logger.warning(f"Couldn't write GitHub cache entry {key}: {str(e)}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY_WRITES == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete the least recently stored responses beyond the disk limit
+
+        Returns:
+            Number of responses deleted
+        """
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return 0
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        files.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+        excess = len(files) - self.max_files
+        if excess <= 0:
+            return 0
+        for _, path in sorted(files)[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        logger.info(f"Pruned {excess} GitHub cache entries")
+        return excess
+
+    def _conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        if entry is None:
+            return {}
+        if entry.get("etag"):
+            return {"If-None-Match": entry["etag"]}
+        if entry.get("last_modified"):
+            return {"If-Modified-Since": entry["last_modified"]}
+        return {}
+
+    def _complete(self, key: str, entry: Optional[Dict[str, Any]], response: Any) -> CachedResponse:
+        """Turn the response into the result, serving 304s from the entry and storing new 200s"""
+        if response.status_code == 304 and entry is not None:
+            self.stats["hits"] += 1
+            return CachedResponse(entry["status_code"], entry["text"], entry.get("headers"), from_cache=True)
+
+        self.stats["misses"] += 1
+        headers = {str(k).lower(): v for k, v in (response.headers or {}).items()}
+        if response.status_code == 200 and (headers.get("etag") or headers.get("last-modified")):
+            self._store(key, {
+                "status_code": response.status_code,
+                "text": response.text,
+                "headers": {"content-type": headers.get("content-type", "")},
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+                "stored_at": time.time(),
+            })
+        return CachedResponse(response.status_code, response.text, dict(response.headers))
+
+    def fetch(self, key: str, send: Callable[[Dict[str, str]], Any]) -> CachedResponse:
+        """
+        Perform a GET through the cache
+
+        Args:
+            key: Cache key from make_key
+            send: Sends the request with the given extra headers and returns the
+                response (anything with status_code, headers and text)
+
+        Returns:
+            The fresh response, or the cached one if GitHub answered 304
+        """
+        if not GITHUB_CACHE_ENABLED:
+            response = send({})
+            return CachedResponse(response.status_code, response.text, dict(response.headers))
+        entry = self._load(key)
+        return self._complete(key, entry, send(self._conditional_headers(entry)))
+
+    async def fetch_async(self, key: str, send: Callable[[Dict[str, str]], Awaitable[Any]]) -> CachedResponse:
+        """Perform a GET through the cache, like fetch, with a coroutine sending the request"""
+        if not GITHUB_CACHE_ENABLED:
+            response = await send({})
+            return CachedResponse(response.status_code, response.text, dict(response.headers))
+        entry = self._load(key)
+        return self._complete(key, entry, await send(self._conditional_headers(entry)))
+
+
+_cache: Optional[GitHubResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_github_cache() -> GitHubResponseCache:
+    """Get the process-wide GitHub response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GitHubResponseCache()
+        return _cache
@@ -0,0 +1,405 @@
+"""
+Asyncio-native GitHub client.
+
+GitHubClient makes blocking requests calls, so a ticket creating a branch or
+a PR from inside the async orchestrator stalled every other ticket on the
+event loop. AsyncGitHubClient has the same methods as coroutines. It sends
+them over one pooled httpx client per event loop, with the shared rate limit
+and the ETag response cache, and backs off with asyncio.sleep. Independent
+requests such as blob uploads run concurrently.
+"""
+import asyncio
+import base64
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from github_cache import CachedResponse, GitHubResponseCache, get_github_cache
+from http_replay import replay_transport
+from rate_limiter import get_rate_limiter
+
+from .github_client import GITHUB_BLOB_CONCURRENCY, GITHUB_COMMIT_RETRIES
+
+logger = logging.getLogger("github-async-client")
+
+GITHUB_HTTP_TIMEOUT_SECONDS = float(os.environ.get("GITHUB_HTTP_TIMEOUT_SECONDS", "30"))
+GITHUB_HTTP_MAX_CONNECTIONS = int(os.environ.get("GITHUB_HTTP_MAX_CONNECTIONS", "20"))
+
+# Retries for rate limits, server errors and network failures: backoff * 2^attempt between them
+GITHUB_MAX_RETRIES = int(os.environ.get("GITHUB_MAX_RETRIES", "3"))
+GITHUB_RETRY_BACKOFF_SECONDS = float(os.environ.get("GITHUB_RETRY_BACKOFF_SECONDS", "1"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AsyncGitHubClient:
+    """Asyncio client for the GitHub API, with the same methods as GitHubClient"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None):
+        """
+        Initialize the client with environment variables
+
+        Args:
+            transport: Transport used instead of the network (for tests). Defaults to the
+                record/replay transport when HTTP_REPLAY_MODE is set.
+        """
+        self.github_token = os.environ.get("GITHUB_TOKEN")
+        self.repo_owner = os.environ.get("GITHUB_REPO_OWNER")
+        self.repo_name = os.environ.get("GITHUB_REPO_NAME")
+        self.default_branch = os.environ.get("GITHUB_DEFAULT_BRANCH", "main")
+        self.use_default_branch_only = os.environ.get("GITHUB_USE_DEFAULT_BRANCH_ONLY", "False").lower() == "true"
+
+        if not all([self.github_token, self.repo_owner, self.repo_name]):
+            logger.error("Missing required GitHub environment variables")
+            raise EnvironmentError(
+                "Missing GitHub credentials. Please set GITHUB_TOKEN, GITHUB_REPO_OWNER and GITHUB_REPO_NAME environment variables."
+            )
+
+        self.headers = {
+            "Accept": "application/vnd.github.v3+json",
+            "Authorization": f"token {self.github_token}",
+        }
+        self.base_url = "https://api.github.com"
+        self.repo_api_url = f"{self.base_url}/repos/{self.repo_owner}/{self.repo_name}"
+
+        self.transport = transport or replay_transport("github")
+        self.rate_limiter = get_rate_limiter("github", self.github_token)
+        self.cache = get_github_cache()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Get the pooled client, creating it on first use in the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # A client from a finished event loop can't be reused, so replace it
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=GITHUB_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=GITHUB_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=GITHUB_HTTP_MAX_CONNECTIONS
+                ),
+                transport=self.transport,
+                event_hooks={"request": [self._wait_for_rate_limit], "response": [self._record_rate_limit]}
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def _wait_for_rate_limit(self, request: httpx.Request) -> None:
+        await self.rate_limiter.acquire_async()
+
+    async def _record_rate_limit(self, response: httpx.Response) -> None:
+        self.rate_limiter.record_response(response.status_code, response.headers)
+
+    async def close(self) -> None:
+        """Close the pooled client"""
+        if self._client is not None and not self._client.is_closed and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying rate limits, server errors and network failures
+
+        A rate-limited retry waits in the rate limiter, which knows the reset
+        time; server errors and network failures back off exponentially.
+        """
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            try:
+                response = await self.get_client().request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= GITHUB_MAX_RETRIES:
+                    raise
+                logger.warning(f"{method} {url} failed: {str(e)}. Retrying ({attempt + 1}/{GITHUB_MAX_RETRIES})")
+            else:
+                rate_limited = response.status_code == 429 or (
+                    response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+                )
+                if attempt >= GITHUB_MAX_RETRIES or not (rate_limited or response.status_code in RETRY_STATUSES):
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}. Retrying ({attempt + 1}/{GITHUB_MAX_RETRIES})")
+                if rate_limited:
+                    continue
+            await asyncio.sleep(GITHUB_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+        return response
+
+    async def _cached_get(self, url: str, params: Dict[str, Any] = None) -> CachedResponse:
+        """Send a GET that is answered from the response cache when GitHub reports no change"""
+        key = GitHubResponseCache.make_key(url, params, self.github_token)
+        return await self.cache.fetch_async(key, lambda conditional: self._request(
+            "GET", url, headers=conditional, params=params
+        ))
+
+    async def check_branch_exists(self, branch_name: str) -> bool:
+        """
+        Check if a branch exists in the repository
+
+        Args:
+            branch_name: Name of the branch to check
+
+        Returns:
+            bool: True if the branch exists, False otherwise
+        """
+        response = await self._cached_get(f"{self.repo_api_url}/git/refs/heads/{branch_name}")
+        if response.status_code == 200:
+            return True
+        if response.status_code != 404:
+            logger.error(f"Failed to check if branch {branch_name} exists: {response.status_code}, {response.text}")
+        return False
+
+    async def create_branch(self, branch_name: str, from_branch: str = None) -> bool:
+        """
+        Create a new branch in the repository
+
+        Args:
+            branch_name: Name of the branch to create
+            from_branch: Branch to create from (defaults to default_branch)
+
+        Returns:
+            bool: True if the branch was created or already exists, False otherwise
+        """
+        if self.use_default_branch_only:
+            logger.info(f"Using default branch {self.default_branch} instead of creating {branch_name}")
+            return True
+
+        from_branch = from_branch or self.default_branch
+        # Both lookups are independent, so run them together
+        exists, base = await asyncio.gather(
+            self.check_branch_exists(branch_name),
+            self._cached_get(f"{self.repo_api_url}/git/refs/heads/{from_branch}")
+        )
+        if exists:
+            logger.info(f"Branch {branch_name} already exists")
+            return True
+        if base.status_code != 200:
+            logger.error(f"Failed to get commit SHA for {from_branch}: {base.status_code}")
+            return False
+
+        response = await self._request("POST", f"{self.repo_api_url}/git/refs", json={
+            "ref": f"refs/heads/{branch_name}",
+            "sha": base.json()["object"]["sha"]
+        })
+        if response.status_code == 201:
+            logger.info(f"Created branch {branch_name} from {from_branch}")
+            return True
+        if response.status_code == 422 and "Reference already exists" in response.text:
+            logger.info(f"Branch {branch_name} was created concurrently")
+            return True
+        logger.error(f"Failed to create branch {branch_name}: {response.status_code}, {response.text}")
+        return False
+
+    async def create_pull_request(self, title: str, body: str, head_branch: str,
+                                  base_branch: str = None) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Create a pull request, or find the open one for the branch
+
+        Args:
+            title: PR title
+            body: PR description
+            head_branch: Source branch
+            base_branch: Target branch (defaults to default_branch if not specified)
+
+        Returns:
+            Tuple of (PR URL, PR number), both None if it failed
+        """
+        base_branch = base_branch or self.default_branch
+        if self.use_default_branch_only:
+            logger.info("Skipping PR creation since we're only using the default branch")
+            return f"https://github.com/{self.repo_owner}/{self.repo_name}/tree/{self.default_branch}", 1
+
+        response = await self._request("POST", f"{self.repo_api_url}/pulls", json={
+            "title": title,
+            "body": body,
+            "head": head_branch,
+            "base": base_branch,
+            "draft": False
+        })
+        if response.status_code == 201:
+            pr = response.json()
+            logger.info(f"Successfully created PR #{pr['number']}: {pr['html_url']}")
+            return pr["html_url"], pr["number"]
+
+        if response.status_code == 422 and "A pull request already exists" in response.text:
+            existing = await self._request("GET", f"{self.repo_api_url}/pulls", params={
+                "head": f"{self.repo_owner}:{head_branch}", "base": base_branch, "state": "open"
+            })
+            if existing.status_code == 200 and existing.json():
+                pr = existing.json()[0]
+                logger.info(f"Found existing PR: {pr['html_url']} (#{pr['number']})")
+                return pr["html_url"], pr["number"]
+
+        logger.error(f"Failed to create PR from {head_branch} to {base_branch}: {response.status_code}, {response.text}")
+        return None, None
+
+    async def get_file_content(self, file_path: str, branch: str = None) -> Optional[str]:
+        """
+        Get the content of a file from GitHub
+
+        Args:
+            file_path: Path to the file in the repository
+            branch: Branch to retrieve from (defaults to default_branch)
+
+        Returns:
+            The content of the file if successful, None otherwise
+        """
+        response = await self._cached_get(f"{self.repo_api_url}/contents/{file_path}",
+                                          {"ref": branch or self.default_branch})
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch file {file_path}: {response.status_code}")
+            return None
+        content_data = response.json()
+        if content_data.get("type") != "file":
+            logger.error(f"Path {file_path} is not a file")
+            return None
+        try:
+            return base64.b64decode(content_data["content"]).decode("utf-8")
+        except Exception as e:
+            logger.error(f"Failed to decode file content: {str(e)}")
+            return None
+
+    async def check_file_exists(self, file_path: str, branch: str = None) -> bool:
+        """
+        Check if a file exists in the repository
+
+        Args:
+            file_path: Path to the file in the repository
+            branch: Branch to check (defaults to default_branch)
+
+        Returns:
+            bool: True if the path is a file on the branch, False otherwise
+        """
+        response = await self._cached_get(f"{self.repo_api_url}/contents/{file_path}",
+                                          {"ref": branch or self.default_branch})
+        if response.status_code == 200:
+            return response.json().get("type") == "file"
+        if response.status_code != 404:
+            logger.error(f"Failed to check file {file_path}: {response.status_code}")
+        return False
+
+    async def commit_file(self, file_path: str, content: str, commit_message: str, branch_name: str) -> bool:
+        """
+        Commit a file to the repository
+
+        Args:
+            file_path: Path to the file in the repository
+            content: New content for the file
+            commit_message: Commit message
+            branch_name: Branch to commit to
+
+        Returns:
+            Success status (True/False)
+        """
+        url = f"{self.repo_api_url}/contents/{file_path}"
+        current = await self._request("GET", url, params={"ref": branch_name})
+        if current.status_code not in (200, 404):
+            logger.error(f"Failed to check file {file_path}: {current.status_code}, {current.text}")
+            return False
+
+        payload = {
+            "message": commit_message,
+            "content": base64.b64encode(content.encode()).decode(),
+            "branch": branch_name
+        }
+        if current.status_code == 200:
+            payload["sha"] = current.json()["sha"]
+
+        response = await self._request("PUT", url, json=payload)
+        if response.status_code not in (200, 201):
+            logger.error(f"Failed to commit file {file_path}: {response.status_code}, {response.text}")
+            return False
+        logger.info(f"Committed {file_path} to {branch_name}")
+        return True
+
+    async def _create_blob(self, content: str, semaphore: asyncio.Semaphore) -> Optional[str]:
+        """Upload file content as a blob and return its SHA, or None on failure"""
+        async with semaphore:
+            response = await self._request("POST", f"{self.repo_api_url}/git/blobs", json={
+                "content": base64.b64encode(content.encode()).decode(), "encoding": "base64"
+            })
+        if response.status_code != 201:
+            logger.error(f"Failed to create blob: {response.status_code}, {response.text}")
+            return None
+        return response.json()["sha"]
+
+    async def commit_files(self, branch_name: str, file_changes: List[Dict[str, Any]], commit_message: str) -> bool:
+        """
+        Commit several files to a branch as a single commit using the Git Data API
+
+        Works like GitHubClient.commit_files, with the blobs uploaded concurrently
+        on the event loop.
+
+        Args:
+            branch_name: Branch to commit to
+            file_changes: List of file changes, each with filename and content.
+                A change with action "delete" removes the file.
+            commit_message: Commit message
+
+        Returns:
+            Success status (True/False)
+        """
+        if self.use_default_branch_only:
+            branch_name = self.default_branch
+
+        changes = [
+            change for change in file_changes or []
+            if change.get("filename") and (change.get("action") == "delete" or change.get("content") is not None)
+        ]
+        if not changes:
+            logger.error("No valid file changes to commit")
+            return False
+
+        uploads = [change for change in changes if change.get("action") != "delete"]
+        semaphore = asyncio.Semaphore(GITHUB_BLOB_CONCURRENCY)
+        blob_shas = await asyncio.gather(*(self._create_blob(str(change["content"]), semaphore) for change in uploads))
+        if None in blob_shas:
+            return False
+
+        tree = [{"path": change["filename"], "mode": "100644", "type": "blob", "sha": sha}
+                for change, sha in zip(uploads, blob_shas)]
+        tree += [{"path": change["filename"], "mode": "100644", "type": "blob", "sha": None}
+                 for change in changes if change.get("action") == "delete"]
+
+        ref_url = f"{self.repo_api_url}/git/refs/heads/{branch_name}"
+        for attempt in range(GITHUB_COMMIT_RETRIES):
+            ref_response = await self._request("GET", ref_url)
+            if ref_response.status_code != 200:
+                logger.error(f"Failed to get branch {branch_name}: {ref_response.status_code}, {ref_response.text}")
+                return False
+            head_sha = ref_response.json()["object"]["sha"]
+
+            head_response = await self._request("GET", f"{self.repo_api_url}/git/commits/{head_sha}")
+            if head_response.status_code != 200:
+                logger.error(f"Failed to get commit {head_sha}: {head_response.status_code}, {head_response.text}")
+                return False
+
+            tree_response = await self._request("POST", f"{self.repo_api_url}/git/trees", json={
+                "base_tree": head_response.json()["tree"]["sha"], "tree": tree
+            })
+            if tree_response.status_code != 201:
+                logger.error(f"Failed to create tree: {tree_response.status_code}, {tree_response.text}")
+                return False
+
+            commit_response = await self._request("POST", f"{self.repo_api_url}/git/commits", json={
+                "message": commit_message, "tree": tree_response.json()["sha"], "parents": [head_sha]
+            })
+            if commit_response.status_code != 201:
+                logger.error(f"Failed to create commit: {commit_response.status_code}, {commit_response.text}")
+                return False
+            commit_sha = commit_response.json()["sha"]
+
+            update_response = await self._request("PATCH", ref_url, json={"sha": commit_sha})
+            if update_response.status_code == 200:
+                logger.info(f"Committed {len(tree)} files to {branch_name} as {commit_sha}")
+                return True
+            if update_response.status_code != 422:
+                logger.error(f"Failed to update branch {branch_name}: {update_response.status_code}, {update_response.text}")
+                return False
+            # Not a fast-forward: someone pushed to the branch meanwhile
+            logger.warning(f"Branch {branch_name} moved while committing, retrying ({attempt + 1}/{GITHUB_COMMIT_RETRIES})")
+
+        logger.error(f"Gave up committing to {branch_name} after {GITHUB_COMMIT_RETRIES} attempts")
+        return False
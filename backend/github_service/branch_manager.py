@@ -1,4 +1,5 @@
 
+import asyncio
 import logging
 from typing import Optional, Tuple, Dict, Any
 import re
@@ -14,7 +15,7 @@ class BranchManager:
     """Manager for Git branch operations with standardized naming and error handling"""
     
     def __init__(self, github_client=None):
-        """Initialize with optional GitHub client"""
+        """Initialize with optional GitHub client (an AsyncGitHubClient)"""
         self.logger = logging.getLogger("branch-manager")
         self.github_client = github_client
         self.env = get_config()
@@ -46,7 +47,7 @@ class BranchManager:
             sanitized = sanitized[:60]
         return sanitized
     
-    def create_bugfix_branch(self, ticket_id: str, bug_description: str = None) -> Tuple[bool, str]:
+    async def create_bugfix_branch(self, ticket_id: str, bug_description: str = None) -> Tuple[bool, str]:
         """
         Create a standardized branch name for a bugfix
         
@@ -79,12 +80,12 @@ class BranchManager:
             branch_name = f"{branch_prefix}/{ticket_id.upper()}"
         
         # Check if the branch already exists first
-        if self.github_client.check_branch_exists(branch_name):
+        if await self.github_client.check_branch_exists(branch_name):
             self.logger.info(f"Branch {branch_name} already exists, reusing it")
             return True, branch_name
             
         # Create the branch
-        success = self.github_client.create_branch(branch_name, default_branch)
+        success = await self.github_client.create_branch(branch_name, default_branch)
         
         if success:
             self.logger.info(f"Created branch {branch_name} from {default_branch}")
@@ -93,7 +94,7 @@ class BranchManager:
             self.logger.error(f"Failed to create branch {branch_name}")
             return False, ""
     
-    def checkout_branch(self, ticket_id: str, bug_summary: str = None) -> Tuple[bool, str]:
+    async def checkout_branch(self, ticket_id: str, bug_summary: str = None) -> Tuple[bool, str]:
         """
         Create and checkout a branch for fixing a bug
         
@@ -109,7 +110,7 @@ class BranchManager:
         """
         # Try using the ticket ID and summary
         if bug_summary:
-            success, branch_name = self.create_bugfix_branch(ticket_id, bug_summary)
+            success, branch_name = await self.create_bugfix_branch(ticket_id, bug_summary)
             if success:
                 return True, branch_name
                 
@@ -117,7 +118,7 @@ class BranchManager:
             self.logger.info("Failed to create branch with summary, trying with just ticket ID")
         
         # Try using just the ticket ID
-        success, branch_name = self.create_bugfix_branch(ticket_id)
+        success, branch_name = await self.create_bugfix_branch(ticket_id)
         if success:
             return True, branch_name
         
@@ -125,7 +126,7 @@ class BranchManager:
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         fallback_branch = f"fix/{ticket_id.upper()}-{timestamp}"
         
-        success = self.github_client.create_branch(fallback_branch)
+        success = await self.github_client.create_branch(fallback_branch)
         if success:
             self.logger.info(f"Created fallback branch {fallback_branch}")
             return True, fallback_branch
@@ -133,7 +134,7 @@ class BranchManager:
         self.logger.error("All attempts to create branch failed")
         return False, ""
     
-    def find_existing_branch(self, ticket_id: str) -> Optional[str]:
+    async def find_existing_branch(self, ticket_id: str) -> Optional[str]:
         """
         Find existing branch for a ticket
         
@@ -150,17 +151,16 @@ class BranchManager:
         # Common branch prefixes to check
         prefixes = ["fix/", "bugfix/", "feature/", "hotfix/"]
         
-        for prefix in prefixes:
-            branch_name = f"{prefix}{ticket_id.upper()}"
-            if self.github_client.check_branch_exists(branch_name):
+        branch_names = [f"{prefix}{ticket_id.upper()}" for prefix in prefixes]
+        
+        # Check every prefix at once and take the first match in prefix order
+        # Note: branches with descriptions ({prefix}{ticket_id}-...) would need
+        # all branches listed and filtered, which this doesn't do
+        exists = await asyncio.gather(*(self.github_client.check_branch_exists(name) for name in branch_names))
+        for branch_name, found in zip(branch_names, exists):
+            if found:
                 self.logger.info(f"Found existing branch {branch_name} for ticket {ticket_id}")
                 return branch_name
-                
-            # Also check for branches with descriptions (truncated search)
-            pattern = f"{prefix}{ticket_id.upper()}-"
-            # Note: This is a simplified version - in a real implementation,
-            # we would need to list all branches and filter by pattern
-            # which requires more GitHub API functionality than shown here
         
         self.logger.info(f"No existing branch found for ticket {ticket_id}")
         return None
\ No newline at end of file
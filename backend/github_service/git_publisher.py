@@ -0,0 +1,213 @@
+"""
+Publishing fixes from the local clone.
+
+Fixes are produced against the code_repo checkout, but publishing them
+through the REST API costs a blob per file plus the tree, commit and ref
+calls. GitWorktreePublisher commits the fix in a dedicated worktree of the
+local clone and pushes it in one go, so a large multi-file fix is as cheap as
+a small one. GitHub is then only called to open the PR. Each publish gets its
+own detached worktree, so concurrent tickets never touch the shared checkout
+or each other.
+
+The remote can be any git URL, which lets the whole flow run against a local
+bare repository.
+
+The module only uses the standard library so the agents can use it too; the
+agent images carry an identical copy as agents/utils/git_publisher.py, which
+the CommunicatorAgent publishes with.
+"""
+import asyncio
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("git-publisher")
+
+# How fixes are published: "git" pushes from the local clone, "rest" commits through the API
+GIT_PUBLISH_BACKEND = os.environ.get("GIT_PUBLISH_BACKEND", "rest").lower()
+
+# Remote the fix branches are pushed to
+GIT_PUBLISH_REMOTE = os.environ.get("GIT_PUBLISH_REMOTE", "origin")
+
+# Directory for the per-publish worktrees
+GIT_WORKTREE_ROOT = os.environ.get("GIT_WORKTREE_ROOT", os.path.join(tempfile.gettempdir(), "bugfix_ai_publish"))
+
+# Identity used for the fix commits
+GIT_COMMIT_AUTHOR_NAME = os.environ.get("GIT_COMMIT_AUTHOR_NAME", "BugFix AI")
+GIT_COMMIT_AUTHOR_EMAIL = os.environ.get("GIT_COMMIT_AUTHOR_EMAIL", "bugfix-ai@users.noreply.github.com")
+
+# Longest a single git command may run, in seconds
+GIT_COMMAND_TIMEOUT_SECONDS = int(os.environ.get("GIT_COMMAND_TIMEOUT_SECONDS", "120"))
+
+# git worktree add/remove and fetch update shared files in the clone, so they are serialized per clone
+_repo_locks: Dict[str, threading.Lock] = {}
+_repo_locks_guard = threading.Lock()
+
+
+def _repo_lock(repo_path: str) -> threading.Lock:
+    with _repo_locks_guard:
+        return _repo_locks.setdefault(os.path.realpath(repo_path), threading.Lock())
+
+
+class GitCommandError(Exception):
+    """Raised when a git command exits with an error"""
+    pass
+
+
+class GitWorktreePublisher:
+    """Commits fixes in a worktree of the local clone and pushes them with one push"""
+
+    def __init__(self, repo_path: str = None, remote: str = None, token: str = None, worktree_root: str = None):
+        """
+        Initialize the publisher
+
+        Args:
+            repo_path: Local clone to publish from. Defaults to REPO_PATH.
+            remote: Remote name or URL to push to. Defaults to GIT_PUBLISH_REMOTE.
+            token: GitHub token sent with fetches and pushes over HTTPS. Defaults to GITHUB_TOKEN.
+            worktree_root: Directory for worktrees. Defaults to GIT_WORKTREE_ROOT.
+        """
+        self.repo_path = repo_path or os.environ.get("REPO_PATH", "/app/code_repo")
+        self.remote = remote or GIT_PUBLISH_REMOTE
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        self.worktree_root = worktree_root or GIT_WORKTREE_ROOT
+
+    def _git(self, args: List[str], cwd: str = None, input: str = None, check: bool = True,
+             remote: bool = False) -> subprocess.CompletedProcess:
+        """
+        Run a git command
+
+        Args:
+            args: Arguments after "git"
+            cwd: Directory to run in. Defaults to the clone.
+            input: Text passed on stdin
+            check: Raise GitCommandError on a non-zero exit
+            remote: The command talks to the remote, so send the token
+
+        Returns:
+            The completed process
+        """
+        command = ["git"]
+        if remote and self.token:
+            # Passed per command rather than stored in the clone's config
+            credentials = base64.b64encode(f"x-access-token:{self.token}".encode()).decode()
+            command += ["-c", f"http.extraheader=AUTHORIZATION: basic {credentials}"]
+        command += args
+        process = subprocess.run(
+            command,
+            cwd=cwd or self.repo_path,
+            input=input,
+            capture_output=True,
+            text=True,
+            timeout=GIT_COMMAND_TIMEOUT_SECONDS
+        )
+        if check and process.returncode != 0:
+            raise GitCommandError(f"git {args[0]} failed: {process.stderr.strip() or process.stdout.strip()}")
+        return process
+
+    def _start_point(self, branch_name: str, base_branch: str) -> str:
+        """
+        Fetch the base and fix branches and return the commit to build on
+
+        A branch that was published before is built on, so the push is a
+        fast-forward and earlier attempts stay in the PR history.
+        """
+        self._git(["fetch", self.remote, f"+refs/heads/{base_branch}:refs/bugfix-publish/base/{base_branch}"],
+                  remote=True)
+        existing = self._git(["fetch", self.remote, f"+refs/heads/{branch_name}:refs/bugfix-publish/head/{branch_name}"],
+                             check=False, remote=True)
+        if existing.returncode == 0:
+            return f"refs/bugfix-publish/head/{branch_name}"
+        return f"refs/bugfix-publish/base/{base_branch}"
+
+    def _write_changes(self, worktree: str, file_changes: List[Dict[str, Any]]) -> None:
+        """Write or delete the changed files in the worktree"""
+        root = os.path.realpath(worktree)
+        for change in file_changes:
+            filename = change.get("filename")
+            if not filename:
+                continue
+            path = os.path.realpath(os.path.join(root, filename))
+            if not path.startswith(root + os.sep):
+                raise ValueError(f"File path {filename} is outside the repository")
+            if change.get("action") == "delete":
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            if change.get("content") is None:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(str(change["content"]))
+
+    def publish(self, branch_name: str, commit_message: str, file_changes: List[Dict[str, Any]] = None,
+                patch: str = None, base_branch: str = "main") -> Optional[str]:
+        """
+        Commit a fix on a branch and push it
+
+        Args:
+            branch_name: Branch to publish to; created from base_branch if it doesn't exist
+            commit_message: Commit message
+            file_changes: List of file changes, each with filename and content.
+                A change with action "delete" removes the file.
+            patch: Unified diff to apply instead of (or before) file_changes
+            base_branch: Branch a new fix branch starts from
+
+        Returns:
+            SHA of the pushed commit, or None if publishing failed
+        """
+        if not file_changes and not patch:
+            logger.error("Nothing to publish")
+            return None
+
+        worktree = os.path.join(self.worktree_root, f"{branch_name.replace('/', '-')}-{uuid.uuid4().hex[:8]}")
+        lock = _repo_lock(self.repo_path)
+        try:
+            with lock:
+                start_point = self._start_point(branch_name, base_branch)
+                os.makedirs(self.worktree_root, exist_ok=True)
+                self._git(["worktree", "add", "--detach", worktree, start_point])
+
+            if patch:
+                self._git(["apply", "--index", "--whitespace=nowarn", "-"], cwd=worktree, input=patch)
+            if file_changes:
+                self._write_changes(worktree, file_changes)
+            self._git(["add", "--all"], cwd=worktree)
+
+            if self._git(["diff", "--cached", "--quiet"], cwd=worktree, check=False).returncode == 0:
+                logger.error(f"The fix makes no changes to {branch_name}")
+                return None
+
+            self._git([
+                "-c", f"user.name={GIT_COMMIT_AUTHOR_NAME}", "-c", f"user.email={GIT_COMMIT_AUTHOR_EMAIL}",
+                "commit", "--quiet", "--no-verify", "-m", commit_message
+            ], cwd=worktree)
+            commit_sha = self._git(["rev-parse", "HEAD"], cwd=worktree).stdout.strip()
+
+            self._git(["push", "--quiet", self.remote, f"HEAD:refs/heads/{branch_name}"], cwd=worktree, remote=True)
+            logger.info(f"Pushed {commit_sha} to {branch_name}")
+            return commit_sha
+        except (GitCommandError, ValueError, OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"Failed to publish {branch_name}: {str(e)}")
+            return None
+        finally:
+            self._remove_worktree(worktree, lock)
+
+    def _remove_worktree(self, worktree: str, lock: threading.Lock) -> None:
+        """Remove a worktree and its administrative files"""
+        with lock:
+            if os.path.exists(worktree):
+                self._git(["worktree", "remove", "--force", worktree], check=False)
+                shutil.rmtree(worktree, ignore_errors=True)
+            self._git(["worktree", "prune"], check=False)
+
+    async def publish_async(self, branch_name: str, commit_message: str, file_changes: List[Dict[str, Any]] = None,
+                            patch: str = None, base_branch: str = "main") -> Optional[str]:
+        """Publish a fix like publish, in a worker thread so the event loop keeps running"""
+        return await asyncio.to_thread(self.publish, branch_name, commit_message, file_changes, patch, base_branch)
@@ -2,18 +2,24 @@ import os
 import logging
 import json
 from typing import Dict, Any, List, Optional, Tuple
-from .github_client import GitHubClient
+from .async_client import AsyncGitHubClient
+from .git_publisher import GIT_PUBLISH_BACKEND, GitWorktreePublisher
 from .patch_validator import PatchValidator
 
 class GitHubService:
-    """Service for interacting with GitHub repositories"""
+    """Service for interacting with GitHub repositories
+    
+    The branch, commit and PR methods are coroutines on AsyncGitHubClient, so
+    one ticket waiting on GitHub doesn't hold up the others.
+    """
     
     def __init__(self):
         """Initialize the GitHub service"""
         self.logger = logging.getLogger("github-service")
         
         try:
-            self.client = GitHubClient()
+            self.client = AsyncGitHubClient()
+            self.publisher = GitWorktreePublisher(token=self.client.github_token)
             self.validator = PatchValidator()
             self.logger.info("GitHub service initialized")
         except Exception as e:
@@ -23,7 +29,7 @@ class GitHubService:
         # Store PR mappings for tickets
         self.pr_mappings = {}
         
-    def create_fix_branch(self, ticket_id: str, base_branch: Optional[str] = None) -> Tuple[bool, str]:
+    async def create_fix_branch(self, ticket_id: str, base_branch: Optional[str] = None) -> Tuple[bool, str]:
         """
         Create a branch for fixing a bug
         
@@ -39,7 +45,7 @@ class GitHubService:
         
         try:
             # Create branch in the repository
-            success = self.client.create_branch(branch_name, base_branch)
+            success = await self.client.create_branch(branch_name, base_branch)
             
             if success:
                 self.logger.info(f"Successfully created branch {branch_name} for ticket {ticket_id}")
@@ -51,8 +57,8 @@ class GitHubService:
             self.logger.error(f"Error creating fix branch for ticket {ticket_id}: {e}")
             return False, branch_name
     
-    def commit_bug_fix(self, branch_name: str, file_changes: List[Dict[str, Any]], 
-                      ticket_id: str, commit_message: Optional[str] = None) -> bool:
+    async def commit_bug_fix(self, branch_name: str, file_changes: List[Dict[str, Any]], 
+                            ticket_id: str, commit_message: Optional[str] = None) -> bool:
         """
         Commit bug fix changes to a branch
         
@@ -85,15 +91,8 @@ class GitHubService:
                 self.logger.error("No valid file paths in file_changes")
                 return False
                 
-            # Create a combined patch
-            combined_patch = ""
-            for change in file_changes:
-                combined_patch += f"--- {change.get('filename')}\n"
-                combined_patch += f"+++ {change.get('filename')}\n"
-                combined_patch += f"{change.get('content', '')}\n\n"
-            
-            # Apply the patch
-            result = self.client.commit_patch(branch_name, combined_patch, commit_message, file_paths)
+            # Commit all files together as a single commit
+            result = await self.client.commit_files(branch_name, file_changes, commit_message)
             
             if result:
                 self.logger.info(f"Successfully committed fix for {ticket_id} to branch {branch_name}")
@@ -105,8 +104,8 @@ class GitHubService:
             self.logger.error(f"Error committing bug fix: {e}")
             return False
     
-    def create_fix_pr(self, branch_name: str, ticket_id: str, title: Optional[str] = None, 
-                     description: Optional[str] = None, base_branch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def create_fix_pr(self, branch_name: str, ticket_id: str, title: Optional[str] = None, 
+                           description: Optional[str] = None, base_branch: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Create a pull request for the fix
         
@@ -140,24 +139,16 @@ class GitHubService:
                 return existing_pr
             
             # Create PR
-            pr_url = self.client.create_pull_request(title, description, branch_name, base_branch)
+            pr_url, pr_number = await self.client.create_pull_request(title, description, branch_name, base_branch)
             
             if not pr_url:
                 self.logger.error(f"Failed to create PR for ticket {ticket_id}")
                 return None
                 
-            # Extract PR number from URL
-            pr_number = None
-            try:
-                import re
-                match = re.search(r'/pull/(\d+)', pr_url)
-                if match:
-                    pr_number = int(match.group(1))
-                    # Store the PR mapping
-                    self.pr_mappings[ticket_id] = pr_number
-                    self.logger.info(f"Mapped ticket {ticket_id} to PR #{pr_number}")
-            except Exception as e:
-                self.logger.error(f"Error extracting PR number from URL: {e}")
+            # Store the PR mapping
+            if pr_number:
+                self.pr_mappings[ticket_id] = pr_number
+                self.logger.info(f"Mapped ticket {ticket_id} to PR #{pr_number}")
             
             self.logger.info(f"Successfully created PR for ticket {ticket_id}: {pr_url}")
             return {
@@ -168,6 +159,53 @@ class GitHubService:
             self.logger.error(f"Error creating PR for ticket {ticket_id}: {e}")
             return None
     
+    async def publish_fix(self, ticket_id: str, file_changes: Optional[List[Dict[str, Any]]] = None,
+                          patch: Optional[str] = None, commit_message: Optional[str] = None,
+                          title: Optional[str] = None, description: Optional[str] = None,
+                          base_branch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Publish a fix to its branch and open the PR
+        
+        With GIT_PUBLISH_BACKEND=git the fix is committed in a worktree of the
+        local clone and pushed once, and GitHub is only called for the PR.
+        Otherwise the branch and commit go through the REST API.
+        
+        Args:
+            ticket_id: JIRA ticket ID
+            file_changes: List of file changes (each with filename and content)
+            patch: Unified diff to apply (git backend only)
+            commit_message: Optional commit message override
+            title: PR title
+            description: PR description
+            base_branch: Target branch (defaults to default branch from config)
+            
+        Returns:
+            Dictionary with PR URL, number and branch if successful, None otherwise
+        """
+        base_branch = base_branch or self.client.default_branch
+        branch_name = f"fix/{ticket_id.lower()}"
+        if self.client.use_default_branch_only:
+            branch_name = self.client.default_branch
+        commit_message = commit_message or f"Fix bug for {ticket_id}"
+        
+        if GIT_PUBLISH_BACKEND == "git":
+            commit_sha = await self.publisher.publish_async(branch_name, commit_message, file_changes, patch, base_branch)
+            if not commit_sha:
+                self.logger.error(f"Failed to push fix for ticket {ticket_id}")
+                return None
+        else:
+            if patch and not file_changes:
+                self.logger.error("The REST backend needs file contents; set GIT_PUBLISH_BACKEND=git to publish a diff")
+                return None
+            success, branch_name = await self.create_fix_branch(ticket_id, base_branch)
+            if not success or not await self.commit_bug_fix(branch_name, file_changes, ticket_id, commit_message):
+                return None
+        
+        pr = await self.create_fix_pr(branch_name, ticket_id, title, description, base_branch)
+        if pr:
+            pr["branch"] = branch_name
+        return pr
+    
     def check_for_existing_pr(self, branch_name: str, base_branch: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Check if a PR already exists for the branch
@@ -4,6 +4,8 @@ import re
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 
+from patch_stream import find_placeholders
+
 class PatchValidator:
     """Validator for LLM-generated code patches"""
     
@@ -161,44 +163,7 @@ class PatchValidator:
         Returns:
             List of placeholder patterns found
         """
-        placeholders = []
-        
-        # Check file path for placeholders
-        path_patterns = [
-            r'/path/to/',
-            r'example\.py',
-            r'your_',
-            r'my_',
-            r'placeholder',
-            r'sample',
-            r'/tmp/',
-            r'foo\.py',
-            r'bar\.py'
-        ]
-        
-        for pattern in path_patterns:
-            if re.search(pattern, file_path, re.IGNORECASE):
-                placeholders.append(f"path_placeholder:{pattern}")
-        
-        # Check diff for placeholders
-        diff_patterns = [
-            r'# TODO',
-            r'# FIXME',
-            r'# NOTE',
-            r'your_function',
-            r'your_variable',
-            r'your_class',
-            r'insert your',
-            r'replace this',
-            r'xyz\.py',
-            r'example\.com'
-        ]
-        
-        for pattern in diff_patterns:
-            if re.search(pattern, diff, re.IGNORECASE):
-                placeholders.append(f"diff_placeholder:{pattern}")
-        
-        return placeholders
+        return find_placeholders(file_path, diff)
     
     def _failed_result(self, reason: str) -> Dict[str, Any]:
         """
@@ -1,4 +1,5 @@
 
+import asyncio
 import os
 import sys
 import logging
@@ -36,8 +37,8 @@ def test_github_service():
         
         # Test creating a branch
         ticket_id = "TEST-123"
-        branch_name = service.create_fix_branch(ticket_id)
-        if not branch_name:
+        success, branch_name = asyncio.run(service.create_fix_branch(ticket_id))
+        if not success:
             logger.error("Failed to create branch")
             return
         
@@ -49,24 +50,24 @@ def test_github_service():
             }
         ]
         
-        commit_success = service.commit_bug_fix(
+        commit_success = asyncio.run(service.commit_bug_fix(
             branch_name,
             test_changes,
             ticket_id,
             "Test commit for automated testing"
-        )
+        ))
         
         if not commit_success:
             logger.error("Failed to commit changes")
             return
         
         # Test creating PR
-        pr_url = service.create_fix_pr(
+        pr_url = asyncio.run(service.create_fix_pr(
             branch_name,
             ticket_id,
             "Test bug fix",
             "This is a test PR created by the GitHub service test script"
-        )
+        ))
         
         if not pr_url:
             logger.error("Failed to create PR")
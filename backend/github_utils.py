@@ -3,70 +3,183 @@ import logging
 import os
 import base64
 import difflib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from github import Github, GithubException, InputGitTreeElement
+from urllib.parse import quote
+
+import requests
+from github import BadCredentialsException, Github, GithubException, InputGitTreeElement
+
+from github_cache import CachedResponse, GitHubResponseCache, get_github_cache
+from rate_limiter import get_rate_limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("github-utils")
 
-def authenticate_github():
-    """Authenticate with GitHub using the personal access token"""
-    # Get the GitHub token from environment variables first
+# Repository handles are reused for this long before being fetched again
+GITHUB_REPO_CACHE_TTL_SECONDS = int(os.environ.get("GITHUB_REPO_CACHE_TTL_SECONDS", "600"))
+
+# HTTP connections per GitHub client, shared by concurrent tickets
+GITHUB_POOL_SIZE = int(os.environ.get("GITHUB_POOL_SIZE", "10"))
+
+# Blob uploads in flight at once when committing several files
+GITHUB_BLOB_CONCURRENCY = int(os.environ.get("GITHUB_BLOB_CONCURRENCY", "8"))
+
+# Attempts at a multi-file commit when the branch moves underneath it
+GITHUB_COMMIT_RETRIES = int(os.environ.get("GITHUB_COMMIT_RETRIES", "3"))
+
+
+class GitHubSessionCache:
+    """
+    Process-wide GitHub clients and repository handles
+
+    Building a Github client and checking the token with get_user() used to
+    happen for every operation, and a PR flow paid for it a dozen times.
+    Clients are now kept per token, the token is checked at most once, and
+    repository handles are reused until GITHUB_REPO_CACHE_TTL_SECONDS pass.
+    Fetching a repository already fails on a bad token, so operations don't
+    check the token separately. A token GitHub rejects is dropped along with
+    everything cached for it. The cache is shared by all threads.
+    """
+
+    def __init__(self, repo_ttl_seconds: float = None):
+        """
+        Initialize the cache
+
+        Args:
+            repo_ttl_seconds: Repository handle lifetime. Defaults to GITHUB_REPO_CACHE_TTL_SECONDS.
+        """
+        self.repo_ttl_seconds = GITHUB_REPO_CACHE_TTL_SECONDS if repo_ttl_seconds is None else repo_ttl_seconds
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Github] = {}
+        # Login of each token that get_user() has confirmed
+        self._logins: Dict[str, str] = {}
+        self._repos: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+    def get_client(self, token: str) -> Github:
+        """Get the client for a token, creating it without any API call"""
+        with self._lock:
+            client = self._clients.get(token)
+            if client is None:
+                client = Github(token, pool_size=GITHUB_POOL_SIZE)
+                self._clients[token] = client
+            return client
+
+    def validate(self, token: str) -> Optional[Github]:
+        """
+        Get the client for a token, checking the token with GitHub the first time
+
+        Returns:
+            The client, or None if GitHub rejected the token
+        """
+        client = self.get_client(token)
+        if token in self._logins:
+            return client
+        try:
+            login = client.get_user().login
+        except GithubException as e:
+            logger.error(f"GitHub authentication error: {str(e)}")
+            self.invalidate(token)
+            return None
+        with self._lock:
+            self._logins[token] = login
+        logger.info(f"Authenticated as GitHub user: {login}")
+        return client
+
+    def get_repo(self, token: str, full_name: str):
+        """
+        Get a repository handle, reusing a cached one until it expires
+
+        Returns:
+            The repository, or None if it can't be accessed
+        """
+        key = (token, full_name)
+        now = time.time()
+        with self._lock:
+            entry = self._repos.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        try:
+            repo = self.get_client(token).get_repo(full_name)
+        except BadCredentialsException as e:
+            logger.error(f"GitHub authentication error: {str(e)}")
+            self.invalidate(token)
+            return None
+        except GithubException as e:
+            logger.error(f"Error accessing repository {full_name}: {str(e)}")
+            return None
+        with self._lock:
+            self._repos[key] = (now + self.repo_ttl_seconds, repo)
+        return repo
+
+    def invalidate(self, token: str = None) -> None:
+        """Drop the cached client, token check and repositories for a token, or for all tokens"""
+        with self._lock:
+            if token is None:
+                self._clients.clear()
+                self._logins.clear()
+                self._repos.clear()
+                return
+            self._clients.pop(token, None)
+            self._logins.pop(token, None)
+            for key in [key for key in self._repos if key[0] == token]:
+                del self._repos[key]
+
+
+_session_cache: Optional[GitHubSessionCache] = None
+_session_cache_lock = threading.Lock()
+
+def get_github_session_cache() -> GitHubSessionCache:
+    """Get the process-wide GitHub session cache"""
+    global _session_cache
+    with _session_cache_lock:
+        if _session_cache is None:
+            _session_cache = GitHubSessionCache()
+        return _session_cache
+
+def _get_github_token() -> Optional[str]:
+    """Get the GitHub token from the environment, or from env.py if it exists"""
     github_token = os.environ.get("GITHUB_TOKEN")
-    
-    # If not found in environment, try importing from env.py if it exists
     if not github_token:
         try:
             from env import GITHUB_TOKEN
             github_token = GITHUB_TOKEN
         except ImportError:
-            logger.error("GitHub token not found. Please set GITHUB_TOKEN environment variable.")
-            return None
-        
+            pass
     if not github_token:
         logger.error("GitHub token not found. Please set GITHUB_TOKEN environment variable.")
         return None
-        
-    try:
-        github_client = Github(github_token)
-        # Test the connection
-        user = github_client.get_user()
-        logger.info(f"Authenticated as GitHub user: {user.login}")
-        return github_client
-    except GithubException as e:
-        logger.error(f"GitHub authentication error: {str(e)}")
+    return github_token
+
+def authenticate_github():
+    """Authenticate with GitHub using the personal access token"""
+    github_token = _get_github_token()
+    if not github_token:
         return None
+    return get_github_session_cache().validate(github_token)
 
 def get_repo(repo_name: str = None):
     """Get a repository by name or from environment variables"""
-    github_client = authenticate_github()
-    if not github_client:
+    github_token = _get_github_token()
+    if not github_token:
         return None
     
     # If repo_name is provided, use it directly
-    if repo_name:
-        try:
-            return github_client.get_repo(repo_name)
-        except GithubException as e:
-            logger.error(f"Error accessing repository {repo_name}: {str(e)}")
+    if not repo_name:
+        # Otherwise try to construct from environment variables
+        owner = os.environ.get("GITHUB_REPO_OWNER")
+        name = os.environ.get("GITHUB_REPO_NAME")
+        
+        if not owner or not name:
+            logger.error("GITHUB_REPO_OWNER and GITHUB_REPO_NAME environment variables are required")
             return None
+        repo_name = f"{owner}/{name}"
     
-    # Otherwise try to construct from environment variables
-    owner = os.environ.get("GITHUB_REPO_OWNER")
-    name = os.environ.get("GITHUB_REPO_NAME")
-    
-    if not owner or not name:
-        logger.error("GITHUB_REPO_OWNER and GITHUB_REPO_NAME environment variables are required")
-        return None
-    
-    try:
-        full_name = f"{owner}/{name}"
-        return github_client.get_repo(full_name)
-    except GithubException as e:
-        logger.error(f"Error accessing repository {full_name}: {str(e)}")
-        return None
+    return get_github_session_cache().get_repo(github_token, repo_name)
 
 def create_branch(repo_name: str, ticket_id: str, base_branch: str = None) -> Optional[str]:
     """Create a new branch for the bugfix"""
@@ -110,58 +223,16 @@ def create_branch(repo_name: str, ticket_id: str, base_branch: str = None) -> Op
 
 def commit_changes(repo_name: str, branch_name: str, file_changes: List[Dict[str, Any]], 
                 commit_message: str) -> bool:
-    """Commit file changes to the branch"""
-    try:
-        github_client = authenticate_github()
-        if not github_client:
-            return False
-            
-        # Get the repository and branch reference
-        repo = get_repo(repo_name)
-        if not repo:
-            return False
-        
-        # First attempt: Try updating files one by one
-        all_success = True
-        for file_change in file_changes:
-            filename = file_change.get('filename')
-            content = file_change.get('content')
-            
-            if not filename or not content:
-                logger.warning(f"Skipping invalid file change: {file_change}")
-                all_success = False
-                continue
-                
-            try:
-                # Check if file exists
-                try:
-                    file_content = repo.get_contents(filename, ref=branch_name)
-                    # Update existing file
-                    repo.update_file(
-                        path=filename,
-                        message=f"Update {filename} - {commit_message}",
-                        content=content,
-                        sha=file_content.sha,
-                        branch=branch_name
-                    )
-                    logger.info(f"Updated file {filename} in {branch_name}")
-                except GithubException:
-                    # File doesn't exist, create it
-                    repo.create_file(
-                        path=filename,
-                        message=f"Create {filename} - {commit_message}",
-                        content=content,
-                        branch=branch_name
-                    )
-                    logger.info(f"Created file {filename} in {branch_name}")
-            except GithubException as e:
-                logger.error(f"Failed to update/create file {filename}: {str(e)}")
-                all_success = False
-                
-        return all_success
-    except Exception as e:
-        logger.error(f"Error committing changes: {str(e)}")
+    """Commit file changes to the branch as a single commit"""
+    valid_changes = [change for change in file_changes if change.get('filename') and change.get('content')]
+    for file_change in file_changes:
+        if file_change not in valid_changes:
+            logger.warning(f"Skipping invalid file change: {file_change}")
+    if not valid_changes:
         return False
+    
+    committed = commit_multiple_changes_as_tree(repo_name, branch_name, valid_changes, commit_message)
+    return committed and len(valid_changes) == len(file_changes)
 
 def create_pull_request(repo_name: str, branch_name: str, ticket_id: str, title: str, 
                       description: str, base_branch: str = None) -> Optional[str]:
@@ -224,7 +295,6 @@ This PR was automatically generated by BugFix AI.
                 elif attempt < max_retries - 1:
                     wait_time = 2 ** attempt  # Exponential backoff
                     logger.warning(f"Retrying PR creation in {wait_time} seconds: {str(e)}")
-                    import time
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Failed to create PR after {max_retries} attempts: {str(e)}")
@@ -238,60 +308,79 @@ def commit_multiple_changes_as_tree(repo_name: str, branch_name: str,
     """
     Commit multiple file changes at once using Git trees for better performance
     and atomic commits across multiple files.
+    
+    The blobs are uploaded concurrently. A change with action "delete" removes
+    the file. If the branch moves while committing, the commit is rebuilt on
+    the new head.
     """
     try:
-        github_client = authenticate_github()
-        if not github_client:
-            return False
-            
         # Get the repository
         repo = get_repo(repo_name)
         if not repo:
             return False
         
+        uploads = []
+        deletions = []
+        for file_change in file_changes:
+            filename = file_change.get('filename')
+            content = file_change.get('content')
+            
+            if filename and file_change.get('action') == 'delete':
+                deletions.append(filename)
+                continue
+            if not filename or content is None:
+                logger.warning(f"Skipping invalid file change: {file_change}")
+                continue
+                
+            # Convert content to string if it's not already
+            uploads.append((filename, content if isinstance(content, str) else str(content)))
+        
+        if not uploads and not deletions:
+            logger.error("No valid file changes to commit")
+            return False
+        
         try:
-            # Get the latest commit on the branch
-            ref = repo.get_git_ref(f"heads/{branch_name}")
-            latest_commit = repo.get_git_commit(ref.object.sha)
-            base_tree = latest_commit.tree
+            with ThreadPoolExecutor(max_workers=max(1, min(GITHUB_BLOB_CONCURRENCY, len(uploads)))) as executor:
+                blobs = list(executor.map(lambda upload: repo.create_git_blob(upload[1], "utf-8"), uploads))
+            
+            # Regular file mode; a missing SHA deletes the path
+            tree_elements = [
+                InputGitTreeElement(path=filename, mode='100644', type='blob', sha=blob.sha)
+                for (filename, _), blob in zip(uploads, blobs)
+            ]
+            tree_elements += [
+                InputGitTreeElement(path=filename, mode='100644', type='blob', sha=None)
+                for filename in deletions
+            ]
             
-            # Create tree elements for new files
-            tree_elements = []
-            for file_change in file_changes:
-                filename = file_change.get('filename')
-                content = file_change.get('content')
+            for attempt in range(GITHUB_COMMIT_RETRIES):
+                # Get the latest commit on the branch
+                ref = repo.get_git_ref(f"heads/{branch_name}")
+                latest_commit = repo.get_git_commit(ref.object.sha)
                 
-                if not filename or content is None:
-                    logger.warning(f"Skipping invalid file change: {file_change}")
+                # Create a tree with the new files and a commit with the new tree
+                new_tree = repo.create_git_tree(tree_elements, latest_commit.tree)
+                new_commit = repo.create_git_commit(
+                    message=commit_message,
+                    tree=new_tree,
+                    parents=[latest_commit]
+                )
+                
+                # Update the reference to point to the new commit
+                try:
+                    ref.edit(new_commit.sha)
+                except GithubException as e:
+                    if e.status != 422:
+                        raise
+                    # Not a fast-forward: someone pushed to the branch meanwhile
+                    logger.warning(f"Branch {branch_name} moved while committing, retrying ({attempt + 1}/{GITHUB_COMMIT_RETRIES})")
                     continue
-                    
-                # Convert content to string if it's not already
-                if not isinstance(content, str):
-                    content = str(content)
                 
-                element = InputGitTreeElement(
-                    path=filename,
-                    mode='100644',  # Regular file mode
-                    type='blob',
-                    content=content
-                )
-                tree_elements.append(element)
-            
-            # Create a tree with the new files
-            new_tree = repo.create_git_tree(tree_elements, base_tree)
-            
-            # Create a commit with the new tree
-            new_commit = repo.create_git_commit(
-                message=commit_message,
-                tree=new_tree,
-                parents=[latest_commit]
-            )
-            
-            # Update the reference to point to the new commit
-            ref.edit(new_commit.sha)
+                logger.info(f"Committed {len(tree_elements)} files to {branch_name}")
+                return True
             
-            logger.info(f"Committed {len(tree_elements)} files to {branch_name}")
-            return True
+            logger.error(f"Gave up committing to {branch_name} after {GITHUB_COMMIT_RETRIES} attempts")
+            return False
         except GithubException as e:
             logger.error(f"Failed to commit files as tree: {str(e)}")
             return False
@@ -340,6 +429,19 @@ def get_branch_commit_history(repo_name: str, branch_name: str, max_commits: int
         logger.error(f"Error getting branch commit history: {str(e)}")
         return []
 
+def _conditional_get(github_token: str, url: str, params: Dict[str, Any] = None) -> CachedResponse:
+    """GET a GitHub API URL through the response cache, so unchanged content costs no quota"""
+    rate_limiter = get_rate_limiter("github", github_token)
+    headers = {"Accept": "application/vnd.github.v3+json", "Authorization": f"token {github_token}"}
+    
+    def send(conditional: Dict[str, str]) -> requests.Response:
+        rate_limiter.acquire()
+        response = requests.get(url, headers={**headers, **conditional}, params=params, timeout=30)
+        rate_limiter.record_response(response.status_code, response.headers)
+        return response
+    
+    return get_github_cache().fetch(GitHubResponseCache.make_key(url, params, github_token), send)
+
 def get_file_content(repo_name: str, file_path: str, branch: str = None) -> Optional[str]:
     """Get the content of a file from GitHub"""
     try:
@@ -350,12 +452,18 @@ def get_file_content(repo_name: str, file_path: str, branch: str = None) -> Opti
         if not branch:
             branch = os.environ.get("GITHUB_DEFAULT_BRANCH", "main")
             
+        response = _conditional_get(_get_github_token(), f"{repo.url}/contents/{quote(file_path)}", {"ref": branch})
+        if response.status_code != 200:
+            logger.error(f"Failed to get file content for {file_path}: {response.status_code}")
+            return None
+        
+        content_data = response.json()
+        if content_data.get("encoding") == "base64":
+            return base64.b64decode(content_data["content"]).decode('utf-8')
+        
+        # Files over 1 MB come without inline content
         try:
-            file_content = repo.get_contents(file_path, ref=branch)
-            if file_content.encoding == "base64":
-                return base64.b64decode(file_content.content).decode('utf-8')
-            else:
-                return file_content.decoded_content.decode('utf-8')
+            return repo.get_contents(file_path, ref=branch).decoded_content.decode('utf-8')
         except GithubException as e:
             logger.error(f"Failed to get file content for {file_path}: {str(e)}")
             return None
@@ -408,13 +516,16 @@ def commit_using_patch(repo_name: str, branch_name: str, file_paths: List[str],
         if not repo:
             return False
             
+        # Fetch the original contents concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(GITHUB_BLOB_CONCURRENCY, len(file_paths)))) as executor:
+            original_contents = list(executor.map(lambda path: get_file_content(repo_name, path, branch_name), file_paths))
+        
         # Process one file at a time
         diffs = []
         file_changes = []
         
         for i, file_path in enumerate(file_paths):
-            # Get the original content
-            original_content = get_file_content(repo_name, file_path, branch_name)
+            original_content = original_contents[i]
             if original_content is None:
                 # File doesn't exist, so we'll create it
                 logger.info(f"File {file_path} doesn't exist, will create it")
@@ -13,6 +13,9 @@ JIRA_API_TOKEN = os.getenv('JIRA_TOKEN') or os.getenv('JIRA_API_TOKEN')
 JIRA_PROJECT_KEY = os.getenv('JIRA_PROJECT_KEY', '')
 JIRA_POLL_INTERVAL = int(os.getenv('JIRA_POLL_INTERVAL', '30'))
 
+# Maximum number of tickets the service leases and works on at once
+MAX_CONCURRENT_TICKETS = int(os.getenv('JIRA_SERVICE_MAX_TICKETS', '4'))
+
 # Retry Configuration
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 RETRY_BACKOFF_FACTOR = 2  # For exponential backoff
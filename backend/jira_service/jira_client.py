@@ -1,12 +1,13 @@
 import logging
 import os
-from typing import List, Dict, Any, Optional
-import httpx
-import json
+from typing import AsyncIterator, List, Dict, Any, Optional
 import asyncio
 from datetime import datetime
 
 from . import config
+from .poller import IncrementalJiraPoller
+from .progress import JIRA_PROGRESS_COMMENTS, DebouncedProgressWriter, ProgressCommentStore
+from .session import JiraSession, get_jira_session
 
 # Set up logging
 logger = logging.getLogger("jira-service.client")
@@ -14,114 +15,168 @@ logger = logging.getLogger("jira-service.client")
 class JiraClient:
     """Client for interacting with JIRA API"""
     
-    def __init__(self):
-        """Initialize JIRA client with credentials from config"""
+    def __init__(self, poll_state_name: str = "jira_client"):
+        """
+        Initialize JIRA client with credentials from config
+        
+        Args:
+            poll_state_name: Name of the persisted poll state, one per consuming service
+        """
         self.jira_url = config.JIRA_URL
         self.jira_user = config.JIRA_USERNAME
         self.jira_token = config.JIRA_API_TOKEN
         self.auth = (self.jira_user, self.jira_token)
         self.project_key = config.JIRA_PROJECT_KEY
+        self.poll_state_name = poll_state_name
+        self.poller = None
+        self.progress = None
         
         logger.info(f"Initialized JIRA client for project {self.project_key}")
     
+    def _get_poller(self) -> IncrementalJiraPoller:
+        """Get the incremental poller for bug tickets, created on first use"""
+        if self.poller is None:
+            # Build JQL query to find bug tickets including In Progress status
+            jql = f"issuetype = Bug AND (status = \"To Do\" OR status = Open OR status = \"In Progress\") AND project = {self.project_key}"
+            
+            # Fields to retrieve
+            fields = "summary,description,status,issuetype,created,updated,assignee,reporter,priority"
+            
+            self.poller = IncrementalJiraPoller(self.poll_state_name, jql, fields)
+        return self.poller
+    
+    def _get_session(self) -> JiraSession:
+        """Get the pooled JIRA session for this site and user"""
+        return get_jira_session(self.jira_url, self.auth)
+    
+    def _get_progress(self) -> DebouncedProgressWriter:
+        """Get the progress comment writer, created on first use"""
+        if self.progress is None:
+            self.progress = DebouncedProgressWriter(self._get_session, ProgressCommentStore(self.poll_state_name))
+        return self.progress
+    
+    async def update_progress(self, ticket_id: str, text: str) -> bool:
+        """
+        Report a pipeline step on the ticket's edit-in-place progress comment
+        
+        Returns immediately; steps reported within the debounce window are
+        written to JIRA in one edit. With JIRA_PROGRESS_COMMENTS disabled the
+        step is posted as a regular comment instead.
+        
+        Args:
+            ticket_id: The JIRA ticket ID
+            text: Step description
+            
+        Returns:
+            True if the step was recorded or posted, False otherwise
+        """
+        if not JIRA_PROGRESS_COMMENTS:
+            try:
+                return await self._get_session().add_comment(ticket_id, text)
+            except Exception as e:
+                logger.error(f"Error adding comment to ticket {ticket_id}: {e}")
+                return False
+        self._get_progress().update(ticket_id, text)
+        return True
+    
+    async def flush_progress(self, ticket_id: str) -> bool:
+        """Write pending progress steps for a ticket now, e.g. before posting its final result"""
+        if self.progress is None:
+            return True
+        return await self.progress.flush(ticket_id)
+    
+    async def iter_bug_tickets(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield bug tickets that are new or changed since the last poll
+        
+        Pages through the search results and maps each page as it arrives.
+        """
+        logger.info("Fetching bug tickets from JIRA")
+        client = self._get_session().get_client()
+        async for ticket in self._get_poller().poll(client, self.jira_url, self.auth, self._map_issue):
+            yield ticket
+    
     async def fetch_bug_tickets(self) -> List[Dict[str, Any]]:
         """
         Fetch bug tickets from JIRA that are in To Do, Open, or In Progress status
+        and are new or have changed since the last poll
         
         Returns:
             List of ticket dictionaries with fields mapped to standard format
         """
         try:
-            logger.info("Fetching bug tickets from JIRA")
+            tickets = [ticket async for ticket in self.iter_bug_tickets()]
             
-            # Build JQL query to find bug tickets including In Progress status
-            jql = f"issuetype = Bug AND (status = \"To Do\" OR status = Open OR status = \"In Progress\") AND project = {self.project_key}"
-            
-            # Fields to retrieve
-            fields = "summary,description,status,issuetype,created,updated,assignee,reporter,priority"
+            if not tickets:
+                logger.info("No new or changed issues found in JIRA")
+                return []
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.jira_url}/rest/api/3/search",
-                    params={"jql": jql, "fields": fields},
-                    auth=self.auth
-                )
-                
-                # Log the HTTP request for debugging
-                logger.info(f"HTTP Request: {response.request.method} {response.request.url} \"{response.http_version} {response.status_code} {response.reason_phrase}\"")
-                
-                if response.status_code != 200:
-                    logger.error(f"Failed to fetch bug tickets: {response.status_code} - {response.text}")
-                    return []
-                
-                data = response.json()
-                issues = data.get("issues", [])
-                
-                if not issues:
-                    logger.info("No issues found in JIRA response")
-                    return []
-                
-                logger.info(f"Found {len(issues)} bug tickets to process")
-                
-                # Map JIRA fields to standard ticket format
-                tickets = []
-                for issue in issues:
-                    # Handle description field which might be complex JSON or plain text
-                    description = issue["fields"].get("description", "")
-                    desc_text = ""
-                    
-                    # Enhanced error handling for description field
-                    try:
-                        if description is None:
-                            desc_text = ""
-                        elif isinstance(description, dict):
-                            # Extract text from Atlassian Document Format
-                            desc_text = self._extract_text_from_adf(description)
-                            # If we couldn't extract text, provide a fallback message
-                            if not desc_text.strip():
-                                desc_text = "No readable description available"
-                        else:
-                            desc_text = str(description)
-                    except Exception as e:
-                        logger.error(f"Error processing description for {issue['key']}: {str(e)}")
-                        desc_text = "Error processing description"
-                    
-                    # Safely extract fields with null checks
-                    status_name = "Unknown"
-                    if issue["fields"].get("status") and isinstance(issue["fields"]["status"], dict):
-                        status_name = issue["fields"]["status"].get("name", "Unknown")
-                        
-                    reporter_name = "Unknown"
-                    if issue["fields"].get("reporter") and isinstance(issue["fields"]["reporter"], dict):
-                        reporter_name = issue["fields"]["reporter"].get("displayName", "Unknown")
-                        
-                    assignee_name = "Unassigned"
-                    if issue["fields"].get("assignee") and isinstance(issue["fields"]["assignee"], dict):
-                        assignee_name = issue["fields"]["assignee"].get("displayName", "Unassigned")
-                        
-                    priority_name = "Medium"
-                    if issue["fields"].get("priority") and isinstance(issue["fields"]["priority"], dict):
-                        priority_name = issue["fields"]["priority"].get("name", "Medium")
-                    
-                    ticket = {
-                        "ticket_id": issue["key"],
-                        "title": issue["fields"].get("summary", "No title"),
-                        "description": desc_text,
-                        "status": status_name,
-                        "created": issue["fields"].get("created", ""),
-                        "updated": issue["fields"].get("updated", ""),
-                        "reporter": reporter_name,
-                        "assignee": assignee_name,
-                        "priority": priority_name
-                    }
-                    tickets.append(ticket)
-                
-                return tickets
+            logger.info(f"Found {len(tickets)} bug tickets to process")
+            return tickets
                 
         except Exception as e:
             logger.error(f"Error fetching bug tickets: {e}")
             return []
     
+    def _map_issue(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map a JIRA search result issue to the standard ticket format
+        
+        Args:
+            issue: Raw issue from the search API
+            
+        Returns:
+            Ticket dictionary
+        """
+        # Handle description field which might be complex JSON or plain text
+        description = issue["fields"].get("description", "")
+        desc_text = ""
+        
+        # Enhanced error handling for description field
+        try:
+            if description is None:
+                desc_text = ""
+            elif isinstance(description, dict):
+                # Extract text from Atlassian Document Format
+                desc_text = self._extract_text_from_adf(description)
+                # If we couldn't extract text, provide a fallback message
+                if not desc_text.strip():
+                    desc_text = "No readable description available"
+            else:
+                desc_text = str(description)
+        except Exception as e:
+            logger.error(f"Error processing description for {issue['key']}: {str(e)}")
+            desc_text = "Error processing description"
+        
+        # Safely extract fields with null checks
+        status_name = "Unknown"
+        if issue["fields"].get("status") and isinstance(issue["fields"]["status"], dict):
+            status_name = issue["fields"]["status"].get("name", "Unknown")
+            
+        reporter_name = "Unknown"
+        if issue["fields"].get("reporter") and isinstance(issue["fields"]["reporter"], dict):
+            reporter_name = issue["fields"]["reporter"].get("displayName", "Unknown")
+            
+        assignee_name = "Unassigned"
+        if issue["fields"].get("assignee") and isinstance(issue["fields"]["assignee"], dict):
+            assignee_name = issue["fields"]["assignee"].get("displayName", "Unassigned")
+            
+        priority_name = "Medium"
+        if issue["fields"].get("priority") and isinstance(issue["fields"]["priority"], dict):
+            priority_name = issue["fields"]["priority"].get("name", "Medium")
+        
+        return {
+            "ticket_id": issue["key"],
+            "title": issue["fields"].get("summary", "No title"),
+            "description": desc_text,
+            "status": status_name,
+            "created": issue["fields"].get("created", ""),
+            "updated": issue["fields"].get("updated", ""),
+            "reporter": reporter_name,
+            "assignee": assignee_name,
+            "priority": priority_name
+        }
+    
     def _extract_text_from_adf(self, doc: Dict[str, Any]) -> str:
         """
         Extract plain text from Atlassian Document Format (ADF)
@@ -201,95 +256,28 @@ class JiraClient:
             True if successful, False otherwise
         """
         try:
+            session = self._get_session()
+            
             # First, add a comment
             if comment:
                 logger.info(f"Adding comment to ticket {ticket_id}")
-                
-                comment_data = {
-                    "body": {
-                        "type": "doc",
-                        "version": 1,
-                        "content": [
-                            {
-                                "type": "paragraph",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": comment
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                }
-                
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        f"{self.jira_url}/rest/api/3/issue/{ticket_id}/comment",
-                        json=comment_data,
-                        auth=self.auth
-                    )
-                    
-                    # Log the HTTP request for debugging
-                    logger.info(f"HTTP Request: {response.request.method} {response.request.url} \"{response.http_version} {response.status_code} {response.reason_phrase}\"")
-                    
-                    if response.status_code not in (201, 200):
-                        logger.error(f"Failed to add comment to ticket {ticket_id}: {response.status_code} - {response.text}")
-                    else:
-                        logger.info(f"Successfully added comment to ticket {ticket_id}")
+                if await session.add_comment(ticket_id, comment):
+                    logger.info(f"Successfully added comment to ticket {ticket_id}")
             
             # Then, update the status
             logger.info(f"Updating ticket {ticket_id} status to '{status}'")
             
-            # Get available transitions
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.jira_url}/rest/api/3/issue/{ticket_id}/transitions",
-                    auth=self.auth
-                )
-                
-                # Log the HTTP request for debugging
-                logger.info(f"HTTP Request: {response.request.method} {response.request.url} \"{response.http_version} {response.status_code} {response.reason_phrase}\"")
-                
-                if response.status_code != 200:
-                    logger.error(f"Failed to get transitions for ticket {ticket_id}: {response.status_code} - {response.text}")
-                    return False
-                
-                transitions = response.json()["transitions"]
-                
-                # Find the transition ID for the desired status
-                transition_id = None
-                for transition in transitions:
-                    if transition["to"]["name"].lower() == status.lower():
-                        transition_id = transition["id"]
-                        break
-                
-                if not transition_id:
-                    logger.error(f"No transition found for status '{status}' for ticket {ticket_id}")
-                    return False
-                
-                # Perform the transition
-                transition_data = {
-                    "transition": {
-                        "id": transition_id
-                    }
-                }
-                
-                response = await client.post(
-                    f"{self.jira_url}/rest/api/3/issue/{ticket_id}/transitions",
-                    json=transition_data,
-                    auth=self.auth
-                )
-                
-                # Log the HTTP request for debugging
-                logger.info(f"HTTP Request: {response.request.method} {response.request.url} \"{response.http_version} {response.status_code} {response.reason_phrase}\"")
-                
-                if response.status_code not in (204, 200):
-                    logger.error(f"Failed to update status for ticket {ticket_id}: {response.status_code} - {response.text}")
-                    return False
-                
-                logger.info(f"Successfully updated ticket {ticket_id} status to '{status}'")
-                return True
+            # The transition ID is cached per project and status, so this is
+            # usually a single POST
+            transitioned = await session.transition(ticket_id, status)
+            if transitioned is None:
+                logger.error(f"No transition found for status '{status}' for ticket {ticket_id}")
+                return False
+            if not transitioned:
+                return False
+            
+            logger.info(f"Successfully updated ticket {ticket_id} status to '{status}'")
+            return True
                 
         except Exception as e:
             logger.error(f"Error updating ticket {ticket_id}: {e}")
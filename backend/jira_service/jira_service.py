@@ -7,7 +7,6 @@ import traceback
 from typing import Dict, Set, Optional
 import os
 import json
-import time
 
 from . import config
 from .jira_client import JiraClient
@@ -21,6 +20,8 @@ from agent_framework.planner_agent import PlannerAgent
 from agent_framework.developer_agent import DeveloperAgent
 from agent_framework.qa_agent import QAAgent
 from agent_framework.communicator_agent import CommunicatorAgent
+from agent_executor import get_agent_executor
+from ticket_ingestion import LeaseHeartbeat, LeaseLostError, TicketIngestion, default_consumer_id
 
 # Set up logging
 logger = config.setup_logging()
@@ -35,7 +36,7 @@ class JiraService:
             logger.info("Initializing JIRA service and agent framework...")
             
             # Initialize JIRA client
-            self.jira_client = JiraClient()
+            self.jira_client = JiraClient(poll_state_name="jira_service")
             
             # Initialize agents for processing
             logger.info("Setting up agent instances...")
@@ -44,6 +45,9 @@ class JiraService:
             self.qa_agent = QAAgent()
             self.communicator_agent = CommunicatorAgent()
             
+            # Thread/process pools that keep blocking agent calls off the event loop
+            self.executor = get_agent_executor()
+            
             # Track processed tickets to avoid duplicates
             self.processed_tickets: Set[str] = set()
             
@@ -56,74 +60,32 @@ class JiraService:
             # Flag to control the polling loop
             self.running = False
             
-            # Set up lock file directory
-            self.lock_dir = os.environ.get("TICKET_LOCK_DIR", "/tmp/bugfix_ai_locks")
-            os.makedirs(self.lock_dir, exist_ok=True)
+            # Shared JIRA ingestion; tickets are leased so other consumers don't take them
+            self.ingestion = TicketIngestion(default_consumer_id("jira_service"), poll_interval=self.poll_interval)
+            self.max_tickets = config.MAX_CONCURRENT_TICKETS
+            
+            # Heartbeats keeping the leases of running workflows alive
+            self.lease_heartbeats: Dict[str, LeaseHeartbeat] = {}
             
             logger.info(f"JIRA service initialized with poll interval of {self.poll_interval}s")
-            logger.info(f"Using lock directory: {self.lock_dir}")
+            logger.info(f"Consuming tickets as {self.ingestion.consumer_id}")
             
         except (EnvironmentError, ValueError) as e:
             logger.critical(f"Failed to initialize JIRA service: {e}")
             sys.exit(1)
     
-    def _acquire_lock(self, ticket_id: str) -> bool:
-        """
-        Acquire a lock on the ticket to prevent duplicate processing.
-        Returns True if the lock was acquired, False otherwise.
-        """
-        lock_file = os.path.join(self.lock_dir, f"{ticket_id}.lock")
-        
-        try:
-            # Check if lock exists and is recent
-            if os.path.exists(lock_file):
-                # Check if the lock is stale (older than 1 hour)
-                lock_time = os.path.getmtime(lock_file)
-                if time.time() - lock_time < 3600:  # 1 hour in seconds
-                    # Lock exists and is recent, read it to see who has it
-                    with open(lock_file, 'r') as f:
-                        try:
-                            lock_data = json.load(f)
-                            owner = lock_data.get('owner', 'unknown')
-                            pid = lock_data.get('pid', 0)
-                            timestamp = lock_data.get('timestamp', 0)
-                            logger.info(f"Ticket {ticket_id} is locked by {owner} (PID: {pid}) since {time.ctime(timestamp)}")
-                            return False
-                        except json.JSONDecodeError:
-                            # Invalid lock file, we'll overwrite it
-                            pass
-                else:
-                    logger.warning(f"Found stale lock for ticket {ticket_id}, will override it")
-            
-            # Create the lock file with our service info
-            with open(lock_file, 'w') as f:
-                lock_data = {
-                    'owner': 'jira_service',
-                    'pid': os.getpid(),
-                    'timestamp': time.time()
-                }
-                json.dump(lock_data, f)
-            
-            logger.info(f"Acquired lock for ticket {ticket_id}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error acquiring lock for ticket {ticket_id}: {str(e)}")
-            return False
+    def _release_lease(self, ticket_id: str, completed: bool = False) -> bool:
+        """Stop the heartbeat for a ticket and release its lease"""
+        heartbeat = self.lease_heartbeats.pop(ticket_id, None)
+        if heartbeat:
+            heartbeat.cancel()
+        return self.ingestion.release(ticket_id, completed=completed)
     
-    def _release_lock(self, ticket_id: str) -> bool:
-        """Release the lock on a ticket."""
-        lock_file = os.path.join(self.lock_dir, f"{ticket_id}.lock")
-        
-        try:
-            if os.path.exists(lock_file):
-                os.remove(lock_file)
-                logger.info(f"Released lock for ticket {ticket_id}")
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error releasing lock for ticket {ticket_id}: {str(e)}")
-            return False
+    def _check_lease(self, ticket_id: str) -> None:
+        """Raise LeaseLostError if another consumer has taken over the ticket, checked between stages"""
+        heartbeat = self.lease_heartbeats.get(ticket_id)
+        if heartbeat:
+            heartbeat.check()
     
     async def process_ticket(self, ticket):
         """Process a single ticket"""
@@ -138,9 +100,9 @@ class JiraService:
                 logger.error("Invalid ticket: missing ticket_id")
                 return
                 
-            # Try to acquire a lock on this ticket
-            if not self._acquire_lock(ticket_id):
-                logger.info(f"Ticket {ticket_id} is already being processed by another service. Skipping.")
+            # Try to lease this ticket
+            if not self.ingestion.acquire_ticket(ticket):
+                logger.info(f"Ticket {ticket_id} is already being processed by another consumer. Skipping.")
                 return
                 
             current_status = ticket.get("status", "Unknown")
@@ -149,7 +111,7 @@ class JiraService:
             # Check if we've already processed this ticket
             if ticket_id in self.processed_tickets:
                 logger.info(f"Ticket {ticket_id} has already been processed. Skipping.")
-                self._release_lock(ticket_id)  # Release lock before returning
+                self._release_lease(ticket_id, completed=True)  # Release lease before returning
                 return
             
             # Add to processed tickets to avoid duplicate processing
@@ -169,39 +131,47 @@ class JiraService:
                         # Create a new task so it runs independently
                         # Important: We need to ensure this is actually called
                         logger.info(f"Starting agent workflow for ticket {ticket_id}...")
+                        self.lease_heartbeats[ticket_id] = self.ingestion.heartbeat(ticket_id).start()
                         task = asyncio.create_task(self.run_agent_workflow(ticket))
                         # Add a callback to handle errors
                         task.add_done_callback(lambda t: self.handle_workflow_completion(t, ticket_id))
                     else:
                         logger.error(f"Failed to update ticket {ticket_id} status to In Progress")
-                        self._release_lock(ticket_id)  # Release lock on failure
+                        self._release_lease(ticket_id)  # Release lease on failure
                 else:
                     logger.info(f"Ticket {ticket_id} is already in progress")
             except Exception as e:
                 logger.error(f"Error handling ticket {ticket_id}: {str(e)}")
-                self._release_lock(ticket_id)  # Release lock on exception
+                self._release_lease(ticket_id)  # Release lease on exception
                 
         except Exception as e:
             logger.error(f"Error processing ticket {ticket.get('ticket_id', 'unknown')}: {e}")
             logger.error(traceback.format_exc())
-            # Try to release the lock if we have a ticket_id
+            # Try to release the lease if we have a ticket_id
             if 'ticket_id' in ticket:
-                self._release_lock(ticket.get('ticket_id'))
+                self._release_lease(ticket.get('ticket_id'))
     
     def handle_workflow_completion(self, task, ticket_id):
         """Handle completion of agent workflow task"""
+        completed = False
         try:
             # Check if the task raised an exception
             if task.exception():
+                # The workflow crashed before reporting an outcome, so let the ticket be retried
                 logger.error(f"Agent workflow for ticket {ticket_id} failed with exception: {task.exception()}")
+                self.processed_tickets.discard(ticket_id)
+                self.tickets_in_progress.pop(ticket_id, None)
+            else:
+                # The workflow reported its outcome to JIRA, so the ticket is done
+                completed = True
         except asyncio.CancelledError:
             logger.warning(f"Agent workflow for ticket {ticket_id} was cancelled")
         except Exception as e:
             logger.error(f"Error handling workflow completion for {ticket_id}: {e}")
             logger.error(traceback.format_exc())
         finally:
-            # Always release the lock when the task is done
-            self._release_lock(ticket_id)
+            # Always release the lease when the task is done
+            self._release_lease(ticket_id, completed=completed)
     
     async def run_agent_workflow(self, ticket):
         """Run the complete agent workflow for a ticket"""
@@ -232,12 +202,12 @@ class JiraService:
             }
             logger.info(f"Planner input: {planner_input}")
             
-            # Run planner (synchronous)
+            # Run planner in the executor so it doesn't block polling
             try:
                 logger.info("Executing planner agent...")
                 # Create a more robust way to run the planner
                 if hasattr(self.planner_agent, 'run') and callable(self.planner_agent.run):
-                    planner_result = self.planner_agent.run(planner_input)
+                    planner_result = await self.executor.run(self.planner_agent, planner_input, agent_type="planner")
                     logger.info(f"Planner agent returned: {planner_result}")
                 else:
                     logger.error("Planner agent doesn't have a 'run' method")
@@ -288,6 +258,7 @@ class JiraService:
             developer_result = None
             
             for attempt in range(1, max_retries + 1):
+                self._check_lease(ticket_id)
                 logger.info(f"Running developer agent for ticket {ticket_id} (attempt {attempt}/{max_retries})")
                 
                 # Add the ticket_id to planner_result
@@ -296,7 +267,7 @@ class JiraService:
                 
                 try:
                     logger.info("Executing developer agent...")
-                    developer_result = self.developer_agent.run(developer_input)
+                    developer_result = await self.executor.run(self.developer_agent, developer_input, agent_type="developer")
                     
                     # Log the keys for debugging
                     if developer_result and isinstance(developer_result, dict):
@@ -317,6 +288,7 @@ class JiraService:
                     continue
                 
                 # Step 3: Run the QA agent to test the fix
+                self._check_lease(ticket_id)
                 logger.info(f"Running QA agent for ticket {ticket_id} (attempt {attempt}/{max_retries})")
                 
                 # Create QA input with developer result
@@ -340,7 +312,7 @@ class JiraService:
                 
                 try:
                     logger.info("Executing QA agent...")
-                    qa_result = self.qa_agent.run(qa_input)
+                    qa_result = await self.executor.run(self.qa_agent, qa_input, agent_type="qa")
                     logger.info(f"QA agent returned: {qa_result}")
                 except Exception as e:
                     logger.error(f"Error running QA agent: {e}")
@@ -375,6 +347,7 @@ class JiraService:
                 await asyncio.sleep(5)
             
             # Step 4: Run the communicator agent to update the ticket
+            self._check_lease(ticket_id)
             logger.info(f"Running communicator agent for ticket {ticket_id}")
             communicator_input = {
                 "ticket_id": ticket_id,
@@ -387,8 +360,7 @@ class JiraService:
             
             try:
                 logger.info("Executing communicator agent...")
-                # Fix: Make sure to await the coroutine if run() returns a coroutine object
-                communicator_result = await self._await_coroutine_if_needed(self.communicator_agent.run(communicator_input))
+                communicator_result = await self.executor.run(self.communicator_agent, communicator_input, agent_type="communicator")
                 logger.info(f"Communicator agent returned: {communicator_result}")
             except Exception as e:
                 logger.error(f"Error running communicator agent: {e}")
@@ -423,6 +395,9 @@ class JiraService:
                     f"BugFix AI couldn't fix the issue after {max_retries} attempts. Human review needed."
                 )
                 
+        except LeaseLostError as e:
+            # Another consumer took the ticket over and reports its outcome to JIRA
+            logger.warning(f"Stopped agent workflow for ticket {ticket_id}: {str(e)}")
         except Exception as e:
             logger.error(f"Error in agent workflow for ticket {ticket_id}: {str(e)}")
             logger.error(traceback.format_exc())
@@ -442,16 +417,17 @@ class JiraService:
         return result
     
     async def poll_tickets(self):
-        """Poll JIRA for new bug tickets"""
+        """Lease new bug tickets from the shared ingestion, polling JIRA if it is due"""
         try:
             logger.info("Polling JIRA for bug tickets...")
-            tickets = await self.jira_client.fetch_bug_tickets()
+            await self.ingestion.poll_if_due()
+            tickets = self.ingestion.acquire(limit=self.max_tickets - len(self.lease_heartbeats))
             
             if not tickets:
                 logger.info("No tickets found to process")
                 return
                 
-            logger.info(f"Found {len(tickets)} tickets to process")
+            logger.info(f"Leased {len(tickets)} tickets to process")
             for ticket in tickets:
                 if not ticket:
                     logger.warning("Received empty ticket data, skipping")
@@ -465,6 +441,8 @@ class JiraService:
                 if ticket_id not in self.processed_tickets:
                     logger.info(f"Found new ticket to process: {ticket_id}")
                     await self.process_ticket(ticket)
+                else:
+                    self._release_lease(ticket_id, completed=True)
         
         except Exception as e:
             logger.error(f"Error during ticket polling: {e}")
@@ -488,21 +466,15 @@ class JiraService:
         """Stop the polling loop"""
         logger.info("Stopping JIRA service")
         self.running = False
+        self.executor.shutdown()
         
-        # Clean up any locks we might have created
-        if os.path.exists(self.lock_dir):
-            # Only remove our locks
-            for lock_file in os.listdir(self.lock_dir):
-                if lock_file.endswith(".lock"):
-                    try:
-                        lock_path = os.path.join(self.lock_dir, lock_file)
-                        with open(lock_path, 'r') as f:
-                            lock_data = json.load(f)
-                            if lock_data.get('owner') == 'jira_service' and lock_data.get('pid') == os.getpid():
-                                os.remove(lock_path)
-                                logger.info(f"Removed lock file {lock_file}")
-                    except Exception as e:
-                        logger.error(f"Error removing lock file {lock_file}: {str(e)}")
+        # Hand our leases back so other consumers can pick the tickets up
+        for heartbeat in self.lease_heartbeats.values():
+            heartbeat.cancel()
+        self.lease_heartbeats.clear()
+        released = self.ingestion.release_all()
+        if released:
+            logger.info(f"Released {released} ticket lease(s)")
 
 def handle_signals():
     """Set up signal handlers for graceful shutdown"""
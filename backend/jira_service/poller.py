@@ -0,0 +1,189 @@
+"""
+Incremental JIRA search polling.
+
+Instead of re-downloading every open ticket on each poll, the poller keeps a
+persisted high-water mark (the latest "updated" timestamp it has seen) and only
+asks JIRA for issues updated since then. Results are paged with startAt /
+maxResults and parsed page by page, and issues whose "updated" timestamp hasn't
+changed since they were last yielded are dropped, so poll cost follows ticket
+churn rather than backlog size.
+"""
+import json
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("jira-poller")
+
+# Directory holding one poll state file per consumer
+JIRA_POLL_STATE_DIR = os.environ.get("JIRA_POLL_STATE_DIR", "data")
+
+# Issues requested per search page
+JIRA_PAGE_SIZE = int(os.environ.get("JIRA_PAGE_SIZE", "50"))
+
+# Extra minutes re-read before the high-water mark to absorb clock skew and
+# the minute precision of JQL date filters
+JIRA_POLL_OVERLAP_MINUTES = int(os.environ.get("JIRA_POLL_OVERLAP_MINUTES", "2"))
+
+JIRA_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+
+def parse_jira_datetime(value: str) -> Optional[datetime]:
+    """Parse a JIRA timestamp such as 2024-01-31T10:15:00.000+0000, or None if invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, JIRA_DATETIME_FORMAT)
+    except ValueError:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class IncrementalJiraPoller:
+    """
+    Paginated "updated since" JIRA search with a persisted high-water mark.
+
+    The date filter is expressed relative to now (updated >= "-90m") so it
+    doesn't depend on the timezone configured for the JIRA user. The state is
+    only saved once a poll has read every page, so an interrupted poll is
+    simply repeated.
+    """
+
+    def __init__(self, name: str, base_jql: str, fields: str, state_path: str = None, page_size: int = None):
+        """
+        Initialize the poller
+
+        Args:
+            name: Consumer name, used for the state file
+            base_jql: JQL selecting the tickets of interest, without ORDER BY
+            fields: Comma separated issue fields to request ("updated" is always added)
+            state_path: State file path. Defaults to JIRA_POLL_STATE_DIR/jira_poll_{name}.json
+            page_size: Issues per page. Defaults to JIRA_PAGE_SIZE.
+        """
+        self.name = name
+        self.base_jql = base_jql
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+        if "updated" not in field_list:
+            field_list.append("updated")
+        self.fields = ",".join(field_list)
+        self.state_path = state_path or os.path.join(JIRA_POLL_STATE_DIR, f"jira_poll_{name}.json")
+        self.page_size = page_size or JIRA_PAGE_SIZE
+        self.high_water_mark, self.seen = self._load_state()
+
+    def _load_state(self) -> Tuple[Optional[str], Dict[str, str]]:
+        """Load the high-water mark and the last seen "updated" value per ticket"""
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, "r") as f:
+                    state = json.load(f)
+                return state.get("high_water_mark"), state.get("seen", {})
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Couldn't read JIRA poll state {self.state_path}, starting a full sync: {str(e)}")
+        return None, {}
+
+    def _save_state(self) -> None:
+        """Persist the state atomically, keeping only tickets inside the overlap window"""
+        hwm = parse_jira_datetime(self.high_water_mark)
+        if hwm:
+            # Anything older than the window can't be returned by the next query
+            cutoff = hwm.timestamp() - JIRA_POLL_OVERLAP_MINUTES * 60
+            self.seen = {
+                ticket_id: updated for ticket_id, updated in self.seen.items()
+                if (parse_jira_datetime(updated) or hwm).timestamp() >= cutoff
+            }
+        try:
+            state_dir = os.path.dirname(self.state_path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"high_water_mark": self.high_water_mark, "seen": self.seen}, f)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            logger.error(f"Couldn't save JIRA poll state {self.state_path}: {str(e)}")
+
+    def build_jql(self, now: datetime = None) -> str:
+        """Build the search JQL, restricted to issues updated since the high-water mark"""
+        hwm = parse_jira_datetime(self.high_water_mark)
+        if hwm is None:
+            return f"{self.base_jql} ORDER BY updated ASC"
+        now = now or datetime.now(timezone.utc)
+        minutes = max(0, math.ceil((now - hwm).total_seconds() / 60)) + JIRA_POLL_OVERLAP_MINUTES
+        return f'({self.base_jql}) AND updated >= "-{minutes}m" ORDER BY updated ASC'
+
+    def reset(self) -> None:
+        """Forget the high-water mark so the next poll is a full sync"""
+        self.high_water_mark = None
+        self.seen = {}
+        self._save_state()
+
+    async def poll(self, client: httpx.AsyncClient, jira_url: str, auth: Tuple[str, str],
+                   parse_issue: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield tickets that are new or changed since the last complete poll
+
+        Args:
+            client: HTTP client used for the search requests
+            jira_url: Base JIRA URL
+            auth: (user, token) pair
+            parse_issue: Converts a raw issue into a ticket dict, or None to skip it
+
+        Yields:
+            Parsed tickets, one page at a time
+        """
+        # Another process may have polled with the same state since we last did
+        self.high_water_mark, self.seen = self._load_state()
+        jql = self.build_jql()
+        start_at = 0
+        high_water_mark = self.high_water_mark
+        scanned = 0
+        changed = 0
+
+        while True:
+            response = await client.get(
+                f"{jira_url}/rest/api/3/search",
+                params={"jql": jql, "fields": self.fields, "startAt": start_at, "maxResults": self.page_size},
+                auth=auth
+            )
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch JIRA tickets: {response.status_code} - {response.text}")
+                return
+
+            data = response.json()
+            issues = data.get("issues") or []
+
+            for issue in issues:
+                if not issue or not issue.get("key"):
+                    continue
+                scanned += 1
+                ticket_id = issue["key"]
+                updated = (issue.get("fields") or {}).get("updated", "")
+
+                updated_at = parse_jira_datetime(updated)
+                if updated_at and (high_water_mark is None or updated_at > parse_jira_datetime(high_water_mark)):
+                    high_water_mark = updated
+
+                # Re-read by the overlap window but unchanged since we last yielded it
+                if updated and self.seen.get(ticket_id) == updated:
+                    continue
+
+                ticket = parse_issue(issue)
+                self.seen[ticket_id] = updated
+                if ticket:
+                    changed += 1
+                    yield ticket
+
+            start_at += len(issues)
+            if not issues or start_at >= data.get("total", 0):
+                break
+
+        self.high_water_mark = high_water_mark
+        self._save_state()
+        logger.info(f"JIRA poll '{self.name}' scanned {scanned} updated issues, {changed} new or changed")
@@ -0,0 +1,204 @@
+"""
+Edit-in-place JIRA progress comments.
+
+Posting a new comment for every pipeline step leaves a four-attempt ticket with
+about twenty comments, each one a JIRA write. In progress mode a ticket gets a
+single status comment instead: each step appends a line and the comment is
+edited in place. Steps that arrive within the debounce window are coalesced
+into one edit.
+
+The lines and the comment ID are persisted per consumer, so a restarted
+process keeps editing the same comment. They are saved when the comment is
+written rather than on every step, so the state file is rewritten once per
+debounce window too; a crash loses at most the steps not yet shown in JIRA.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from .poller import JIRA_POLL_STATE_DIR
+from .session import JiraSession
+
+logger = logging.getLogger("jira-service.progress")
+
+# Set to false to post every step as its own comment, as before
+JIRA_PROGRESS_COMMENTS = os.environ.get("JIRA_PROGRESS_COMMENTS", "true").lower() == "true"
+
+# Steps arriving within this window are written to JIRA in a single edit
+JIRA_PROGRESS_DEBOUNCE_SECONDS = float(os.environ.get("JIRA_PROGRESS_DEBOUNCE_SECONDS", "10"))
+
+# Lines shown in the comment; older ones are summarised
+JIRA_PROGRESS_MAX_LINES = int(os.environ.get("JIRA_PROGRESS_MAX_LINES", "40"))
+
+# Tickets whose progress is remembered, most recently updated first
+JIRA_PROGRESS_MAX_TICKETS = int(os.environ.get("JIRA_PROGRESS_MAX_TICKETS", "500"))
+
+PROGRESS_COMMENT_TITLE = "BugFix AI progress"
+
+
+class ProgressCommentStore:
+    """Persisted progress lines and status comment ID per ticket"""
+
+    def __init__(self, name: str, state_path: str = None):
+        """
+        Initialize the store
+
+        Args:
+            name: Consumer name, used for the state file
+            state_path: State file path. Defaults to JIRA_POLL_STATE_DIR/jira_progress_{name}.json
+        """
+        self.state_path = state_path or os.path.join(JIRA_POLL_STATE_DIR, f"jira_progress_{name}.json")
+        self._lock = threading.Lock()
+        self.tickets: Dict[str, Dict] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, "r") as f:
+                    return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Couldn't read progress comment state {self.state_path}: {str(e)}")
+        return {}
+
+    def _save_state(self) -> None:
+        """Persist the state atomically, forgetting the least recently updated tickets beyond the limit"""
+        if len(self.tickets) > JIRA_PROGRESS_MAX_TICKETS:
+            newest = sorted(self.tickets.items(), key=lambda item: item[1].get("updated_at", 0), reverse=True)
+            self.tickets = dict(newest[:JIRA_PROGRESS_MAX_TICKETS])
+        try:
+            state_dir = os.path.dirname(self.state_path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.tickets, f)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            logger.error(f"Couldn't save progress comment state {self.state_path}: {str(e)}")
+
+    def add_line(self, ticket_id: str, text: str) -> int:
+        """
+        Append a step to a ticket's progress
+
+        Returns:
+            Number of steps recorded for the ticket so far
+        """
+        with self._lock:
+            entry = self.tickets.setdefault(ticket_id, {"comment_id": None, "lines": [], "count": 0})
+            entry["lines"].append(f"[{datetime.now().strftime('%H:%M:%S')}] {text}")
+            # Only what is shown needs keeping; count tracks the total
+            entry["lines"] = entry["lines"][-JIRA_PROGRESS_MAX_LINES:]
+            entry["count"] += 1
+            entry["updated_at"] = time.time()
+            return entry["count"]
+
+    def save(self) -> None:
+        """Persist the progress of all tickets, e.g. before their comment is written"""
+        with self._lock:
+            self._save_state()
+
+    def render(self, ticket_id: str) -> Optional[str]:
+        """Build the status comment text, or None if the ticket has no progress"""
+        entry = self.tickets.get(ticket_id)
+        if not entry or not entry["lines"]:
+            return None
+        lines = [f"{PROGRESS_COMMENT_TITLE} ({entry['count']} updates, this comment is edited as work continues)"]
+        hidden = entry["count"] - len(entry["lines"])
+        if hidden > 0:
+            lines.append(f"... {hidden} earlier updates")
+        lines.extend(entry["lines"])
+        return "\n".join(lines)
+
+    def get_comment_id(self, ticket_id: str) -> Optional[str]:
+        """Get the ID of the ticket's status comment, if it was created"""
+        return self.tickets.get(ticket_id, {}).get("comment_id")
+
+    def set_comment_id(self, ticket_id: str, comment_id: Optional[str]) -> None:
+        """Remember the ID of the ticket's status comment"""
+        with self._lock:
+            if ticket_id in self.tickets:
+                self.tickets[ticket_id]["comment_id"] = comment_id
+                self._save_state()
+
+
+async def publish_progress(session: JiraSession, store: ProgressCommentStore, ticket_id: str) -> bool:
+    """
+    Write a ticket's progress to its status comment, creating the comment on first use
+
+    If the comment was deleted in JIRA, a new one is created.
+
+    Returns:
+        True if JIRA shows the latest progress, False if a request failed
+    """
+    text = store.render(ticket_id)
+    if text is None:
+        return True
+    store.save()
+
+    comment_id = store.get_comment_id(ticket_id)
+    if comment_id:
+        edited = await session.edit_comment(ticket_id, comment_id, text)
+        if edited is not None:
+            return edited
+        logger.info(f"Progress comment {comment_id} on {ticket_id} no longer exists, posting a new one")
+
+    comment_id = await session.create_comment(ticket_id, text)
+    if comment_id is None:
+        return False
+    store.set_comment_id(ticket_id, comment_id or None)
+    return True
+
+
+class DebouncedProgressWriter:
+    """
+    Coalesces progress updates in memory before writing them
+
+    For callers that write to JIRA directly rather than through the
+    notification outbox, which does its own debouncing.
+    """
+
+    def __init__(self, get_session: Callable[[], JiraSession], store: ProgressCommentStore, debounce_seconds: float = None):
+        """
+        Initialize the writer
+
+        Args:
+            get_session: Returns the JIRA session to write with
+            store: Progress state
+            debounce_seconds: Coalescing window. Defaults to JIRA_PROGRESS_DEBOUNCE_SECONDS.
+        """
+        self.get_session = get_session
+        self.store = store
+        self.debounce_seconds = JIRA_PROGRESS_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def update(self, ticket_id: str, text: str) -> None:
+        """Record a step and schedule a write unless one is already waiting"""
+        self.store.add_line(ticket_id, text)
+        task = self._pending.get(ticket_id)
+        if task is None or task.done():
+            self._pending[ticket_id] = asyncio.create_task(self._write_later(ticket_id))
+
+    async def _write_later(self, ticket_id: str) -> None:
+        await asyncio.sleep(self.debounce_seconds)
+        # Steps recorded from here on schedule a new write
+        self._pending.pop(ticket_id, None)
+        try:
+            await publish_progress(self.get_session(), self.store, ticket_id)
+        except Exception as e:
+            logger.error(f"Error writing progress comment for {ticket_id}: {str(e)}")
+
+    async def flush(self, ticket_id: str) -> bool:
+        """Write a ticket's progress now instead of waiting for the debounce window"""
+        task = self._pending.pop(ticket_id, None)
+        if task is not None:
+            task.cancel()
+        try:
+            return await publish_progress(self.get_session(), self.store, ticket_id)
+        except Exception as e:
+            logger.error(f"Error writing progress comment for {ticket_id}: {str(e)}")
+            return False
@@ -0,0 +1,364 @@
+"""
+Pooled JIRA REST session with metadata caches.
+
+Status updates are the most frequent JIRA writes: a ticket run posts ten or
+more of them. Opening a new client for each one costs a handshake, and the
+naive update also costs a GET /transitions for every status change plus a GET
+/field for the whole field catalog whenever a PR link is set. JiraSession keeps
+one connection pool per JIRA site. It also caches transition IDs per (project,
+target status) and the field catalog, so a steady-state update is one request
+per write. A cached transition ID that JIRA rejects, e.g. because the ticket
+is in a status with different outgoing transitions, is dropped and looked up
+again.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from http_replay import replay_transport
+from rate_limiter import TokenBucket, get_rate_limiter
+
+logger = logging.getLogger("jira-service.session")
+
+JIRA_HTTP_TIMEOUT_SECONDS = float(os.environ.get("JIRA_HTTP_TIMEOUT_SECONDS", "30"))
+JIRA_HTTP_MAX_CONNECTIONS = int(os.environ.get("JIRA_HTTP_MAX_CONNECTIONS", "10"))
+JIRA_TRANSITION_CACHE_TTL_SECONDS = int(os.environ.get("JIRA_TRANSITION_CACHE_TTL_SECONDS", "3600"))
+JIRA_FIELD_CACHE_TTL_SECONDS = int(os.environ.get("JIRA_FIELD_CACHE_TTL_SECONDS", str(6 * 3600)))
+JIRA_CACHE_MAX_ENTRIES = int(os.environ.get("JIRA_CACHE_MAX_ENTRIES", "256"))
+
+# Responses that mean a cached transition ID is not valid for this ticket
+STALE_TRANSITION_STATUSES = (400, 404, 409)
+
+
+class JiraRateLimitError(Exception):
+    """Raised when JIRA answers 429 Too Many Requests"""
+
+    def __init__(self, retry_after: Optional[str] = None):
+        """
+        Args:
+            retry_after: Raw Retry-After header value, seconds or an HTTP date
+        """
+        super().__init__(f"JIRA rate limit exceeded (Retry-After: {retry_after})")
+        self.retry_after = retry_after
+
+
+class TTLCache:
+    """Small in-memory cache whose entries expire after a TTL, evicting least recently used first"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = None):
+        """
+        Initialize the cache
+
+        Args:
+            ttl_seconds: Entry lifetime
+            max_entries: Maximum number of entries kept. Defaults to JIRA_CACHE_MAX_ENTRIES.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries or JIRA_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Get a cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        """Cache a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Any) -> None:
+        """Drop a cached value"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every cached value"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _adf_text(text: str) -> Dict[str, Any]:
+    """Wrap plain text in an Atlassian Document Format body"""
+    return {
+        "type": "doc",
+        "version": 1,
+        "content": [{
+            "type": "paragraph",
+            "content": [{
+                "type": "text",
+                "text": text
+            }]
+        }]
+    }
+
+
+def project_key(ticket_id: str) -> str:
+    """Get the project key of a ticket ID, e.g. PROJ for PROJ-123"""
+    return ticket_id.rsplit("-", 1)[0]
+
+
+def find_transition(transitions: List[Dict[str, Any]], status: str) -> Optional[str]:
+    """
+    Find the transition leading to a status
+
+    Prefers a transition whose target status matches exactly, then one whose
+    name contains the status (e.g. "Start Progress" for "Progress").
+
+    Args:
+        transitions: Transitions from GET /issue/{id}/transitions
+        status: Target status name
+
+    Returns:
+        The transition ID, or None if no transition matches
+    """
+    wanted = status.lower()
+    for transition in transitions:
+        if transition.get("to", {}).get("name", "").lower() == wanted:
+            return transition["id"]
+    for transition in transitions:
+        if wanted in transition.get("name", "").lower():
+            return transition["id"]
+    return None
+
+
+class JiraSession:
+    """Long-lived JIRA REST client with cached transition and field metadata"""
+
+    def __init__(self, base_url: str, auth: Tuple[str, str], transport: httpx.AsyncBaseTransport = None,
+                 transition_ttl: float = None, field_ttl: float = None, rate_limiter: TokenBucket = None):
+        """
+        Initialize the session
+
+        Args:
+            base_url: JIRA site URL
+            auth: (user, API token) for basic auth
+            transport: Transport used instead of the network (for tests). Defaults to the
+                record/replay transport when HTTP_REPLAY_MODE is set.
+            transition_ttl: Transition ID cache lifetime. Defaults to JIRA_TRANSITION_CACHE_TTL_SECONDS.
+            field_ttl: Field catalog cache lifetime. Defaults to JIRA_FIELD_CACHE_TTL_SECONDS.
+            rate_limiter: Bucket requests are counted against. Defaults to the shared one for the site and user.
+        """
+        self.base_url = (base_url or "").rstrip("/")
+        self.auth = auth
+        self.transport = transport or replay_transport("jira")
+        self.transitions = TTLCache(transition_ttl if transition_ttl is not None else JIRA_TRANSITION_CACHE_TTL_SECONDS)
+        self.fields = TTLCache(field_ttl if field_ttl is not None else JIRA_FIELD_CACHE_TTL_SECONDS)
+        self.rate_limiter = rate_limiter or get_rate_limiter("jira", f"{self.base_url}|{auth[0] if auth else ''}")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the pooled client, creating it on first use
+
+        The client is authenticated and has the JIRA site as its base URL, so
+        callers pass paths like /rest/api/3/search.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # A client from a finished event loop can't be reused, so replace it
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=self.auth,
+                timeout=JIRA_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=JIRA_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=JIRA_HTTP_MAX_CONNECTIONS
+                ),
+                transport=self.transport,
+                event_hooks={"request": [self._wait_for_rate_limit], "response": [self._check_rate_limit]}
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def _wait_for_rate_limit(self, request: httpx.Request) -> None:
+        """Hold the request until the site's rate limit has a token for it"""
+        await self.rate_limiter.acquire_async()
+
+    async def _check_rate_limit(self, response: httpx.Response) -> None:
+        """Feed the response into the rate limit and turn 429s into JiraRateLimitError so callers can back off"""
+        self.rate_limiter.record_response(response.status_code, response.headers)
+        if response.status_code == 429:
+            raise JiraRateLimitError(response.headers.get("Retry-After"))
+
+    async def close(self) -> None:
+        """Close the pooled client"""
+        if self._client is not None and not self._client.is_closed and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def create_comment(self, ticket_id: str, text: str) -> Optional[str]:
+        """
+        Add a plain text comment to a ticket
+
+        Returns:
+            The new comment's ID, or None if it wasn't created
+        """
+        response = await self.get_client().post(
+            f"/rest/api/3/issue/{ticket_id}/comment",
+            json={"body": _adf_text(text)}
+        )
+        if response.status_code not in (200, 201):
+            logger.error(f"Failed to add comment to JIRA ticket {ticket_id}: {response.status_code} - {response.text}")
+            return None
+        try:
+            return str(response.json()["id"])
+        except (ValueError, KeyError):
+            # Created, but we can't refer to it later
+            return ""
+
+    async def add_comment(self, ticket_id: str, text: str) -> bool:
+        """
+        Add a plain text comment to a ticket
+
+        Returns:
+            True if the comment was created, False otherwise
+        """
+        return await self.create_comment(ticket_id, text) is not None
+
+    async def edit_comment(self, ticket_id: str, comment_id: str, text: str) -> Optional[bool]:
+        """
+        Replace the text of an existing comment
+
+        Returns:
+            True if edited, False if the request failed, None if the comment no longer exists
+        """
+        response = await self.get_client().put(
+            f"/rest/api/3/issue/{ticket_id}/comment/{comment_id}",
+            json={"body": _adf_text(text)}
+        )
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            logger.error(f"Failed to edit comment {comment_id} on JIRA ticket {ticket_id}: {response.status_code} - {response.text}")
+            return False
+        return True
+
+    async def _post_transition(self, ticket_id: str, transition_id: str) -> httpx.Response:
+        return await self.get_client().post(
+            f"/rest/api/3/issue/{ticket_id}/transitions",
+            json={"transition": {"id": transition_id}}
+        )
+
+    async def transition(self, ticket_id: str, status: str) -> Optional[bool]:
+        """
+        Move a ticket to a status
+
+        Uses the cached transition ID for the ticket's project and the target
+        status when there is one, and only lists the ticket's transitions on a
+        cache miss or when JIRA rejects the cached ID.
+
+        Args:
+            ticket_id: The JIRA ticket ID
+            status: Target status name
+
+        Returns:
+            True if transitioned, False if a request failed, None if no transition leads to the status
+        """
+        key = (project_key(ticket_id), status.lower())
+        cached_id = self.transitions.get(key)
+        if cached_id:
+            response = await self._post_transition(ticket_id, cached_id)
+            if response.status_code in (200, 204):
+                return True
+            if response.status_code not in STALE_TRANSITION_STATUSES:
+                logger.error(f"Failed to transition JIRA ticket {ticket_id}: {response.status_code} - {response.text}")
+                return False
+            logger.info(f"Cached transition {cached_id} to '{status}' rejected for {ticket_id}, refreshing")
+            self.transitions.invalidate(key)
+
+        response = await self.get_client().get(f"/rest/api/3/issue/{ticket_id}/transitions")
+        if response.status_code != 200:
+            logger.error(f"Failed to get transitions for JIRA ticket {ticket_id}: {response.status_code}")
+            return False
+
+        transition_id = find_transition(response.json().get("transitions", []), status)
+        if not transition_id:
+            return None
+
+        response = await self._post_transition(ticket_id, transition_id)
+        if response.status_code not in (200, 204):
+            logger.error(f"Failed to transition JIRA ticket {ticket_id}: {response.status_code} - {response.text}")
+            return False
+        self.transitions.set(key, transition_id)
+        return True
+
+    async def get_fields(self) -> List[Dict[str, Any]]:
+        """
+        Get the site's field catalog, cached for the field TTL
+
+        Returns:
+            Field metadata from GET /field, or an empty list on error
+        """
+        fields = self.fields.get("fields")
+        if fields is not None:
+            return fields
+
+        response = await self.get_client().get("/rest/api/3/field")
+        if response.status_code != 200:
+            logger.error(f"Failed to get JIRA field metadata: {response.status_code}")
+            return []
+        fields = response.json()
+        self.fields.set("fields", fields)
+        return fields
+
+    async def find_field_id(self, matches: Callable[[Dict[str, Any]], bool]) -> Optional[str]:
+        """Get the ID of the first field in the catalog that matches a predicate"""
+        for field in await self.get_fields():
+            if matches(field):
+                return field["id"]
+        return None
+
+    async def update_fields(self, ticket_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Set field values on a ticket
+
+        Returns:
+            True if the ticket was updated, False otherwise
+        """
+        response = await self.get_client().put(f"/rest/api/3/issue/{ticket_id}", json={"fields": fields})
+        if response.status_code not in (200, 204):
+            logger.error(f"Failed to update fields of JIRA ticket {ticket_id}: {response.status_code} - {response.text}")
+            return False
+        return True
+
+
+# One session per JIRA site and user, shared by every caller in the process
+_sessions: Dict[Tuple[str, str], JiraSession] = {}
+
+def get_jira_session(base_url: str, auth: Tuple[str, str]) -> JiraSession:
+    """Get the shared session for a JIRA site and user"""
+    key = ((base_url or "").rstrip("/"), auth[0] if auth else "")
+    session = _sessions.get(key)
+    if session is None:
+        session = JiraSession(base_url, auth)
+        _sessions[key] = session
+    return session
+
+async def close_jira_sessions() -> None:
+    """Close the pooled clients of every shared session, e.g. on application shutdown"""
+    for session in list(_sessions.values()):
+        await session.close()
@@ -0,0 +1,115 @@
+"""
+JIRA webhook handling.
+
+JIRA calls the webhook endpoint when an issue is created or updated, which lets
+tickets enter the pipeline within a second instead of waiting for the next poll.
+Deliveries are verified against an optional shared secret, filtered down to bug
+tickets and de-duplicated, since JIRA retries deliveries and sends an update
+event for every field change.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from jira_utils import is_bug_ticket, parse_jira_issue
+
+logger = logging.getLogger("jira-webhook")
+
+# Shared secret configured on the JIRA webhook. Empty disables verification.
+JIRA_WEBHOOK_SECRET = os.environ.get("JIRA_WEBHOOK_SECRET", "")
+
+# Number of recent deliveries remembered for de-duplication
+JIRA_WEBHOOK_DEDUP_SIZE = int(os.environ.get("JIRA_WEBHOOK_DEDUP_SIZE", "1000"))
+
+HANDLED_EVENTS = ("jira:issue_created", "jira:issue_updated")
+
+
+def verify_signature(body: bytes, signature: Optional[str] = None, secret_param: Optional[str] = None,
+                     secret: str = None) -> bool:
+    """
+    Verify a webhook delivery against the shared secret
+
+    JIRA signs deliveries with an X-Hub-Signature header (sha256=<hmac>) when a
+    secret is configured on the webhook. Older setups pass the secret as a
+    query parameter instead, so either is accepted.
+
+    Args:
+        body: Raw request body
+        signature: Value of the X-Hub-Signature header, if any
+        secret_param: Value of the secret query parameter, if any
+        secret: Shared secret. Defaults to JIRA_WEBHOOK_SECRET.
+
+    Returns:
+        True if the delivery is authentic or no secret is configured
+    """
+    secret = JIRA_WEBHOOK_SECRET if secret is None else secret
+    if not secret:
+        return True
+    if secret_param and hmac.compare_digest(secret_param, secret):
+        return True
+    if signature and signature.startswith("sha256="):
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(signature[len("sha256="):], expected)
+    return False
+
+
+class WebhookDeduplicator:
+    """Bounded memory of recently accepted deliveries"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or JIRA_WEBHOOK_DEDUP_SIZE
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_and_add(self, key: str) -> bool:
+        """
+        Record a delivery key
+
+        Returns:
+            True if the key is new, False if it was already seen
+        """
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return False
+            self._seen[key] = True
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+            return True
+
+
+def ticket_from_webhook(payload: Dict[str, Any],
+                        deduplicator: WebhookDeduplicator) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Turn a webhook delivery into a ticket ready for processing
+
+    Args:
+        payload: Parsed webhook JSON body
+        deduplicator: Memory of deliveries already accepted
+
+    Returns:
+        (ticket, reason) where ticket is None if the delivery should be ignored
+    """
+    event = payload.get("webhookEvent", "")
+    if event not in HANDLED_EVENTS:
+        return None, f"unhandled event {event or 'unknown'}"
+
+    issue = payload.get("issue") or {}
+    ticket = parse_jira_issue(issue)
+    if not ticket:
+        return None, "payload has no usable issue"
+
+    if not is_bug_ticket(ticket):
+        return None, f"{ticket['ticket_id']} is not an open bug ticket"
+
+    # The issue's updated timestamp identifies this version of the ticket, so
+    # retried deliveries and repeated events for the same edit collapse together
+    version = ticket.get("updated") or str(payload.get("timestamp", ""))
+    if not deduplicator.check_and_add(f"{ticket['ticket_id']}:{version}"):
+        return None, f"duplicate delivery for {ticket['ticket_id']}"
+
+    return ticket, "accepted"
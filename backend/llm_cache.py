@@ -0,0 +1,226 @@
+"""
+Persistent cache of LLM completions.
+
+The same prompts are sent again and again: tickets polled again, retries after
+infrastructure errors, test runs of the agents, and the LangChain tools
+repeating a planner step. LLMResponseCache keeps completions in SQLite, keyed
+by model, temperature, system prompt and a hash of the rest of the request,
+so LLMGateway can answer a repeat without waiting for a slot or spending the
+token budget.
+
+Only deterministic calls are cached: a call with a temperature above
+LLM_CACHE_MAX_TEMPERATURE asks for variety (the speculative candidates do),
+so it always goes to the model. Entries expire after a TTL and the least
+recently used are evicted beyond LLM_CACHE_MAX_ENTRIES.
+
+The module only uses the standard library so the agents can use it too; the
+agent images carry an identical copy as agents/utils/llm_cache.py.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("llm-cache")
+
+# Set to false to send every completion to the model
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", "data/llm_cache.db")
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Calls with a higher temperature are never cached
+LLM_CACHE_MAX_TEMPERATURE = float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", "0.1"))
+
+
+def is_cacheable(temperature: Optional[float]) -> bool:
+    """Check whether a call at this temperature is deterministic enough to cache"""
+    return temperature is not None and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+
+class LLMResponseCache:
+    """SQLite cache of chat completions with TTL, LRU eviction and hit/miss counts"""
+
+    def __init__(self, db_path: str = None, ttl_seconds: int = None, max_entries: int = None):
+        """
+        Initialize the cache
+
+        Args:
+            db_path: SQLite database path. Defaults to LLM_CACHE_DB.
+            ttl_seconds: Entry lifetime. Defaults to LLM_CACHE_TTL_SECONDS.
+            max_entries: Maximum number of entries. Defaults to LLM_CACHE_MAX_ENTRIES.
+        """
+        self.db_path = db_path or LLM_CACHE_DB
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else LLM_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else LLM_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT,
+                    completion TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and rolling back on error"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with self._lock:
+                yield conn
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: List[Dict[str, Any]],
+                 options: Dict[str, Any] = None) -> str:
+        """
+        Build the cache key for a completion
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            messages: Chat messages; system messages form the system prompt
+            options: Other request arguments that change the answer, e.g. max_tokens
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        system_prompt = "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+        prompt = [m for m in messages if m.get("role") != "system"]
+        prompt_hash = hashlib.sha256(
+            json.dumps({"messages": prompt, "options": options or {}}, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        content = json.dumps({
+            "model": model,
+            "temperature": temperature,
+            "system": system_prompt,
+            "prompt": prompt_hash
+        }, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Get a cached completion, or None if it is missing or expired"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT completion, created_at FROM llm_cache WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+                if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (cache_key,))
+                    row = None
+                if row is None:
+                    self.stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+                self.stats["hits"] += 1
+                return row[0]
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+
+    def set(self, cache_key: str, model: str, completion: str) -> None:
+        """Store a completion and evict expired and least recently used entries over the limit"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (cache_key, model, completion, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, model, completion, now, now)
+                )
+                evicted = 0
+                if self.ttl_seconds:
+                    evicted += conn.execute(
+                        "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+                    ).rowcount
+                if self.max_entries:
+                    evicted += conn.execute(
+                        "DELETE FROM llm_cache WHERE cache_key IN ("
+                        "SELECT cache_key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    ).rowcount
+                self.stats["stores"] += 1
+                self.stats["evictions"] += evicted
+        except Exception as e:
+            logger.error(f"Error writing LLM cache: {str(e)}")
+
+    def invalidate(self, cache_key: str = None) -> int:
+        """
+        Remove one cached completion, or everything
+
+        Args:
+            cache_key: Remove this entry; all entries if not given
+
+        Returns:
+            Number of entries removed
+        """
+        try:
+            with self._connect() as conn:
+                if cache_key:
+                    cursor = conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (cache_key,))
+                else:
+                    cursor = conn.execute("DELETE FROM llm_cache")
+                removed = cursor.rowcount
+            logger.info(f"Invalidated {removed} LLM cache entries")
+            return removed
+        except Exception as e:
+            logger.error(f"Error invalidating LLM cache: {str(e)}")
+            return 0
+
+    def size(self) -> int:
+        """Get the number of cached entries"""
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error reading LLM cache size: {str(e)}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counts for this process and the number of entries, for health reporting"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": self.size(),
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Get the process-wide LLM response cache, or None if caching is disabled or unavailable"""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMResponseCache()
+            except Exception as e:
+                logger.error(f"LLM cache unavailable, sending every completion: {str(e)}")
+                return None
+        return _cache
@@ -1,14 +1,17 @@
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import logging
-import os
 from datetime import datetime
 import httpx
 import asyncio
 from env import verify_env_vars, GITHUB_TOKEN, JIRA_TOKEN, JIRA_USER, JIRA_URL
 import controller
+from agent_http import get_agent_client_pool
+from jira_service.session import close_jira_sessions
+from notification_outbox import get_notification_outbox
+from jira_webhook import WebhookDeduplicator, ticket_from_webhook, verify_signature
 
 # Verify environment variables on startup
 verify_env_vars()
@@ -27,11 +30,8 @@ logger = logging.getLogger("bugfix-ai")
 
 app = FastAPI(title="BugFix AI Pilot")
 
-# Agent service URLs
-PLANNER_URL = os.getenv("PLANNER_URL", "http://planner:8001")
-DEVELOPER_URL = os.getenv("DEVELOPER_URL", "http://developer:8002")
-QA_URL = os.getenv("QA_URL", "http://qa:8003")
-COMMUNICATOR_URL = os.getenv("COMMUNICATOR_URL", "http://communicator:8004")
+# Recently accepted JIRA webhook deliveries
+webhook_deduplicator = WebhookDeduplicator()
 
 class TicketRequest(BaseModel):
     ticket_id: str
@@ -114,6 +114,31 @@ async def process_ticket(request: TicketRequest, background_tasks: BackgroundTas
     # Return initial status
     return {"message": f"Started processing ticket {ticket_id}", "status": "initializing"}
 
+@app.post("/webhooks/jira")
+async def jira_webhook(request: Request, secret: Optional[str] = None):
+    """Receive JIRA issue created/updated events and start processing bug tickets immediately"""
+    body = await request.body()
+    if not verify_signature(body, request.headers.get("X-Hub-Signature"), secret):
+        logger.warning("Rejected JIRA webhook delivery with an invalid secret")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+    
+    ticket, reason = ticket_from_webhook(payload, webhook_deduplicator)
+    if not ticket:
+        logger.info(f"Ignored JIRA webhook delivery: {reason}")
+        return {"status": "ignored", "reason": reason}
+    
+    ticket_id = ticket["ticket_id"]
+    if not controller.submit_ticket(ticket):
+        return {"status": "ignored", "reason": f"{ticket_id} is already being processed or was previously processed"}
+    
+    logger.info(f"Queued ticket {ticket_id} from JIRA webhook ({payload.get('webhookEvent')})")
+    return {"status": "queued", "ticket_id": ticket_id}
+
 @app.get("/tickets/{ticket_id}")
 async def get_ticket_status(ticket_id: str):
     if ticket_id not in controller.active_tickets:
@@ -214,30 +239,38 @@ async def update_agent_status(agent_id: str, status: AgentStatus):
 async def check_agents_health():
     """Check the health of all agent services."""
     health = {}
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        for agent, url in [
-            ("planner", PLANNER_URL),
-            ("developer", DEVELOPER_URL),
-            ("qa", QA_URL),
-            ("communicator", COMMUNICATOR_URL)
-        ]:
-            try:
-                response = await client.get(f"{url}/")
-                health[agent] = {
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "details": response.json() if response.status_code == 200 else None
-                }
-            except Exception as e:
-                health[agent] = {"status": "error", "message": str(e)}
+    pool = get_agent_client_pool()
+    for agent in ["planner", "developer", "qa", "communicator"]:
+        try:
+            # Health checks share the agent's pooled connections but not its long timeout
+            response = await pool.get_client(agent).get("/", timeout=5.0)
+            health[agent] = {
+                "status": "healthy" if response.status_code == 200 else "unhealthy",
+                "details": response.json() if response.status_code == 200 else None
+            }
+        except Exception as e:
+            health[agent] = {"status": "error", "message": str(e)}
     
     return health
 
 @app.on_event("startup")
 async def startup_event():
+    # Open the pooled agent HTTP clients before any ticket work starts
+    await get_agent_client_pool().start()
+    
     # Start the controller in a background task
     asyncio.create_task(controller.run_controller())
     logger.info("Controller started and running in background")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Undelivered notifications stay in the outbox for the next start
+    await get_notification_outbox().stop()
+    
+    # Close pooled agent and JIRA connections so keep-alive sockets don't leak
+    await get_agent_client_pool().close()
+    await close_jira_sessions()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
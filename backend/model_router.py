@@ -0,0 +1,225 @@
+"""
+Model cascade for the planner and developer calls.
+
+Every call used to go to the strongest model, also for one-line fixes a
+cheaper model gets right. ModelCascade tracks one ticket: its calls go to the
+cheapest tier in LLM_MODEL_TIERS first and move up a tier only when the
+output isn't good enough - the planner's JSON fails validation, the developer's
+confidence is below the threshold, or QA fails. Later calls for the ticket
+stay on the tier it reached.
+
+Each call's model, latency and estimated cost is recorded along with what the
+same tokens would have cost on the strongest tier, so AnalyticsTracker can
+report the latency and cost per ticket and what the cascade saved. The
+cascade travels between agents as a plain dict (to_dict/from_dict) so it
+survives JSON checkpoints and process pools.
+
+The module only needs the standard library and llm_gateway, so the agents can
+use it too; the agent images carry an identical copy as
+agents/utils/model_router.py.
+"""
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .llm_gateway import LLM_DEFAULT_MODEL, estimate_tokens
+except ImportError:  # Imported as a top-level module in the backend
+    from llm_gateway import LLM_DEFAULT_MODEL, estimate_tokens
+
+logger = logging.getLogger("model-router")
+
+# Set to false to send every call to the strongest model
+LLM_CASCADE_ENABLED = os.environ.get("LLM_CASCADE_ENABLED", "true").lower() == "true"
+
+# Models to try, cheapest first; the last one is also used when the cascade is disabled
+LLM_MODEL_TIERS = [
+    model.strip() for model in os.environ.get("LLM_MODEL_TIERS", f"gpt-4o-mini,{LLM_DEFAULT_MODEL}").split(",")
+    if model.strip()
+]
+
+# USD per million prompt and completion tokens, for the cost estimates
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-turbo-preview": (10.00, 30.00),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the price of a call
+
+    Args:
+        model: Model name
+        prompt_tokens: Tokens sent
+        completion_tokens: Tokens generated
+
+    Returns:
+        Cost in USD, 0.0 for models without a known price
+    """
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class ModelCascade:
+    """Routes one ticket's calls to the cheapest model tier that is still good enough"""
+
+    def __init__(self, models: List[str] = None, tier: int = None):
+        """
+        Initialize the cascade
+
+        Args:
+            models: Model tiers, cheapest first. Defaults to LLM_MODEL_TIERS.
+            tier: Starting tier. Defaults to the cheapest, or the strongest when LLM_CASCADE_ENABLED is off.
+        """
+        self.models = list(models or LLM_MODEL_TIERS) or [LLM_DEFAULT_MODEL]
+        if tier is None:
+            tier = 0 if LLM_CASCADE_ENABLED else len(self.models) - 1
+        self.tier = min(max(tier, 0), len(self.models) - 1)
+        self.decisions: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+
+    @property
+    def model(self) -> str:
+        """The model for the ticket's next call"""
+        return self.models[self.tier]
+
+    @property
+    def can_escalate(self) -> bool:
+        return self.tier < len(self.models) - 1
+
+    def escalate(self, stage: str, reason: str) -> bool:
+        """
+        Move the ticket to the next stronger model
+
+        Args:
+            stage: Where the output fell short, e.g. "planner", "developer" or "qa"
+            reason: Why, e.g. "invalid JSON" or "confidence 45% below 60%"
+
+        Returns:
+            True if there was a stronger model to move to
+        """
+        if not self.can_escalate:
+            return False
+        self.tier += 1
+        self.decisions.append({
+            "stage": stage,
+            "reason": reason,
+            "from_model": self.models[self.tier - 1],
+            "to_model": self.model,
+            "timestamp": time.time(),
+        })
+        logger.info(f"Escalating to {self.model} after {stage}: {reason}")
+        return True
+
+    def record(self, stage: str, model: str, messages: List[Dict[str, Any]], completion: Optional[str],
+               latency_seconds: float) -> None:
+        """
+        Record a call for the ticket's latency and cost
+
+        Args:
+            stage: Agent that made the call
+            model: Model used
+            messages: Messages sent
+            completion: Text received, or None if the call failed
+            latency_seconds: Time the call took
+        """
+        prompt_tokens = estimate_tokens(messages, 0)
+        completion_tokens = len(completion or "") // 4
+        self.calls.append({
+            "stage": stage,
+            "model": model,
+            "success": completion is not None,
+            "latency_seconds": round(latency_seconds, 3),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+            # What the same call would have cost without the cascade
+            "strong_cost_usd": estimate_cost(self.models[-1], prompt_tokens, completion_tokens),
+        })
+
+    def complete_sync(self, gateway: Any, stage: str, messages: List[Dict[str, Any]], **kwargs) -> Optional[str]:
+        """Run gateway.complete_sync on the ticket's current model and record the call"""
+        return self._timed(stage, messages, lambda model: gateway.complete_sync(messages, model=model, **kwargs))
+
+    async def complete(self, gateway: Any, stage: str, messages: List[Dict[str, Any]], **kwargs) -> Optional[str]:
+        """Run gateway.complete on the ticket's current model and record the call"""
+        model = self.model
+        started = time.monotonic()
+        completion = await gateway.complete(messages, model=model, **kwargs)
+        self.record(stage, model, messages, completion, time.monotonic() - started)
+        return completion
+
+    def complete_stream_sync(self, gateway: Any, stage: str, messages: List[Dict[str, Any]],
+                             on_delta: Callable[[str], Optional[bool]], **kwargs) -> Optional[str]:
+        """Run gateway.complete_stream_sync on the ticket's current model and record the call"""
+        return self._timed(stage, messages,
+                           lambda model: gateway.complete_stream_sync(messages, on_delta, model=model, **kwargs))
+
+    def _timed(self, stage: str, messages: List[Dict[str, Any]], call: Callable[[str], Optional[str]]) -> Optional[str]:
+        model = self.model
+        started = time.monotonic()
+        completion = call(model)
+        self.record(stage, model, messages, completion, time.monotonic() - started)
+        return completion
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the ticket's routing decisions, latency and cost, for analytics"""
+        cost = sum(call["cost_usd"] for call in self.calls)
+        strong_cost = sum(call["strong_cost_usd"] for call in self.calls)
+        return {
+            "final_model": self.model,
+            "escalations": list(self.decisions),
+            "calls": len(self.calls),
+            "calls_by_model": {model: sum(1 for call in self.calls if call["model"] == model)
+                               for model in dict.fromkeys(call["model"] for call in self.calls)},
+            "llm_latency_seconds": round(sum(call["latency_seconds"] for call in self.calls), 3),
+            "cost_usd": round(cost, 6),
+            "strong_only_cost_usd": round(strong_cost, 6),
+            "savings_usd": round(strong_cost - cost, 6),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the cascade's state as JSON-serializable data"""
+        return {"models": self.models, "tier": self.tier, "decisions": self.decisions, "calls": self.calls}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ModelCascade":
+        """
+        Restore a cascade from to_dict's data
+
+        Args:
+            data: Saved state; a new cascade is started if it is empty
+
+        Returns:
+            The cascade
+        """
+        if not data:
+            return cls()
+        cascade = cls(models=data.get("models"), tier=data.get("tier", 0))
+        cascade.decisions = list(data.get("decisions", []))
+        cascade.calls = list(data.get("calls", []))
+        return cascade
+
+
+def model_for_attempt(attempt: int, models: List[str] = None) -> str:
+    """
+    Get the model for a stateless caller's attempt: the cheapest first, one tier up per failed attempt
+
+    Args:
+        attempt: Attempt number, starting at 1
+        models: Model tiers, cheapest first. Defaults to LLM_MODEL_TIERS.
+
+    Returns:
+        Model name
+    """
+    models = list(models or LLM_MODEL_TIERS) or [LLM_DEFAULT_MODEL]
+    if not LLM_CASCADE_ENABLED:
+        return models[-1]
+    return models[min(max(attempt, 1) - 1, len(models) - 1)]
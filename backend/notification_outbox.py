@@ -0,0 +1,463 @@
+"""
+Durable outbox for JIRA and Communicator notifications.
+
+The ticket pipeline posts a JIRA comment or a Communicator update after almost
+every stage. Awaiting those calls inline put JIRA's latency, and its outages,
+on the path between developer and QA attempts. Instead, notifications are
+written to a SQLite outbox and the call returns immediately. A background
+deliverer sends them in order per ticket, retrying failures with exponential
+backoff and honouring Retry-After on 429 responses.
+
+Each message has an idempotency key, derived from its content unless the
+caller passes one. Re-queueing a message that is still waiting for delivery,
+e.g. when a ticket resumes after a restart, is a no-op. Once it has been
+delivered, the same message can be queued again, so a re-processed or reopened
+ticket still gets its transitions and comments. Delivery is at least once: a
+message whose send succeeded but whose delivered mark was lost in a crash is
+sent again. The key and the message's row ID go out as the Idempotency-Key
+header where the receiving service can use it (the Communicator agent).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from rate_limiter import parse_retry_after
+
+logger = logging.getLogger("notification-outbox")
+
+NOTIFICATION_OUTBOX_DB = os.environ.get("NOTIFICATION_OUTBOX_DB", "data/notification_outbox.db")
+
+# Delivery attempts before a message is marked failed
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", "8"))
+
+# Exponential backoff between attempts: base * 2^(attempts - 1), capped
+NOTIFICATION_BACKOFF_SECONDS = float(os.environ.get("NOTIFICATION_BACKOFF_SECONDS", "2"))
+NOTIFICATION_MAX_BACKOFF_SECONDS = float(os.environ.get("NOTIFICATION_MAX_BACKOFF_SECONDS", "300"))
+
+# How often the deliverer checks for due messages when it isn't woken up by a new one
+NOTIFICATION_POLL_SECONDS = float(os.environ.get("NOTIFICATION_POLL_SECONDS", "5"))
+
+# Longest the pipeline waits for a ticket's queued notifications before its final step
+NOTIFICATION_FLUSH_TIMEOUT_SECONDS = float(os.environ.get("NOTIFICATION_FLUSH_TIMEOUT_SECONDS", "60"))
+
+# Tickets whose notifications are delivered at the same time
+NOTIFICATION_CONCURRENCY = int(os.environ.get("NOTIFICATION_CONCURRENCY", "4"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    delivered_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, ticket_id, id);
+CREATE UNIQUE INDEX IF NOT EXISTS outbox_pending_key ON outbox (idempotency_key) WHERE status = 'pending';
+"""
+
+Handler = Callable[[Dict[str, Any], str], Awaitable[bool]]
+
+
+class RetryLater(Exception):
+    """Raised by a handler when the receiver asked us to back off (e.g. HTTP 429)"""
+
+    def __init__(self, delay: Optional[float] = None, message: str = "rate limited"):
+        super().__init__(message)
+        self.delay = delay
+
+
+def make_idempotency_key(ticket_id: str, kind: str, payload: Dict[str, Any]) -> str:
+    """Derive a stable idempotency key from a message's content"""
+    content = json.dumps([ticket_id, kind, payload], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+async def _deliver_jira(payload: Dict[str, Any], send: Callable[..., Awaitable[Optional[bool]]], *args) -> Optional[bool]:
+    """Run a jira_utils call, turning JIRA's 429 into RetryLater"""
+    from jira_service.session import JiraRateLimitError
+    try:
+        return await send(payload["ticket_id"], *args)
+    except JiraRateLimitError as e:
+        raise RetryLater(parse_retry_after(e.retry_after), str(e))
+
+async def _deliver_jira_comment(payload: Dict[str, Any], idempotency_key: str) -> bool:
+    from jira_utils import add_jira_comment
+    return await _deliver_jira(payload, add_jira_comment, payload["comment"])
+
+async def _deliver_jira_transition(payload: Dict[str, Any], idempotency_key: str) -> bool:
+    from jira_utils import transition_jira_ticket
+    # None means no transition leads to the status; retrying won't change that
+    return await _deliver_jira(payload, transition_jira_ticket, payload["status"]) is not False
+
+async def _deliver_jira_pr_link(payload: Dict[str, Any], idempotency_key: str) -> bool:
+    from jira_utils import set_jira_pr_link
+    return await _deliver_jira(payload, set_jira_pr_link, payload["pr_url"])
+
+async def _deliver_jira_progress(payload: Dict[str, Any], idempotency_key: str) -> bool:
+    from jira_utils import publish_jira_progress
+    return await _deliver_jira(payload, publish_jira_progress)
+
+async def _deliver_communicator(payload: Dict[str, Any], idempotency_key: str) -> bool:
+    from agent_http import get_agent_client_pool
+    response = await get_agent_client_pool().post(
+        "communicator", "/deploy", json=payload, headers={"Idempotency-Key": idempotency_key}
+    )
+    if response.status_code == 429:
+        raise RetryLater(parse_retry_after(response.headers.get("Retry-After")))
+    if response.status_code != 200:
+        logger.error(f"Communicator agent error: {response.status_code}, {response.text}")
+        return False
+    return True
+
+DEFAULT_HANDLERS: Dict[str, Handler] = {
+    "jira_comment": _deliver_jira_comment,
+    "jira_transition": _deliver_jira_transition,
+    "jira_pr_link": _deliver_jira_pr_link,
+    "jira_progress": _deliver_jira_progress,
+    "communicator": _deliver_communicator,
+}
+
+
+class NotificationOutbox:
+    """SQLite-backed outbox with a background deliverer"""
+
+    def __init__(self, db_path: str = None, handlers: Dict[str, Handler] = None):
+        """
+        Initialize the outbox
+
+        Args:
+            db_path: Path of the SQLite database. Defaults to NOTIFICATION_OUTBOX_DB.
+            handlers: Delivery function per message kind. Defaults to DEFAULT_HANDLERS.
+                A handler returns True when delivered, returns False or raises to
+                retry with backoff, and raises RetryLater to retry after a given delay.
+        """
+        self.db_path = os.path.abspath(db_path or NOTIFICATION_OUTBOX_DB)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.handlers = handlers or DEFAULT_HANDLERS
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        with self._connect() as conn:
+            # WAL lets the pipeline queue messages while the deliverer writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+        logger.info(f"Using notification outbox database: {self.db_path}")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and rolling back on error"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                yield conn
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, ticket_id: str, kind: str, payload: Dict[str, Any], idempotency_key: str = None,
+                delay: float = 0, coalesce: bool = False) -> bool:
+        """
+        Durably queue a message for delivery
+
+        Args:
+            ticket_id: Ticket the message belongs to; messages of one ticket are delivered in order
+            kind: Message kind, one of the handler names
+            payload: Message content, must be JSON serializable
+            idempotency_key: Key identifying the message among those waiting for delivery.
+                Defaults to a hash of its content.
+            delay: Seconds to hold the message before its first delivery attempt
+            coalesce: Skip queueing if a message of the same kind for the ticket is
+                still being held, for messages whose handler always sends the latest state
+
+        Returns:
+            True if queued, False if an equivalent message is still pending or on error
+        """
+        if kind not in self.handlers:
+            logger.error(f"No handler for notification kind '{kind}'")
+            return False
+        key = idempotency_key or make_idempotency_key(ticket_id, kind, payload)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                if coalesce and conn.execute(
+                    "SELECT 1 FROM outbox WHERE ticket_id = ? AND kind = ? AND status = 'pending' "
+                    "AND attempts = 0 AND next_attempt_at > ?",
+                    (ticket_id, kind, now)
+                ).fetchone():
+                    return False
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO outbox (ticket_id, kind, payload, idempotency_key, status, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                    (ticket_id, kind, json.dumps(payload, default=str), key, now + delay, now)
+                )
+                queued = cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error queueing {kind} notification for ticket {ticket_id}: {str(e)}")
+            return False
+
+        if queued and self._wakeup is not None:
+            self._wakeup.set()
+        return queued
+
+    def _next_message(self, ticket_id: str) -> Optional[sqlite3.Row]:
+        """Get a ticket's oldest pending message if it is due, else None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM outbox WHERE ticket_id = ? AND status = 'pending' ORDER BY id LIMIT 1",
+                (ticket_id,)
+            ).fetchone()
+        if row is None or row["next_attempt_at"] > time.time():
+            return None
+        return row
+
+    def _due_tickets(self) -> List[str]:
+        """Get tickets whose oldest pending message is due"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT o.ticket_id FROM outbox o WHERE o.status = 'pending' AND o.next_attempt_at <= ? "
+                "AND o.id = (SELECT MIN(id) FROM outbox WHERE ticket_id = o.ticket_id AND status = 'pending') "
+                "ORDER BY o.id",
+                (time.time(),)
+            ).fetchall()
+        return [row["ticket_id"] for row in rows]
+
+    def _mark_delivered(self, message_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'delivered', attempts = attempts + 1, delivered_at = ?, last_error = NULL WHERE id = ?",
+                (time.time(), message_id)
+            )
+
+    def _mark_retry(self, message: sqlite3.Row, error: str, delay: Optional[float] = None) -> str:
+        """
+        Schedule another attempt, or mark the message failed once it has used all of them
+
+        Returns:
+            The message's new status, pending or failed
+        """
+        attempts = message["attempts"] + 1
+        if attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            status, next_attempt_at = "failed", message["next_attempt_at"]
+            logger.error(f"Giving up on {message['kind']} notification for ticket {message['ticket_id']} after {attempts} attempts: {error}")
+        else:
+            if delay is None:
+                delay = min(NOTIFICATION_BACKOFF_SECONDS * 2 ** (attempts - 1), NOTIFICATION_MAX_BACKOFF_SECONDS)
+            status, next_attempt_at = "pending", time.time() + delay
+            logger.warning(f"Retrying {message['kind']} notification for ticket {message['ticket_id']} in {delay:.0f}s: {error}")
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt_at, error, message["id"])
+            )
+        return status
+
+    async def _deliver(self, message: sqlite3.Row) -> str:
+        """
+        Attempt one message, recording the outcome
+
+        Returns:
+            The message's new status: delivered, pending (retry later) or failed
+        """
+        handler = self.handlers.get(message["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for notification kind '{message['kind']}'")
+            # A message queued again after delivery is a new message to the receiver
+            idempotency_key = f"{message['idempotency_key']}-{message['id']}"
+            delivered = await handler(json.loads(message["payload"]), idempotency_key)
+        except RetryLater as e:
+            return self._mark_retry(message, str(e), e.delay)
+        except Exception as e:
+            return self._mark_retry(message, str(e))
+
+        if not delivered:
+            return self._mark_retry(message, "handler reported failure")
+        self._mark_delivered(message["id"])
+        return "delivered"
+
+    async def _drain_ticket(self, ticket_id: str) -> int:
+        """Deliver a ticket's due messages in order, stopping at the first one that must be retried"""
+        delivered = 0
+        while True:
+            message = self._next_message(ticket_id)
+            if message is None:
+                return delivered
+            status = await self._deliver(message)
+            if status == "pending":
+                return delivered
+            if status == "delivered":
+                delivered += 1
+
+    async def deliver_due(self) -> int:
+        """
+        Deliver every message that is due
+
+        Tickets are drained concurrently, messages within a ticket one at a time.
+
+        Returns:
+            Number of messages delivered
+        """
+        semaphore = asyncio.Semaphore(NOTIFICATION_CONCURRENCY)
+
+        async def drain(ticket_id: str) -> int:
+            async with semaphore:
+                return await self._drain_ticket(ticket_id)
+
+        results = await asyncio.gather(*(drain(ticket_id) for ticket_id in self._due_tickets()))
+        return sum(results)
+
+    async def wait_delivered(self, ticket_id: str, timeout: float) -> bool:
+        """
+        Wait until a ticket has no pending messages
+
+        Used before steps whose own JIRA updates must come after the queued ones.
+
+        Returns:
+            True if everything was delivered (or failed for good), False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending_count(ticket_id):
+            if time.monotonic() >= deadline:
+                return False
+            if self._task is None:
+                await self._drain_ticket(ticket_id)
+            await asyncio.sleep(0.1)
+        return True
+
+    def pending_count(self, ticket_id: str = None) -> int:
+        """Count messages that are still waiting for delivery"""
+        query = "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+        params = ()
+        if ticket_id:
+            query += " AND ticket_id = ?"
+            params = (ticket_id,)
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def get_messages(self, ticket_id: str) -> List[Dict[str, Any]]:
+        """Get a ticket's messages in queue order, for status reporting"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, status, attempts, last_error, created_at, delivered_at FROM outbox WHERE ticket_id = ? ORDER BY id",
+                (ticket_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    async def _run(self) -> None:
+        """Deliverer loop: deliver due messages, then sleep until woken or the poll interval passes"""
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.deliver_due()
+            except Exception as e:
+                logger.error(f"Error delivering notifications: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=NOTIFICATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start the background deliverer on the running event loop, if it isn't running yet"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Notification deliverer started ({self.pending_count()} pending)")
+
+    async def stop(self) -> None:
+        """Stop the background deliverer; undelivered messages stay queued for the next start"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+
+
+# Singleton instance
+_notification_outbox = None
+
+def get_notification_outbox() -> NotificationOutbox:
+    """Get the singleton notification outbox instance"""
+    global _notification_outbox
+    if _notification_outbox is None:
+        _notification_outbox = NotificationOutbox()
+    return _notification_outbox
+
+
+def queue_jira_update(ticket_id: str, status: str, comment: str, pr_url: Optional[str] = None) -> None:
+    """
+    Queue a JIRA comment, status transition and PR link without waiting for JIRA
+
+    Takes the same arguments as jira_utils.update_jira_ticket. Each side effect
+    is its own message, so a retried transition never re-posts the comment.
+    """
+    outbox = get_notification_outbox()
+    if comment:
+        outbox.enqueue(ticket_id, "jira_comment", {"ticket_id": ticket_id, "comment": comment})
+    if status:
+        outbox.enqueue(ticket_id, "jira_transition", {"ticket_id": ticket_id, "status": status})
+    if pr_url:
+        outbox.enqueue(ticket_id, "jira_pr_link", {"ticket_id": ticket_id, "pr_url": pr_url})
+
+
+def queue_jira_progress(ticket_id: str, comment: str, status: str = "") -> None:
+    """
+    Queue a pipeline step for the ticket's edit-in-place progress comment
+
+    Steps queued within JIRA_PROGRESS_DEBOUNCE_SECONDS of each other are written
+    in one edit. With JIRA_PROGRESS_COMMENTS disabled, this posts a regular
+    comment like queue_jira_update.
+    """
+    from jira_service.progress import JIRA_PROGRESS_COMMENTS, JIRA_PROGRESS_DEBOUNCE_SECONDS
+    if not JIRA_PROGRESS_COMMENTS:
+        queue_jira_update(ticket_id, status, comment)
+        return
+
+    from jira_utils import record_jira_progress
+    record_jira_progress(ticket_id, comment)
+    outbox = get_notification_outbox()
+    # The handler renders every recorded step, so each queued write is unique
+    # rather than keyed on its content
+    outbox.enqueue(
+        ticket_id, "jira_progress", {"ticket_id": ticket_id},
+        idempotency_key=f"jira_progress:{ticket_id}:{time.time()}",
+        delay=JIRA_PROGRESS_DEBOUNCE_SECONDS, coalesce=True
+    )
+    if status:
+        outbox.enqueue(ticket_id, "jira_transition", {"ticket_id": ticket_id, "status": status})
+
+
+def queue_communicator_update(ticket_id: str, **kwargs) -> None:
+    """
+    Queue a Communicator agent notification without waiting for it
+
+    Takes the same arguments as agent_utils.call_communicator_agent. Use it for
+    notifications whose response isn't needed, not for the final deployment.
+    """
+    from agent_utils import build_communicator_payload
+    payload = build_communicator_payload(ticket_id, **kwargs)
+    if payload is not None:
+        get_notification_outbox().enqueue(ticket_id, "communicator", payload)
@@ -2,7 +2,6 @@ import asyncio
 import logging
 import os
 import json
-import time
 from datetime import datetime
 import traceback
 from typing import Dict, Any, List, Optional
@@ -19,6 +18,17 @@ from agent_framework.communicator_agent import CommunicatorAgent
 from jira_service.jira_client import JiraClient
 from github_service.github_service import GitHubService
 from analytics_tracker import get_analytics_tracker
+from agent_executor import get_agent_executor
+from model_router import ModelCascade
+from work_queue import FINISHED_STATUSES, get_work_queue
+from ticket_ingestion import LeaseHeartbeat, LeaseLostError, TicketIngestion, default_consumer_id
+from speculative_runner import (
+    SPECULATIVE_CANDIDATES,
+    RepoSandbox,
+    build_candidate_variants,
+    race_candidates,
+    select_fallback_candidate
+)
 from env import MAX_RETRIES
 
 # Configure logging
@@ -39,11 +49,23 @@ REPO_PATH = os.environ.get('REPO_PATH', '/app/code_repo')
 RETRY_DELAY_SECONDS = 5  # Delay between retries
 LOW_CONFIDENCE_THRESHOLD = 60  # Threshold for early escalation
 
+# Scheduler config: number of concurrent ticket workers and per-stage limits
+MAX_CONCURRENT_TICKETS = int(os.environ.get('MAX_CONCURRENT_TICKETS', '4'))
+STAGE_CONCURRENCY = {
+    "planner": int(os.environ.get('PLANNER_CONCURRENCY', '4')),
+    "developer": int(os.environ.get('DEVELOPER_CONCURRENCY', '2')),
+    # QA runs the test suite against the shared repo checkout, so default to serial
+    "qa": int(os.environ.get('QA_CONCURRENCY', '1')),
+    "communicator": int(os.environ.get('COMMUNICATOR_CONCURRENCY', '4')),
+}
+# With SPECULATIVE_CANDIDATES > 1 each attempt races that many candidate patches,
+# each tested in its own sandbox; raise QA_CONCURRENCY to let them test in parallel
+
 
 class Orchestrator:
     def __init__(self):
         """Initialize orchestrator and its dependencies"""
-        self.jira_client = JiraClient()
+        self.jira_client = JiraClient(poll_state_name="orchestrator")
         self.github_service = GitHubService()
         
         # Initialize agent instances
@@ -55,139 +77,70 @@ class Orchestrator:
         # Get analytics tracker
         self.analytics_tracker = get_analytics_tracker()
         
+        # Thread/process pools that keep blocking agent calls off the event loop
+        self.executor = get_agent_executor()
+        
+        # Number of candidate patches generated and tested per attempt
+        self.speculative_candidates = max(1, SPECULATIVE_CANDIDATES)
+        if self.speculative_candidates > 1 and not getattr(self.developer_agent, "supports_sampling", False):
+            # Candidates only differ by temperature and strategy; a developer that ignores both
+            # would produce K identical patches
+            logger.warning("SPECULATIVE_CANDIDATES ignored: the developer agent doesn't vary its fixes")
+            self.speculative_candidates = 1
+        
+        # Durable queue and stage checkpoints so a restart resumes in-flight tickets
+        self.work_queue = get_work_queue()
+        
         # Track active tickets
         self.active_tickets = {}
         
         # Track processed tickets to avoid duplicates with JIRA service
         self.processed_tickets = set()
         
-        # Set up lock directory
-        self.lock_dir = os.environ.get("TICKET_LOCK_DIR", "/tmp/bugfix_ai_locks")
-        os.makedirs(self.lock_dir, exist_ok=True)
+        # Ticket queue feeding the worker pool, plus the IDs currently waiting in it
+        self.max_workers = max(1, MAX_CONCURRENT_TICKETS)
+        self.ticket_queue: asyncio.Queue = asyncio.Queue()
+        self.queued_tickets = set()
+        self.workers: List[asyncio.Task] = []
         
-        logger.info("Orchestrator initialized")
-        logger.info(f"Using lock directory: {self.lock_dir}")
-    
-    def _check_ticket_locked(self, ticket_id: str) -> bool:
-        """Check if a ticket is locked by another service."""
-        lock_file = os.path.join(self.lock_dir, f"{ticket_id}.lock")
+        # Per-stage concurrency limits shared by all workers
+        self.stage_limits = {stage: max(1, limit) for stage, limit in STAGE_CONCURRENCY.items()}
+        self.stage_semaphores = {
+            stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()
+        }
         
-        if not os.path.exists(lock_file):
-            return False
-            
-        # Check if the lock is stale (older than 1 hour)
-        lock_time = os.path.getmtime(lock_file)
-        if time.time() - lock_time >= 3600:  # 1 hour in seconds
-            logger.info(f"Found stale lock for ticket {ticket_id}, considering it unlocked")
-            return False
-            
-        # Lock exists and is valid, check who owns it
-        try:
-            with open(lock_file, 'r') as f:
-                lock_data = json.load(f)
-                owner = lock_data.get('owner', 'unknown')
-                pid = lock_data.get('pid', 0)
-                timestamp = lock_data.get('timestamp', 0)
-                
-                # If we own the lock, it's not considered locked by another service
-                if owner == "orchestrator" and pid == os.getpid():
-                    return False
-                    
-                logger.info(f"Ticket {ticket_id} is locked by {owner} (PID: {pid}) since {time.ctime(timestamp)}")
-                return True
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error reading lock file for ticket {ticket_id}: {str(e)}")
-            # If we can't read the lock file, assume it's locked to be safe
-            return True
-    
-    def _acquire_lock(self, ticket_id: str) -> bool:
-        """Try to acquire a lock on the ticket."""
-        lock_file = os.path.join(self.lock_dir, f"{ticket_id}.lock")
+        # Shared JIRA ingestion; tickets are leased so other consumers don't take them
+        self.ingestion = TicketIngestion(default_consumer_id("orchestrator"), poll_interval=POLL_INTERVAL_SECONDS)
         
-        try:
-            # Check if locked by another service first
-            if self._check_ticket_locked(ticket_id):
-                return False
-                
-            # Create the lock file with our service info
-            with open(lock_file, 'w') as f:
-                lock_data = {
-                    'owner': 'orchestrator',
-                    'pid': os.getpid(),
-                    'timestamp': time.time()
-                }
-                json.dump(lock_data, f)
-            
-            logger.info(f"Acquired lock for ticket {ticket_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Error acquiring lock for ticket {ticket_id}: {str(e)}")
-            return False
-            
-    def _release_lock(self, ticket_id: str) -> bool:
-        """Release our lock on a ticket."""
-        lock_file = os.path.join(self.lock_dir, f"{ticket_id}.lock")
+        # Heartbeats keeping the leases of the tickets being processed alive
+        self.lease_heartbeats: Dict[str, LeaseHeartbeat] = {}
         
-        try:
-            if os.path.exists(lock_file):
-                # Verify we own the lock before removing it
-                try:
-                    with open(lock_file, 'r') as f:
-                        lock_data = json.load(f)
-                        if lock_data.get('owner') == 'orchestrator' and lock_data.get('pid') == os.getpid():
-                            os.remove(lock_file)
-                            logger.info(f"Released lock for ticket {ticket_id}")
-                            return True
-                        else:
-                            logger.warning(f"Lock for ticket {ticket_id} is owned by another process, not releasing")
-                            return False
-                except (json.JSONDecodeError, IOError):
-                    # If we can't read the file, don't delete it
-                    logger.error(f"Couldn't read lock file for ticket {ticket_id}")
-                    return False
-            return True  # No lock file exists
-        except Exception as e:
-            logger.error(f"Error releasing lock for ticket {ticket_id}: {str(e)}")
-            return False
+        logger.info("Orchestrator initialized")
+        logger.info(f"Consuming tickets as {self.ingestion.consumer_id}")
+        logger.info(f"Ticket workers: {self.max_workers}, stage limits: {self.stage_limits}")
     
     async def fetch_eligible_tickets(self) -> List[Dict[str, Any]]:
-        """Fetch eligible tickets from JIRA that need processing"""
+        """Lease eligible tickets from the shared ingestion, up to the free worker capacity"""
         try:
-            # Changed from fetch_tickets to fetch_bug_tickets to match the actual method name in JiraClient
-            tickets = await self.jira_client.fetch_bug_tickets()
+            # Poll JIRA unless another consumer already did so this interval
+            await self.ingestion.poll_if_due()
             
-            if not tickets:
-                return []
-                
-            # Filter tickets to process - now check lock status
-            eligible_tickets = []
+            # Tickets waiting in the queue or being processed occupy a worker slot
+            free_slots = self.max_workers - len(self.queued_tickets)
             
-            for ticket in tickets:
-                if not ticket or not isinstance(ticket, dict):
-                    continue
-                    
+            # Only process tickets that are "To Do" - let jira_service handle "In Progress"
+            leased = self.ingestion.acquire(limit=free_slots, statuses=("To Do",))
+            
+            eligible_tickets = []
+            for ticket in leased:
                 ticket_id = ticket.get("ticket_id")
-                if not ticket_id:
-                    continue
-                    
-                status = ticket.get("status", "Unknown")
                 
-                # Skip tickets we're already processing
-                if ticket_id in self.active_tickets:
-                    continue
-                    
                 # Skip tickets we've already processed
-                if ticket_id in self.processed_tickets:
+                if ticket_id in self.processed_tickets or self.work_queue.is_finished(ticket_id):
+                    self.ingestion.release(ticket_id, completed=True)
                     continue
                     
-                # Skip tickets locked by another service
-                if self._check_ticket_locked(ticket_id):
-                    logger.info(f"Ticket {ticket_id} is locked by another service, skipping")
-                    continue
-                    
-                # Only process tickets that are "To Do" - let jira_service handle "In Progress"
-                if status == "To Do":
-                    eligible_tickets.append(ticket)
+                eligible_tickets.append(ticket)
             
             return eligible_tickets
         
@@ -208,23 +161,32 @@ class Orchestrator:
             logger.error("Invalid ticket: missing ticket_id")
             return
             
-        # Try to acquire lock
-        if not self._acquire_lock(ticket_id):
-            logger.info(f"Could not acquire lock for ticket {ticket_id}, skipping")
+        # Check if already processed or active before touching the lease, since
+        # another worker in this process may hold it for the same ticket
+        if ticket_id in self.processed_tickets:
+            logger.info(f"Ticket {ticket_id} has already been processed. Skipping.")
+            return
+            
+        if ticket_id in self.active_tickets:
+            logger.info(f"Ticket {ticket_id} is already being processed. Skipping.")
+            return
+            
+        if self.work_queue.is_finished(ticket_id):
+            logger.info(f"Ticket {ticket_id} finished in a previous run. Skipping.")
+            self.processed_tickets.add(ticket_id)
+            self.ingestion.release(ticket_id, completed=True)
             return
             
+        # Take (or keep) the lease so no other consumer processes the ticket
+        if not self.ingestion.acquire_ticket(ticket):
+            logger.info(f"Ticket {ticket_id} is leased by another consumer, skipping")
+            return
+        
+        # Renew the lease for as long as the ticket is being worked on
+        heartbeat = self.ingestion.heartbeat(ticket_id).start()
+        self.lease_heartbeats[ticket_id] = heartbeat
+            
         try:
-            # Check if already processed or active
-            if ticket_id in self.processed_tickets:
-                logger.info(f"Ticket {ticket_id} has already been processed. Skipping.")
-                self._release_lock(ticket_id)
-                return
-                
-            if ticket_id in self.active_tickets:
-                logger.info(f"Ticket {ticket_id} is already being processed. Skipping.")
-                self._release_lock(ticket_id)
-                return
-                
             # Add to processed tickets set
             self.processed_tickets.add(ticket_id)
             
@@ -238,6 +200,8 @@ class Orchestrator:
             }
             
             logger.info(f"Starting processing for ticket {ticket_id}")
+            self.work_queue.enqueue(ticket)
+            self.work_queue.set_status(ticket_id, "processing")
             
             # Create log directory for this ticket
             log_dir = f"logs/{ticket_id}"
@@ -259,16 +223,24 @@ class Orchestrator:
                 "ticket_id": ticket_id,
                 "title": ticket.get("title", ""),
                 "description": ticket.get("description", ""),
+                "priority": ticket.get("priority"),
             }
             
             with open(f"{log_dir}/planner_input.json", 'w') as f:
                 json.dump(planner_input, f, indent=2)
             
-            planner_result = await self.run_agent(self.planner_agent, planner_input)
-            
-            if not planner_result or "error" in planner_result:
-                error_msg = planner_result.get("error", "Unknown error") if planner_result else "No result"
-                raise Exception(f"PlannerAgent failed: {error_msg}")
+            # Reuse the planner output saved before a restart instead of paying for it again
+            planner_result = self.work_queue.get_checkpoint(ticket_id, "planner")
+            if planner_result:
+                logger.info(f"Resuming ticket {ticket_id} from saved planner result")
+            else:
+                planner_result = await self.run_agent(self.planner_agent, planner_input, stage="planner")
+                
+                if not planner_result or "error" in planner_result:
+                    error_msg = planner_result.get("error", "Unknown error") if planner_result else "No result"
+                    raise Exception(f"PlannerAgent failed: {error_msg}")
+                
+                self.work_queue.save_checkpoint(ticket_id, "planner", planner_result)
             
             with open(f"{log_dir}/planner_output.json", 'w') as f:
                 json.dump(planner_result, f, indent=2)
@@ -277,8 +249,19 @@ class Orchestrator:
             self.active_tickets[ticket_id]["planner_result"] = planner_result
             
             # STEP 2-4: Developer-QA loop with retries
+            self.check_lease(ticket_id)
             await self.run_development_qa_loop(ticket_id, planner_result)
             
+            # Mark the ticket finished so a restart doesn't pick it up again
+            final_status = self.active_tickets[ticket_id].get("status")
+            self.work_queue.set_status(ticket_id, final_status if final_status in FINISHED_STATUSES else "failed")
+            
+        except LeaseLostError as e:
+            # Another consumer owns the ticket now and reports its outcome, so
+            # leave JIRA and the work queue to it
+            logger.warning(f"Stopped processing ticket {ticket_id}: {str(e)}")
+            self.active_tickets[ticket_id]["status"] = "lease_lost"
+            
         except Exception as e:
             logger.error(f"Error processing ticket {ticket_id}: {str(e)}")
             logger.error(traceback.format_exc())
@@ -286,6 +269,7 @@ class Orchestrator:
             # Update ticket as failed
             self.active_tickets[ticket_id]["status"] = "failed"
             self.active_tickets[ticket_id]["error"] = str(e)
+            self.work_queue.set_status(ticket_id, "failed")
             
             # Try to update JIRA with the failure
             try:
@@ -305,8 +289,22 @@ class Orchestrator:
                 escalation_reason=f"Process error: {str(e)}"
             )
         finally:
-            # Release the lock when we're done
-            self._release_lock(ticket_id)
+            # Write the steps still waiting in the debounce window, unless another consumer owns the ticket now
+            if not heartbeat.lost:
+                try:
+                    await self.jira_client.flush_progress(ticket_id)
+                except Exception as e:
+                    logger.error(f"Failed to write progress comment for ticket {ticket_id}: {str(e)}")
+            # Release the lease when we're done; finished tickets are never handed out again
+            await heartbeat.stop()
+            self.lease_heartbeats.pop(ticket_id, None)
+            self.ingestion.release(ticket_id, completed=self.work_queue.is_finished(ticket_id))
+    
+    def check_lease(self, ticket_id: str) -> None:
+        """Raise LeaseLostError if another consumer has taken over the ticket, checked between stages"""
+        heartbeat = self.lease_heartbeats.get(ticket_id)
+        if heartbeat:
+            heartbeat.check()
     
     async def run_development_qa_loop(self, ticket_id: str, planner_result: Dict[str, Any]) -> None:
         """Run the developer-QA loop with retries"""
@@ -322,14 +320,23 @@ class Orchestrator:
         # Initialize retry history for this ticket
         retry_history = []
         
+        # Model tier the planner left the ticket on; failed attempts move it up
+        cascade = ModelCascade.from_dict(planner_result.get("model_routing"))
+        
         while current_attempt <= max_retries and not success and not early_escalation:
             logger.info(f"Starting development attempt {current_attempt}/{max_retries} for ticket {ticket_id}")
             
             # Update ticket tracking
             self.active_tickets[ticket_id]["current_attempt"] = current_attempt
             
+            # Outputs saved for this attempt before a restart are reused, not regenerated
+            saved_developer_result = self.work_queue.get_checkpoint(ticket_id, "developer", current_attempt)
+            saved_qa_result = self.work_queue.get_checkpoint(ticket_id, "qa", current_attempt)
+            replayed = saved_developer_result is not None and saved_qa_result is not None
+            
             try:
                 # STEP 2: Run developer agent
+                self.check_lease(ticket_id)
                 logger.info(f"Running DeveloperAgent for ticket {ticket_id} (attempt {current_attempt})")
                 
                 # Add context for retries with previous QA failures
@@ -340,17 +347,36 @@ class Orchestrator:
                     **planner_result,
                     "attempt": current_attempt,
                     "max_attempts": max_retries,
-                    "context": developer_context
+                    "context": developer_context,
+                    "model": cascade.model,
+                    "model_routing": cascade.to_dict()
                 }
                 
                 with open(f"{log_dir}/developer_input_{current_attempt}.json", 'w') as f:
                     json.dump(developer_input, f, indent=2)
                 
-                developer_result = await self.run_agent(self.developer_agent, developer_input)
+                speculative_qa_result = None
+                if saved_developer_result is not None:
+                    logger.info(f"Resuming ticket {ticket_id} attempt {current_attempt} from saved developer result")
+                    developer_result = saved_developer_result
+                elif self.speculative_candidates > 1:
+                    # Race several candidate patches; QA has already run on the one returned
+                    developer_result, speculative_qa_result = await self._run_speculative_attempt(
+                        ticket_id, developer_input, current_attempt, log_dir
+                    )
+                else:
+                    developer_result = await self.run_agent(self.developer_agent, developer_input, stage="developer")
                 
                 if not developer_result or "error" in developer_result:
                     raise Exception(f"DeveloperAgent failed: {developer_result.get('error', 'Unknown error')}")
                 
+                if saved_developer_result is None:
+                    self.work_queue.save_checkpoint(ticket_id, "developer", developer_result, current_attempt)
+                
+                # The developer's calls were recorded on its copy of the cascade
+                if developer_result.get("model_routing"):
+                    cascade = ModelCascade.from_dict(developer_result["model_routing"])
+                
                 # Get confidence score from developer result
                 confidence_score = developer_result.get("confidence_score")
                 if confidence_score is not None:
@@ -364,6 +390,7 @@ class Orchestrator:
                 self.active_tickets[ticket_id]["confidence_score"] = confidence_score
                 
                 # STEP 3: Run QA agent
+                self.check_lease(ticket_id)
                 logger.info(f"Running QAAgent for ticket {ticket_id} (attempt {current_attempt})")
                 
                 qa_input = {
@@ -374,11 +401,19 @@ class Orchestrator:
                 with open(f"{log_dir}/qa_input_{current_attempt}.json", 'w') as f:
                     json.dump(qa_input, f, indent=2)
                 
-                qa_result = await self.run_agent(self.qa_agent, qa_input)
+                if saved_qa_result is not None:
+                    qa_result = saved_qa_result
+                elif speculative_qa_result is not None:
+                    qa_result = speculative_qa_result
+                else:
+                    qa_result = await self.run_agent(self.qa_agent, qa_input, stage="qa")
                 
                 if not qa_result:
                     raise Exception(f"QAAgent failed with no result")
                 
+                if saved_qa_result is None:
+                    self.work_queue.save_checkpoint(ticket_id, "qa", qa_result, current_attempt)
+                
                 with open(f"{log_dir}/qa_output_{current_attempt}.json", 'w') as f:
                     json.dump(qa_result, f, indent=2)
                 
@@ -421,6 +456,7 @@ class Orchestrator:
                     self.active_tickets[ticket_id]["retry_history"] = []
                     
                     # STEP 4: Create PR and update JIRA via communicator agent
+                    self.check_lease(ticket_id)
                     await self.finalize_successful_fix(
                         ticket_id, 
                         current_attempt, 
@@ -430,9 +466,18 @@ class Orchestrator:
                 else:
                     logger.warning(f"QA tests failed for ticket {ticket_id} on attempt {current_attempt}")
                     
+                    # Move the ticket up a tier for its next attempt. The in-process
+                    # DeveloperAgent doesn't call an LLM, so this only affects what a
+                    # model-aware developer would use; it doesn't postpone escalation.
+                    low_confidence = confidence_score is not None and confidence_score < LOW_CONFIDENCE_THRESHOLD
+                    if low_confidence:
+                        cascade.escalate("developer", f"confidence {confidence_score}% below {LOW_CONFIDENCE_THRESHOLD}%")
+                    else:
+                        cascade.escalate("qa", f"tests failed: {qa_result.get('failure_summary', 'unknown failure')[:200]}")
+                    
                     # Check for early escalation based on confidence score
                     # Only check on first attempt
-                    if current_attempt == 1 and confidence_score is not None and confidence_score < LOW_CONFIDENCE_THRESHOLD:
+                    if current_attempt == 1 and low_confidence:
                         early_escalation = True
                         escalation_reason = f"Low confidence score ({confidence_score}%) on first attempt"
                         logger.warning(f"Early escalation for ticket {ticket_id}: {escalation_reason}")
@@ -453,12 +498,15 @@ class Orchestrator:
                         logger.warning(f"Maximum retries reached for ticket {ticket_id}, escalating")
                         await self.escalate_ticket(ticket_id, current_attempt, qa_result)
                         break  # Exit retry loop after escalation
+                    elif replayed:
+                        # This attempt already failed and was reported before the restart
+                        logger.info(f"Replayed failed attempt {current_attempt} for ticket {ticket_id} from checkpoints")
                     else:
-                        # Update JIRA with retry information and failure summary
+                        # Report the retry on the ticket's progress comment; the
+                        # ticket is already In Progress
                         failure_summary = qa_result.get("failure_summary", "Unknown failure")
-                        await self.jira_client.update_ticket(
+                        await self.jira_client.update_progress(
                             ticket_id,
-                            "In Progress",
                             f"Attempt {current_attempt}/{max_retries} failed with errors: {failure_summary}. Retrying with improved fix..."
                         )
                         
@@ -466,6 +514,8 @@ class Orchestrator:
                         logger.info(f"Waiting {RETRY_DELAY_SECONDS} seconds before next retry")
                         await asyncio.sleep(RETRY_DELAY_SECONDS)
             
+            except LeaseLostError:
+                raise
             except Exception as e:
                 logger.error(f"Error in development-QA loop for ticket {ticket_id}: {str(e)}")
                 
@@ -499,7 +549,8 @@ class Orchestrator:
                 final_status="success",
                 confidence_score=confidence_score,
                 early_escalation=early_escalation,
-                additional_data={"final_qa_result": qa_result.get("passed", False)}
+                additional_data={"final_qa_result": qa_result.get("passed", False)},
+                model_routing=cascade.summary()
             )
         elif early_escalation:
             self.analytics_tracker.log_ticket_result(
@@ -509,9 +560,90 @@ class Orchestrator:
                 confidence_score=confidence_score,
                 escalation_reason=escalation_reason,
                 early_escalation=True,
-                qa_failure_summary=qa_result.get("failure_summary", "")
+                qa_failure_summary=qa_result.get("failure_summary", ""),
+                model_routing=cascade.summary()
             )
     
+    async def _run_speculative_attempt(
+        self, 
+        ticket_id: str, 
+        developer_input: Dict[str, Any], 
+        attempt: int, 
+        log_dir: str
+    ) -> tuple:
+        """Generate and QA-test several candidate patches concurrently
+        
+        Each candidate gets its own temperature, prompt strategy and repo sandbox.
+        The first candidate whose tests pass wins and the others are cancelled. If
+        none pass, the highest-confidence candidate is returned so the retry loop
+        records it exactly as it would a single failed attempt.
+        
+        Returns:
+            Tuple of (developer_result, qa_result) for the chosen candidate
+        """
+        variants = build_candidate_variants(self.speculative_candidates)
+        logger.info(f"Racing {len(variants)} candidate patches for ticket {ticket_id} (attempt {attempt})")
+        
+        def make_candidate(variant: Dict[str, Any]):
+            async def run_candidate() -> Dict[str, Any]:
+                sandbox = RepoSandbox(REPO_PATH, f"{ticket_id}-a{attempt}-c{variant['candidate']}")
+                sandbox_path = await asyncio.to_thread(sandbox.create)
+                try:
+                    candidate_input = {**developer_input, **variant, "repo_path": sandbox_path}
+                    developer_result = await self.run_agent(self.developer_agent, candidate_input, stage="developer")
+                    
+                    qa_result = None
+                    if developer_result and "error" not in developer_result:
+                        qa_input = {
+                            "ticket_id": ticket_id,
+                            "test_command": "npm test",
+                            "repo_path": sandbox_path
+                        }
+                        qa_result = await self.run_agent(self.qa_agent, qa_input, stage="qa", isolated=True)
+                    
+                    candidate = {**variant, "developer_result": developer_result, "qa_result": qa_result}
+                    with open(f"{log_dir}/candidate_{attempt}_{variant['candidate']}.json", 'w') as f:
+                        json.dump(self._ensure_json_serializable(candidate), f, indent=2)
+                    return candidate
+                finally:
+                    await asyncio.to_thread(sandbox.cleanup)
+            return run_candidate
+        
+        winner, results = await race_candidates(
+            [make_candidate(variant) for variant in variants],
+            lambda candidate: bool(candidate.get("qa_result") and candidate["qa_result"].get("passed", False))
+        )
+        
+        if winner is None:
+            chosen = select_fallback_candidate(
+                results, 
+                lambda candidate: (candidate.get("developer_result") or {}).get("confidence_score")
+            )
+            if chosen is None:
+                raise Exception("All candidate patches failed to run")
+            logger.info(f"No candidate passed for ticket {ticket_id}, reporting candidate {chosen + 1}")
+        else:
+            chosen = winner
+            logger.info(f"Candidate {winner + 1} passed QA for ticket {ticket_id}")
+        
+        candidate = results[chosen]
+        developer_result = candidate["developer_result"]
+        qa_result = candidate["qa_result"]
+        
+        # Carry the winning patch over from its sandbox to the working repository
+        if winner is not None and hasattr(self.developer_agent, "apply_patch"):
+            await asyncio.to_thread(self.developer_agent.apply_patch, developer_result, REPO_PATH)
+        
+        self.active_tickets[ticket_id]["speculative"] = {
+            "attempt": attempt,
+            "candidates": len(variants),
+            "finished": len(results),
+            "chosen_candidate": chosen + 1,
+            "passed": winner is not None
+        }
+        
+        return developer_result, qa_result
+    
     async def finalize_successful_fix(
         self, 
         ticket_id: str, 
@@ -545,7 +677,7 @@ class Orchestrator:
                 json.dump(communicator_input, f, indent=2)
             
             # FIXED: Await the coroutine before trying to use its result
-            communicator_result = await self.run_agent(self.communicator_agent, communicator_input)
+            communicator_result = await self.run_agent(self.communicator_agent, communicator_input, stage="communicator")
             
             # Write the result, not the coroutine
             with open(f"{log_dir}/communicator_output.json", 'w') as f:
@@ -619,7 +751,7 @@ class Orchestrator:
             
             try:
                 # FIXED: Await the coroutine before trying to use its result
-                communicator_result = await self.run_agent(self.communicator_agent, communicator_input)
+                communicator_result = await self.run_agent(self.communicator_agent, communicator_input, stage="communicator")
                 
                 # Ensure the result is serializable before writing
                 serializable_result = self._ensure_json_serializable(communicator_result)
@@ -647,19 +779,31 @@ class Orchestrator:
             logger.error(f"Error escalating ticket {ticket_id}: {str(e)}")
             logger.error(traceback.format_exc())
     
-    async def run_agent(self, agent, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def run_agent(
+        self, 
+        agent, 
+        input_data: Dict[str, Any], 
+        stage: Optional[str] = None, 
+        isolated: bool = False
+    ) -> Dict[str, Any]:
         """Run an agent and ensure we get a usable result back
         
-        This wrapper handles both regular functions and async functions (coroutines)
+        This wrapper handles both regular functions and async functions (coroutines).
+        Synchronous agents run in the executor's pool for the stage so they never
+        block the event loop. When a stage is given, the call also waits for a free
+        slot in that stage's concurrency limit so parallel tickets don't overload a
+        single agent. Set isolated to give a process-pool call its own worker so
+        cancelling it can't affect other tickets.
         """
+        semaphore = self.stage_semaphores.get(stage) if stage else None
         try:
-            # Call the agent's run method
-            if asyncio.iscoroutinefunction(agent.run):
-                # If it's async, await it
-                result = await agent.run(input_data)
-            else:
-                # If it's synchronous, just call it directly
-                result = agent.run(input_data)
+            if semaphore:
+                await semaphore.acquire()
+            try:
+                result = await self.executor.run(agent, input_data, agent_type=stage or "default", isolated=isolated)
+            finally:
+                if semaphore:
+                    semaphore.release()
             
             return result
         except Exception as e:
@@ -684,10 +828,29 @@ class Orchestrator:
         """Get current status of the orchestrator"""
         status = {
             "active_tickets": self.active_tickets,
-            "agent_statuses": self.get_agent_statuses()
+            "agent_statuses": self.get_agent_statuses(),
+            "scheduler": self.get_scheduler_status(),
+            "executor": self.executor.get_status(),
+            "leases": self.ingestion.store.get_leases()
         }
         return status
     
+    def get_scheduler_status(self) -> Dict[str, Any]:
+        """Get worker pool, queue and per-stage concurrency information"""
+        return {
+            "workers": self.max_workers,
+            "running_workers": len([w for w in self.workers if not w.done()]),
+            "queued_tickets": sorted(self.queued_tickets),
+            "queue_size": self.ticket_queue.qsize(),
+            "stages": {
+                stage: {
+                    "limit": self.stage_limits[stage],
+                    "available": self.stage_semaphores[stage]._value
+                }
+                for stage in self.stage_limits
+            }
+        }
+    
     def get_agent_statuses(self) -> Dict[str, str]:
         """Get statuses of all agents for health check"""
         return {
@@ -697,30 +860,113 @@ class Orchestrator:
             "communicator": self.communicator_agent.status.value
         }
 
-    async def run_forever(self):
-        """Run the orchestrator in an infinite loop, processing tickets"""
-        logger.info("Starting orchestrator polling loop")
+    def enqueue_ticket(self, ticket: Dict[str, Any]) -> bool:
+        """Queue a ticket for the worker pool
+        
+        Returns False if the ticket is invalid, already queued, active or processed.
+        """
+        if not ticket or not isinstance(ticket, dict):
+            logger.error("Invalid ticket object: not a dictionary or None")
+            return False
+            
+        ticket_id = ticket.get("ticket_id")
+        if not ticket_id:
+            logger.error("Invalid ticket: missing ticket_id")
+            return False
+            
+        if (ticket_id in self.queued_tickets or ticket_id in self.active_tickets
+                or ticket_id in self.processed_tickets):
+            logger.debug(f"Ticket {ticket_id} is already queued or processed, not queueing")
+            return False
+            
+        # Record the ticket durably; refuse tickets that finished before a restart
+        if not self.work_queue.enqueue(ticket):
+            logger.info(f"Ticket {ticket_id} already finished in a previous run, not queueing")
+            self.processed_tickets.add(ticket_id)
+            return False
+            
+        self.queued_tickets.add(ticket_id)
+        self.ticket_queue.put_nowait(ticket)
+        logger.info(f"Queued ticket {ticket_id} ({self.ticket_queue.qsize()} waiting)")
+        return True
+    
+    async def _ticket_worker(self, worker_id: int) -> None:
+        """Take tickets off the queue and run them through the pipeline one at a time"""
+        logger.info(f"Ticket worker {worker_id} started")
         
         while True:
+            ticket = await self.ticket_queue.get()
+            ticket_id = ticket.get("ticket_id")
             try:
-                # Fetch eligible tickets
-                tickets = await self.fetch_eligible_tickets()
-                
-                if tickets:
-                    logger.info(f"Found {len(tickets)} eligible tickets to process")
-                    
-                    # Process each ticket
-                    for ticket in tickets:
-                        await self.process_ticket(ticket)
-                else:
-                    logger.debug("No eligible tickets found")
-                
-                # Wait for next poll interval
-                await asyncio.sleep(POLL_INTERVAL_SECONDS)
-                
+                logger.info(f"Worker {worker_id} picked up ticket {ticket_id}")
+                await self.process_ticket(ticket)
             except Exception as e:
-                logger.error(f"Error in orchestrator main loop: {str(e)}")
+                # process_ticket handles its own errors; this keeps the worker alive regardless
+                logger.error(f"Worker {worker_id} failed on ticket {ticket_id}: {str(e)}")
                 logger.error(traceback.format_exc())
-                
-                # Don't crash, just wait and try again
-                await asyncio.sleep(POLL_INTERVAL_SECONDS)
\ No newline at end of file
+            finally:
+                self.queued_tickets.discard(ticket_id)
+                self.ticket_queue.task_done()
+    
+    def resume_pending_tickets(self) -> int:
+        """Re-queue tickets that were queued or in progress when the process last stopped"""
+        resumed = 0
+        for ticket in self.work_queue.pending_tickets():
+            if self.enqueue_ticket(ticket):
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished ticket(s) from the work queue")
+        return resumed
+    
+    def start_workers(self) -> None:
+        """Start the ticket worker pool if it isn't already running"""
+        self.workers = [w for w in self.workers if not w.done()]
+        for worker_id in range(len(self.workers), self.max_workers):
+            self.workers.append(asyncio.create_task(self._ticket_worker(worker_id + 1)))
+    
+    async def stop_workers(self) -> None:
+        """Cancel all ticket workers and wait for them to exit"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def run_forever(self):
+        """Run the orchestrator in an infinite loop, feeding tickets to the worker pool"""
+        logger.info(f"Starting orchestrator polling loop with {self.max_workers} ticket workers")
+        self.start_workers()
+        self.resume_pending_tickets()
+        
+        try:
+            while True:
+                try:
+                    # Fetch eligible tickets
+                    tickets = await self.fetch_eligible_tickets()
+                    
+                    if tickets:
+                        logger.info(f"Found {len(tickets)} eligible tickets to process")
+                        
+                        # Hand each ticket to the worker pool, returning leases we can't use
+                        for ticket in tickets:
+                            if not self.enqueue_ticket(ticket):
+                                ticket_id = ticket.get("ticket_id")
+                                if ticket_id not in self.queued_tickets and ticket_id not in self.active_tickets:
+                                    self.ingestion.release(ticket_id, completed=ticket_id in self.processed_tickets)
+                    else:
+                        logger.debug("No eligible tickets found")
+                    
+                    # Wait for next poll interval
+                    await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                    
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error in orchestrator main loop: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    
+                    # Don't crash, just wait and try again
+                    await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        finally:
+            await self.stop_workers()
+            self.ingestion.release_all()
+            self.executor.shutdown()
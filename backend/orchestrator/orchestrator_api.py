@@ -3,7 +3,7 @@ from fastapi import FastAPI, HTTPException
 import uvicorn
 import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pydantic import BaseModel
 import os
 import sys
@@ -145,22 +145,30 @@ async def process_ticket(request: TicketRequest):
     # Convert to dict for processing
     ticket_dict = request.dict()
     
-    # Check if ticket is already being processed
-    if request.ticket_id in orchestrator.active_tickets:
+    # Hand the ticket to the worker pool; refuse duplicates
+    if not orchestrator.enqueue_ticket(ticket_dict):
         raise HTTPException(
             status_code=409, 
-            detail=f"Ticket {request.ticket_id} is already being processed"
+            detail=f"Ticket {request.ticket_id} is already queued or being processed"
         )
     
-    # Create task to process the ticket
-    asyncio.create_task(orchestrator.process_ticket(ticket_dict))
-    
     return {
-        "message": f"Started processing ticket {request.ticket_id}",
-        "status": "processing",
+        "message": f"Queued ticket {request.ticket_id} for processing",
+        "status": "queued",
         "ticketId": request.ticket_id
     }
 
 
+@app.delete("/planner-cache")
+async def invalidate_planner_cache(ticket_id: Optional[str] = None):
+    """Drop cached planner results for one ticket, or the whole cache if no ticket is given"""
+    cache = orchestrator.planner_agent.cache
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Planner cache is disabled")
+    
+    removed = cache.invalidate(ticket_id=ticket_id)
+    return {"removed": removed, "ticketId": ticket_id}
+
+
 if __name__ == "__main__":
     uvicorn.run("orchestrator_api:app", host="0.0.0.0", port=8000, reload=True)
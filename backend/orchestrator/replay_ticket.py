@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Run one ticket through Orchestrator.process_ticket on recorded HTTP fixtures.
+
+Record a run once, with network access and real credentials:
+
+    python orchestrator/replay_ticket.py record ticket.json --fixtures data/replays/BUG-1
+
+then replay it as often as needed without network or credentials, e.g. to
+benchmark or profile the orchestrator:
+
+    python orchestrator/replay_ticket.py replay --fixtures data/replays/BUG-1 --latency-scale 0 --profile out.prof
+
+The ticket and the non-secret settings that end up in request URLs and bodies
+(JIRA site, repository, models) are saved with the fixtures, so a replay sends
+the same requests. Each run keeps its queue, lease, cache and rate limit state
+in a fresh temporary directory, so every call of the run goes over HTTP and is
+recorded, and a replay doesn't find the ticket already finished.
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings saved with a recording because they change the requests
+RECORDED_SETTINGS = [
+    "JIRA_URL", "JIRA_PROJECT_KEY", "GITHUB_REPO_OWNER", "GITHUB_REPO_NAME", "GITHUB_DEFAULT_BRANCH",
+    "PLANNER_MODEL", "OPENAI_MODEL", "LLM_MODEL_TIERS", "LLM_CASCADE_ENABLED", "SPECULATIVE_CANDIDATES",
+]
+
+# Stand-ins for the credentials the clients require; replayed requests never reach a server
+REPLAY_CREDENTIALS = {
+    "OPENAI_API_KEY": "replay",
+    "JIRA_USERNAME": "replay",
+    "JIRA_API_TOKEN": "replay",
+    "GITHUB_TOKEN": "replay",
+}
+
+
+def prepare_environment(mode: str, fixtures: str, state_dir: str, ticket_path: str = None,
+                        latency_scale: float = None) -> dict:
+    """
+    Set the environment for a recorded or replayed run; must happen before the orchestrator is imported
+
+    Args:
+        mode: "record" or "replay"
+        fixtures: Fixture directory of the run
+        state_dir: Empty directory for the run's local state
+        ticket_path: Ticket JSON file to record
+        latency_scale: Factor for the recorded response times in replay
+
+    Returns:
+        The ticket to process
+    """
+    run_path = os.path.join(fixtures, "run.json")
+    if mode == "record":
+        with open(ticket_path) as f:
+            ticket = json.load(f)
+        os.makedirs(fixtures, exist_ok=True)
+        with open(run_path, "w") as f:
+            settings = {name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ}
+            json.dump({"ticket": ticket, "settings": settings}, f, indent=2)
+    else:
+        with open(run_path) as f:
+            run = json.load(f)
+        ticket = run["ticket"]
+        for name, value in {**run.get("settings", {}), **REPLAY_CREDENTIALS}.items():
+            os.environ.setdefault(name, value)
+        if latency_scale is not None:
+            os.environ["HTTP_REPLAY_LATENCY_SCALE"] = str(latency_scale)
+
+    os.environ["HTTP_REPLAY_MODE"] = mode
+    os.environ["HTTP_REPLAY_DIR"] = fixtures
+    # Nothing may be answered from a local cache or skipped as already done
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["PLANNER_CACHE_DB"] = os.path.join(state_dir, "planner_cache.db")
+    os.environ["GITHUB_CACHE_DIR"] = os.path.join(state_dir, "github_cache")
+    os.environ["WORK_QUEUE_DIR"] = state_dir
+    os.environ["TICKET_LEASE_DB"] = os.path.join(state_dir, "ticket_leases.db")
+    os.environ["JIRA_POLL_STATE_DIR"] = state_dir
+    os.environ["NOTIFICATION_OUTBOX_DB"] = os.path.join(state_dir, "notification_outbox.db")
+    os.environ["RATE_LIMIT_STATE_DIR"] = os.path.join(state_dir, "rate_limits")
+    return ticket
+
+
+async def process_ticket(ticket: dict) -> float:
+    """Process the ticket with a new orchestrator and return the seconds it took"""
+    from orchestrator.orchestrator import Orchestrator
+
+    orchestrator = Orchestrator()
+    started = time.perf_counter()
+    await orchestrator.process_ticket(ticket)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay one ticket's run of the orchestrator")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("ticket", nargs="?", help="Ticket JSON file (record only)")
+    parser.add_argument("--fixtures", required=True, help="Directory of the run's fixtures")
+    parser.add_argument("--latency-scale", type=float, help="Factor for the recorded response times (replay only)")
+    parser.add_argument("--profile", help="Write cProfile statistics of the run to this file")
+    args = parser.parse_args()
+    if args.mode == "record" and not args.ticket:
+        parser.error("record needs a ticket JSON file")
+
+    os.makedirs("logs", exist_ok=True)
+    with tempfile.TemporaryDirectory() as state_dir:
+        ticket = prepare_environment(args.mode, args.fixtures, state_dir, args.ticket, args.latency_scale)
+
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        seconds = asyncio.run(process_ticket(ticket))
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    print(f"{args.mode}: processed ticket {ticket.get('ticket_id')} in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,25 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from orchestrator.orchestrator import Orchestrator
 from agent_framework.agent_base import AgentStatus
+from work_queue import WorkQueue
+from ticket_ingestion import TicketIngestion, TicketLeaseStore
 
 # Ensure we have subprocess available for mocking
 import subprocess
 
 
+@pytest.fixture
+def work_queue(tmp_path):
+    """Create a work queue backed by a temporary database"""
+    return WorkQueue(str(tmp_path / "work_queue.db"))
+
+
+@pytest.fixture
+def lease_store(tmp_path):
+    """Create a ticket lease store backed by a temporary database"""
+    return TicketLeaseStore(str(tmp_path / "leases.db"))
+
+
 @pytest.fixture
 def mock_jira_client():
     """Create a mock JIRA client"""
@@ -29,6 +43,8 @@ def mock_jira_client():
     ])
     mock.add_comment = AsyncMock(return_value=True)
     mock.update_ticket = AsyncMock(return_value=True)
+    mock.update_progress = AsyncMock(return_value=True)
+    mock.flush_progress = AsyncMock(return_value=True)
     return mock
 
 
@@ -277,5 +293,206 @@ async def test_acquire_ticket_lock():
         temp_dir.cleanup()
 
 
+
+@pytest.mark.asyncio
+async def test_enqueue_ticket_deduplicates(work_queue):
+    """Test that a ticket is only queued once while waiting, active or processed"""
+    orchestrator = Orchestrator()
+    orchestrator.work_queue = work_queue
+    ticket = {"ticket_id": "BUG-200", "title": "Queued Bug", "description": ""}
+    
+    assert orchestrator.enqueue_ticket(ticket) == True
+    assert orchestrator.enqueue_ticket(ticket) == False
+    assert orchestrator.ticket_queue.qsize() == 1
+    
+    orchestrator.processed_tickets.add("BUG-201")
+    assert orchestrator.enqueue_ticket({"ticket_id": "BUG-201"}) == False
+    assert orchestrator.enqueue_ticket({"title": "No id"}) == False
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_processes_tickets_concurrently(work_queue):
+    """Test that the worker pool runs several tickets at once, bounded by max_workers"""
+    orchestrator = Orchestrator()
+    orchestrator.work_queue = work_queue
+    orchestrator.max_workers = 2
+    
+    running = 0
+    peak = 0
+    
+    async def fake_process_ticket(ticket):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        orchestrator.processed_tickets.add(ticket["ticket_id"])
+    
+    orchestrator.process_ticket = fake_process_ticket
+    
+    for i in range(4):
+        orchestrator.enqueue_ticket({"ticket_id": f"BUG-3{i}"})
+    
+    orchestrator.start_workers()
+    try:
+        await asyncio.wait_for(orchestrator.ticket_queue.join(), timeout=5)
+    finally:
+        await orchestrator.stop_workers()
+    
+    assert peak == 2
+    assert len(orchestrator.processed_tickets) == 4
+    assert not orchestrator.queued_tickets
+
+
+@pytest.mark.asyncio
+async def test_run_agent_respects_stage_limit():
+    """Test that run_agent never exceeds the configured concurrency for a stage"""
+    orchestrator = Orchestrator()
+    orchestrator.stage_limits["qa"] = 1
+    orchestrator.stage_semaphores["qa"] = asyncio.Semaphore(1)
+    
+    running = 0
+    peak = 0
+    
+    class SlowAgent:
+        async def run(self, input_data):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return {"passed": True}
+    
+    agent = SlowAgent()
+    results = await asyncio.gather(*[orchestrator.run_agent(agent, {}, stage="qa") for _ in range(3)])
+    
+    assert peak == 1
+    assert all(result["passed"] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_resume_reuses_saved_planner_and_developer_output(work_queue, lease_store, mock_jira_client, tmp_path, monkeypatch):
+    """Test that a ticket resumed after a restart doesn't re-run saved planner/developer calls"""
+    monkeypatch.chdir(tmp_path)
+    orchestrator = Orchestrator()
+    orchestrator.work_queue = work_queue
+    orchestrator.ingestion = TicketIngestion("orchestrator-test", store=lease_store)
+    orchestrator.jira_client = mock_jira_client
+    orchestrator.finalize_successful_fix = AsyncMock()
+    
+    # State left behind by a crash after the developer finished attempt 1
+    ticket = {"ticket_id": "BUG-400", "title": "Resumed Bug", "description": "", "status": "In Progress"}
+    work_queue.enqueue(ticket)
+    work_queue.set_status("BUG-400", "processing")
+    work_queue.save_checkpoint("BUG-400", "planner", {"affected_files": ["app.py"], "root_cause": "typo"})
+    work_queue.save_checkpoint("BUG-400", "developer", {"patch_content": "saved patch", "confidence_score": 90}, 1)
+    
+    class FailIfCalled:
+        def run(self, input_data):
+            raise AssertionError("agent output was already saved")
+    
+    class PassingQA:
+        async def run(self, input_data):
+            return {"passed": True}
+    
+    orchestrator.planner_agent = FailIfCalled()
+    orchestrator.developer_agent = FailIfCalled()
+    orchestrator.qa_agent = PassingQA()
+    
+    assert orchestrator.resume_pending_tickets() == 1
+    await orchestrator.process_ticket(orchestrator.ticket_queue.get_nowait())
+    
+    developer_result = orchestrator.finalize_successful_fix.call_args[0][2]
+    assert developer_result["patch_content"] == "saved patch"
+    assert work_queue.get_checkpoint("BUG-400", "qa", 1) == {"passed": True}
+    mock_jira_client.flush_progress.assert_awaited_once_with("BUG-400")
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_processing_between_stages(work_queue, lease_store, mock_jira_client, tmp_path, monkeypatch):
+    """Test that a worker whose lease was taken over stops before the next stage and leaves the ticket alone"""
+    monkeypatch.chdir(tmp_path)
+    orchestrator = Orchestrator()
+    orchestrator.work_queue = work_queue
+    orchestrator.ingestion = TicketIngestion("orchestrator-test", store=lease_store)
+    orchestrator.jira_client = mock_jira_client
+    
+    class PlannerLosingLease:
+        def run(self, input_data):
+            # Another consumer takes the ticket over while the planner runs
+            orchestrator.lease_heartbeats["BUG-600"].lost = True
+            return {"affected_files": ["app.py"], "root_cause": "typo"}
+    
+    class FailIfCalled:
+        def run(self, input_data):
+            raise AssertionError("stage ran after the lease was lost")
+    
+    orchestrator.planner_agent = PlannerLosingLease()
+    orchestrator.developer_agent = FailIfCalled()
+    orchestrator.qa_agent = FailIfCalled()
+    
+    await orchestrator.process_ticket({"ticket_id": "BUG-600", "title": "Taken over", "status": "In Progress"})
+    
+    assert orchestrator.active_tickets["BUG-600"]["status"] == "lease_lost"
+    assert not work_queue.is_finished("BUG-600")
+    mock_jira_client.update_ticket.assert_not_called()
+    mock_jira_client.flush_progress.assert_not_called()
+    assert "BUG-600" not in orchestrator.lease_heartbeats
+
+@pytest.mark.asyncio
+async def test_low_confidence_first_attempt_escalates_early(work_queue, lease_store, mock_jira_client, tmp_path, monkeypatch):
+    """Test that a low-confidence failed first attempt escalates even while a stronger model tier is left"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("model_router.LLM_CASCADE_ENABLED", True)
+    orchestrator = Orchestrator()
+    orchestrator.work_queue = work_queue
+    orchestrator.ingestion = TicketIngestion("orchestrator-test", store=lease_store)
+    orchestrator.jira_client = mock_jira_client
+    orchestrator.escalate_ticket = AsyncMock()
+    
+    class LowConfidenceDeveloper:
+        def run(self, input_data):
+            return {"patch_content": "patch", "confidence_score": 30}
+    
+    class FailingQA:
+        async def run(self, input_data):
+            return {"passed": False, "failure_summary": "AssertionError"}
+    
+    orchestrator.developer_agent = LowConfidenceDeveloper()
+    orchestrator.qa_agent = FailingQA()
+    orchestrator.active_tickets["BUG-700"] = {"current_attempt": 0}
+    os.makedirs("logs/BUG-700")
+    
+    routing = {"models": ["gpt-4o-mini", "gpt-4o"], "tier": 0}
+    await orchestrator.run_development_qa_loop("BUG-700", {"affected_files": ["app.py"], "model_routing": routing})
+    
+    orchestrator.escalate_ticket.assert_awaited_once()
+    assert orchestrator.escalate_ticket.call_args.kwargs["early"] is True
+    assert orchestrator.active_tickets["BUG-700"]["current_attempt"] == 1
+
+@pytest.mark.asyncio
+async def test_fetch_eligible_tickets_leases_from_shared_ingestion(work_queue, lease_store):
+    """Test that tickets come from one shared poll and are leased to a single orchestrator"""
+    fetch = AsyncMock(return_value=[
+        {"ticket_id": "BUG-500", "status": "To Do"},
+        {"ticket_id": "BUG-501", "status": "In Progress"},
+        {"ticket_id": "BUG-502", "status": "To Do"},
+    ])
+    first = Orchestrator()
+    second = Orchestrator()
+    for n, orchestrator in enumerate((first, second)):
+        orchestrator.work_queue = work_queue
+        orchestrator.ingestion = TicketIngestion(f"orchestrator-{n}", store=lease_store, fetch=fetch, poll_interval=60)
+    first.max_workers = 1
+    
+    leased_first = await first.fetch_eligible_tickets()
+    leased_second = await second.fetch_eligible_tickets()
+    
+    # JIRA was polled once; In Progress tickets are left for jira_service
+    fetch.assert_called_once()
+    assert [t["ticket_id"] for t in leased_first] == ["BUG-500"]
+    assert [t["ticket_id"] for t in leased_second] == ["BUG-502"]
+    assert lease_store.get_leases()["BUG-500"]["owner"] == "orchestrator-0"
+
 if __name__ == "__main__":
     pytest.main(["-xvs", __file__])
\ No newline at end of file
@@ -0,0 +1,360 @@
+"""
+Shared token-bucket rate limiting for JIRA, GitHub and OpenAI.
+
+Each client used to find out about provider limits only by hitting them: the
+JIRA clients ignored 429s, the GitHub clients ignored X-RateLimit-Remaining and
+the OpenAI client slept 2**attempt on RateLimitError. Under load every worker
+hit the wall at once and then retried at once.
+
+There is one token bucket per provider and credential. Every request takes a
+token first and waits if the bucket is empty. Responses feed back into the
+bucket: a remaining count from the provider caps the tokens, an exhausted
+budget or a 429 blocks the bucket until the reset time or Retry-After, and a
+429 without either backs off exponentially.
+
+Bucket state is kept in a small JSON file per bucket under
+RATE_LIMIT_STATE_DIR, locked with flock while it is read and updated, so all
+processes on a host that share the directory share one budget. Point the
+setting at a shared volume to include several containers. Where flock isn't
+available, or the file can't be used, the bucket falls back to per-process
+state.
+
+The module only uses the standard library so the agents can use it too; the
+agent images carry an identical copy as agents/utils/rate_limiter.py.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are per process
+    fcntl = None
+
+logger = logging.getLogger("rate-limiter")
+
+# Set to false to send requests without client-side limiting
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Directory for shared bucket state; empty keeps buckets per process
+RATE_LIMIT_STATE_DIR = os.environ.get("RATE_LIMIT_STATE_DIR", os.path.join(tempfile.gettempdir(), "bugfix-ai-rate-limits"))
+
+# Longest a request waits for a token before going ahead anyway
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "300"))
+
+# Backoff after a 429 that says nothing about when to retry: base * 2^(strikes - 1), capped
+RATE_LIMIT_BACKOFF_SECONDS = float(os.environ.get("RATE_LIMIT_BACKOFF_SECONDS", "2"))
+RATE_LIMIT_MAX_BACKOFF_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_BACKOFF_SECONDS", "120"))
+
+# Requests per minute and burst size per provider. Override with
+# RATE_LIMIT_<PROVIDER>_PER_MINUTE and RATE_LIMIT_<PROVIDER>_BURST.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "jira": (300, 20),
+    # 5000 requests per hour for a token
+    "github": (80, 20),
+    "openai": (500, 10),
+    # Tokens rather than requests: prompt plus max_tokens, as OpenAI counts them
+    "openai_tokens": (30000, 30000),
+}
+FALLBACK_RATE_LIMIT: Tuple[float, float] = (60, 10)
+
+# Header names, lower case. OpenAI reports per-request budgets with a -requests suffix.
+REMAINING_HEADERS = ("x-ratelimit-remaining", "x-ratelimit-remaining-requests")
+RESET_HEADERS = ("x-ratelimit-reset", "x-ratelimit-reset-requests")
+
+# Providers whose budget is reported under other headers: (remaining, reset)
+PROVIDER_HEADERS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "openai_tokens": (("x-ratelimit-remaining-tokens",), ("x-ratelimit-reset-tokens",)),
+}
+
+# Durations such as "6m0s", "1.5s" or "20ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header
+
+    Args:
+        value: Delay in seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value: Optional[str], now: float = None) -> Optional[float]:
+    """
+    Parse a rate limit reset header into an absolute time
+
+    GitHub sends epoch seconds, JIRA an ISO 8601 timestamp and OpenAI a
+    duration such as "6m0s".
+
+    Args:
+        value: Header value
+        now: Current time, defaults to time.time()
+
+    Returns:
+        Epoch seconds when the budget resets, or None if the value is missing or malformed
+    """
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    value = value.strip()
+    try:
+        number = float(value)
+        # Small numbers are a delay, large ones a Unix timestamp
+        return number if number > 1e9 else now + number
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(amount + unit for amount, unit in parts) == value:
+        return now + sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return reset_at.timestamp()
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Token bucket whose state can be shared between processes through a locked file"""
+
+    def __init__(self, name: str, per_minute: float, burst: float, state_path: str = None,
+                 remaining_headers: Tuple[str, ...] = REMAINING_HEADERS, reset_headers: Tuple[str, ...] = RESET_HEADERS):
+        """
+        Initialize the bucket
+
+        Args:
+            name: Bucket name, used in logs
+            per_minute: Sustained requests per minute
+            burst: Most requests that can be sent back to back
+            state_path: Shared state file. None keeps the state in this process.
+            remaining_headers: Lower-case headers carrying the provider's remaining budget
+            reset_headers: Lower-case headers carrying when that budget resets
+        """
+        self.name = name
+        self.remaining_headers = remaining_headers
+        self.reset_headers = reset_headers
+        self.rate = max(per_minute, 0.001) / 60.0
+        self.capacity = max(burst, 1.0)
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._memory_state = self._initial_state()
+
+    def _initial_state(self) -> Dict[str, float]:
+        return {"tokens": self.capacity, "updated_at": time.time(), "blocked_until": 0.0, "strikes": 0}
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, float]]:
+        """Yield the bucket state for update, holding the thread and file locks"""
+        with self._lock:
+            if not self.state_path or fcntl is None:
+                yield self._memory_state
+                return
+            try:
+                os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+                f = open(self.state_path, "a+")
+            except OSError as e:
+                logger.warning(f"Couldn't open rate limit state {self.state_path}, limiting per process: {str(e)}")
+                self.state_path = None
+                yield self._memory_state
+                return
+            with f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "null") or self._initial_state()
+                except json.JSONDecodeError:
+                    state = self._initial_state()
+                yield state
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+
+    def _refill(self, state: Dict[str, float], now: float) -> None:
+        # Nothing refills while the provider has us blocked
+        start = max(state["updated_at"], state["blocked_until"])
+        if now > start:
+            state["tokens"] = min(self.capacity, state["tokens"] + (now - start) * self.rate)
+        state["updated_at"] = max(now, state["updated_at"])
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """
+        Take tokens
+
+        The tokens are taken even when the bucket is empty, so concurrent callers
+        queue up behind each other instead of all retrying at the same moment.
+
+        Args:
+            cost: Tokens to take; 1 for buckets counting requests
+
+        Returns:
+            Seconds the caller must wait before sending its request
+        """
+        if not RATE_LIMIT_ENABLED:
+            return 0.0
+        now = time.time()
+        with self._state() as state:
+            self._refill(state, now)
+            state["tokens"] -= cost
+            wait = max(0.0, state["blocked_until"] - now) + max(0.0, -state["tokens"]) / self.rate
+        if wait > RATE_LIMIT_MAX_WAIT_SECONDS:
+            logger.warning(f"Rate limit {self.name} asks for a {wait:.0f}s wait, sending after {RATE_LIMIT_MAX_WAIT_SECONDS:.0f}s")
+            wait = RATE_LIMIT_MAX_WAIT_SECONDS
+        return wait
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """
+        Wait for tokens, blocking the thread
+
+        Args:
+            cost: Tokens to take
+
+        Returns:
+            Seconds waited
+        """
+        wait = self.reserve(cost)
+        if wait > 0:
+            logger.info(f"Rate limit {self.name}: waiting {wait:.1f}s")
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, cost: float = 1.0) -> float:
+        """
+        Wait for tokens without blocking the event loop
+
+        Args:
+            cost: Tokens to take
+
+        Returns:
+            Seconds waited
+        """
+        wait = self.reserve(cost)
+        if wait > 0:
+            logger.info(f"Rate limit {self.name}: waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_response(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        Update the bucket from a provider response
+
+        Args:
+            status_code: HTTP status of the response
+            headers: Response headers
+        """
+        if not RATE_LIMIT_ENABLED:
+            return
+        now = time.time()
+        headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+        remaining = None
+        for name in self.remaining_headers:
+            try:
+                remaining = float(headers[name])
+                break
+            except (KeyError, TypeError, ValueError):
+                continue
+        reset_at = next((parse_reset(headers[name], now) for name in self.reset_headers if name in headers), None)
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        # GitHub answers 403 rather than 429 when the primary budget is exhausted
+        limited = status_code == 429 or (status_code == 403 and remaining == 0)
+
+        with self._state() as state:
+            self._refill(state, now)
+            if remaining is not None:
+                state["tokens"] = min(state["tokens"], remaining)
+            block_until = None
+            if retry_after is not None and (limited or status_code == 503):
+                block_until = now + retry_after
+            elif (limited or remaining == 0) and reset_at is not None:
+                block_until = reset_at
+            elif limited:
+                backoff = RATE_LIMIT_BACKOFF_SECONDS * (2 ** state["strikes"])
+                block_until = now + min(backoff, RATE_LIMIT_MAX_BACKOFF_SECONDS)
+
+            if limited:
+                state["strikes"] += 1
+                state["tokens"] = min(state["tokens"], 0.0)
+            elif status_code < 400:
+                state["strikes"] = 0
+            if block_until is not None and block_until > state["blocked_until"]:
+                state["blocked_until"] = block_until
+                logger.warning(f"Rate limit {self.name} reached (HTTP {status_code}), holding requests for {block_until - now:.1f}s")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the bucket's current tokens and block, for health reporting"""
+        now = time.time()
+        with self._state() as state:
+            self._refill(state, now)
+            return {
+                "name": self.name,
+                "tokens": round(state["tokens"], 2),
+                "capacity": self.capacity,
+                "per_minute": self.rate * 60.0,
+                "blocked_for_seconds": round(max(0.0, state["blocked_until"] - now), 1),
+                "shared": bool(self.state_path) and fcntl is not None,
+            }
+
+
+def get_provider_limits(provider: str) -> Tuple[float, float]:
+    """Get (requests per minute, burst) for a provider, applying environment overrides"""
+    per_minute, burst = DEFAULT_RATE_LIMITS.get(provider, FALLBACK_RATE_LIMIT)
+    prefix = f"RATE_LIMIT_{provider.upper()}"
+    return (float(os.environ.get(f"{prefix}_PER_MINUTE", per_minute)),
+            float(os.environ.get(f"{prefix}_BURST", burst)))
+
+
+# One bucket per provider and credential, shared by every client in the process
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(provider: str, credential: str = "") -> TokenBucket:
+    """
+    Get the shared bucket for a provider and credential
+
+    Args:
+        provider: "jira", "github", "openai" or "openai_tokens"
+        credential: What the provider counts requests against, e.g. the API token.
+            Only a hash of it is used.
+
+    Returns:
+        The bucket, backed by a file in RATE_LIMIT_STATE_DIR when one is configured
+    """
+    digest = hashlib.sha256((credential or "").encode("utf-8")).hexdigest()[:16]
+    name = f"{provider}-{digest}"
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            per_minute, burst = get_provider_limits(provider)
+            state_path = os.path.join(RATE_LIMIT_STATE_DIR, f"{name}.json") if RATE_LIMIT_STATE_DIR else None
+            bucket = TokenBucket(name, per_minute, burst, state_path, *PROVIDER_HEADERS.get(provider, ()))
+            _buckets[name] = bucket
+        return bucket
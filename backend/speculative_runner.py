@@ -0,0 +1,165 @@
+"""
+Speculative execution helpers for the developer/QA loop.
+
+Instead of generating one patch per attempt, K candidate patches are generated
+concurrently with different temperatures and prompt strategies, each is tested
+in its own sandbox, and the first passing candidate wins while the rest are
+cancelled.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("speculative-runner")
+
+# Number of candidate patches per attempt. 1 disables speculative mode.
+SPECULATIVE_CANDIDATES = int(os.environ.get("SPECULATIVE_CANDIDATES", "1"))
+# Temperatures assigned to candidates in order (cycled if there are more candidates)
+SPECULATIVE_TEMPERATURES = [
+    float(t) for t in os.environ.get("SPECULATIVE_TEMPERATURES", "0.2,0.5,0.8").split(",") if t.strip()
+]
+# Root directory for candidate sandboxes
+SANDBOX_ROOT = os.environ.get("SANDBOX_ROOT", os.path.join(tempfile.gettempdir(), "bugfix_ai_sandboxes"))
+
+# Prompt strategies that push candidates towards different fixes
+CANDIDATE_STRATEGIES = [
+    "Make the smallest possible change that fixes the bug.",
+    "Fix the underlying root cause, even if it touches more code.",
+    "Fix the bug and add defensive checks around the failing code path.",
+]
+
+
+def build_candidate_variants(count: int) -> List[Dict[str, Any]]:
+    """
+    Build the generation settings for each candidate
+
+    Args:
+        count: Number of candidates
+
+    Returns:
+        List of dicts with candidate index, temperature and strategy hint
+    """
+    temperatures = SPECULATIVE_TEMPERATURES or [0.2]
+    return [
+        {
+            "candidate": i + 1,
+            "temperature": temperatures[i % len(temperatures)],
+            "strategy": CANDIDATE_STRATEGIES[i % len(CANDIDATE_STRATEGIES)],
+        }
+        for i in range(count)
+    ]
+
+
+async def race_candidates(
+    candidates: List[Callable[[], Awaitable[Any]]],
+    is_winner: Callable[[Any], bool]
+) -> Tuple[Optional[int], Dict[int, Any]]:
+    """
+    Run candidate coroutines concurrently and stop at the first winner
+
+    Args:
+        candidates: Factories returning one coroutine per candidate
+        is_winner: Predicate applied to each finished candidate's result
+
+    Returns:
+        Tuple of (index of the winning candidate or None, results of all candidates
+        that finished, keyed by index). Candidates that raised are left out.
+    """
+    tasks = {asyncio.create_task(factory()): index for index, factory in enumerate(candidates)}
+    results: Dict[int, Any] = {}
+    winner = None
+
+    try:
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Check finished tasks in candidate order so ties go to the lower index
+            for task in sorted(done, key=lambda t: tasks[t]):
+                index = tasks[task]
+                if task.exception() is not None:
+                    logger.error(f"Candidate {index + 1} failed: {str(task.exception())}")
+                    continue
+                results[index] = task.result()
+                if winner is None and is_winner(results[index]):
+                    winner = index
+    finally:
+        # Cancel the losers (or everything, if we were cancelled ourselves)
+        leftover = [task for task in tasks if not task.done()]
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            await asyncio.gather(*leftover, return_exceptions=True)
+            logger.info(f"Cancelled {len(leftover)} remaining candidate(s)")
+
+    return winner, results
+
+
+def select_fallback_candidate(results: Dict[int, Any], confidence_of: Callable[[Any], Optional[float]]) -> Optional[int]:
+    """
+    Pick the candidate to report when none passed: highest confidence, then lowest index
+
+    Args:
+        results: Finished candidate results keyed by index
+        confidence_of: Function extracting a confidence score from a result
+
+    Returns:
+        Index of the chosen candidate, or None if no candidate finished
+    """
+    if not results:
+        return None
+    return min(results, key=lambda index: (-(confidence_of(results[index]) or 0), index))
+
+
+class RepoSandbox:
+    """Isolated copy of a repository for testing one candidate patch"""
+
+    def __init__(self, repo_path: str, name: str):
+        """
+        Args:
+            repo_path: Repository to copy
+            name: Unique sandbox name, e.g. TICKET-1-a1-c2
+        """
+        self.repo_path = repo_path
+        self.path = os.path.join(SANDBOX_ROOT, name)
+        self.uses_worktree = False
+
+    def create(self) -> str:
+        """Create the sandbox and return its path"""
+        if os.path.exists(self.path):
+            self.cleanup()
+        os.makedirs(SANDBOX_ROOT, exist_ok=True)
+
+        # A detached worktree is cheap and keeps git diff working inside the sandbox
+        if os.path.isdir(os.path.join(self.repo_path, ".git")):
+            process = subprocess.run(
+                ["git", "worktree", "add", "--detach", self.path, "HEAD"],
+                cwd=self.repo_path,
+                capture_output=True,
+                text=True
+            )
+            if process.returncode == 0:
+                self.uses_worktree = True
+                return self.path
+            logger.warning(f"git worktree failed, copying repository instead: {process.stderr.strip()}")
+
+        shutil.copytree(self.repo_path, self.path, symlinks=True)
+        return self.path
+
+    def cleanup(self) -> None:
+        """Remove the sandbox"""
+        try:
+            if self.uses_worktree:
+                subprocess.run(
+                    ["git", "worktree", "remove", "--force", self.path],
+                    cwd=self.repo_path,
+                    capture_output=True,
+                    text=True
+                )
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Error removing sandbox {self.path}: {str(e)}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import threading
+import time
+import unittest
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_executor import AgentExecutor, AgentTimeoutError
+
+
+class EchoAgent:
+    """Synchronous agent that records the thread it ran on"""
+
+    def run(self, input_data):
+        return {"echo": input_data["value"], "thread": threading.current_thread().name, "pid": os.getpid()}
+
+
+class SleepyAgent:
+    """Synchronous agent that blocks for the requested number of seconds"""
+
+    def run(self, input_data):
+        time.sleep(input_data.get("seconds", 1))
+        return {"slept": True, "pid": os.getpid()}
+
+
+class StatusAgent:
+    """Synchronous agent that reports its status like the agent framework's agents"""
+
+    def __init__(self):
+        self.status = "pending"
+
+    def run(self, input_data):
+        self.status = "success"
+        return {"pid": os.getpid()}
+
+
+class AsyncAgent:
+    async def run(self, input_data):
+        await asyncio.sleep(0)
+        return {"async": True}
+
+
+class TestAgentExecutor(unittest.TestCase):
+    """Test cases for AgentExecutor"""
+
+    def setUp(self):
+        self.executor = AgentExecutor({
+            "planner": {"kind": "thread", "workers": 2, "timeout": 5},
+            "qa": {"kind": "process", "workers": 1, "timeout": 30},
+            "default": {"kind": "thread", "workers": 2, "timeout": 5},
+        })
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_runs_sync_agent_in_thread_pool(self):
+        """Test that synchronous agents run off the event loop thread"""
+        result = asyncio.run(self.executor.run(EchoAgent(), {"value": 1}, agent_type="planner"))
+        self.assertEqual(result["echo"], 1)
+        self.assertTrue(result["thread"].startswith("planner-agent"))
+
+    def test_event_loop_stays_responsive(self):
+        """Test that a blocking agent doesn't stall other coroutines"""
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            tick_task = asyncio.create_task(ticker())
+            await self.executor.run(SleepyAgent(), {"seconds": 0.3}, agent_type="planner")
+            tick_task.cancel()
+            return ticks
+
+        ticks = asyncio.run(scenario())
+        self.assertGreater(ticks, 5)
+
+    def test_timeout_raises(self):
+        """Test that a call exceeding its timeout raises AgentTimeoutError"""
+        with self.assertRaises(AgentTimeoutError):
+            asyncio.run(self.executor.run(SleepyAgent(), {"seconds": 1}, agent_type="planner", timeout=0.1))
+
+    def test_async_agent(self):
+        """Test that async agents are awaited directly"""
+        result = asyncio.run(self.executor.run(AsyncAgent(), {}, agent_type="planner"))
+        self.assertTrue(result["async"])
+
+    def test_runs_qa_agent_in_process_pool(self):
+        """Test that process-pool agents run in a separate process"""
+        result = asyncio.run(self.executor.run(EchoAgent(), {"value": 2}, agent_type="qa"))
+        self.assertEqual(result["echo"], 2)
+        self.assertNotEqual(result["pid"], os.getpid())
+
+    def test_process_agent_status_reaches_the_parent(self):
+        """Test that the status a process-pool agent sets in the child is applied to the parent's agent"""
+        agent = StatusAgent()
+        result = asyncio.run(self.executor.run(agent, {}, agent_type="qa"))
+        self.assertNotEqual(result["pid"], os.getpid())
+        self.assertEqual(agent.status, "success")
+
+    def test_process_timeout_terminates_worker(self):
+        """Test that a timed out process-pool call is killed and the pool recovers"""
+        with self.assertRaises(AgentTimeoutError):
+            asyncio.run(self.executor.run(SleepyAgent(), {"seconds": 30}, agent_type="qa", timeout=2))
+
+        # Pool is recreated for the next call
+        result = asyncio.run(self.executor.run(EchoAgent(), {"value": 3}, agent_type="qa"))
+        self.assertEqual(result["echo"], 3)
+
+    def test_unknown_agent_type_uses_default_pool(self):
+        """Test that unconfigured agent types fall back to the default pool"""
+        result = asyncio.run(self.executor.run(EchoAgent(), {"value": 4}, agent_type="other"))
+        self.assertTrue(result["thread"].startswith("default-agent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
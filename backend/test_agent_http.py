@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+import unittest
+import sys
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_http import AgentClientPool
+from agent_utils import call_developer_agent
+
+TEST_CONFIG = {
+    "planner": {"url": "http://planner:8001", "timeout": 30.0, "max_connections": 5},
+    "qa": {"url": "http://qa:8003", "timeout": 600.0, "max_connections": 1},
+    "developer": {"url": "http://developer:8002", "timeout": 60.0, "max_connections": 5},
+}
+
+
+class TestAgentClientPool(unittest.TestCase):
+    """Test cases for the pooled agent HTTP clients"""
+
+    def setUp(self):
+        """Record requests made through a mock transport"""
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(200, json={"path": request.url.path})
+
+        self.pool = AgentClientPool(config=TEST_CONFIG, http2=False, transport=httpx.MockTransport(handler))
+
+    def test_client_is_reused_across_calls(self):
+        """Test that every call to an agent goes through the same client"""
+        async def run():
+            first = self.pool.get_client("planner")
+            await self.pool.post("planner", "/analyze", json={"ticket_id": "BUG-1"})
+            await self.pool.post("planner", "/analyze", json={"ticket_id": "BUG-2"})
+            same = self.pool.get_client("planner") is first
+            await self.pool.close()
+            return same, first.is_closed
+
+        same, closed = asyncio.run(run())
+        self.assertTrue(same)
+        self.assertTrue(closed)
+        self.assertEqual([str(r.url) for r in self.requests], ["http://planner:8001/analyze"] * 2)
+
+    def test_per_agent_timeouts(self):
+        """Test that each agent's client gets its own read timeout"""
+        async def run():
+            await self.pool.start()
+            timeouts = {agent: self.pool.get_client(agent).timeout for agent in TEST_CONFIG}
+            await self.pool.close()
+            return timeouts
+
+        timeouts = asyncio.run(run())
+        self.assertEqual(timeouts["planner"].read, 30.0)
+        self.assertEqual(timeouts["qa"].read, 600.0)
+
+    def test_new_event_loop_gets_new_client(self):
+        """Test that a client bound to a finished event loop isn't reused"""
+        async def get():
+            return self.pool.get_client("qa")
+
+        first = asyncio.run(get())
+        second = asyncio.run(get())
+        self.assertIsNot(first, second)
+
+    def test_unknown_agent(self):
+        """Test that asking for an unconfigured agent fails loudly"""
+        async def run():
+            self.pool.get_client("deployer")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+    def test_developer_call_matches_the_generate_fix_endpoint(self):
+        """Test that a candidate's temperature and strategy reach the developer service's /generate-fix"""
+        planner_analysis = {
+            "ticket_id": "BUG-1",
+            "bug_summary": "Total is off by one",
+            "error_type": "IndexError",
+            "affected_files": [{"file": "app.py", "valid": True}, {"file": "gone.py", "valid": False}],
+        }
+        ticket = {"ticket_id": "BUG-1", "description": "Totals are wrong", "priority": "High"}
+
+        async def run():
+            with patch("agent_utils.get_agent_client_pool", return_value=self.pool):
+                result = await call_developer_agent(planner_analysis, 2, ticket=ticket,
+                                                    options={"candidate": 1, "temperature": 0.8, "strategy": "Refactor"})
+            await self.pool.close()
+            return result
+
+        self.assertEqual(asyncio.run(run()), {"path": "/generate-fix"})
+        [request] = self.requests
+        self.assertEqual(request.url.params["attempt"], "2")
+        body = json.loads(request.content)
+        self.assertEqual(body["analysis"]["affected_files"], ["app.py"])
+        self.assertEqual(body["analysis"]["root_cause"], "Total is off by one")
+        self.assertEqual(body["ticket"]["description"], "Totals are wrong")
+        self.assertEqual(body["options"], {"temperature": 0.8, "strategy": "Refactor"})
+
+
+if __name__ == "__main__":
+    unittest.main()
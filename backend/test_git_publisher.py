@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import subprocess
+import tempfile
+import unittest
+import sys
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from github_cache import GitHubResponseCache
+from github_service.async_client import AsyncGitHubClient
+from github_service.git_publisher import GitWorktreePublisher
+from github_service.github_service import GitHubService
+from rate_limiter import TokenBucket
+
+PATCH = """--- a/app.py
++++ b/app.py
+@@ -1 +1 @@
+-print("hello")
++print("hello, world")
+"""
+
+
+def git(*args, cwd=None):
+    """Run a git command and return its output"""
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestGitWorktreePublisher(unittest.TestCase):
+    """Test cases for publishing fixes from a local clone to a bare repository"""
+
+    def setUp(self):
+        """Create a bare "remote" with one commit on main and a clone of it"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.remote = os.path.join(self.temp_dir.name, "remote.git")
+        self.clone = os.path.join(self.temp_dir.name, "code_repo")
+        git("init", "--quiet", "--bare", "--initial-branch=main", self.remote)
+        git("clone", "--quiet", self.remote, self.clone)
+        with open(os.path.join(self.clone, "app.py"), "w") as f:
+            f.write('print("hello")\n')
+        git("add", "app.py", cwd=self.clone)
+        git("-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "--quiet", "-m", "Initial", cwd=self.clone)
+        git("push", "--quiet", "origin", "HEAD:main", cwd=self.clone)
+        self.worktrees = os.path.join(self.temp_dir.name, "worktrees")
+        self.publisher = GitWorktreePublisher(self.clone, token="", worktree_root=self.worktrees)
+
+    def remote_file(self, branch, path):
+        return git("--git-dir", self.remote, "show", f"{branch}:{path}")
+
+    def test_files_are_pushed_as_one_commit(self):
+        """Test that several files land on the new branch in a single commit on top of main"""
+        changes = [{"filename": f"src/f{i}.py", "content": f"x = {i}\n"} for i in range(20)]
+        changes.append({"filename": "app.py", "action": "delete"})
+        sha = self.publisher.publish("fix/bug-1", "Fix BUG-1", file_changes=changes)
+
+        self.assertEqual(git("--git-dir", self.remote, "rev-parse", "fix/bug-1"), sha)
+        self.assertEqual(git("--git-dir", self.remote, "rev-list", "--count", "main..fix/bug-1"), "1")
+        self.assertEqual(self.remote_file("fix/bug-1", "src/f7.py"), "x = 7")
+        self.assertNotIn("app.py", git("--git-dir", self.remote, "ls-tree", "--name-only", "fix/bug-1"))
+        # The shared checkout is untouched and the worktree is gone
+        self.assertEqual(git("status", "--porcelain", cwd=self.clone), "")
+        self.assertEqual(os.listdir(self.worktrees), [])
+        self.assertEqual(len(git("worktree", "list", cwd=self.clone).splitlines()), 1)
+
+    def test_patch_is_applied(self):
+        """Test that a unified diff is applied and pushed"""
+        self.assertTrue(self.publisher.publish("fix/bug-2", "Fix BUG-2", patch=PATCH))
+        self.assertEqual(self.remote_file("fix/bug-2", "app.py"), 'print("hello, world")')
+
+    def test_republishing_builds_on_the_branch(self):
+        """Test that a second attempt is pushed as a fast-forward of the first"""
+        first = self.publisher.publish("fix/bug-3", "Attempt 1", file_changes=[{"filename": "a.py", "content": "1"}])
+        second = self.publisher.publish("fix/bug-3", "Attempt 2", file_changes=[{"filename": "a.py", "content": "2"}])
+        self.assertEqual(git("--git-dir", self.remote, "rev-parse", "fix/bug-3^"), first)
+        self.assertEqual(git("--git-dir", self.remote, "rev-parse", "fix/bug-3"), second)
+
+    def test_failures_return_none(self):
+        """Test that a bad patch, an escaping path or an empty fix publishes nothing"""
+        self.assertIsNone(self.publisher.publish("fix/bug-4", "Fix", patch=PATCH.replace("hello", "bye")))
+        self.assertIsNone(self.publisher.publish("fix/bug-4", "Fix", file_changes=[
+            {"filename": "../outside.py", "content": "x"}]))
+        self.assertIsNone(self.publisher.publish("fix/bug-4", "Fix", file_changes=[
+            {"filename": "app.py", "content": 'print("hello")\n'}]))
+        self.assertEqual(git("--git-dir", self.remote, "branch", "--list", "fix/bug-4"), "")
+        self.assertEqual(os.listdir(self.worktrees), [])
+
+    def test_concurrent_publishes(self):
+        """Test that tickets published at the same time each get their own branch"""
+        async def run():
+            return await asyncio.gather(*(
+                self.publisher.publish_async(f"fix/bug-{i}", f"Fix {i}", [{"filename": f"f{i}.py", "content": str(i)}])
+                for i in range(10, 14)
+            ))
+
+        self.assertTrue(all(asyncio.run(run())))
+        for i in range(10, 14):
+            self.assertEqual(self.remote_file(f"fix/bug-{i}", f"f{i}.py"), str(i))
+
+    def test_service_only_calls_github_for_the_pr(self):
+        """Test that GitHubService pushes with git and makes a single API request"""
+        requests = []
+
+        def handle(request):
+            requests.append(f"{request.method} {request.url.path}")
+            return httpx.Response(201, json={"html_url": "https://github.com/acme/app/pull/9", "number": 9})
+
+        env = {"GITHUB_TOKEN": "t", "GITHUB_REPO_OWNER": "acme", "GITHUB_REPO_NAME": "app"}
+        with patch.dict(os.environ, env), patch("github_service.github_service.GIT_PUBLISH_BACKEND", "git"):
+            service = GitHubService()
+            service.client = AsyncGitHubClient(transport=httpx.MockTransport(handle))
+            service.client.rate_limiter = TokenBucket("test", per_minute=60000, burst=100)
+            service.client.cache = GitHubResponseCache(cache_dir="")
+            service.publisher = self.publisher
+            changes = [{"filename": f"src/f{i}.py", "content": str(i)} for i in range(10)]
+            pr = asyncio.run(service.publish_fix("BUG-5", changes))
+
+        self.assertEqual(pr, {"url": "https://github.com/acme/app/pull/9", "number": 9, "branch": "fix/bug-5"})
+        self.assertEqual(requests, ["POST /repos/acme/app/pulls"])
+        self.assertEqual(self.remote_file("fix/bug-5", "src/f3.py"), "3")
+
+    def test_agents_copy_is_in_sync(self):
+        """Test that the copy the CommunicatorAgent publishes with matches this one"""
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(backend_dir, "github_service", "git_publisher.py")) as f:
+            backend_copy = f.read()
+        with open(os.path.join(backend_dir, "..", "agents", "utils", "git_publisher.py")) as f:
+            self.assertEqual(f.read(), backend_copy)
+
+
+if __name__ == "__main__":
+    unittest.main()
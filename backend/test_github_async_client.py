@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+import unittest
+import sys
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from github_cache import GitHubResponseCache
+from github_service.async_client import AsyncGitHubClient
+from github_service.github_service import GitHubService
+from rate_limiter import TokenBucket
+
+
+class FakeGitHub:
+    """Answers GitHub API requests after a short delay and tracks how many overlap"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failures = {}
+
+    async def handle(self, request):
+        path = request.url.path.split("/repos/acme/app")[1]
+        self.requests.append(f"{request.method} {path}")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if self.failures.get(path):
+            self.failures[path] -= 1
+            return httpx.Response(502, text="Bad gateway")
+        body = json.loads(request.content) if request.content else {}
+        if path == "/git/blobs":
+            return httpx.Response(201, json={"sha": f"blob-{len(body['content'])}"})
+        if path == "/git/refs/heads/main":
+            return httpx.Response(200, json={"object": {"sha": "head"}})
+        if path.startswith("/git/refs/heads/") and request.method == "GET":
+            return httpx.Response(404, json={"message": "Not Found"})
+        if path == "/git/refs":
+            return httpx.Response(201, json={"ref": body["ref"]})
+        if path.startswith("/git/commits/"):
+            return httpx.Response(200, json={"tree": {"sha": "base-tree"}})
+        if path == "/git/trees":
+            return httpx.Response(201, json={"sha": "tree"})
+        if path == "/git/commits":
+            return httpx.Response(201, json={"sha": "new"})
+        if path.startswith("/git/refs/heads/") and request.method == "PATCH":
+            return httpx.Response(200, json={})
+        if path == "/pulls" and request.method == "POST":
+            return httpx.Response(422, json={"message": "A pull request already exists for acme:fix/bug-1."})
+        if path == "/pulls":
+            return httpx.Response(200, json=[{"html_url": "https://github.com/acme/app/pull/7", "number": 7}])
+        if path.startswith("/contents/"):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, headers={"ETag": '"v1"'},
+                                  json={"type": "file", "sha": "f1", "content": "aGVsbG8="})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+
+class TestAsyncGitHubClient(unittest.TestCase):
+    """Test cases for the asyncio GitHub client"""
+
+    def setUp(self):
+        """Set up a client against a fake GitHub API"""
+        self.api = FakeGitHub()
+        env = {"GITHUB_TOKEN": "t", "GITHUB_REPO_OWNER": "acme", "GITHUB_REPO_NAME": "app"}
+        self.env = patch.dict(os.environ, env)
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        self.client = self.make_client()
+
+    def make_client(self):
+        client = AsyncGitHubClient(transport=httpx.MockTransport(self.api.handle))
+        client.rate_limiter = TokenBucket("test", per_minute=60000, burst=100)
+        client.cache = GitHubResponseCache(cache_dir="")
+        return client
+
+    def test_blobs_upload_concurrently(self):
+        """Test that a multi-file commit uploads its blobs side by side and makes one commit"""
+        changes = [{"filename": f"src/f{i}.py", "content": "x" * i} for i in range(1, 6)]
+        self.assertTrue(asyncio.run(self.client.commit_files("main", changes, "Fix BUG-1")))
+
+        self.assertEqual(self.api.max_in_flight, 5)
+        self.assertEqual(self.api.requests.count("POST /git/commits"), 1)
+        self.assertEqual(self.api.requests[-1], "PATCH /git/refs/heads/main")
+
+    def test_tickets_do_not_block_each_other(self):
+        """Test that branches for several tickets are created at the same time on one loop"""
+        async def run():
+            return await asyncio.gather(*(self.client.create_branch(f"fix/bug-{i}") for i in range(4)))
+
+        self.assertEqual(asyncio.run(run()), [True] * 4)
+        self.assertGreaterEqual(self.api.max_in_flight, 4)
+
+    def test_server_errors_back_off_without_blocking(self):
+        """Test that a 502 is retried after an asyncio sleep rather than time.sleep"""
+        self.api.failures["/git/refs"] = 2
+        with patch("github_service.async_client.GITHUB_RETRY_BACKOFF_SECONDS", 0.01), \
+                patch("time.sleep", side_effect=AssertionError("blocking sleep")):
+            self.assertTrue(asyncio.run(self.client.create_branch("fix/bug-1")))
+        self.assertEqual(self.api.requests.count("POST /git/refs"), 3)
+
+    def test_reads_are_conditional(self):
+        """Test that an unchanged file is served from the response cache"""
+        async def run():
+            exists = await self.client.check_file_exists("src/app.py")
+            return exists, await self.client.get_file_content("src/app.py")
+
+        self.assertEqual(asyncio.run(run()), (True, "hello"))
+        self.assertEqual(self.client.cache.stats, {"hits": 1, "misses": 1})
+
+    def test_client_follows_the_event_loop(self):
+        """Test that the pooled client is replaced when used from a new event loop"""
+        self.assertTrue(asyncio.run(self.client.check_file_exists("a.py")))
+        self.assertTrue(asyncio.run(self.client.check_file_exists("b.py")))
+
+    def test_service_maps_existing_pr(self):
+        """Test that GitHubService awaits the client and maps the ticket to the existing PR"""
+        service = GitHubService()
+        service.client = self.client
+        pr = asyncio.run(service.create_fix_pr("fix/bug-1", "BUG-1"))
+        self.assertEqual(pr, {"url": "https://github.com/acme/app/pull/7", "number": 7})
+        self.assertEqual(service.pr_mappings, {"BUG-1": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
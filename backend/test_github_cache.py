@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import logging
+import os
+import tempfile
+import unittest
+import sys
+from unittest.mock import MagicMock
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from github_cache import GitHubResponseCache
+
+
+class FakeGitHub:
+    """Answers with an ETag for the current content and 304 when the client already has it"""
+
+    def __init__(self, text='{"sha": "a"}', etag='"a"'):
+        self.text = text
+        self.etag = etag
+        self.sent = []
+
+    def send(self, headers):
+        self.sent.append(headers)
+        if headers.get("If-None-Match") == self.etag:
+            return MagicMock(status_code=304, headers={"ETag": self.etag}, text="")
+        return MagicMock(status_code=200, headers={"ETag": self.etag, "Content-Type": "application/json"}, text=self.text)
+
+
+class TestGitHubResponseCache(unittest.TestCase):
+    """Test cases for the ETag response cache"""
+
+    def setUp(self):
+        """Set up a temporary cache directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = GitHubResponseCache(cache_dir=self.temp_dir.name)
+        self.key = GitHubResponseCache.make_key("https://api.github.com/repos/acme/app/contents/a.py", {"ref": "main"}, "t")
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_unchanged_content_is_served_from_cache(self):
+        """Test that a 304 returns the stored body"""
+        github = FakeGitHub()
+        first = self.cache.fetch(self.key, github.send)
+        second = self.cache.fetch(self.key, github.send)
+
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json(), {"sha": "a"})
+        self.assertEqual(github.sent, [{}, {"If-None-Match": '"a"'}])
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 1})
+
+    def test_changed_content_replaces_entry(self):
+        """Test that new content is returned and cached under the new ETag"""
+        github = FakeGitHub()
+        self.cache.fetch(self.key, github.send)
+        github.text, github.etag = '{"sha": "b"}', '"b"'
+
+        self.assertEqual(self.cache.fetch(self.key, github.send).json(), {"sha": "b"})
+        self.assertTrue(self.cache.fetch(self.key, github.send).from_cache)
+
+    def test_entries_survive_restart(self):
+        """Test that a new cache instance revalidates with the ETag stored on disk"""
+        self.cache.fetch(self.key, FakeGitHub().send)
+
+        github = FakeGitHub()
+        restarted = GitHubResponseCache(cache_dir=self.temp_dir.name)
+        self.assertTrue(restarted.fetch(self.key, github.send).from_cache)
+        self.assertEqual(github.sent, [{"If-None-Match": '"a"'}])
+
+    def test_keys_are_separate_per_token(self):
+        """Test that the same URL under different tokens uses different entries"""
+        url = "https://api.github.com/repos/acme/app"
+        self.assertNotEqual(GitHubResponseCache.make_key(url, None, "t1"), GitHubResponseCache.make_key(url, None, "t2"))
+        self.assertEqual(GitHubResponseCache.make_key(url, {"a": 1, "b": 2}, "t"),
+                         GitHubResponseCache.make_key(url, {"b": 2, "a": 1}, "t"))
+
+    def test_errors_are_not_cached(self):
+        """Test that responses other than 200 are passed through and not stored"""
+        send = MagicMock(return_value=MagicMock(status_code=404, headers={"ETag": '"x"'}, text="{}"))
+        self.cache.fetch(self.key, send)
+        self.cache.fetch(self.key, send)
+        self.assertEqual(send.call_args_list[1].args[0], {})
+
+    def test_prune_keeps_newest(self):
+        """Test that pruning deletes entries beyond the disk limit"""
+        cache = GitHubResponseCache(cache_dir=self.temp_dir.name, max_files=2)
+        for i in range(4):
+            cache.fetch(GitHubResponseCache.make_key(f"https://api.github.com/{i}"), FakeGitHub().send)
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(cache.prune(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import threading
+import unittest
+import sys
+from unittest.mock import MagicMock, patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from github_cache import GitHubResponseCache
+from github_service.github_client import GitHubClient
+from rate_limiter import TokenBucket
+
+
+class FakeGitDataApi:
+    """Answers the Git Data API endpoints used for multi-file commits and records each request"""
+
+    def __init__(self, ref_conflicts=0):
+        self.requests = []
+        self.ref_conflicts = ref_conflicts
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        path = url.split("/repos/acme/app")[1]
+        with self._lock:
+            self.requests.append(f"{method} {path}")
+        body = kwargs.get("json") or {}
+        if path == "/git/blobs":
+            return self._response(201, {"sha": f"blob-{len(body['content'])}"})
+        if path.startswith("/git/refs/heads/") and method == "GET":
+            return self._response(200, {"object": {"sha": "head"}})
+        if path.startswith("/git/commits/"):
+            return self._response(200, {"tree": {"sha": "base-tree"}})
+        if path == "/git/trees":
+            return self._response(201, {"sha": "tree"})
+        if path == "/git/commits":
+            return self._response(201, {"sha": "new"})
+        if path.startswith("/git/refs/heads/") and method == "PATCH":
+            if self.ref_conflicts:
+                self.ref_conflicts -= 1
+                return self._response(422, {"message": "Update is not a fast forward"})
+            return self._response(200, {})
+        return self._response(404, {})
+
+    @staticmethod
+    def _response(status_code, payload):
+        response = MagicMock(status_code=status_code, headers={})
+        response.json.return_value = payload
+        response.text = json.dumps(payload)
+        return response
+
+
+class TestGitHubClientCommits(unittest.TestCase):
+    """Test cases for GitHubClient.commit_files"""
+
+    def setUp(self):
+        """Set up a client against a fake GitHub API"""
+        env = {"GITHUB_TOKEN": "t", "GITHUB_REPO_OWNER": "acme", "GITHUB_REPO_NAME": "app"}
+        with patch.dict(os.environ, env):
+            self.client = GitHubClient()
+        self.client.rate_limiter = TokenBucket("test", per_minute=60000, burst=100)
+        self.client.cache = GitHubResponseCache(cache_dir="")
+
+    def test_repeated_reads_are_conditional(self):
+        """Test that checking and then reading an unchanged file downloads it once"""
+        body = '{"type": "file", "content": "aGVsbG8="}'
+        sent = []
+
+        def request(method, url, **kwargs):
+            sent.append(kwargs["headers"].get("If-None-Match"))
+            if kwargs["headers"].get("If-None-Match") == '"v1"':
+                return MagicMock(status_code=304, headers={}, text="")
+            return MagicMock(status_code=200, headers={"ETag": '"v1"'}, text=body)
+
+        with patch("github_service.github_client.requests.request", side_effect=request):
+            self.assertTrue(self.client.check_file_exists("src/app.py"))
+            self.assertEqual(self.client.get_file_content("src/app.py"), "hello")
+            self.assertEqual(self.client.get_file_content("src/app.py"), "hello")
+        self.assertEqual(sent, [None, '"v1"', '"v1"'])
+
+    def test_files_are_committed_together(self):
+        """Test that several files cost their blobs plus five requests and one commit"""
+        api = FakeGitDataApi()
+        changes = [{"filename": f"src/f{i}.py", "content": "x" * i} for i in range(1, 6)]
+        with patch("github_service.github_client.requests.request", side_effect=api.request):
+            self.assertTrue(self.client.commit_files("bugfix/BUG-1", changes, "Fix BUG-1"))
+
+        self.assertEqual(api.requests.count("POST /git/blobs"), 5)
+        self.assertEqual(api.requests[5:], [
+            "GET /git/refs/heads/bugfix/BUG-1",
+            "GET /git/commits/head",
+            "POST /git/trees",
+            "POST /git/commits",
+            "PATCH /git/refs/heads/bugfix/BUG-1",
+        ])
+
+    def test_moved_branch_is_retried(self):
+        """Test that a rejected ref update rebuilds the commit on the new head"""
+        api = FakeGitDataApi(ref_conflicts=1)
+        with patch("github_service.github_client.requests.request", side_effect=api.request):
+            self.assertTrue(self.client.commit_files("main", [{"filename": "a.py", "content": "x"}], "Fix"))
+        self.assertEqual(api.requests.count("POST /git/commits"), 2)
+        self.assertEqual(api.requests.count("POST /git/blobs"), 1)
+
+    def test_nothing_to_commit(self):
+        """Test that changes without content are rejected without any request"""
+        with patch("github_service.github_client.requests.request") as request:
+            self.assertFalse(self.client.commit_files("main", [{"filename": "a.py"}], "Fix"))
+        request.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
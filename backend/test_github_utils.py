@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import logging
+import os
+import threading
+import time
+import unittest
+import sys
+from unittest.mock import MagicMock, patch
+
+from github import BadCredentialsException, GithubException
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import github_utils
+from github_cache import GitHubResponseCache
+from github_utils import GitHubSessionCache
+
+
+def contents_response(status_code=200):
+    """A contents API response for a file holding "hello", with an ETag"""
+    response = MagicMock(status_code=status_code, headers={"ETag": '"v1"'})
+    response.text = '{"type": "file", "encoding": "base64", "content": "aGVsbG8="}'
+    return response
+
+
+class FakeGithub:
+    """Stands in for github.Github and counts the API calls made through it"""
+
+    instances = []
+
+    def __init__(self, token, **kwargs):
+        self.token = token
+        self.calls = []
+        FakeGithub.instances.append(self)
+
+    def get_user(self):
+        self.calls.append("get_user")
+        if self.token == "bad":
+            raise BadCredentialsException(401, {"message": "Bad credentials"}, {})
+        return MagicMock(login="bugfix-bot")
+
+    def get_repo(self, full_name):
+        self.calls.append(f"get_repo {full_name}")
+        if self.token == "bad":
+            raise BadCredentialsException(401, {"message": "Bad credentials"}, {})
+        return MagicMock(full_name=full_name, url=f"https://api.github.com/repos/{full_name}")
+
+
+class TestGitHubSessionCache(unittest.TestCase):
+    """Test cases for the shared GitHub client and repository cache"""
+
+    def setUp(self):
+        """Route github_utils to the fake client and a fresh cache"""
+        FakeGithub.instances = []
+        self.cache = GitHubSessionCache()
+        patches = [
+            patch("github_utils.Github", FakeGithub),
+            patch("github_utils._session_cache", self.cache),
+            patch("github_utils.get_github_cache", return_value=GitHubResponseCache(cache_dir="")),
+            patch.dict(os.environ, {"GITHUB_TOKEN": "good", "GITHUB_REPO_OWNER": "acme", "GITHUB_REPO_NAME": "app"}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_operations_share_one_client_and_repo(self):
+        """Test that repeated reads build one client, fetch the repo once and revalidate the file by ETag"""
+        with patch("github_utils.requests.get", side_effect=[contents_response(), contents_response(304),
+                                                             contents_response(304)]) as get:
+            for _ in range(3):
+                self.assertEqual(github_utils.get_file_content("acme/app", "README.md", "main"), "hello")
+
+        self.assertEqual(len(FakeGithub.instances), 1)
+        self.assertEqual(FakeGithub.instances[0].calls, ["get_repo acme/app"])
+        self.assertNotIn("If-None-Match", get.call_args_list[0].kwargs["headers"])
+        self.assertEqual(get.call_args_list[2].kwargs["headers"]["If-None-Match"], '"v1"')
+
+    def test_token_is_checked_once(self):
+        """Test that authenticate_github checks the token only on first use"""
+        first = github_utils.authenticate_github()
+        second = github_utils.authenticate_github()
+        self.assertIs(first, second)
+        self.assertEqual(first.calls.count("get_user"), 1)
+
+    def test_repo_handle_expires(self):
+        """Test that a repository handle is fetched again after the TTL"""
+        github_utils.get_repo()
+        with patch("github_utils.time.time", return_value=time.time() + github_utils.GITHUB_REPO_CACHE_TTL_SECONDS + 1):
+            github_utils.get_repo()
+        self.assertEqual(FakeGithub.instances[0].calls, ["get_repo acme/app", "get_repo acme/app"])
+
+    def test_rejected_token_is_dropped(self):
+        """Test that a token GitHub rejects isn't kept in the cache"""
+        with patch.dict(os.environ, {"GITHUB_TOKEN": "bad"}):
+            self.assertIsNone(github_utils.get_repo())
+            self.assertIsNone(github_utils.authenticate_github())
+            self.assertIsNone(github_utils.get_repo())
+        # Each attempt started from a fresh client
+        self.assertEqual(len(FakeGithub.instances), 3)
+
+    def test_concurrent_callers_share_the_client(self):
+        """Test that threads asking at the same time get the same client"""
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(self.cache.get_client("good"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+
+class FakeRef:
+    """Branch ref that refuses the first update, as if someone pushed meanwhile"""
+
+    def __init__(self, conflicts=0):
+        self.object = MagicMock(sha="head")
+        self.conflicts = conflicts
+        self.edits = []
+
+    def edit(self, sha):
+        if self.conflicts:
+            self.conflicts -= 1
+            raise GithubException(422, {"message": "Update is not a fast forward"}, {})
+        self.edits.append(sha)
+
+
+class TestTreeCommits(unittest.TestCase):
+    """Test cases for committing several files as one commit"""
+
+    def setUp(self):
+        """Set up a fake repository handed out by get_repo"""
+        self.repo = MagicMock()
+        self.repo.create_git_blob.side_effect = lambda content, encoding: MagicMock(sha=f"blob-{content}")
+        self.repo.create_git_commit.return_value = MagicMock(sha="new")
+        self.ref = FakeRef()
+        self.repo.get_git_ref.side_effect = lambda name: self.ref
+        p = patch("github_utils.get_repo", return_value=self.repo)
+        p.start()
+        self.addCleanup(p.stop)
+
+    def test_commit_changes_makes_one_commit(self):
+        """Test that several files become one tree and one commit, without the contents API"""
+        changes = [{"filename": f"src/f{i}.py", "content": str(i)} for i in range(5)]
+        self.assertTrue(github_utils.commit_changes("acme/app", "bugfix/BUG-1", changes, "Fix BUG-1"))
+
+        self.assertEqual(self.repo.create_git_blob.call_count, 5)
+        self.assertEqual(self.repo.create_git_commit.call_count, 1)
+        elements = self.repo.create_git_tree.call_args[0][0]
+        self.assertEqual([e._identity["sha"] for e in elements], [f"blob-{i}" for i in range(5)])
+        self.assertEqual(self.ref.edits, ["new"])
+        self.repo.update_file.assert_not_called()
+        self.repo.create_file.assert_not_called()
+
+    def test_moved_branch_is_retried(self):
+        """Test that a rejected ref update rebuilds the commit on the new head"""
+        self.ref = FakeRef(conflicts=1)
+        self.assertTrue(github_utils.commit_multiple_changes_as_tree(
+            "acme/app", "bugfix/BUG-1", [{"filename": "a.py", "content": "x"}], "Fix"))
+        self.assertEqual(self.repo.create_git_commit.call_count, 2)
+        # Blobs are uploaded once
+        self.assertEqual(self.repo.create_git_blob.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
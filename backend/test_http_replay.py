@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+import sys
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_replay import FixtureStore, RecordReplayTransport, ReplayMissError
+from llm_gateway import LLMGateway
+from orchestrator.replay_ticket import prepare_environment
+from rate_limiter import TokenBucket
+
+ISSUE_URL = "https://example.atlassian.net/rest/api/3/issue/BUG-1"
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "Recorded answer"}}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+}
+
+
+def offline(request):
+    raise AssertionError(f"Replay reached the network for {request.url}")
+
+
+class TestHTTPReplay(unittest.TestCase):
+    """Test cases for recording HTTP responses to fixtures and replaying them offline"""
+
+    def setUp(self):
+        """Set up a fixture directory and a fake server that counts its requests"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.requests = []
+
+    def server(self, request):
+        self.requests.append(request)
+        if request.url.path.endswith("/search"):
+            return httpx.Response(200, json={"issues": [], "query": json.loads(request.content)})
+        # A gzipped body whose status changes between reads
+        body = json.dumps({"key": "BUG-1", "status": "Open" if len(self.requests) == 1 else "In Progress"})
+        return httpx.Response(200, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+                              content=gzip.compress(body.encode()))
+
+    async def send(self, transport, *requests):
+        async with httpx.AsyncClient(transport=transport) as client:
+            return [await client.request(method, url, **kwargs) for method, url, kwargs in requests]
+
+    def record(self, *requests):
+        transport = RecordReplayTransport("jira", mode="record", store=FixtureStore(self.temp_dir.name),
+                                          transport=httpx.MockTransport(self.server))
+        return asyncio.run(self.send(transport, *requests))
+
+    def replay(self, *requests, **kwargs):
+        transport = RecordReplayTransport("jira", mode="replay", store=FixtureStore(self.temp_dir.name),
+                                          transport=httpx.MockTransport(offline), **kwargs)
+        return asyncio.run(self.send(transport, *requests))
+
+    def test_replay_serves_recorded_responses_in_order(self):
+        """Test that repeated requests get their responses in the recorded order, repeating the last"""
+        recorded = self.record(("GET", ISSUE_URL, {}), ("GET", ISSUE_URL, {}))
+        self.assertEqual([r.json()["status"] for r in recorded], ["Open", "In Progress"])
+
+        replayed = self.replay(*[("GET", ISSUE_URL, {})] * 3, latency_scale=0)
+        self.assertEqual([r.json()["status"] for r in replayed], ["Open", "In Progress", "In Progress"])
+        self.assertEqual(len(self.requests), 2)
+
+    def test_fixtures_are_readable_and_keep_no_credentials(self):
+        """Test that bodies are saved decoded and request headers are not saved"""
+        self.record(("GET", ISSUE_URL, {"headers": {"Authorization": "Basic c2VjcmV0"}}))
+        [path] = [os.path.join(root, name) for root, _, names in os.walk(self.temp_dir.name) for name in names]
+        with open(path) as f:
+            text = f.read()
+        self.assertIn('\\"status\\": \\"Open\\"', text)
+        self.assertNotIn("c2VjcmV0", text)
+        self.assertTrue(os.path.basename(path).startswith("get_rest_api_3_issue_BUG_1_"))
+
+    def test_key_ignores_parameter_and_json_key_order(self):
+        """Test that a request matches its recording however its query and JSON body are ordered"""
+        search = ISSUE_URL.replace("issue/BUG-1", "search")
+        self.record(("POST", f"{search}?a=1&b=2", {"json": {"jql": "project = BUG", "maxResults": 50}}))
+        [response] = self.replay(("POST", f"{search}?b=2&a=1", {"json": {"maxResults": 50, "jql": "project = BUG"}}),
+                                 latency_scale=0)
+        self.assertEqual(response.json()["query"]["jql"], "project = BUG")
+
+    def test_unrecorded_request_fails_like_a_network_error(self):
+        """Test that replay raises a transport error for a request without a fixture"""
+        with self.assertRaises(ReplayMissError) as raised:
+            self.replay(("GET", ISSUE_URL, {}))
+        self.assertIsInstance(raised.exception, httpx.TransportError)
+
+    def test_replay_simulates_latency(self):
+        """Test that the recorded response time is scaled, or replaced by a fixed one"""
+        self.record(("GET", ISSUE_URL, {}))
+        with patch("http_replay.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            self.replay(("GET", ISSUE_URL, {}), latency_seconds=0.25)
+        sleep.assert_awaited_once_with(0.25)
+
+        path = FixtureStore(self.temp_dir.name).path_for("jira", {"method": "GET", "url": ISSUE_URL, "body": ""})
+        with open(path) as f:
+            fixture = json.load(f)
+        fixture["responses"][0]["latency_seconds"] = 0.4
+        with open(path, "w") as f:
+            json.dump(fixture, f)
+        with patch("http_replay.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            self.replay(("GET", ISSUE_URL, {}), latency_scale=0.5)
+        sleep.assert_awaited_once_with(0.2)
+
+    @patch("llm_gateway.get_llm_cache", return_value=None)
+    def test_gateway_completions_replay_offline(self, _):
+        """Test that an OpenAI completion recorded under the gateway is answered again without the network"""
+        messages = [{"role": "user", "content": "Summarize BUG-1"}]
+
+        def run(mode, handler):
+            transport = RecordReplayTransport("openai", mode=mode, store=FixtureStore(self.temp_dir.name),
+                                              transport=httpx.MockTransport(handler), latency_scale=0)
+            with patch("llm_gateway.replay_transport", return_value=transport):
+                gateway = LLMGateway("key")
+                gateway.request_limiter = TokenBucket("requests", per_minute=60000, burst=100)
+                gateway.token_limiter = TokenBucket("tokens", per_minute=6000000, burst=100000)
+                return gateway.complete_sync(messages, model="gpt-4o-mini", use_cache=False)
+
+        self.assertEqual(run("record", lambda request: httpx.Response(200, json=COMPLETION)), "Recorded answer")
+        self.assertEqual(run("replay", offline), "Recorded answer")
+
+    def test_replay_restores_the_recorded_model(self):
+        """Test that the OpenAI model a run was recorded with is used again on replay"""
+        ticket_path = os.path.join(self.temp_dir.name, "ticket.json")
+        with open(ticket_path, "w") as f:
+            json.dump({"ticket_id": "BUG-1"}, f)
+        fixtures = os.path.join(self.temp_dir.name, "fixtures")
+
+        with patch.dict(os.environ, {"OPENAI_MODEL": "gpt-4o-mini"}):
+            prepare_environment("record", fixtures, self.temp_dir.name, ticket_path)
+        with patch.dict(os.environ, {}):
+            os.environ.pop("OPENAI_MODEL", None)
+            ticket = prepare_environment("replay", fixtures, self.temp_dir.name)
+            self.assertEqual(os.environ["OPENAI_MODEL"], "gpt-4o-mini")
+        self.assertEqual(ticket["ticket_id"], "BUG-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
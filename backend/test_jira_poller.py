@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import tempfile
+import unittest
+import sys
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jira_service.poller import IncrementalJiraPoller
+
+
+def make_issue(key, updated):
+    return {"key": key, "fields": {"summary": key, "updated": updated}}
+
+
+class FakeJira:
+    """Serves a fixed list of issues from the search API, honouring startAt/maxResults"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        self.requests = []
+
+    def handler(self, request):
+        params = {k: v[0] for k, v in parse_qs(request.url.query.decode()).items()}
+        self.requests.append(params)
+        start_at = int(params["startAt"])
+        max_results = int(params["maxResults"])
+        return httpx.Response(200, json={
+            "startAt": start_at,
+            "maxResults": max_results,
+            "total": len(self.issues),
+            "issues": self.issues[start_at:start_at + max_results]
+        })
+
+
+class TestIncrementalJiraPoller(unittest.TestCase):
+    """Test cases for IncrementalJiraPoller"""
+
+    def setUp(self):
+        """Set up a temporary state file"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.temp_dir.name, "poll.json")
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def _poll(self, poller, jira):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(jira.handler)) as client:
+                return [t async for t in poller.poll(client, "https://jira.example.com", ("u", "t"), lambda i: {"ticket_id": i["key"]})]
+        return asyncio.run(run())
+
+    def test_pages_through_all_results(self):
+        """Test that every page is requested on the first full sync"""
+        jira = FakeJira([make_issue(f"BUG-{n}", f"2024-01-01T10:0{n}:00.000+0000") for n in range(5)])
+        poller = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path, page_size=2)
+
+        tickets = self._poll(poller, jira)
+
+        self.assertEqual([t["ticket_id"] for t in tickets], [f"BUG-{n}" for n in range(5)])
+        self.assertEqual([r["startAt"] for r in jira.requests], ["0", "2", "4"])
+        self.assertEqual(jira.requests[0]["jql"], "labels = Bug ORDER BY updated ASC")
+        self.assertEqual(jira.requests[0]["fields"], "summary,updated")
+
+    def test_only_new_or_changed_tickets_are_yielded(self):
+        """Test that the persisted state filters unchanged tickets across restarts"""
+        jira = FakeJira([make_issue("BUG-1", "2024-01-01T10:00:00.000+0000"),
+                         make_issue("BUG-2", "2024-01-01T10:05:00.000+0000")])
+        poller = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path)
+        self.assertEqual(len(self._poll(poller, jira)), 2)
+        self.assertEqual(poller.high_water_mark, "2024-01-01T10:05:00.000+0000")
+
+        # Same results after a restart, plus one edited ticket and one new ticket
+        jira.issues = [make_issue("BUG-2", "2024-01-01T10:05:00.000+0000"),
+                       make_issue("BUG-1", "2024-01-01T10:06:00.000+0000"),
+                       make_issue("BUG-3", "2024-01-01T10:07:00.000+0000")]
+        restarted = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path)
+        tickets = self._poll(restarted, jira)
+
+        self.assertEqual([t["ticket_id"] for t in tickets], ["BUG-1", "BUG-3"])
+        self.assertIn('updated >= "-', jira.requests[-1]["jql"])
+
+    def test_jql_window_is_relative_to_high_water_mark(self):
+        """Test that the updated-since window covers the gap plus the overlap"""
+        poller = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path)
+        poller.high_water_mark = "2024-01-01T10:00:00.000+0000"
+        now = datetime(2024, 1, 1, 11, 0, 30, tzinfo=timezone.utc)
+        self.assertEqual(
+            poller.build_jql(now),
+            '(labels = Bug) AND updated >= "-63m" ORDER BY updated ASC'
+        )
+
+    def test_failed_poll_keeps_high_water_mark(self):
+        """Test that an error response doesn't advance the saved state"""
+        poller = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path)
+        poller.high_water_mark = "2024-01-01T10:00:00.000+0000"
+        poller._save_state()
+
+        class FailingJira(FakeJira):
+            def handler(self, request):
+                return httpx.Response(500, text="boom")
+
+        self.assertEqual(self._poll(poller, FailingJira([])), [])
+        restarted = IncrementalJiraPoller("test", "labels = Bug", "summary", state_path=self.state_path)
+        self.assertEqual(restarted.high_water_mark, "2024-01-01T10:00:00.000+0000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import sys
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jira_service.progress import DebouncedProgressWriter, ProgressCommentStore, publish_progress
+from jira_service.session import JiraSession
+
+
+class FakeJira:
+    """Stores comments per ticket and records each write"""
+
+    def __init__(self):
+        self.comments = {}
+        self.writes = []
+        self.next_id = 100
+
+    def handler(self, request):
+        self.writes.append(request.method)
+        path = request.url.path.rstrip("/")
+        text = json.loads(request.content)["body"]["content"][0]["content"][0]["text"]
+        if request.method == "POST":
+            self.next_id += 1
+            self.comments[str(self.next_id)] = text
+            return httpx.Response(201, json={"id": str(self.next_id)})
+        comment_id = path.rsplit("/", 1)[1]
+        if comment_id not in self.comments:
+            return httpx.Response(404, json={"errorMessages": ["Comment not found"]})
+        self.comments[comment_id] = text
+        return httpx.Response(200, json={"id": comment_id})
+
+
+class TestJiraProgress(unittest.TestCase):
+    """Test cases for edit-in-place progress comments"""
+
+    def setUp(self):
+        """Set up a temporary state file and a fake JIRA site"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.temp_dir.name, "progress.json")
+        self.store = ProgressCommentStore("test", state_path=self.state_path)
+        self.jira = FakeJira()
+        self.session = JiraSession("https://jira.example.com", ("u", "t"),
+                                   transport=httpx.MockTransport(self.jira.handler))
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_one_comment_is_edited_in_place(self):
+        """Test that later steps edit the comment created by the first one"""
+        async def run():
+            self.store.add_line("BUG-1", "Developer generating patch")
+            await publish_progress(self.session, self.store, "BUG-1")
+            self.store.add_line("BUG-1", "QA testing fix (attempt 1)")
+            await publish_progress(self.session, self.store, "BUG-1")
+
+        asyncio.run(run())
+        self.assertEqual(self.jira.writes, ["POST", "PUT"])
+        self.assertEqual(len(self.jira.comments), 1)
+        text = self.jira.comments[self.store.get_comment_id("BUG-1")]
+        self.assertIn("Developer generating patch", text)
+        self.assertIn("QA testing fix (attempt 1)", text)
+
+    def test_comment_id_survives_restart_and_deleted_comment_is_recreated(self):
+        """Test that a new process keeps editing the same comment, and recreates it if deleted"""
+        self.store.add_line("BUG-1", "started")
+        asyncio.run(publish_progress(self.session, self.store, "BUG-1"))
+        first_id = self.store.get_comment_id("BUG-1")
+
+        restarted = ProgressCommentStore("test", state_path=self.state_path)
+        self.assertEqual(restarted.get_comment_id("BUG-1"), first_id)
+
+        del self.jira.comments[first_id]
+        restarted.add_line("BUG-1", "planned")
+        self.assertTrue(asyncio.run(publish_progress(self.session, restarted, "BUG-1")))
+        self.assertNotEqual(restarted.get_comment_id("BUG-1"), first_id)
+        self.assertEqual(self.jira.writes, ["POST", "PUT", "POST"])
+
+    def test_state_is_saved_when_the_comment_is_written(self):
+        """Test that recording steps doesn't rewrite the state file, publishing them does"""
+        for n in range(3):
+            self.store.add_line("BUG-1", f"step {n}")
+        self.assertFalse(os.path.exists(self.state_path))
+
+        asyncio.run(publish_progress(self.session, self.store, "BUG-1"))
+        restarted = ProgressCommentStore("test", state_path=self.state_path)
+        self.assertIn("step 2", restarted.render("BUG-1"))
+
+    def test_old_lines_are_summarised(self):
+        """Test that the comment keeps the latest lines and counts the rest"""
+        with patch("jira_service.progress.JIRA_PROGRESS_MAX_LINES", 2):
+            for n in range(5):
+                self.store.add_line("BUG-1", f"step {n}")
+
+        text = self.store.render("BUG-1")
+        self.assertIn("5 updates", text)
+        self.assertIn("... 3 earlier updates", text)
+        self.assertNotIn("step 2", text)
+        self.assertIn("step 4", text)
+
+    def test_rapid_updates_are_coalesced(self):
+        """Test that steps within the debounce window become a single write"""
+        writer = DebouncedProgressWriter(lambda: self.session, self.store, debounce_seconds=0.05)
+
+        async def run():
+            for n in range(4):
+                writer.update("BUG-1", f"step {n}")
+            await asyncio.sleep(0.2)
+            writer.update("BUG-1", "step 4")
+            await writer.flush("BUG-1")
+
+        asyncio.run(run())
+        self.assertEqual(self.jira.writes, ["POST", "PUT"])
+        self.assertIn("step 4", list(self.jira.comments.values())[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
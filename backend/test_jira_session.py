@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+import time
+import unittest
+import sys
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jira_service.session import JiraSession, TTLCache
+
+
+class FakeJira:
+    """Serves the comment, transition and field endpoints and records each request"""
+
+    def __init__(self):
+        self.requests = []
+        # Transition IDs JIRA currently accepts, keyed by ticket
+        self.valid_transitions = {}
+
+    def handler(self, request):
+        path = request.url.path
+        self.requests.append(f"{request.method} {path}")
+        ticket_id = path.split("/")[5] if path.startswith("/rest/api/3/issue/") else None
+
+        if path.endswith("/comment"):
+            return httpx.Response(201, json={"id": "1"})
+        if path.endswith("/transitions") and request.method == "GET":
+            return httpx.Response(200, json={"transitions": [
+                {"id": tid, "name": name, "to": {"name": name}}
+                for tid, name in self.valid_transitions.get(ticket_id, {}).items()
+            ]})
+        if path.endswith("/transitions"):
+            transition_id = json.loads(request.content)["transition"]["id"]
+            if transition_id not in self.valid_transitions.get(ticket_id, {}):
+                return httpx.Response(400, json={"errorMessages": ["Transition is not valid"]})
+            return httpx.Response(204)
+        if path == "/rest/api/3/field":
+            return httpx.Response(200, json=[{"id": "summary", "name": "Summary"},
+                                             {"id": "customfield_1", "name": "Pull Request"}])
+        return httpx.Response(204)
+
+
+class TestJiraSession(unittest.TestCase):
+    """Test cases for the pooled JIRA session and its caches"""
+
+    def setUp(self):
+        """Set up a session against a fake JIRA site"""
+        self.jira = FakeJira()
+        self.session = JiraSession("https://jira.example.com", ("u", "t"),
+                                   transport=httpx.MockTransport(self.jira.handler))
+
+    def test_steady_state_transition_is_one_request(self):
+        """Test that transitions are looked up once per project and status"""
+        self.jira.valid_transitions = {"BUG-1": {"31": "In Progress"}, "BUG-2": {"31": "In Progress"}}
+
+        async def run():
+            first = await self.session.transition("BUG-1", "In Progress")
+            second = await self.session.transition("BUG-2", "In Progress")
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), (True, True))
+        self.assertEqual(self.jira.requests, [
+            "GET /rest/api/3/issue/BUG-1/transitions",
+            "POST /rest/api/3/issue/BUG-1/transitions",
+            "POST /rest/api/3/issue/BUG-2/transitions",
+        ])
+
+    def test_rejected_cached_transition_is_refreshed(self):
+        """Test that a cached ID JIRA rejects is replaced by a fresh lookup"""
+        self.session.transitions.set(("BUG", "done"), "99")
+        self.jira.valid_transitions = {"BUG-1": {"41": "Done"}}
+
+        self.assertTrue(asyncio.run(self.session.transition("BUG-1", "Done")))
+        self.assertEqual(self.session.transitions.get(("BUG", "done")), "41")
+        self.assertEqual(len(self.jira.requests), 3)
+
+    def test_missing_transition(self):
+        """Test that an unreachable status is reported as None and not cached"""
+        self.jira.valid_transitions = {"BUG-1": {"31": "In Progress"}}
+        self.assertIsNone(asyncio.run(self.session.transition("BUG-1", "Done")))
+        self.assertEqual(len(self.session.transitions), 0)
+
+    def test_field_catalog_is_cached(self):
+        """Test that finding the PR field downloads the catalog only once"""
+        async def run():
+            ids = [await self.session.find_field_id(lambda f: "Pull Request" in f["name"]) for _ in range(3)]
+            await self.session.close()
+            return ids
+
+        self.assertEqual(asyncio.run(run()), ["customfield_1"] * 3)
+        self.assertEqual(self.jira.requests, ["GET /rest/api/3/field"])
+
+    def test_ttl_cache_expiry_and_eviction(self):
+        """Test that entries expire after the TTL and the least recently used is evicted"""
+        cache = TTLCache(ttl_seconds=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+        with patch("jira_service.session.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
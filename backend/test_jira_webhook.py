@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import hashlib
+import hmac
+import logging
+import os
+import unittest
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jira_webhook import WebhookDeduplicator, ticket_from_webhook, verify_signature
+
+
+def make_payload(event="jira:issue_created", key="BUG-1", status="To Do", labels=("Bug",),
+                 updated="2024-01-01T10:00:00.000+0000"):
+    return {
+        "webhookEvent": event,
+        "timestamp": 1704103200000,
+        "issue": {
+            "key": key,
+            "fields": {
+                "summary": "Crash on login",
+                "description": "KeyError in auth.py",
+                "status": {"name": status},
+                "labels": list(labels),
+                "updated": updated
+            }
+        }
+    }
+
+
+class TestJiraWebhook(unittest.TestCase):
+    """Test cases for JIRA webhook handling"""
+
+    def test_signature_verification(self):
+        """Test HMAC header and query parameter secrets"""
+        body = b'{"webhookEvent": "jira:issue_created"}'
+        signature = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+
+        self.assertTrue(verify_signature(body, signature, secret="s3cret"))
+        self.assertTrue(verify_signature(body, secret_param="s3cret", secret="s3cret"))
+        self.assertFalse(verify_signature(body, "sha256=bad", secret="s3cret"))
+        self.assertFalse(verify_signature(body, secret="s3cret"))
+        self.assertTrue(verify_signature(body, secret=""))
+
+    def test_bug_ticket_is_accepted(self):
+        """Test that an open bug ticket is parsed into the standard ticket format"""
+        ticket, reason = ticket_from_webhook(make_payload(), WebhookDeduplicator())
+        self.assertEqual(reason, "accepted")
+        self.assertEqual(ticket["ticket_id"], "BUG-1")
+        self.assertEqual(ticket["title"], "Crash on login")
+        self.assertEqual(ticket["status"], "To Do")
+
+    def test_irrelevant_deliveries_are_ignored(self):
+        """Test that other events, other labels and closed tickets are ignored"""
+        dedup = WebhookDeduplicator()
+        self.assertIsNone(ticket_from_webhook(make_payload(event="jira:issue_deleted"), dedup)[0])
+        self.assertIsNone(ticket_from_webhook(make_payload(labels=("Feature",)), dedup)[0])
+        self.assertIsNone(ticket_from_webhook(make_payload(status="Done"), dedup)[0])
+        self.assertIsNone(ticket_from_webhook({"webhookEvent": "jira:issue_updated"}, dedup)[0])
+
+    def test_duplicate_deliveries_are_dropped(self):
+        """Test that retries collapse but a later edit of the same ticket goes through"""
+        dedup = WebhookDeduplicator()
+        self.assertIsNotNone(ticket_from_webhook(make_payload(), dedup)[0])
+        self.assertIsNone(ticket_from_webhook(make_payload(), dedup)[0])
+        self.assertIsNone(ticket_from_webhook(make_payload(event="jira:issue_updated"), dedup)[0])
+
+        edited = make_payload(event="jira:issue_updated", updated="2024-01-01T10:05:00.000+0000")
+        self.assertIsNotNone(ticket_from_webhook(edited, dedup)[0])
+
+    def test_deduplicator_is_bounded(self):
+        """Test that the oldest keys are forgotten beyond the size limit"""
+        dedup = WebhookDeduplicator(max_entries=2)
+        for key in ("a", "b", "c"):
+            self.assertTrue(dedup.check_and_add(key))
+        self.assertTrue(dedup.check_and_add("a"))
+        self.assertFalse(dedup.check_and_add("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
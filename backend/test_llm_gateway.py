@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import openai
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import LLMResponseCache
+from llm_gateway import (
+    PRIORITY_BACKLOG, PRIORITY_NORMAL, PRIORITY_URGENT, LLMGateway, estimate_tokens, priority_for_ticket
+)
+from rate_limiter import TokenBucket
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions.with_raw_response and records the calls"""
+
+    def __init__(self, failures=None):
+        self.failures = list(failures or [])
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.gate = None
+        self.stream_pieces = None
+        self.streams = []
+
+    async def create(self, **kwargs):
+        content = kwargs["messages"][-1]["content"]
+        self.calls.append(content)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                await self.gate
+            await asyncio.sleep(0.02)
+            if self.failures:
+                raise self.failures.pop(0)
+        finally:
+            self.in_flight -= 1
+        if kwargs.get("stream"):
+            stream = FakeStream(self.stream_pieces or [f"re: {content}"])
+            self.streams.append(stream)
+            return SimpleNamespace(status_code=200, headers={}, parse=lambda: stream)
+        completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"re: {content}"))])
+        return SimpleNamespace(status_code=200, headers={"x-ratelimit-remaining-tokens": "100000"},
+                               parse=lambda: completion)
+
+
+class FakeStream:
+    """Stands in for openai.AsyncStream, yielding one chunk per piece"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            await asyncio.sleep(0.01)
+            self.sent += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        self.closed = True
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class TestLLMGateway(unittest.TestCase):
+    """Test cases for the shared LLM gateway"""
+
+    def setUp(self):
+        """Keep the gateways from using the process-wide completion cache"""
+        p = patch("llm_gateway.get_llm_cache", return_value=None)
+        p.start()
+        self.addCleanup(p.stop)
+
+    def make_gateway(self, max_in_flight=2, failures=None):
+        self.completions = FakeCompletions(failures)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=self.completions)))
+        gateway = LLMGateway("key", max_in_flight=max_in_flight, client=client)
+        gateway.request_limiter = TokenBucket("requests", per_minute=60000, burst=100)
+        gateway.token_limiter = TokenBucket("tokens", per_minute=6000000, burst=100000)
+        return gateway
+
+    def test_in_flight_limit(self):
+        """Test that no more than max_in_flight completions run at once"""
+        gateway = self.make_gateway(max_in_flight=3)
+
+        async def run():
+            return await asyncio.gather(*(gateway.complete(user(f"q{i}")) for i in range(10)))
+
+        self.assertEqual(asyncio.run(run()), [f"re: q{i}" for i in range(10)])
+        self.assertEqual(self.completions.max_in_flight, 3)
+        self.assertEqual(gateway.get_status()["in_flight"], 0)
+
+    def test_urgent_calls_go_first(self):
+        """Test that a free slot goes to the urgent lane before older backlog calls"""
+        gateway = self.make_gateway(max_in_flight=1)
+        # Completions run on the gateway's loop, so the gate holding them must live there too
+        loop = gateway._get_loop()
+        gate = asyncio.run_coroutine_threadsafe(self._make_future(), loop).result()
+        self.completions.gate = gate
+
+        async def run():
+            first = asyncio.ensure_future(gateway.complete(user("running")))
+            await asyncio.sleep(0.05)
+            backlog = [asyncio.ensure_future(gateway.complete(user(f"backlog{i}"), priority=PRIORITY_BACKLOG))
+                       for i in range(2)]
+            await asyncio.sleep(0.05)
+            urgent = asyncio.ensure_future(gateway.complete(user("urgent"), priority=PRIORITY_URGENT))
+            await asyncio.sleep(0.05)
+            self.assertEqual(gateway.get_status()["waiting"], {"urgent": 1, "normal": 0, "backlog": 2})
+            loop.call_soon_threadsafe(gate.set_result, None)
+            return await asyncio.gather(first, *backlog, urgent)
+
+        asyncio.run(run())
+        self.assertEqual(self.completions.calls, ["running", "urgent", "backlog0", "backlog1"])
+
+    @staticmethod
+    async def _make_future():
+        return asyncio.get_running_loop().create_future()
+
+    def test_tokens_are_charged_up_front(self):
+        """Test that the prompt estimate plus max_tokens is taken from the token budget"""
+        gateway = self.make_gateway()
+        gateway.token_limiter = TokenBucket("tokens", per_minute=60, burst=10000)
+        messages = user("x" * 400)
+        gateway.complete_sync(messages, max_tokens=1000)
+        self.assertEqual(estimate_tokens(messages, 1000), 1104)
+        self.assertAlmostEqual(gateway.token_limiter.get_status()["tokens"], 10000 - 1104, delta=1)
+
+    def test_transient_errors_back_off_without_holding_a_slot(self):
+        """Test that a call waiting to retry lets other calls use its slot"""
+        gateway = self.make_gateway(max_in_flight=1, failures=[openai.APIConnectionError(request=REQUEST)])
+
+        async def run():
+            failing = asyncio.ensure_future(gateway.complete(user("flaky")))
+            await asyncio.sleep(0.01)
+            other = asyncio.ensure_future(gateway.complete(user("other")))
+            return await asyncio.gather(failing, other)
+
+        with patch("llm_gateway.LLM_RETRY_BACKOFF_SECONDS", 0.2):
+            self.assertEqual(asyncio.run(run()), ["re: flaky", "re: other"])
+        self.assertEqual(self.completions.calls, ["flaky", "other", "flaky"])
+
+    def test_rate_limit_blocks_the_shared_budget(self):
+        """Test that a 429 is recorded in the request bucket and retried after it"""
+        response = httpx.Response(429, headers={"retry-after": "0.1"}, request=REQUEST)
+        gateway = self.make_gateway(failures=[openai.RateLimitError("slow down", response=response, body=None)])
+        self.assertEqual(gateway.complete_sync(user("q")), "re: q")
+        self.assertEqual(len(self.completions.calls), 2)
+
+    def test_bad_requests_are_not_retried(self):
+        """Test that a 400 gives up at once"""
+        response = httpx.Response(400, request=REQUEST)
+        error = openai.BadRequestError("bad", response=response, body=None)
+        gateway = self.make_gateway(failures=[error])
+        self.assertIsNone(gateway.complete_sync(user("q")))
+        self.assertEqual(len(self.completions.calls), 1)
+
+    def test_threads_share_the_scheduler(self):
+        """Test that synchronous callers on several threads share one in-flight limit"""
+        gateway = self.make_gateway(max_in_flight=2)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(gateway.complete_sync(user(f"q{i}"))))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [f"re: q{i}" for i in range(6)])
+        self.assertEqual(self.completions.max_in_flight, 2)
+
+    def test_stream_passes_text_on_as_it_arrives(self):
+        """Test that the sync and async streams hand every piece to the callback and return the whole text"""
+        gateway = self.make_gateway()
+        self.completions.stream_pieces = ["--- a/app.py\n", "+++ b/app.py\n", "@@ -1 +1 @@\n"]
+        pieces = []
+        self.assertEqual(gateway.complete_stream_sync(user("q"), pieces.append), "".join(self.completions.stream_pieces))
+        self.assertEqual(pieces, self.completions.stream_pieces)
+
+        async_pieces = []
+        completion = asyncio.run(gateway.complete_stream(user("q"), async_pieces.append))
+        self.assertEqual(async_pieces, self.completions.stream_pieces)
+        self.assertEqual(completion, "".join(async_pieces))
+
+    def test_stream_stopped_by_the_caller_frees_its_slot(self):
+        """Test that returning False stops the generation and lets the next call run"""
+        gateway = self.make_gateway(max_in_flight=1)
+        self.completions.stream_pieces = [f"line {i}\n" for i in range(50)]
+        seen = []
+
+        def on_delta(text):
+            seen.append(text)
+            return len(seen) < 3
+
+        self.assertIsNone(gateway.complete_stream_sync(user("q"), on_delta))
+        self.assertEqual(len(seen), 3)
+        stream = self.completions.streams[0]
+        self.assertTrue(stream.closed)
+        self.assertLess(stream.sent, 10)
+        self.assertEqual(gateway.complete_sync(user("next")), "re: next")
+        self.assertEqual(gateway.get_status()["in_flight"], 0)
+
+    def test_stream_retries_before_the_first_piece(self):
+        """Test that a stream failing to start is retried like any other call"""
+        gateway = self.make_gateway(failures=[openai.APIConnectionError(request=REQUEST)])
+        pieces = []
+        with patch("llm_gateway.LLM_RETRY_BACKOFF_SECONDS", 0.01):
+            self.assertEqual(gateway.complete_stream_sync(user("q"), pieces.append), "re: q")
+        self.assertEqual(pieces, ["re: q"])
+        self.assertEqual(len(self.completions.calls), 2)
+
+    def test_ticket_priorities(self):
+        """Test the lanes for JIRA priority names"""
+        self.assertEqual(priority_for_ticket("Highest"), PRIORITY_URGENT)
+        self.assertEqual(priority_for_ticket("Medium"), PRIORITY_NORMAL)
+        self.assertEqual(priority_for_ticket(None), PRIORITY_NORMAL)
+        self.assertEqual(priority_for_ticket(" low "), PRIORITY_BACKLOG)
+
+    def test_agents_copies_are_in_sync(self):
+        """Test that the agents' copies of the shared LLM modules match these"""
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in ("llm_gateway.py", "llm_cache.py", "patch_stream.py", "model_router.py", "http_replay.py"):
+            with open(os.path.join(backend_dir, name)) as f:
+                backend_copy = f.read()
+            with open(os.path.join(backend_dir, "..", "agents", "utils", name)) as f:
+                agents_copy = f.read()
+            self.assertEqual(backend_copy, agents_copy, name)
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Test cases for the completion cache and its use by the gateway"""
+
+    def setUp(self):
+        """Set up a cache in a temporary directory and a gateway using it"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_path = os.path.join(self.temp_dir.name, "llm_cache.db")
+        self.cache = LLMResponseCache(self.db_path)
+        self.completions = FakeCompletions()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=self.completions)))
+        self.gateway = LLMGateway("key", client=client, cache=self.cache)
+        self.gateway.request_limiter = TokenBucket("requests", per_minute=60000, burst=100)
+        self.gateway.token_limiter = TokenBucket("tokens", per_minute=6000000, burst=100000)
+
+    def test_deterministic_repeat_is_served_from_cache(self):
+        """Test that a repeated low-temperature call doesn't reach the model, also after a restart"""
+        messages = [{"role": "system", "content": "Plan"}, {"role": "user", "content": "q"}]
+        self.assertEqual(self.gateway.complete_sync(messages, temperature=0.0), "re: q")
+        self.assertEqual(asyncio.run(self.gateway.complete(messages, temperature=0.0)), "re: q")
+        self.assertEqual(self.completions.calls, ["q"])
+
+        # A new process opening the same database gets the answer too
+        self.gateway.cache = LLMResponseCache(self.db_path)
+        self.assertEqual(self.gateway.complete_sync(messages, temperature=0.0), "re: q")
+        self.assertEqual(self.completions.calls, ["q"])
+        self.assertEqual(self.gateway.get_status()["cache"]["hits"], 1)
+
+    def test_key_covers_model_temperature_and_system_prompt(self):
+        """Test that changing any part of the request misses the cache"""
+        messages = [{"role": "system", "content": "Plan"}, {"role": "user", "content": "q"}]
+        self.gateway.complete_sync(messages)
+        self.gateway.complete_sync(messages, model="gpt-4o-mini")
+        self.gateway.complete_sync(messages, temperature=0.0)
+        self.gateway.complete_sync([{"role": "system", "content": "Fix"}, messages[1]])
+        self.gateway.complete_sync(messages, max_tokens=100)
+        self.assertEqual(len(self.completions.calls), 5)
+        self.assertEqual(self.cache.get_stats()["misses"], 5)
+
+    def test_opt_out_and_sampling_calls_skip_the_cache(self):
+        """Test that use_cache=False and high temperatures always reach the model"""
+        self.gateway.complete_sync(user("q"))
+        self.gateway.complete_sync(user("q"), use_cache=False)
+        self.gateway.complete_sync(user("q"), temperature=0.8)
+        self.gateway.complete_sync(user("q"), temperature=0.8)
+        self.assertEqual(len(self.completions.calls), 4)
+        self.assertEqual(self.cache.size(), 1)
+
+    def test_stream_is_cached_once_complete(self):
+        """Test that a finished stream is stored and a repeat gets it in one piece"""
+        self.completions.stream_pieces = ["a", "b", "c"]
+        self.assertEqual(self.gateway.complete_stream_sync(user("q"), lambda text: None), "abc")
+        pieces = []
+        self.assertEqual(self.gateway.complete_stream_sync(user("q"), pieces.append), "abc")
+        self.assertEqual(pieces, ["abc"])
+        self.assertEqual(len(self.completions.calls), 1)
+
+    def test_failures_are_not_cached(self):
+        """Test that a failed call is retried by the next caller"""
+        response = httpx.Response(400, request=REQUEST)
+        self.completions.failures = [openai.BadRequestError("bad", response=response, body=None)]
+        self.assertIsNone(self.gateway.complete_sync(user("q")))
+        self.assertEqual(self.gateway.complete_sync(user("q")), "re: q")
+
+    def test_ttl_and_lru_eviction(self):
+        """Test that entries expire and the least recently used go first beyond the limit"""
+        cache = LLMResponseCache(self.db_path, ttl_seconds=60, max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, "m", key.upper())
+        self.assertEqual(cache.get("a"), "A")
+        cache.set("c", "m", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+        with patch("llm_cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import sys
+from unittest.mock import patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_framework.planner_agent import PlannerAgent
+from agent_framework.planner_cache import PlannerCache
+from analytics_tracker import AnalyticsTracker
+from model_router import ModelCascade, estimate_cost, model_for_attempt
+
+MODELS = ["gpt-4o-mini", "gpt-4o"]
+MESSAGES = [{"role": "user", "content": "x" * 4000}]
+VALID_GPT_RESPONSE = '{"bug_summary": "Crash on login", "affected_files": ["auth.py"], "error_type": "KeyError"}'
+
+
+class FakeGateway:
+    """Stands in for the LLM gateway and records the model of each call"""
+
+    def __init__(self, answer="y" * 400):
+        self.answer = answer
+        self.models = []
+
+    def complete_sync(self, messages, model=None, **kwargs):
+        self.models.append(model)
+        return self.answer
+
+    async def complete(self, messages, model=None, **kwargs):
+        return self.complete_sync(messages, model=model, **kwargs)
+
+
+class TestModelCascade(unittest.TestCase):
+    """Test cases for routing calls to the cheapest good-enough model"""
+
+    def test_calls_use_the_current_tier_until_escalated(self):
+        """Test that calls go to the cheap model first and stay on the tier they were escalated to"""
+        gateway = FakeGateway()
+        cascade = ModelCascade(models=MODELS, tier=0)
+        cascade.complete_sync(gateway, "planner", MESSAGES)
+        self.assertTrue(cascade.escalate("qa", "tests failed"))
+        asyncio.run(cascade.complete(gateway, "developer", MESSAGES))
+        self.assertFalse(cascade.escalate("qa", "tests failed again"))
+
+        self.assertEqual(gateway.models, MODELS)
+        self.assertEqual(cascade.model, "gpt-4o")
+        self.assertEqual(len(cascade.decisions), 1)
+        self.assertEqual(cascade.decisions[0]["from_model"], "gpt-4o-mini")
+        self.assertEqual(cascade.decisions[0]["stage"], "qa")
+
+    def test_summary_reports_cost_and_savings(self):
+        """Test that the summary compares the calls' cost to the strongest model's"""
+        cascade = ModelCascade(models=MODELS, tier=0)
+        cascade.complete_sync(FakeGateway(), "planner", MESSAGES)
+        summary = cascade.summary()
+
+        prompt_tokens = cascade.calls[0]["prompt_tokens"]
+        self.assertEqual(summary["calls_by_model"], {"gpt-4o-mini": 1})
+        self.assertAlmostEqual(summary["cost_usd"], estimate_cost("gpt-4o-mini", prompt_tokens, 100), places=6)
+        self.assertAlmostEqual(summary["strong_only_cost_usd"], estimate_cost("gpt-4o", prompt_tokens, 100), places=6)
+        self.assertGreater(summary["savings_usd"], 0)
+
+    def test_state_survives_a_round_trip(self):
+        """Test that to_dict/from_dict keeps the tier and the call record through JSON"""
+        cascade = ModelCascade(models=MODELS, tier=0)
+        cascade.complete_sync(FakeGateway(), "planner", MESSAGES)
+        cascade.escalate("planner", "invalid JSON")
+
+        restored = ModelCascade.from_dict(json.loads(json.dumps(cascade.to_dict())))
+        self.assertEqual(restored.model, "gpt-4o")
+        self.assertEqual(restored.summary(), cascade.summary())
+
+    def test_disabled_cascade_uses_the_strongest_model(self):
+        """Test that LLM_CASCADE_ENABLED=false starts on the last tier"""
+        with patch("model_router.LLM_CASCADE_ENABLED", False):
+            self.assertEqual(ModelCascade(models=MODELS).model, "gpt-4o")
+            self.assertEqual(model_for_attempt(1, MODELS), "gpt-4o")
+        self.assertEqual(model_for_attempt(1, MODELS), "gpt-4o-mini")
+        self.assertEqual(model_for_attempt(5, MODELS), "gpt-4o")
+
+    def test_planner_escalates_on_invalid_json(self):
+        """Test that PlannerAgent retries an invalid answer on the stronger model and records why"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            planner = PlannerAgent(cache=PlannerCache(os.path.join(temp_dir, "planner_cache.db")))
+            ticket = {"ticket_id": "BUG-1", "title": "Login crash", "description": "KeyError when logging in"}
+            models = []
+
+            def query(prompt, max_retries=1, priority=None, cascade=None):
+                models.append(cascade.model)
+                return "not json" if len(models) == 1 else VALID_GPT_RESPONSE
+
+            with patch("agent_framework.planner_agent.LLM_MODEL_TIERS", MODELS), \
+                    patch("model_router.LLM_CASCADE_ENABLED", True), \
+                    patch.object(PlannerAgent, "_query_gpt", side_effect=query):
+                output = planner.run(ticket)
+
+        self.assertEqual(models, ["gpt-4o-mini", planner.model])
+        self.assertEqual(output["bug_summary"], "Crash on login")
+        self.assertEqual(output["model_routing"]["decisions"][0]["stage"], "planner")
+
+    def test_analytics_summarize_routing(self):
+        """Test that AnalyticsTracker reports cost, savings and escalations across tickets"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tracker = AnalyticsTracker(output_dir=temp_dir)
+            cheap = ModelCascade(models=MODELS, tier=0)
+            cheap.complete_sync(FakeGateway(), "developer", MESSAGES)
+            escalated = ModelCascade(models=MODELS, tier=0)
+            escalated.escalate("qa", "tests failed")
+            escalated.complete_sync(FakeGateway(), "developer", MESSAGES)
+
+            tracker.log_ticket_result("BUG-1", 1, "success", model_routing=cheap.summary())
+            tracker.log_ticket_result("BUG-2", 2, "success", model_routing=escalated.summary())
+            tracker.log_ticket_result("BUG-3", 1, "success")
+            summary = tracker.get_model_routing_summary()
+
+        self.assertEqual(summary["routed_tickets"], 2)
+        self.assertEqual(summary["cheapest_tier_tickets"], 1)
+        self.assertEqual(summary["final_models"], {"gpt-4o-mini": 1, "gpt-4o": 1})
+        self.assertEqual(summary["escalations_by_stage"], {"qa": 1})
+        self.assertAlmostEqual(summary["total_savings_usd"], cheap.summary()["savings_usd"], places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import unittest
+import sys
+from unittest.mock import patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from notification_outbox import NotificationOutbox, RetryLater, parse_retry_after
+
+
+class RecordingHandler:
+    """Handler that records deliveries and fails according to a script"""
+
+    def __init__(self, outcomes=None):
+        self.delivered = []
+        self.outcomes = list(outcomes or [])
+
+    async def __call__(self, payload, idempotency_key):
+        outcome = self.outcomes.pop(0) if self.outcomes else True
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome:
+            self.delivered.append(payload["text"])
+        return outcome
+
+
+class TestNotificationOutbox(unittest.TestCase):
+    """Test cases for the notification outbox"""
+
+    def setUp(self):
+        """Set up a temporary outbox database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "outbox.db")
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_messages_are_delivered_in_order_per_ticket(self):
+        """Test that a ticket's messages go out in the order they were queued"""
+        handler = RecordingHandler()
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+        for text in ("started", "planned", "patched"):
+            outbox.enqueue("BUG-1", "note", {"text": text})
+        outbox.enqueue("BUG-2", "note", {"text": "other"})
+
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 4)
+        self.assertEqual([t for t in handler.delivered if t != "other"], ["started", "planned", "patched"])
+        self.assertEqual(outbox.pending_count(), 0)
+
+    def test_duplicate_messages_are_queued_once(self):
+        """Test that the idempotency key collapses re-queued messages"""
+        outbox = NotificationOutbox(self.db_path, handlers={"note": RecordingHandler()})
+        self.assertTrue(outbox.enqueue("BUG-1", "note", {"text": "started"}))
+        self.assertFalse(outbox.enqueue("BUG-1", "note", {"text": "started"}))
+        self.assertTrue(outbox.enqueue("BUG-1", "note", {"text": "started"}, idempotency_key="run-2"))
+        self.assertEqual(outbox.pending_count("BUG-1"), 2)
+
+    def test_delivered_messages_can_be_queued_again(self):
+        """Test that a message identical to a delivered one is sent again, e.g. for a reopened ticket"""
+        keys = []
+        handler = RecordingHandler()
+
+        async def record_key(payload, idempotency_key):
+            keys.append(idempotency_key)
+            return await handler(payload, idempotency_key)
+
+        outbox = NotificationOutbox(self.db_path, handlers={"note": record_key})
+        self.assertTrue(outbox.enqueue("BUG-1", "note", {"text": "In Progress"}))
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 1)
+        self.assertTrue(outbox.enqueue("BUG-1", "note", {"text": "In Progress"}))
+        self.assertFalse(outbox.enqueue("BUG-1", "note", {"text": "In Progress"}))
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 1)
+
+        self.assertEqual(handler.delivered, ["In Progress", "In Progress"])
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_held_messages_are_coalesced(self):
+        """Test that coalescing messages queued during the hold collapse into the held one"""
+        handler = RecordingHandler()
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+        self.assertTrue(outbox.enqueue("BUG-1", "note", {"text": "v1"}, delay=30, coalesce=True))
+        self.assertFalse(outbox.enqueue("BUG-1", "note", {"text": "v2"}, delay=30, coalesce=True))
+        self.assertTrue(outbox.enqueue("BUG-2", "note", {"text": "other"}, delay=30, coalesce=True))
+
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 0)
+        with patch("notification_outbox.time.time", return_value=time.time() + 31):
+            self.assertEqual(asyncio.run(outbox.deliver_due()), 2)
+
+    def test_failed_message_blocks_later_ones_until_retried(self):
+        """Test that a failure backs off and keeps the ticket's later messages waiting"""
+        handler = RecordingHandler([False])
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+        outbox.enqueue("BUG-1", "note", {"text": "first"})
+        outbox.enqueue("BUG-1", "note", {"text": "second"})
+
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 0)
+        self.assertEqual(handler.delivered, [])
+
+        # Not due again until the backoff has passed
+        self.assertEqual(asyncio.run(outbox.deliver_due()), 0)
+        with patch("notification_outbox.time.time", return_value=time.time() + 10):
+            self.assertEqual(asyncio.run(outbox.deliver_due()), 2)
+        self.assertEqual(handler.delivered, ["first", "second"])
+
+    def test_retry_after_is_honoured(self):
+        """Test that RetryLater schedules the next attempt after the requested delay"""
+        handler = RecordingHandler([RetryLater(120)])
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+        outbox.enqueue("BUG-1", "note", {"text": "first"})
+        asyncio.run(outbox.deliver_due())
+
+        with patch("notification_outbox.time.time", return_value=time.time() + 60):
+            self.assertEqual(asyncio.run(outbox.deliver_due()), 0)
+        with patch("notification_outbox.time.time", return_value=time.time() + 121):
+            self.assertEqual(asyncio.run(outbox.deliver_due()), 1)
+
+        self.assertEqual(parse_retry_after("30"), 30.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that a message that keeps failing is marked failed and unblocks the ticket"""
+        handler = RecordingHandler([RuntimeError("boom")] * 2)
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+        outbox.enqueue("BUG-1", "note", {"text": "first"})
+        outbox.enqueue("BUG-1", "note", {"text": "second"})
+
+        with patch("notification_outbox.NOTIFICATION_MAX_ATTEMPTS", 2), \
+             patch("notification_outbox.NOTIFICATION_BACKOFF_SECONDS", 0):
+            asyncio.run(outbox.deliver_due())
+            asyncio.run(outbox.deliver_due())
+
+        self.assertEqual([m["status"] for m in outbox.get_messages("BUG-1")], ["failed", "delivered"])
+        self.assertEqual(handler.delivered, ["second"])
+
+    def test_background_deliverer_survives_restart(self):
+        """Test that messages queued before a restart are delivered by the next deliverer"""
+        NotificationOutbox(self.db_path, handlers={"note": RecordingHandler()}).enqueue("BUG-1", "note", {"text": "queued"})
+
+        handler = RecordingHandler()
+        outbox = NotificationOutbox(self.db_path, handlers={"note": handler})
+
+        async def run():
+            outbox.start()
+            delivered = await outbox.wait_delivered("BUG-1", timeout=5)
+            await outbox.stop()
+            return delivered
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(handler.delivered, ["queued"])
+
+
+if __name__ == "__main__":
+    unittest.main()
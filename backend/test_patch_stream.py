@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import logging
+import os
+import unittest
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from github_service.patch_validator import PatchValidator
+from patch_stream import StreamingPatchParser, find_placeholders
+
+RESPONSE = """Fix off-by-one in pagination
+
+```patch
+--- a/app/pages.py
++++ b/app/pages.py
+@@ -1,2 +1,2 @@
+ def last_page(total, size):
+-    return total // size
++    return (total + size - 1) // size
+
+--- a/app/views.py
++++ b/app/views.py
+@@ -3 +3 @@
+-pages = last_page(n, 10) + 1
++pages = last_page(n, 10)
+```
+"""
+
+
+def feed_in_pieces(parser, text, size=7):
+    """Feed text the way a stream delivers it; returns how much was fed before the parser gave up"""
+    for start in range(0, len(text), size):
+        if not parser.feed(text[start:start + size]):
+            return start + size
+    return len(text)
+
+
+class TestStreamingPatchParser(unittest.TestCase):
+    """Test cases for parsing patches while they are generated"""
+
+    def test_files_are_ready_as_soon_as_the_next_one_starts(self):
+        """Test that each file's diff is handed on when the following header or the closing fence arrives"""
+        ready = []
+        fed = [0]
+        parser = StreamingPatchParser(on_file_ready=lambda path, diff: ready.append((path, fed[0])))
+        for start in range(0, len(RESPONSE), 7):
+            fed[0] = start + 7
+            self.assertTrue(parser.feed(RESPONSE[start:start + 7]))
+        files = parser.finish()
+
+        self.assertEqual([path for path, _ in ready], ["app/pages.py", "app/views.py"])
+        # The first file was ready long before the answer was complete
+        self.assertLess(ready[0][1], RESPONSE.index("+pages ="))
+        self.assertEqual(files[0]["diff"], RESPONSE[RESPONSE.index("--- a/app/pages.py"):RESPONSE.index("\n--- a/app/views.py")])
+        self.assertTrue(files[1]["diff"].endswith("+pages = last_page(n, 10)\n"))
+
+    def test_placeholder_path_aborts_at_the_header(self):
+        """Test that a diff against an example path is abandoned before its hunks are generated"""
+        response = RESPONSE.replace("app/pages.py", "path/to/file1.py")
+        parser = StreamingPatchParser()
+        fed = feed_in_pieces(parser, response)
+        self.assertIn("placeholder path path/to/file1.py", parser.abort_reason)
+        self.assertLess(fed, response.index(" def last_page"))
+        self.assertFalse(parser.feed("more"))
+
+    def test_placeholder_content_aborts(self):
+        """Test that an added your_* placeholder stops the generation, while one in unchanged code doesn't"""
+        parser = StreamingPatchParser()
+        feed_in_pieces(parser, RESPONSE.replace(" def last_page", " x = your_value\n def last_page"))
+        self.assertIsNone(parser.abort_reason)
+
+        parser = StreamingPatchParser()
+        response = RESPONSE.replace("+    return (total", "+    size = your_page_size\n+    return (total")
+        fed = feed_in_pieces(parser, response)
+        self.assertIn("app/pages.py", parser.abort_reason)
+        self.assertLess(fed, response.index("app/views.py"))
+
+    def test_advisory_placeholders_do_not_abort(self):
+        """Test that real files and added TODOs or URLs only count against the finished patch"""
+        response = (RESPONSE.replace("app/pages.py", "app/sampler.py").replace("app/views.py", "tests/sample_data.py")
+                    .replace("+    return (total", "+    # TODO: cache this, see https://example.com\n+    return (total"))
+        parser = StreamingPatchParser()
+        feed_in_pieces(parser, response)
+        self.assertIsNone(parser.abort_reason)
+        files = parser.finish()
+        self.assertEqual([f["file_path"] for f in files], ["app/sampler.py", "tests/sample_data.py"])
+        self.assertIn("diff_placeholder:# TODO", find_placeholders(files[0]["file_path"], files[0]["diff"]))
+
+    def test_answer_without_a_diff_aborts(self):
+        """Test that prose or a full file instead of a diff is abandoned after the preamble limit"""
+        parser = StreamingPatchParser(max_preamble_chars=200)
+        response = "Here is the corrected file:\n```python\n" + "x = 1\n" * 500 + "```\n"
+        fed = feed_in_pieces(parser, response)
+        self.assertIn("no diff header", parser.abort_reason)
+        self.assertLess(fed, 220)
+
+    def test_validator_uses_the_same_checks(self):
+        """Test that PatchValidator reports what find_placeholders finds"""
+        diff = "+++ b/src/your_module.py\n+# FIXME\n"
+        expected = find_placeholders("src/your_module.py", diff)
+        self.assertEqual(expected, ["path_placeholder:your_", "diff_placeholder:# FIXME"])
+        self.assertEqual(PatchValidator()._check_for_placeholders("src/your_module.py", diff), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
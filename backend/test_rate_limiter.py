@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import unittest
+import sys
+from multiprocessing import Pool
+from unittest.mock import patch
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import TokenBucket, parse_reset
+from jira_service.session import JiraRateLimitError, JiraSession
+
+
+def reserve_from_shared_bucket(state_path):
+    """Take a token from a bucket backed by state_path, in a separate process"""
+    return TokenBucket("shared", per_minute=60, burst=2, state_path=state_path).reserve()
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the shared token-bucket rate limiter"""
+
+    def setUp(self):
+        """Set up a temporary state directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.temp_dir.name, "bucket.json")
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_burst_then_paced(self):
+        """Test that the burst goes out at once and later requests queue at the refill rate"""
+        bucket = TokenBucket("test", per_minute=60, burst=2)
+        waits = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 1.0, delta=0.05)
+        self.assertAlmostEqual(waits[3], 2.0, delta=0.05)
+
+    def test_processes_share_one_budget(self):
+        """Test that buckets in different processes draw from the same state file"""
+        with Pool(4) as pool:
+            waits = pool.map(reserve_from_shared_bucket, [self.state_path] * 4)
+        self.assertEqual(sorted(round(w) for w in waits), [0, 0, 1, 2])
+
+    def test_retry_after_blocks_bucket(self):
+        """Test that a 429 with Retry-After holds every request until it has passed"""
+        bucket = TokenBucket("test", per_minute=600, burst=10, state_path=self.state_path)
+        bucket.record_response(429, {"Retry-After": "30"})
+        self.assertAlmostEqual(bucket.reserve(), 30.0, delta=0.5)
+
+        # Another process using the same file sees the block too
+        other = TokenBucket("test", per_minute=600, burst=10, state_path=self.state_path)
+        self.assertGreater(other.reserve(), 29.0)
+
+    def test_exhausted_budget_waits_for_reset(self):
+        """Test that a zero remaining count blocks until the provider's reset time"""
+        bucket = TokenBucket("test", per_minute=600, burst=10)
+        reset_at = time.time() + 60
+        bucket.record_response(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(reset_at))})
+        self.assertAlmostEqual(bucket.reserve(), 60.0, delta=1.5)
+
+        # A low remaining count only caps the burst
+        bucket = TokenBucket("test", per_minute=600, burst=10)
+        bucket.record_response(200, {"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "6s"})
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertGreater(bucket.reserve(), 0.0)
+
+    def test_429_without_hints_backs_off_exponentially(self):
+        """Test that repeated bare 429s back off longer each time and a success resets it"""
+        bucket = TokenBucket("test", per_minute=6000, burst=10)
+        with patch("rate_limiter.RATE_LIMIT_BACKOFF_SECONDS", 1):
+            bucket.record_response(429, {})
+            first = bucket.get_status()["blocked_for_seconds"]
+            bucket.record_response(429, {})
+            second = bucket.get_status()["blocked_for_seconds"]
+        self.assertAlmostEqual(first, 1.0, delta=0.2)
+        self.assertAlmostEqual(second, 2.0, delta=0.2)
+
+    def test_parse_reset_formats(self):
+        """Test the GitHub, OpenAI and JIRA reset header formats"""
+        now = 1_700_000_000.0
+        self.assertEqual(parse_reset("1700000060", now), 1700000060.0)
+        self.assertEqual(parse_reset("6m0s", now), now + 360)
+        self.assertEqual(parse_reset("20ms", now), now + 0.02)
+        self.assertEqual(parse_reset("2023-11-14T22:14:20Z", now), 1700000060.0)
+        self.assertIsNone(parse_reset("soon", now))
+
+    def test_jira_session_feeds_the_bucket(self):
+        """Test that the JIRA session waits on the bucket and records 429s in it"""
+        bucket = TokenBucket("jira", per_minute=600, burst=10)
+        transport = httpx.MockTransport(lambda request: httpx.Response(429, headers={"Retry-After": "45"}))
+        session = JiraSession("https://jira.example.com", ("u", "t"), transport=transport, rate_limiter=bucket)
+
+        with self.assertRaises(JiraRateLimitError):
+            asyncio.run(session.add_comment("BUG-1", "hello"))
+        self.assertGreater(bucket.get_status()["blocked_for_seconds"], 44)
+
+    def test_agents_copy_is_in_sync(self):
+        """Test that the agents' copy of the module matches this one"""
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(backend_dir, "rate_limiter.py")) as f:
+            backend_copy = f.read()
+        with open(os.path.join(backend_dir, "..", "agents", "utils", "rate_limiter.py")) as f:
+            agents_copy = f.read()
+        self.assertEqual(backend_copy, agents_copy)
+
+
+if __name__ == "__main__":
+    unittest.main()
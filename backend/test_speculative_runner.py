@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import subprocess
+import tempfile
+import unittest
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import speculative_runner
+from speculative_runner import (
+    RepoSandbox,
+    build_candidate_variants,
+    race_candidates,
+    select_fallback_candidate
+)
+
+
+class TestSpeculativeRunner(unittest.TestCase):
+    """Test cases for the speculative candidate helpers"""
+
+    def test_candidate_variants_differ(self):
+        """Test that candidates get distinct temperatures and strategies"""
+        variants = build_candidate_variants(3)
+        self.assertEqual([v["candidate"] for v in variants], [1, 2, 3])
+        self.assertEqual(len({v["temperature"] for v in variants}), 3)
+        self.assertEqual(len({v["strategy"] for v in variants}), 3)
+
+    def test_first_passing_candidate_wins_and_rest_are_cancelled(self):
+        """Test that the race stops at the first winner and cancels slower candidates"""
+        cancelled = []
+
+        def candidate(delay, passed, index):
+            async def run():
+                try:
+                    await asyncio.sleep(delay)
+                    return {"passed": passed}
+                except asyncio.CancelledError:
+                    cancelled.append(index)
+                    raise
+            return run
+
+        winner, results = asyncio.run(race_candidates(
+            [candidate(0.01, False, 0), candidate(0.02, True, 1), candidate(5, True, 2)],
+            lambda result: result["passed"]
+        ))
+
+        self.assertEqual(winner, 1)
+        self.assertEqual(set(results), {0, 1})
+        self.assertEqual(cancelled, [2])
+
+    def test_no_winner_returns_all_results(self):
+        """Test that every finished candidate is returned when none pass"""
+        async def failing():
+            return {"passed": False, "confidence": 40}
+
+        async def broken():
+            raise RuntimeError("agent crashed")
+
+        winner, results = asyncio.run(race_candidates([failing, broken, failing], lambda r: r["passed"]))
+
+        self.assertIsNone(winner)
+        self.assertEqual(set(results), {0, 2})
+
+    def test_fallback_prefers_highest_confidence(self):
+        """Test fallback selection by confidence, then candidate order"""
+        results = {0: {"c": 50}, 1: {"c": 80}, 2: {"c": 80}}
+        self.assertEqual(select_fallback_candidate(results, lambda r: r["c"]), 1)
+        self.assertIsNone(select_fallback_candidate({}, lambda r: r["c"]))
+
+    def test_sandbox_is_isolated_git_worktree(self):
+        """Test that a sandbox is a separate checkout and is removed on cleanup"""
+        with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as root:
+            subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+            with open(os.path.join(repo, "app.py"), "w") as f:
+                f.write("x = 1\n")
+            subprocess.run(["git", "add", "app.py"], cwd=repo, check=True)
+            subprocess.run(
+                ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-qm", "init"],
+                cwd=repo, check=True
+            )
+
+            original_root = speculative_runner.SANDBOX_ROOT
+            speculative_runner.SANDBOX_ROOT = root
+            try:
+                sandbox = RepoSandbox(repo, "BUG-1-a1-c1")
+                path = sandbox.create()
+                with open(os.path.join(path, "app.py"), "w") as f:
+                    f.write("x = 2\n")
+
+                # The original checkout is untouched
+                with open(os.path.join(repo, "app.py")) as f:
+                    self.assertEqual(f.read(), "x = 1\n")
+
+                sandbox.cleanup()
+                self.assertFalse(os.path.exists(path))
+            finally:
+                speculative_runner.SANDBOX_ROOT = original_root
+
+
+if __name__ == "__main__":
+    unittest.main()
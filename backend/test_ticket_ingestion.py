@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import unittest
+import sys
+from unittest.mock import patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ticket_ingestion import LeaseHeartbeat, LeaseLostError, TicketIngestion, TicketLeaseStore
+
+
+class TestTicketIngestion(unittest.TestCase):
+    """Test cases for the shared ticket ingestion and lease store"""
+
+    def setUp(self):
+        """Set up a temporary lease database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "leases.db")
+        self.store = TicketLeaseStore(self.db_path)
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_each_ticket_is_leased_to_one_consumer(self):
+        """Test that consumers sharing the store never get the same ticket"""
+        for n in range(3):
+            self.store.publish({"ticket_id": f"BUG-{n}", "status": "To Do"})
+
+        # A second store instance stands in for another process
+        other = TicketLeaseStore(self.db_path)
+        first = self.store.acquire("worker-a", limit=2)
+        second = other.acquire("worker-b", limit=2)
+
+        self.assertEqual([t["ticket_id"] for t in first], ["BUG-0", "BUG-1"])
+        self.assertEqual([t["ticket_id"] for t in second], ["BUG-2"])
+        self.assertEqual(other.acquire("worker-b"), [])
+
+    def test_status_filter(self):
+        """Test that consumers can restrict leases to some JIRA statuses"""
+        self.store.publish({"ticket_id": "BUG-1", "status": "In Progress"})
+        self.store.publish({"ticket_id": "BUG-2", "status": "To Do"})
+        leased = self.store.acquire("worker-a", limit=5, statuses=("To Do",))
+        self.assertEqual([t["ticket_id"] for t in leased], ["BUG-2"])
+
+    def test_expired_lease_is_handed_out_again(self):
+        """Test that a consumer that stops renewing loses the ticket"""
+        self.store.publish({"ticket_id": "BUG-1"})
+        self.assertEqual(len(self.store.acquire("worker-a", lease_seconds=30)), 1)
+        self.assertEqual(self.store.acquire("worker-b"), [])
+
+        with patch("ticket_ingestion.time.time", return_value=time.time() + 60):
+            leased = self.store.acquire("worker-b")
+        self.assertEqual([t["ticket_id"] for t in leased], ["BUG-1"])
+        self.assertFalse(self.store.renew("BUG-1", "worker-a"))
+        self.assertTrue(self.store.renew("BUG-1", "worker-b"))
+
+    def test_release_and_complete(self):
+        """Test that released tickets return to the pool and completed ones don't"""
+        self.store.publish({"ticket_id": "BUG-1"})
+        self.store.publish({"ticket_id": "BUG-2"})
+        self.store.acquire("worker-a", limit=2)
+
+        self.assertTrue(self.store.release("BUG-1", "worker-a"))
+        self.assertTrue(self.store.release("BUG-2", "worker-a", completed=True))
+        self.assertEqual([t["ticket_id"] for t in self.store.acquire("worker-b", limit=5)], ["BUG-1"])
+
+        # Completed tickets stay done even if JIRA reports a change
+        self.assertFalse(self.store.publish({"ticket_id": "BUG-2", "updated": "later"}))
+
+    def test_acquire_specific_ticket(self):
+        """Test leasing a ticket by ID, e.g. one received from a webhook"""
+        ticket = {"ticket_id": "BUG-1", "status": "To Do"}
+        self.assertTrue(self.store.acquire_ticket(ticket, "worker-a"))
+        self.assertTrue(self.store.acquire_ticket(ticket, "worker-a"))
+        self.assertFalse(self.store.acquire_ticket(ticket, "worker-b"))
+        self.assertEqual(self.store.release_all("worker-a"), 1)
+        self.assertTrue(self.store.acquire_ticket(ticket, "worker-b"))
+
+    def test_only_one_consumer_polls_per_interval(self):
+        """Test that JIRA is fetched once however many consumers run"""
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return [{"ticket_id": "BUG-1", "updated": "v1"}]
+
+        consumers = [
+            TicketIngestion(f"worker-{n}", store=TicketLeaseStore(self.db_path), fetch=fetch, poll_interval=60)
+            for n in range(3)
+        ]
+
+        async def run():
+            return [await consumer.poll_if_due() for consumer in consumers]
+
+        self.assertEqual(asyncio.run(run()), [1, 0, 0])
+        self.assertEqual(len(calls), 1)
+
+    def test_heartbeat_renews_lease(self):
+        """Test that a running heartbeat keeps extending the lease"""
+        self.store.publish({"ticket_id": "BUG-1"})
+        self.store.acquire("worker-a", lease_seconds=3)
+
+        async def run():
+            async with LeaseHeartbeat(self.store, "BUG-1", "worker-a", lease_seconds=3):
+                await asyncio.sleep(1.2)
+            return self.store.get_leases()["BUG-1"]
+
+        lease = asyncio.run(run())
+        self.assertEqual(lease["owner"], "worker-a")
+        self.assertGreater(lease["expires_in"], 2.5)
+
+
+    def test_heartbeat_reports_lost_lease(self):
+        """Test that check() raises once another consumer has taken the expired lease over"""
+        self.store.publish({"ticket_id": "BUG-1"})
+        self.store.acquire("worker-a", lease_seconds=3)
+        with patch("ticket_ingestion.time.time", return_value=time.time() + 60):
+            self.store.acquire("worker-b")
+
+        async def run():
+            heartbeat = LeaseHeartbeat(self.store, "BUG-1", "worker-a", lease_seconds=3)
+            heartbeat.check()
+            async with heartbeat:
+                await asyncio.sleep(1.2)
+            return heartbeat
+
+        heartbeat = asyncio.run(run())
+        self.assertTrue(heartbeat.lost)
+        with self.assertRaises(LeaseLostError):
+            heartbeat.check()
+
+if __name__ == "__main__":
+    unittest.main()
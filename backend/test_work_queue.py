@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import logging
+import os
+import tempfile
+import unittest
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add the current directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from work_queue import WorkQueue
+
+
+class TestWorkQueue(unittest.TestCase):
+    """Test cases for WorkQueue"""
+
+    def setUp(self):
+        """Set up a temporary database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "queue.db")
+        self.queue = WorkQueue(self.db_path)
+
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        self.temp_dir.cleanup()
+
+    def test_enqueue_and_finish(self):
+        """Test that finished tickets are refused and no longer pending"""
+        ticket = {"ticket_id": "BUG-1", "title": "Crash"}
+        self.assertTrue(self.queue.enqueue(ticket))
+        self.assertTrue(self.queue.enqueue(ticket))
+        self.assertEqual(self.queue.get_status("BUG-1"), "queued")
+
+        self.queue.set_status("BUG-1", "completed")
+        self.assertTrue(self.queue.is_finished("BUG-1"))
+        self.assertFalse(self.queue.enqueue(ticket))
+        self.assertEqual(self.queue.pending_tickets(), [])
+
+    def test_pending_tickets_survive_restart(self):
+        """Test that queued and in-progress tickets are returned by a new instance"""
+        self.queue.enqueue({"ticket_id": "BUG-1", "title": "First"})
+        self.queue.enqueue({"ticket_id": "BUG-2", "title": "Second"})
+        self.queue.enqueue({"ticket_id": "BUG-3", "title": "Third"})
+        self.queue.set_status("BUG-1", "processing")
+        self.queue.set_status("BUG-3", "escalated")
+
+        restarted = WorkQueue(self.db_path)
+        pending = restarted.pending_tickets()
+        self.assertEqual([t["ticket_id"] for t in pending], ["BUG-1", "BUG-2"])
+        self.assertEqual(pending[0]["title"], "First")
+
+    def test_checkpoints_survive_restart(self):
+        """Test that stage outputs are stored per stage and attempt"""
+        self.queue.enqueue({"ticket_id": "BUG-1"})
+        self.queue.save_checkpoint("BUG-1", "planner", {"root_cause": "typo"})
+        self.queue.save_checkpoint("BUG-1", "developer", {"patch_content": "v1"}, attempt=1)
+        self.queue.save_checkpoint("BUG-1", "developer", {"patch_content": "v2"}, attempt=2)
+
+        restarted = WorkQueue(self.db_path)
+        self.assertEqual(restarted.get_checkpoint("BUG-1", "planner"), {"root_cause": "typo"})
+        self.assertEqual(restarted.get_checkpoint("BUG-1", "developer", 2), {"patch_content": "v2"})
+        self.assertIsNone(restarted.get_checkpoint("BUG-1", "qa", 1))
+        self.assertEqual(
+            [(c["stage"], c["attempt"]) for c in restarted.get_checkpoints("BUG-1")],
+            [("planner", 0), ("developer", 1), ("developer", 2)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,467 @@
+"""
+Shared JIRA ingestion with lease-based ticket distribution.
+
+One component fetches tickets from JIRA (incremental poll or webhook) and
+publishes them to a SQLite lease store. Any number of consumers - the
+controller, the orchestrator and the JIRA service, in one or several
+processes - take tickets from the store under a time-limited lease, renew it
+with heartbeats while they work, and release it when they finish. A consumer
+that dies simply stops renewing and its tickets become available again once
+the lease expires.
+
+Polling itself is coordinated through the same database, so however many
+consumers run, JIRA is searched once per poll interval. Consumers in several
+containers on one host share TICKET_LEASE_DB through a local volume (see
+docker-compose.yml). SQLite's locking isn't reliable on network filesystems,
+so the store must not be shared across nodes that way.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("ticket-ingestion")
+
+TICKET_LEASE_DB = os.environ.get("TICKET_LEASE_DB", "data/ticket_leases.db")
+
+# How long a lease lasts without a heartbeat
+TICKET_LEASE_SECONDS = int(os.environ.get("TICKET_LEASE_SECONDS", "300"))
+
+# Minimum time between JIRA polls across all consumers
+INGESTION_POLL_INTERVAL_SECONDS = int(os.environ.get("INGESTION_POLL_INTERVAL_SECONDS", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated TEXT,
+    state TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    published_at REAL NOT NULL,
+    completed_at REAL
+);
+CREATE TABLE IF NOT EXISTS ingestion (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    last_poll_at REAL NOT NULL
+);
+"""
+
+
+def default_consumer_id(role: str) -> str:
+    """Build a consumer ID that is unique per host and process"""
+    return f"{role}@{socket.gethostname()}:{os.getpid()}"
+
+
+class TicketLeaseStore:
+    """SQLite-backed store of published tickets and the leases held on them"""
+
+    def __init__(self, db_path: str = None):
+        """
+        Initialize the lease store
+
+        Args:
+            db_path: SQLite database path. Defaults to TICKET_LEASE_DB.
+        """
+        # Absolute so a later chdir doesn't point the store at a different file
+        self.db_path = os.path.abspath(db_path or TICKET_LEASE_DB)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # WAL lets consumers read while another one holds the write lock
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+        logger.info(f"Using ticket lease database: {self.db_path}")
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a connection inside an immediate transaction
+
+        BEGIN IMMEDIATE takes the write lock up front, so reading candidate
+        tickets and leasing them is atomic across processes.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+
+    def publish(self, ticket: Dict[str, Any]) -> bool:
+        """
+        Publish a ticket so consumers can lease it
+
+        Args:
+            ticket: Ticket payload, must contain ticket_id
+
+        Returns:
+            True if the ticket is new or its content changed, False otherwise
+        """
+        ticket_id = ticket.get("ticket_id")
+        if not ticket_id:
+            return False
+        updated = ticket.get("updated") or ""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT state, updated FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO tickets (ticket_id, payload, updated, state, published_at) VALUES (?, ?, ?, 'available', ?)",
+                        (ticket_id, json.dumps(ticket, default=str), updated, time.time())
+                    )
+                    return True
+                if row["state"] == "done" or (updated and row["updated"] == updated):
+                    return False
+                # Refresh the payload but leave any lease in place
+                conn.execute(
+                    "UPDATE tickets SET payload = ?, updated = ? WHERE ticket_id = ?",
+                    (json.dumps(ticket, default=str), updated, ticket_id)
+                )
+                return True
+        except Exception as e:
+            logger.error(f"Error publishing ticket {ticket_id}: {str(e)}")
+            return False
+
+    def acquire(self, consumer_id: str, limit: int = 1, lease_seconds: int = None,
+                statuses: Iterable[str] = None) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` available tickets, oldest first
+
+        Tickets whose lease expired without being renewed are available again.
+
+        Args:
+            consumer_id: ID of the consumer taking the leases
+            limit: Maximum number of tickets to lease
+            lease_seconds: Lease duration. Defaults to TICKET_LEASE_SECONDS.
+            statuses: Only lease tickets whose JIRA status is one of these
+
+        Returns:
+            Payloads of the leased tickets
+        """
+        if limit <= 0:
+            return []
+        lease_seconds = lease_seconds or TICKET_LEASE_SECONDS
+        now = time.time()
+        leased = []
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT ticket_id, payload FROM tickets "
+                    "WHERE state = 'available' OR (state = 'leased' AND lease_expires < ?) "
+                    "ORDER BY published_at",
+                    (now,)
+                ).fetchall()
+                for row in rows:
+                    ticket = json.loads(row["payload"])
+                    if statuses is not None and ticket.get("status") not in statuses:
+                        continue
+                    conn.execute(
+                        "UPDATE tickets SET state = 'leased', owner = ?, lease_expires = ? WHERE ticket_id = ?",
+                        (consumer_id, now + lease_seconds, row["ticket_id"])
+                    )
+                    leased.append(ticket)
+                    if len(leased) >= limit:
+                        break
+        except Exception as e:
+            logger.error(f"Error leasing tickets for {consumer_id}: {str(e)}")
+            return []
+        if leased:
+            logger.info(f"{consumer_id} leased {[t['ticket_id'] for t in leased]}")
+        return leased
+
+    def acquire_ticket(self, ticket: Dict[str, Any], consumer_id: str, lease_seconds: int = None) -> bool:
+        """
+        Lease a specific ticket, publishing it first if needed
+
+        Returns:
+            True if the consumer now holds the lease (including if it already did)
+        """
+        ticket_id = ticket.get("ticket_id")
+        lease_seconds = lease_seconds or TICKET_LEASE_SECONDS
+        self.publish(ticket)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "UPDATE tickets SET state = 'leased', owner = ?, lease_expires = ? "
+                    "WHERE ticket_id = ? AND (state = 'available' OR (state = 'leased' AND (owner = ? OR lease_expires < ?)))",
+                    (consumer_id, now + lease_seconds, ticket_id, consumer_id, now)
+                )
+                return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error leasing ticket {ticket_id} for {consumer_id}: {str(e)}")
+            return False
+
+    def renew(self, ticket_id: str, consumer_id: str, lease_seconds: int = None) -> bool:
+        """
+        Extend a lease held by the consumer
+
+        Returns:
+            False if the consumer no longer holds the lease
+        """
+        lease_seconds = lease_seconds or TICKET_LEASE_SECONDS
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "UPDATE tickets SET lease_expires = ? WHERE ticket_id = ? AND state = 'leased' AND owner = ?",
+                    (time.time() + lease_seconds, ticket_id, consumer_id)
+                )
+                return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error renewing lease on {ticket_id} for {consumer_id}: {str(e)}")
+            return False
+
+    def release(self, ticket_id: str, consumer_id: str, completed: bool = False) -> bool:
+        """
+        Give up a lease
+
+        Args:
+            ticket_id: Leased ticket
+            consumer_id: Consumer holding the lease
+            completed: Mark the ticket done so it is never handed out again,
+                otherwise make it available to other consumers
+
+        Returns:
+            True if the consumer held the lease
+        """
+        try:
+            with self._connect() as conn:
+                if completed:
+                    cursor = conn.execute(
+                        "UPDATE tickets SET state = 'done', owner = ?, lease_expires = NULL, completed_at = ? "
+                        "WHERE ticket_id = ? AND (owner = ? OR state = 'available')",
+                        (consumer_id, time.time(), ticket_id, consumer_id)
+                    )
+                else:
+                    cursor = conn.execute(
+                        "UPDATE tickets SET state = 'available', owner = NULL, lease_expires = NULL "
+                        "WHERE ticket_id = ? AND state = 'leased' AND owner = ?",
+                        (ticket_id, consumer_id)
+                    )
+                return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error releasing lease on {ticket_id} for {consumer_id}: {str(e)}")
+            return False
+
+    def release_all(self, consumer_id: str) -> int:
+        """Return every lease held by a consumer, e.g. on shutdown"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "UPDATE tickets SET state = 'available', owner = NULL, lease_expires = NULL "
+                    "WHERE state = 'leased' AND owner = ?",
+                    (consumer_id,)
+                )
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error releasing leases for {consumer_id}: {str(e)}")
+            return 0
+
+    def claim_poll(self, name: str, consumer_id: str, interval_seconds: int) -> bool:
+        """
+        Claim the right to run the next poll for a source
+
+        Returns:
+            True if no consumer has polled within the interval, in which case
+            the caller should poll now
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT last_poll_at FROM ingestion WHERE name = ?", (name,)).fetchone()
+                if row is not None and now - row["last_poll_at"] < interval_seconds:
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingestion (name, owner, last_poll_at) VALUES (?, ?, ?)",
+                    (name, consumer_id, now)
+                )
+                return True
+        except Exception as e:
+            logger.error(f"Error claiming poll for {name}: {str(e)}")
+            return False
+
+    def get_leases(self) -> Dict[str, Dict[str, Any]]:
+        """Get the tickets currently leased, with their owners and expiry"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT ticket_id, owner, lease_expires FROM tickets WHERE state = 'leased'"
+                ).fetchall()
+                now = time.time()
+                return {
+                    row["ticket_id"]: {
+                        "owner": row["owner"],
+                        "expires_in": round(row["lease_expires"] - now, 1),
+                        "expired": row["lease_expires"] < now
+                    }
+                    for row in rows
+                }
+        except Exception as e:
+            logger.error(f"Error reading leases: {str(e)}")
+            return {}
+
+
+class LeaseLostError(Exception):
+    """Raised when another consumer has taken over the lease on a ticket being worked on"""
+
+
+class LeaseHeartbeat:
+    """Renews a lease in the background while a ticket is being worked on"""
+
+    def __init__(self, store: TicketLeaseStore, ticket_id: str, consumer_id: str, lease_seconds: int = None):
+        self.store = store
+        self.ticket_id = ticket_id
+        self.consumer_id = consumer_id
+        self.lease_seconds = lease_seconds or TICKET_LEASE_SECONDS
+        self.lost = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        # Renew well before expiry so one slow or failed heartbeat doesn't lose the lease
+        interval = max(1, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.store.renew(self.ticket_id, self.consumer_id, self.lease_seconds):
+                self.lost = True
+                logger.warning(f"{self.consumer_id} lost its lease on ticket {self.ticket_id}")
+                return
+
+    def check(self) -> None:
+        """
+        Make sure the lease is still held, for use between the stages of a ticket
+
+        Raises:
+            LeaseLostError: If a renewal failed, so another consumer may be working on the ticket
+        """
+        if self.lost:
+            raise LeaseLostError(f"{self.consumer_id} no longer holds the lease on ticket {self.ticket_id}")
+
+    def start(self) -> "LeaseHeartbeat":
+        """Start renewing the lease"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    def cancel(self) -> None:
+        """Stop renewing the lease without waiting, for use from sync callbacks"""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def stop(self) -> None:
+        """Stop renewing the lease"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def __aenter__(self) -> "LeaseHeartbeat":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
+
+
+async def _fetch_jira_tickets() -> List[Dict[str, Any]]:
+    """Default ticket source: incremental poll of the bug ticket query"""
+    from jira_utils import fetch_jira_tickets
+    return await fetch_jira_tickets()
+
+
+class TicketIngestion:
+    """
+    Fetches tickets once and distributes them through leases
+
+    Each consumer process creates its own TicketIngestion with its own
+    consumer ID; they coordinate through the shared lease store.
+    """
+
+    def __init__(self, consumer_id: str, store: TicketLeaseStore = None,
+                 fetch: Callable[[], Awaitable[List[Dict[str, Any]]]] = None,
+                 poll_interval: int = None, lease_seconds: int = None):
+        """
+        Initialize the ingestion component
+
+        Args:
+            consumer_id: Unique ID of this consumer, see default_consumer_id()
+            store: Lease store. Defaults to the shared store from get_lease_store().
+            fetch: Coroutine function returning new or changed tickets. Defaults to the JIRA poll.
+            poll_interval: Minimum seconds between polls. Defaults to INGESTION_POLL_INTERVAL_SECONDS.
+            lease_seconds: Lease duration. Defaults to TICKET_LEASE_SECONDS.
+        """
+        self.consumer_id = consumer_id
+        self.store = store or get_lease_store()
+        self.fetch = fetch or _fetch_jira_tickets
+        self.poll_interval = poll_interval if poll_interval is not None else INGESTION_POLL_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or TICKET_LEASE_SECONDS
+
+    async def poll_if_due(self) -> int:
+        """
+        Poll JIRA if no consumer has done so within the poll interval
+
+        Returns:
+            Number of new or changed tickets published
+        """
+        if not self.store.claim_poll("jira", self.consumer_id, self.poll_interval):
+            return 0
+        tickets = await self.fetch()
+        published = sum(1 for ticket in tickets or [] if ticket and self.store.publish(ticket))
+        if published:
+            logger.info(f"{self.consumer_id} published {published} new or changed ticket(s)")
+        return published
+
+    def publish(self, ticket: Dict[str, Any]) -> bool:
+        """Publish a ticket received from outside the poll, e.g. a webhook"""
+        return self.store.publish(ticket)
+
+    def acquire(self, limit: int = 1, statuses: Iterable[str] = None) -> List[Dict[str, Any]]:
+        """Lease up to `limit` available tickets for this consumer"""
+        return self.store.acquire(self.consumer_id, limit, self.lease_seconds, statuses)
+
+    def acquire_ticket(self, ticket: Dict[str, Any]) -> bool:
+        """Lease a specific ticket for this consumer"""
+        return self.store.acquire_ticket(ticket, self.consumer_id, self.lease_seconds)
+
+    def heartbeat(self, ticket_id: str) -> LeaseHeartbeat:
+        """Create a heartbeat that keeps this consumer's lease on a ticket alive"""
+        return LeaseHeartbeat(self.store, ticket_id, self.consumer_id, self.lease_seconds)
+
+    def release(self, ticket_id: str, completed: bool = False) -> bool:
+        """Release this consumer's lease on a ticket"""
+        return self.store.release(ticket_id, self.consumer_id, completed)
+
+    def release_all(self) -> int:
+        """Release every lease this consumer holds"""
+        return self.store.release_all(self.consumer_id)
+
+
+# Singleton instance
+_lease_store = None
+
+def get_lease_store() -> TicketLeaseStore:
+    """Get the singleton lease store instance"""
+    global _lease_store
+    if _lease_store is None:
+        _lease_store = TicketLeaseStore()
+    return _lease_store
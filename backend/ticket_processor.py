@@ -4,8 +4,14 @@ import asyncio
 import os
 import json
 from datetime import datetime
-from typing import Dict, Any, List
-from jira_utils import update_jira_ticket
+from typing import Dict, Any, List, Optional, Tuple
+from notification_outbox import (
+    NOTIFICATION_FLUSH_TIMEOUT_SECONDS,
+    get_notification_outbox,
+    queue_communicator_update,
+    queue_jira_progress,
+    queue_jira_update
+)
 from agent_utils import (
     call_planner_agent,
     call_developer_agent,
@@ -27,6 +33,14 @@ from log_utils import (
     log_error
 )
 from analytics_tracker import get_analytics_tracker
+from ticket_ingestion import LeaseHeartbeat, LeaseLostError
+from work_queue import get_work_queue
+from speculative_runner import (
+    SPECULATIVE_CANDIDATES,
+    build_candidate_variants,
+    race_candidates,
+    select_fallback_candidate
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,10 +51,79 @@ RETRY_DELAY_SECONDS = int(os.environ.get('RETRY_DELAY_SECONDS', '5'))
 # Get confidence threshold from environment or default to 60%
 CONFIDENCE_THRESHOLD = int(os.environ.get('CONFIDENCE_THRESHOLD', '60'))
 
-async def process_ticket(ticket: Dict[str, Any]):
-    """Process a single ticket through the enhanced agent workflow"""
+async def run_speculative_candidates(
+    ticket: Dict[str, Any],
+    planner_analysis: Dict[str, Any],
+    attempt: int,
+    developer_context: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Generate and test SPECULATIVE_CANDIDATES patches concurrently for one attempt
+    
+    Each candidate asks the Developer agent for a fix with its own temperature and
+    prompt strategy, then sends it to the QA agent under its own sandbox_id. The
+    first candidate that passes QA wins and the rest are cancelled. If none pass,
+    the highest-confidence candidate is returned.
+    
+    Returns:
+        Tuple of (developer_response, qa_response) for the chosen candidate
+    """
+    ticket_id = ticket["ticket_id"]
+    variants = build_candidate_variants(SPECULATIVE_CANDIDATES)
+    logger.info(f"Racing {len(variants)} candidate patches for ticket {ticket_id} (attempt {attempt})")
+    
+    def make_candidate(variant: Dict[str, Any]):
+        async def run_candidate() -> Dict[str, Any]:
+            developer_response = await call_developer_agent(
+                planner_analysis, attempt, developer_context, ticket=ticket, options=variant
+            )
+            
+            qa_response = None
+            if developer_response:
+                sandbox_id = f"{ticket_id}-a{attempt}-c{variant['candidate']}"
+                qa_response = await call_qa_agent({**developer_response, "sandbox_id": sandbox_id})
+            
+            return {"developer_response": developer_response, "qa_response": qa_response}
+        return run_candidate
+    
+    winner, results = await race_candidates(
+        [make_candidate(variant) for variant in variants],
+        lambda candidate: bool(candidate["qa_response"] and candidate["qa_response"].get("passed", False))
+    )
+    
+    # Only candidates that produced a patch are eligible when none passed
+    results = {index: candidate for index, candidate in results.items() if candidate["developer_response"]}
+    chosen = winner if winner is not None else select_fallback_candidate(
+        results,
+        lambda candidate: candidate["developer_response"].get("confidence_score")
+    )
+    if chosen is None:
+        return None, None
+    
+    logger.info(f"Using candidate {chosen + 1} for ticket {ticket_id} (passed: {winner is not None})")
+    return results[chosen]["developer_response"], results[chosen]["qa_response"]
+
+async def process_ticket(ticket: Dict[str, Any], lease: Optional[LeaseHeartbeat] = None):
+    """
+    Process a single ticket through the enhanced agent workflow
+    
+    Args:
+        ticket: Ticket to process
+        lease: Heartbeat of this consumer's lease on the ticket; processing stops
+            between stages once the lease is lost
+    """
     ticket_id = ticket["ticket_id"]
     
+    def check_lease():
+        if lease:
+            lease.check()
+    
+    # Stage outputs are checkpointed so a restart resumes instead of re-running LLM calls
+    work_queue = get_work_queue("controller")
+    work_queue.enqueue(ticket)
+    work_queue.set_status(ticket_id, "processing")
+    finished = True
+    
     try:
         # Setup logging and initialize ticket
         ticket_log_dir = setup_ticket_logging(ticket_id)
@@ -53,11 +136,7 @@ async def process_ticket(ticket: Dict[str, Any]):
         logger.info(f"Starting processing for ticket {ticket_id}")
         
         # Update JIRA ticket to "In Progress"
-        await update_jira_ticket(
-            ticket_id, 
-            "In Progress", 
-            "BugFix AI has started working on this ticket."
-        )
+        queue_jira_progress(ticket_id, "BugFix AI has started working on this ticket.", "In Progress")
         
         # Step 1: Enhanced Planner Analysis
         logger.info(f"Sending ticket {ticket_id} to enhanced Planner agent")
@@ -74,7 +153,13 @@ async def process_ticket(ticket: Dict[str, Any]):
                 logger.warning(f"Could not fetch additional ticket data: {str(e)}")
         
         log_agent_input(ticket_id, "planner", enhanced_ticket)
-        planner_analysis = await call_planner_agent(enhanced_ticket)
+        planner_analysis = work_queue.get_checkpoint(ticket_id, "planner")
+        if planner_analysis:
+            logger.info(f"Resuming ticket {ticket_id} from saved planner analysis")
+        else:
+            planner_analysis = await call_planner_agent(enhanced_ticket)
+            if planner_analysis:
+                work_queue.save_checkpoint(ticket_id, "planner", planner_analysis)
         
         if planner_analysis:
             log_agent_output(ticket_id, "planner", planner_analysis)
@@ -95,11 +180,7 @@ async def process_ticket(ticket: Dict[str, Any]):
                     logger.info(f"Planner identified {valid_files} valid files and {invalid_files} invalid files")
             
             # Notify JIRA about planner completion
-            await update_jira_ticket(
-                ticket_id,
-                "", 
-                "BugFix AI: Planner analysis completed. Identified affected files and error type."
-            )
+            queue_jira_progress(ticket_id, "BugFix AI: Planner analysis completed. Identified affected files and error type.")
             
             # Check if fallback was used
             if planner_analysis.get('using_fallback'):
@@ -107,7 +188,7 @@ async def process_ticket(ticket: Dict[str, Any]):
         else:
             log_error(ticket_id, "planner", "Planner analysis failed")
             update_ticket_status(ticket_id, "error")
-            await update_jira_ticket(
+            queue_jira_update(
                 ticket_id,
                 "",
                 "BugFix AI: Planner analysis failed. Escalating to human review."
@@ -115,6 +196,7 @@ async def process_ticket(ticket: Dict[str, Any]):
             return
             
         update_ticket_status(ticket_id, "processing", {"planner_analysis": planner_analysis})
+        check_lease()
         
         # Step 2-4: Developer-QA Loop
         current_attempt = 1
@@ -122,6 +204,7 @@ async def process_ticket(ticket: Dict[str, Any]):
         retry_history = []  # Track retry history with QA results
         
         while current_attempt <= MAX_RETRIES and not qa_passed:
+            check_lease()
             logger.info(f"Sending ticket {ticket_id} to Developer agent (attempt {current_attempt}/{MAX_RETRIES})")
             update_ticket_status(ticket_id, "processing", {
                 "current_attempt": current_attempt,
@@ -130,16 +213,15 @@ async def process_ticket(ticket: Dict[str, Any]):
             
             # Update JIRA
             if current_attempt == 1:
-                await update_jira_ticket(ticket_id, "", "Developer generating patch")
+                queue_jira_progress(ticket_id, "Developer generating patch")
             else:
                 # Include detailed failure information from previous attempt for smart retries
                 previous_failure = ""
                 if retry_history and "failure_summary" in retry_history[-1].get("qa_results", {}):
                     previous_failure = f" based on previous failure: {retry_history[-1]['qa_results']['failure_summary']}"
                 
-                await update_jira_ticket(
+                queue_jira_progress(
                     ticket_id,
-                    "",
                     f"Developer generating revised patch (attempt {current_attempt}/{MAX_RETRIES}){previous_failure}"
                 )
             
@@ -156,9 +238,23 @@ async def process_ticket(ticket: Dict[str, Any]):
             }
             
             log_agent_input(ticket_id, "developer", developer_input)
-            developer_response = await call_developer_agent(planner_analysis, current_attempt, developer_context)
+            speculative_qa_response = None
+            saved_qa_response = work_queue.get_checkpoint(ticket_id, "qa", current_attempt)
+            developer_response = work_queue.get_checkpoint(ticket_id, "developer", current_attempt)
+            if developer_response:
+                logger.info(f"Resuming ticket {ticket_id} attempt {current_attempt} from saved developer patch")
+            elif SPECULATIVE_CANDIDATES > 1:
+                # Race several candidate patches; QA has already run on the one returned
+                developer_response, speculative_qa_response = await run_speculative_candidates(
+                    ticket, planner_analysis, current_attempt, developer_context
+                )
+            else:
+                developer_response = await call_developer_agent(
+                    planner_analysis, current_attempt, developer_context, ticket=ticket
+                )
             
             if developer_response:
+                work_queue.save_checkpoint(ticket_id, "developer", developer_response, current_attempt)
                 log_agent_output(ticket_id, "developer", developer_response)
                 
                 # Check for confidence score and consider early escalation
@@ -175,7 +271,7 @@ async def process_ticket(ticket: Dict[str, Any]):
                     })
                     
                     # Call communicator for early escalation
-                    await call_communicator_agent(
+                    queue_communicator_update(
                         ticket_id=ticket_id,
                         diffs=[],
                         test_results=None,
@@ -201,15 +297,14 @@ async def process_ticket(ticket: Dict[str, Any]):
                     return
                     
                 # Update JIRA with developed patch details
-                await update_jira_ticket(
+                queue_jira_progress(
                     ticket_id,
-                    "",
                     f"BugFix AI: Developer created patch (attempt {current_attempt}/{MAX_RETRIES})." +
                     (f" Confidence score: {confidence_score}%" if confidence_score is not None else "")
                 )
                 
                 # Notify JIRA about developer patch
-                await call_communicator_agent(
+                queue_communicator_update(
                     ticket_id=ticket_id,
                     diffs=developer_response.get("diffs", []),
                     test_results=None,
@@ -221,7 +316,7 @@ async def process_ticket(ticket: Dict[str, Any]):
             else:
                 log_error(ticket_id, "developer", f"Developer patch generation failed on attempt {current_attempt}")
                 update_ticket_status(ticket_id, "error")
-                await update_jira_ticket(
+                queue_jira_update(
                     ticket_id,
                     "",
                     f"BugFix AI: Developer patch generation failed on attempt {current_attempt}. Escalating to human review."
@@ -229,10 +324,11 @@ async def process_ticket(ticket: Dict[str, Any]):
                 return
                 
             update_ticket_status(ticket_id, "processing", {"developer_diffs": developer_response})
+            check_lease()
             
             # Call QA
             logger.info(f"Sending ticket {ticket_id} to QA agent (attempt {current_attempt})")
-            await update_jira_ticket(ticket_id, "", f"QA testing fix (attempt {current_attempt})")
+            queue_jira_progress(ticket_id, f"QA testing fix (attempt {current_attempt})")
             
             qa_input = {
                 "ticket_id": ticket_id,
@@ -241,7 +337,14 @@ async def process_ticket(ticket: Dict[str, Any]):
             }
             log_agent_input(ticket_id, "qa", qa_input)
             
-            qa_response = await call_qa_agent(developer_response)
+            if saved_qa_response is not None:
+                qa_response = saved_qa_response
+            elif speculative_qa_response is not None:
+                qa_response = speculative_qa_response
+            else:
+                qa_response = await call_qa_agent(developer_response)
+            if qa_response and saved_qa_response is None:
+                work_queue.save_checkpoint(ticket_id, "qa", qa_response, current_attempt)
             qa_passed = process_qa_results(ticket_id, developer_response, qa_response)
             
             update_ticket_status(ticket_id, "processing", {"qa_results": qa_response})
@@ -274,11 +377,7 @@ async def process_ticket(ticket: Dict[str, Any]):
                     qa_jira_comment += "\nMaximum retries reached. Escalating to human review."
                     
             # Post QA results to JIRA
-            await update_jira_ticket(
-                ticket_id, 
-                "", 
-                qa_jira_comment
-            )
+            queue_jira_progress(ticket_id, qa_jira_comment)
             
             # Store results for future retries - key for smart retry logic
             retry_entry = {
@@ -319,7 +418,7 @@ async def process_ticket(ticket: Dict[str, Any]):
                         })
                         
                         # Call communicator for early escalation
-                        await call_communicator_agent(
+                        queue_communicator_update(
                             ticket_id=ticket_id,
                             diffs=[],
                             test_results=qa_response.get("test_results", []),
@@ -354,7 +453,7 @@ async def process_ticket(ticket: Dict[str, Any]):
                 escalation_reason = f"Maximum retries ({MAX_RETRIES}) reached with continued test failures"
                 
                 # Call communicator for escalation
-                await call_communicator_agent(
+                queue_communicator_update(
                     ticket_id=ticket_id,
                     diffs=[],
                     test_results=qa_response.get("test_results", []),
@@ -390,8 +489,13 @@ async def process_ticket(ticket: Dict[str, Any]):
             return
         
         # Step 5: Communicator for successful fix
+        check_lease()
         logger.info(f"Sending ticket {ticket_id} to Communicator agent")
         
+        # The Communicator posts its own JIRA updates; let the queued ones land first
+        # so the ticket's comment history stays in order
+        await get_notification_outbox().wait_delivered(ticket_id, NOTIFICATION_FLUSH_TIMEOUT_SECONDS)
+        
         commit_message = developer_response.get("commit_message", f"Fix bug {ticket_id}")
         if not commit_message.startswith(f"Fix {ticket_id}:"):
             commit_message = f"Fix {ticket_id}: {commit_message}"
@@ -423,7 +527,7 @@ async def process_ticket(ticket: Dict[str, Any]):
         else:
             log_error(ticket_id, "communicator", "Failed to deploy fix")
             update_ticket_status(ticket_id, "error")
-            await update_jira_ticket(
+            queue_jira_update(
                 ticket_id,
                 "",
                 "BugFix AI: Failed to deploy the fix. Escalating to human review."
@@ -445,12 +549,20 @@ async def process_ticket(ticket: Dict[str, Any]):
         from controller import collate_logs
         collate_logs(ticket_id)
             
+    except asyncio.CancelledError:
+        # Leave the ticket pending in the work queue so it resumes after a restart
+        finished = False
+        raise
+    except LeaseLostError as e:
+        # Another consumer took the ticket over and reports its outcome to JIRA
+        logger.warning(f"Stopped processing ticket {ticket_id}: {str(e)}")
+        finished = False
     except Exception as e:
         logger.error(f"Error processing ticket {ticket_id}: {str(e)}")
         update_ticket_status(ticket_id, "error")
         log_error(ticket_id, "processor", f"Unhandled exception: {str(e)}")
         
-        await update_jira_ticket(
+        queue_jira_update(
             ticket_id,
             "",
             f"BugFix AI encountered an error: {str(e)}. Escalating to human review."
@@ -467,3 +579,8 @@ async def process_ticket(ticket: Dict[str, Any]):
             )
         except Exception as analytics_error:
             logger.error(f"Error logging analytics: {str(analytics_error)}")
+    finally:
+        if finished:
+            # Map the in-memory ticket status onto a final work queue status
+            status = active_tickets.get(ticket_id, {}).get("status")
+            work_queue.set_status(ticket_id, status if status in ("completed", "escalated") else "failed")
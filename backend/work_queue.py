@@ -0,0 +1,212 @@
+"""
+Durable work queue with per-stage checkpoints, backed by SQLite.
+
+Every ticket that enters the pipeline is recorded along with the output of each
+finished stage (planner result, each developer attempt, each QA result). After a
+restart, unfinished tickets are picked up again and resume from their last saved
+stage, so LLM calls whose output is already stored are never repeated.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("work-queue")
+
+# Directory holding one SQLite database per pipeline (orchestrator, controller)
+WORK_QUEUE_DIR = os.environ.get("WORK_QUEUE_DIR", "data")
+
+# Statuses that mean the ticket is done and must not be picked up again
+FINISHED_STATUSES = ("completed", "escalated", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    ticket_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    output TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (ticket_id, stage, attempt)
+);
+"""
+
+
+class WorkQueue:
+    """SQLite-backed ticket queue and stage checkpoint store"""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the work queue
+
+        Args:
+            db_path: Path of the SQLite database, created if missing
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            # WAL lets the status API read while a worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+        logger.info(f"Using work queue database: {self.db_path}")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and rolling back on error"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                yield conn
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, ticket: Dict[str, Any]) -> bool:
+        """
+        Record a ticket as queued
+
+        Args:
+            ticket: Ticket payload, must contain ticket_id
+
+        Returns:
+            True if the ticket is queued or in progress, False if it already finished
+        """
+        ticket_id = ticket.get("ticket_id")
+        now = datetime.now().isoformat()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT status FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO tickets (ticket_id, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (ticket_id, json.dumps(ticket, default=str), "queued", now, now)
+                    )
+                    return True
+                return row["status"] not in FINISHED_STATUSES
+        except Exception as e:
+            logger.error(f"Error queueing ticket {ticket_id}: {str(e)}")
+            return False
+
+    def set_status(self, ticket_id: str, status: str) -> None:
+        """Update a ticket's status (queued, processing, completed, escalated, failed)"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE tickets SET status = ?, updated_at = ? WHERE ticket_id = ?",
+                    (status, datetime.now().isoformat(), ticket_id)
+                )
+        except Exception as e:
+            logger.error(f"Error updating status for ticket {ticket_id}: {str(e)}")
+
+    def get_status(self, ticket_id: str) -> Optional[str]:
+        """Get a ticket's status, or None if it was never queued"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT status FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+                return row["status"] if row else None
+        except Exception as e:
+            logger.error(f"Error reading status for ticket {ticket_id}: {str(e)}")
+            return None
+
+    def is_finished(self, ticket_id: str) -> bool:
+        """Check whether a ticket has reached a final status"""
+        return self.get_status(ticket_id) in FINISHED_STATUSES
+
+    def pending_tickets(self) -> List[Dict[str, Any]]:
+        """Get payloads of tickets that are queued or were interrupted mid-processing, oldest first"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT payload FROM tickets WHERE status IN ('queued', 'processing') ORDER BY created_at"
+                ).fetchall()
+                return [json.loads(row["payload"]) for row in rows]
+        except Exception as e:
+            logger.error(f"Error reading pending tickets: {str(e)}")
+            return []
+
+    def save_checkpoint(self, ticket_id: str, stage: str, output: Dict[str, Any], attempt: int = 0) -> None:
+        """
+        Save the output of a finished stage
+
+        Args:
+            ticket_id: Ticket the stage belongs to
+            stage: Stage name (planner, developer, qa, ...)
+            output: Stage output, must be JSON serializable
+            attempt: Attempt number for stages that repeat, 0 otherwise
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (ticket_id, stage, attempt, output, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (ticket_id, stage, attempt, json.dumps(output, default=str), datetime.now().isoformat())
+                )
+        except Exception as e:
+            logger.error(f"Error saving {stage} checkpoint for ticket {ticket_id}: {str(e)}")
+
+    def get_checkpoint(self, ticket_id: str, stage: str, attempt: int = 0) -> Optional[Dict[str, Any]]:
+        """Get the saved output of a stage, or None if it hasn't finished"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT output FROM checkpoints WHERE ticket_id = ? AND stage = ? AND attempt = ?",
+                    (ticket_id, stage, attempt)
+                ).fetchone()
+                return json.loads(row["output"]) if row else None
+        except Exception as e:
+            logger.error(f"Error reading {stage} checkpoint for ticket {ticket_id}: {str(e)}")
+            return None
+
+    def get_checkpoints(self, ticket_id: str) -> List[Dict[str, Any]]:
+        """Get all saved stage outputs for a ticket in the order they were saved"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT stage, attempt, output, created_at FROM checkpoints WHERE ticket_id = ? ORDER BY created_at",
+                    (ticket_id,)
+                ).fetchall()
+                return [
+                    {
+                        "stage": row["stage"],
+                        "attempt": row["attempt"],
+                        "output": json.loads(row["output"]),
+                        "created_at": row["created_at"]
+                    }
+                    for row in rows
+                ]
+        except Exception as e:
+            logger.error(f"Error reading checkpoints for ticket {ticket_id}: {str(e)}")
+            return []
+
+
+# Singleton instances, one per pipeline
+_work_queues: Dict[str, WorkQueue] = {}
+
+def get_work_queue(name: str = "orchestrator") -> WorkQueue:
+    """
+    Get the singleton work queue for a pipeline
+
+    The orchestrator and the controller run different agents whose stage outputs
+    aren't interchangeable, so each gets its own database.
+    """
+    if name not in _work_queues:
+        _work_queues[name] = WorkQueue(os.path.join(WORK_QUEUE_DIR, f"{name}_work_queue.db"))
+    return _work_queues[name]